@@ -2,13 +2,45 @@
 from __future__ import annotations  # 允许在注解中引用后定义的类型
 
 import asyncio  # 用于在同步环境中运行异步协程
-from dataclasses import dataclass  # 用 dataclass 表达广播结果
+import time  # Telegram 调用计时
+from dataclasses import dataclass, field  # 用 dataclass 表达广播结果
+from datetime import datetime, timedelta  # 渲染变量中的日期时间；失败冷却期
+from typing import Any, Awaitable, Callable, Iterable, Sequence, TypeVar  # 描述批量任务的输入类型
+from zoneinfo import ZoneInfo  # 按 Settings.timezone 计算日期
 
+from loguru import logger  # 结构化日志，handler 由 app.log 配置
 from telegram import Bot  # Telegram 官方 Bot 客户端
 
+from app.bot.client import bot_client_lifespan, get_bot_client  # 复用进程级 Bot 客户端
+from app.bot.progress import FAILED, RATE_LIMITED, RETRYING, SENT  # 进度回调使用的状态名
+from app.bot.rate_limit import RateLimiter, get_rate_limiter, infer_chat_type  # 发送前等待令牌；未登记 chat 的类型推断
+from app.bot.retry import CHAT_MIGRATED, DEFAULT_RETRY_POLICY, PERMANENT, DelayQueue, DeliveryAttempt, FloodDetector, RetryPolicy, chat_failure  # 429 与网络错误的重试；chat 失效识别
 from app.config import get_settings  # 读取运行时配置（如 BOT_TOKEN）
-from app.db.session import init_db, session_scope  # 初始化数据库并提供会话上下文
-from app.services.templates import TemplateNotFoundError, TemplateService  # 使用模板服务读取或校验模板
+from app.db.session import ensure_schema, session_scope  # 确保表结构就绪并提供会话上下文
+from app.log import new_correlation_id  # 每条投递一个关联 ID
+from app.metrics import CHAT_HEALTH_TOTAL, MANUAL_BROADCAST_SECONDS, MANUAL_BROADCASTS_TOTAL, SENDS_TOTAL, TELEGRAM_REQUEST_SECONDS, timed  # 发送路径指标
+from app.profiling import profiling_broadcasts, span  # PROFILE_BROADCASTS 开启时按阶段计时
+from app.services.chats import ChatHealthReport, ChatService, ChatStatus  # chat 跳过判断与状态回写
+from app.services.deliveries import DeliveryService  # 写入逐次发送尝试
+from app.services.templates import TemplateNotFoundError, TemplateService, TemplateSnapshot, get_compiled, get_template_cache  # 通过进程级缓存读取并渲染模板
+
+T = TypeVar("T")  # 同步封装的返回类型
+ProgressCallback = Callable[[int, str, str | None, float | None], None]  # (输入序号, 状态, 错误, retry_after)
+
+
+class ChatSkippedError(RuntimeError):
+    """chat 已停用或处于失败冷却期，本次没有发送。"""  # 错误信息为跳过原因
+
+
+def _observe_send(chat_id: int, chat_type: str | None, outcome: str, elapsed: float) -> None:  # 记录一次 sendMessage 调用
+    TELEGRAM_REQUEST_SECONDS.labels("sendMessage", "ok" if outcome == SENT else "error").observe(elapsed)  # Telegram 调用耗时
+    SENDS_TOTAL.labels(chat_type or infer_chat_type(chat_id), outcome).inc()  # 按 chat 类型与结果计数，未登记的 chat 与限速器同样按 ID 推断
+
+
+def _retry_outcome(decision) -> str:  # 把重试决策映射为指标/进度中的结果名
+    if not decision.retry:  # 不再重试即最终失败
+        return FAILED
+    return RATE_LIMITED if decision.retry_after is not None else RETRYING  # 429 单独统计
 
 
 @dataclass(slots=True)  # 使用 slots 减少开销
@@ -21,31 +53,350 @@ class ManualBroadcastResult:
     dry_run: bool  # 标记是否仅为预览
 
 
+@dataclass(slots=True)  # 单条待发送任务
+class BroadcastJob:
+    """批量广播中的一个 (模板, chat) 组合。"""  # 可选携带覆盖文本
+
+    template_name: str  # 模板名称；按 ID 投递时可为空
+    chat_id: int  # 目标 chat 的 ID
+    override_text: str | None = None  # 可选的覆盖文本
+    template_id: int | None = None  # 指定时按模板 ID 读取（投递队列使用）
+    context: dict[str, Any] | None = None  # 额外的渲染变量，覆盖内置变量
+    correlation_id: str | None = None  # 日志关联 ID；为空时自动生成，重试沿用同一个
+
+
+@dataclass(slots=True)  # 单条任务的执行结果
+class BroadcastOutcome:
+    """记录批量广播中每个 (模板, chat) 的执行结果。"""  # 失败不会中断整批任务
+
+    template_name: str  # 模板名称
+    chat_id: int  # 目标 chat 的 ID
+    ok: bool  # 是否发送（或预览）成功
+    text: str | None = None  # 实际发送或预览的文本
+    dry_run: bool = False  # 是否仅为预览
+    error: str | None = None  # 失败时的错误描述
+    attempts: list[DeliveryAttempt] = field(default_factory=list)  # 历次发送尝试
+    exception: BaseException | None = None  # 最终失败的原始异常，单条发送时原样抛出
+
+
+@timed(MANUAL_BROADCAST_SECONDS)  # 记录整次调用耗时
 async def send_manual_broadcast(*, template_name: str, chat_id: int, override_text: str | None = None, dry_run: bool = False) -> ManualBroadcastResult:  # 执行真正的广播逻辑
     """根据模板向指定 chat 发送消息，可选择仅预览。"""  # 支持 override 文本与 dry-run
 
-    init_db()  # 确保第一次运行时数据库表已创建
+    correlation_id = new_correlation_id()  # 本次调用内的日志共用一个关联 ID
+    with logger.contextualize(correlation_id=correlation_id), profiling_broadcasts("manual_broadcast"):  # 开启剖析时整次调用计入一次剖析
+        try:
+            result = await _send_manual_broadcast(template_name=template_name, chat_id=chat_id, override_text=override_text, dry_run=dry_run, correlation_id=correlation_id)  # 实际逻辑
+        except Exception as exc:
+            MANUAL_BROADCASTS_TOTAL.labels(FAILED).inc()  # 模板缺失或发送最终失败
+            logger.warning("manual broadcast failed", template=template_name, chat_id=chat_id, error=f"{type(exc).__name__}: {exc}")  # 记录失败原因
+            raise
+        MANUAL_BROADCASTS_TOTAL.labels("dry_run" if result.dry_run else SENT).inc()  # 按结果计数
+        logger.info("manual broadcast finished", template=template_name, chat_id=chat_id, dry_run=result.dry_run)  # 记录本次结果
+        return result
+
+
+async def _send_manual_broadcast(*, template_name: str, chat_id: int, override_text: str | None, dry_run: bool, correlation_id: str | None = None) -> ManualBroadcastResult:  # send_manual_broadcast 的实现
+    """单条任务交给批量引擎执行，与批量发送共用停用 chat 的跳过、群组迁移后的重发、重试与 chat 状态回写。"""  # 最终失败时抛出原始异常
+
+    job = BroadcastJob(template_name=template_name, chat_id=chat_id, override_text=override_text, correlation_id=correlation_id)  # 沿用调用方的关联 ID
+    outcome = (await broadcast_many([job], concurrency=1, dry_run=dry_run))[0]  # 单条任务
+    if not outcome.ok:  # 模板缺失、chat 被跳过或发送最终失败
+        raise outcome.exception or RuntimeError(outcome.error)
+    return ManualBroadcastResult(template_name=outcome.template_name, chat_id=outcome.chat_id, text=outcome.text, dry_run=dry_run)  # chat 迁移后为新 ID
+
+
+def iter_matrix(template_names: Sequence[str], chat_ids: Sequence[int], *, override_text: str | None = None) -> Iterable[BroadcastJob]:  # 展开模板 × chat 组合
+    """按模板优先的顺序生成所有 (模板, chat) 组合。"""  # 惰性生成，避免提前构造大列表
+
+    for name in template_names:  # 外层遍历模板
+        for chat_id in chat_ids:  # 内层遍历 chat
+            yield BroadcastJob(template_name=name, chat_id=chat_id, override_text=override_text)  # 逐个产出任务
+
+
+def _lookup_template(key: str | int) -> TemplateSnapshot | TemplateNotFoundError:  # 在线程中读取模板
+    with session_scope() as session:  # 缓存未命中或需要校验版本时打开短会话
+        try:
+            return TemplateService(session).get_cached_template(key)  # 读取并写入进程级缓存
+        except TemplateNotFoundError as exc:  # 返回而不是抛出，并发等待者共用同一结果
+            return exc
+
+
+def _load_chats() -> dict[int, ChatStatus]:  # 一次性读取全部 chat 类型、标题与跳过原因
+    """返回 chat_id → ChatStatus，供限速器区分群组与私聊、渲染 chat 变量、跳过已失效的 chat。"""  # Chat 表规模很小，整表读取比逐条查询更省
+
+    settings = get_settings()  # 失败阈值与冷却期
+    with session_scope() as session:  # 打开短会话
+        return ChatService(session).load_statuses(threshold=settings.chat_failure_threshold, cooldown=timedelta(seconds=settings.chat_failure_cooldown))  # 单条查询
+
+
+def attempt_rows(attempts: Iterable[DeliveryAttempt], template_id: int | None) -> list[dict]:  # 转换为 sendattempt 表的行
+    """每次尝试一行：时间、结果、错误类别、错误描述与 retry_after；delivery_id 由调用方补充。"""
+
+    return [
+        {
+            "template_id": template_id,
+            "chat_id": attempt.chat_id,
+            "attempt": attempt.attempt,
+            "ok": attempt.ok,
+            "kind": attempt.kind,
+            "error": attempt.error[:500] if attempt.error else None,
+            "retry_after": attempt.retry_after,
+            "created_at": attempt.at,
+        }
+        for attempt in attempts
+    ]
+
+
+def _record_attempts(rows: list[dict]) -> None:  # 在线程中写入发送尝试
+    with session_scope() as session:
+        DeliveryService(session).record_attempts(rows)  # 一次 executemany
+
+
+def _record_health(report: ChatHealthReport) -> None:  # 在线程中写回 chat 状态
+    with session_scope() as session:
+        ChatService(session).record_health(report)  # 各类变化各一次 executemany
+
+
+async def _flush_health(report: ChatHealthReport) -> None:  # 批次结束时写回 chat 状态
+    """停用失效 chat、改写已迁移的 chat、累计或清零失败计数，并记录指标。"""
+
+    if not report:  # 全部正常时不访问数据库
+        return
+    await asyncio.to_thread(_record_health, report)
+    for change, count in (("gone", len(report.gone)), ("migrated", len(report.migrated)), ("failed", len(report.failed)), ("recovered", len(report.recovered))):
+        if count:
+            CHAT_HEALTH_TOTAL.labels(change).inc(count)
+    logger.info("chat health updated", gone=sorted(report.gone), migrated=report.migrated, failed=sorted(report.failed), recovered=len(report.recovered))
+
+
+def _note_failure(report: ChatHealthReport, chat_id: int, kind: str, error: str, exc: BaseException) -> None:  # 把最终失败归入 chat 状态
+    failure = chat_failure(exc)  # Forbidden / chat not found / ChatMigrated
+    if failure is not None and failure.kind == CHAT_MIGRATED:
+        report.migrated[chat_id] = failure.migrate_to
+    elif failure is not None:  # Bot 已不在 chat 中
+        report.gone[chat_id] = error
+    elif kind != PERMANENT:  # 重试用尽的网络错误与 429 计入失败分数；模板格式等错误与 chat 无关
+        report.failed[chat_id] = error
+
+
+def render_context(job: BroadcastJob, template: TemplateSnapshot, *, index: int, chat: tuple[str, str | None] | None, now: datetime) -> dict[str, Any]:  # 构造单条消息的渲染变量
+    """内置变量：chat_id、chat_title、chat_type、template_name、version、index（批次内从 1 开始的序号）、date、time。"""
+
+    chat_type, title = chat or (None, None)  # 未登记的 chat 没有标题
+    context: dict[str, Any] = {
+        "chat_id": job.chat_id,
+        "chat_title": title or str(job.chat_id),
+        "chat_type": chat_type or "",
+        "template_name": template.name,
+        "version": template.version,
+        "index": index + 1,
+        "date": now.strftime("%Y-%m-%d"),
+        "time": now.strftime("%H:%M"),
+    }
+    if job.context:  # 调用方提供的变量优先
+        context.update(job.context)
+    return context
+
+
+@dataclass(slots=True)  # 引擎内部的任务状态
+class _PendingJob:
+    """在就绪队列与延迟队列之间流转的任务。"""  # 记录序号与历次尝试
+
+    index: int  # 输入序号
+    job: BroadcastJob  # 原始任务
+    correlation_id: str  # 日志关联 ID，整个重试过程不变
+    attempts: list[DeliveryAttempt] = field(default_factory=list)  # 已完成的尝试
+    holds_slot: bool = True  # 是否占用背压窗口的名额
+
+
+async def broadcast_many(jobs: Iterable[BroadcastJob], *, concurrency: int | None = None, dry_run: bool = False, limiter: RateLimiter | None = None, retry_policy: RetryPolicy | None = None, on_progress: ProgressCallback | None = None, record_attempts: bool = True) -> list[BroadcastOutcome]:  # 并发执行一批广播任务
+    """以有界并发执行一批广播任务，返回与输入顺序一致的逐条结果。
+
+    on_progress 在每次状态变化时同步调用：最终结果为 sent/failed，停放重试时为 retrying/rate_limited。
+    record_attempts 为真时整批结束后把逐次尝试写入 sendattempt 表；投递队列传 False，随结果回写一并写入。
+    """  # 在途请求数不超过 concurrency；需重试的任务停放在延迟队列中
+
+    with profiling_broadcasts():  # PROFILE_BROADCASTS 开启且未处于其他剖析中时，整批计入一次剖析
+        return await _broadcast_many(jobs, concurrency=concurrency, dry_run=dry_run, limiter=limiter, retry_policy=retry_policy, on_progress=on_progress, record_attempts=record_attempts)
+
+
+async def _broadcast_many(jobs: Iterable[BroadcastJob], *, concurrency: int | None, dry_run: bool, limiter: RateLimiter | None, retry_policy: RetryPolicy | None, on_progress: ProgressCallback | None, record_attempts: bool) -> list[BroadcastOutcome]:  # broadcast_many 的实现
+    limit = max(1, concurrency or get_settings().broadcast_concurrency)  # 计算并发上限
+    ensure_schema()  # 进程内只迁移一次，之后为常数时间检查
+
+    cache = get_template_cache()  # 进程级模板缓存，整批只在首次遇到某模板时访问数据库
+    missing: dict[str | int, TemplateNotFoundError] = {}  # 本批次中不存在的模板，键为名称或 ID
+    loading: dict[str | int, asyncio.Future] = {}  # 进行中的模板查询，键为名称或 ID
+    outcomes: dict[int, BroadcastOutcome] = {}  # 按输入序号保存结果
+    ready: asyncio.Queue[_PendingJob] = asyncio.Queue()  # 就绪队列，容量由 window 控制
+    window = asyncio.Semaphore(limit * 2)  # 就绪与执行中的任务上限，流式输入时提供背压
+    parked: DelayQueue[_PendingJob] = DelayQueue(ready.put_nowait)  # 等待重试的任务，到期后放回就绪队列
+    with span("bot_client"):  # 首次调用时构造 Bot 与连接池
+        client = None if dry_run else get_bot_client()  # dry-run 不需要网络客户端
+    limiter = limiter or get_rate_limiter()  # 默认使用进程级限速器
+    policy = retry_policy or DEFAULT_RETRY_POLICY  # 默认重试策略
+    flood = FloodDetector()  # 识别全局限流
+    chats = None if dry_run else await asyncio.to_thread(_load_chats)  # 预取 chat 类型与跳过原因；dry-run 只在模板含变量时读取
+    health = ChatHealthReport()  # 本批 chat 状态变化，结束时一次写回
+    attempt_log: list[dict] = []  # 本批逐次尝试，结束时一次写入
+    now = datetime.now(ZoneInfo(get_settings().timezone))  # 整批共用的渲染时间
+    remaining = 0  # 尚未得出最终结果的任务数
+    producing = True  # 输入是否仍在读取
+    finished = asyncio.Event()  # 全部任务结束的信号
+
+    async def resolve(job: BroadcastJob) -> TemplateSnapshot | TemplateNotFoundError:  # 读取模板快照
+        key = job.template_id if job.template_id is not None else job.template_name  # 优先按 ID
+        if key in missing:  # 缺失的模板整批只查询一次
+            return missing[key]
+        snapshot = cache.get(key)  # 命中时无需打开会话
+        if snapshot is not None:
+            return snapshot
+        lookup = loading.get(key)  # 同一模板的并发未命中共用一次查询
+        if lookup is None:
+            lookup = loading[key] = asyncio.ensure_future(asyncio.to_thread(_lookup_template, key))  # 数据库访问放到线程中，不阻塞同一事件循环上的 API 请求
+            lookup.add_done_callback(lambda _: loading.pop(key, None))  # 之后的未命中（如版本校验到期）重新查询
+        result = await lookup
+        if isinstance(result, TemplateNotFoundError):  # 缺失模板在本批次内缓存，避免重复查询
+            missing[key] = result
+        return result
+
+    async def render(item: _PendingJob, template: TemplateSnapshot) -> str:  # 使用编译缓存渲染
+        nonlocal chats
+        compiled = get_compiled(template)  # 按 (id, version, 正文) 缓存的编译结果
+        if compiled.is_static and not item.job.context:  # 不含变量时直接返回正文
+            return compiled.render()
+        if chats is None:  # dry-run 首次遇到含变量的模板时读取 chat 标题
+            chats = await asyncio.to_thread(_load_chats)
+        status = chats.get(item.job.chat_id)  # 未登记的 chat 没有标题
+        return compiled.render(render_context(item.job, template, index=item.index, chat=(status.type, status.title) if status else None, now=now))
+
+    def finish(item: _PendingJob, outcome: BroadcastOutcome) -> None:  # 记录最终结果
+        nonlocal remaining
+        outcome.attempts = item.attempts  # 附带历次尝试
+        if record_attempts and item.attempts:  # dry-run 与未发送的任务没有尝试
+            attempt_log.extend(attempt_rows(item.attempts, item.job.template_id))
+        outcomes[item.index] = outcome  # 按序号保存
+        if on_progress is not None:  # 通知调用方最终状态
+            on_progress(item.index, SENT if outcome.ok else FAILED, outcome.error, None)
+        if item.holds_slot:  # 归还背压名额
+            window.release()
+        remaining -= 1
+        if not producing and remaining == 0:  # 输入已读完且全部结束
+            finished.set()
+
+    async def attempt(item: _PendingJob, bot: Bot | None) -> None:  # 执行一次尝试
+        job = item.job  # 原始任务
+        with span("template"):  # 模板查找（缓存未命中时含数据库）
+            template = await resolve(job)  # 获取模板
+        if isinstance(template, TemplateNotFoundError):  # 模板缺失时直接记为失败
+            logger.warning("delivery failed", chat_id=job.chat_id, template=job.template_name or job.template_id, error="template not found")  # 模板缺失
+            return finish(item, BroadcastOutcome(template_name=job.template_name, chat_id=job.chat_id, ok=False, error=f"未找到模板：{template}", exception=template))  # 返回失败结果
+        if not job.template_name:  # 按 ID 投递时补全模板名称，便于结果展示
+            job.template_name = template.name
+        if job.template_id is None:  # 按名称发送时补全模板 ID，尝试记录使用
+            job.template_id = template.id
+        with span("render"):  # 渲染阶段
+            text = job.override_text or await render(item, template)  # 优先使用覆盖文本，否则渲染模板
+        if dry_run:  # 预览模式不访问网络
+            return finish(item, BroadcastOutcome(template_name=job.template_name, chat_id=job.chat_id, ok=True, text=text, dry_run=True))  # 返回预览结果
+        status = chats.get(job.chat_id)  # 已登记 chat 的类型与跳过原因
+        if status is not None and status.skip_reason:  # 已停用或连续失败的 chat 不占用请求与限速令牌
+            CHAT_HEALTH_TOTAL.labels("skipped").inc()
+            return finish(item, BroadcastOutcome(template_name=job.template_name, chat_id=job.chat_id, ok=False, text=text, error=status.skip_reason, exception=ChatSkippedError(status.skip_reason)))
+        number = len(item.attempts) + 1  # 本次为第几次尝试
+        chat_type = status.type if status else None  # 限速档位
+        with span("rate_limit"):  # 限速等待
+            await limiter.acquire(job.chat_id, chat_type)  # 等待全局与单聊令牌
+        started = time.perf_counter()  # Telegram 调用计时
+        try:
+            with span("http"):  # Telegram 请求
+                await bot.send_message(chat_id=job.chat_id, text=text, parse_mode=template.parse_mode)  # 调用 Telegram 发送
+        except Exception as exc:  # noqa: BLE001 - 单条失败不影响其他任务
+            error = f"{type(exc).__name__}: {exc}"  # 错误描述
+            decision = policy.decide(exc, number)  # 根据错误类型决定是否重试
+            elapsed = time.perf_counter() - started  # 本次调用耗时
+            _observe_send(job.chat_id, chat_type, _retry_outcome(decision), elapsed)  # 记录失败的调用
+            if decision.retry_after is not None:  # 429：只暂停受影响的 chat
+                limiter.pause_chat(job.chat_id, decision.retry_after, chat_type)
+                if flood.record(job.chat_id):  # 多个 chat 同时 429，判定为全局限流
+                    limiter.pause_global(decision.retry_after)
+            failure = chat_failure(exc)  # 群组升级后改用新 ID 立即重发一次
+            if failure is not None and failure.kind == CHAT_MIGRATED and job.chat_id not in health.migrated:
+                health.migrated[job.chat_id] = failure.migrate_to
+                item.attempts.append(DeliveryAttempt(attempt=number, ok=False, error=error, kind=CHAT_MIGRATED, next_delay=0.0, chat_id=job.chat_id))
+                logger.warning("chat migrated, resending", chat_id=job.chat_id, migrate_to=failure.migrate_to)
+                job.chat_id = failure.migrate_to  # 结果与后续日志使用新 ID
+                ready.put_nowait(item)  # 保留背压名额，直接重新排队
+                return None
+            item.attempts.append(DeliveryAttempt(attempt=number, ok=False, error=error, kind=decision.kind, retry_after=decision.retry_after, next_delay=decision.delay if decision.retry else None, chat_id=job.chat_id))  # 记录本次尝试
+            if decision.retry:  # 停放到延迟队列，释放 worker 与背压名额
+                if item.holds_slot:
+                    window.release()
+                    item.holds_slot = False
+                parked.push(item, decision.delay)
+                logger.warning("delivery retry scheduled", chat_id=job.chat_id, template_id=template.id, attempt=number, kind=decision.kind, delay=decision.delay, retry_after=decision.retry_after, error=error)  # 停放等待重试
+                if on_progress is not None:  # 通知调用方进入重试
+                    on_progress(item.index, _retry_outcome(decision), error, decision.retry_after)
+                return None
+            logger.warning("delivery failed", chat_id=job.chat_id, template_id=template.id, attempt=number, kind=decision.kind, elapsed_ms=round(elapsed * 1000, 1), error=error)  # 最终失败
+            _note_failure(health, job.chat_id, decision.kind, error, exc)  # 停用失效 chat 或累计失败分数
+            return finish(item, BroadcastOutcome(template_name=job.template_name, chat_id=job.chat_id, ok=False, text=text, error=error, exception=exc))  # 记录失败原因
+        elapsed = time.perf_counter() - started  # 本次调用耗时
+        _observe_send(job.chat_id, chat_type, SENT, elapsed)  # 记录成功的调用
+        logger.info("delivery sent", chat_id=job.chat_id, template_id=template.id, attempt=number, elapsed_ms=round(elapsed * 1000, 1))  # 每条成功投递一行日志
+        item.attempts.append(DeliveryAttempt(attempt=number, ok=True, chat_id=job.chat_id))  # 记录成功的尝试
+        if status is not None and status.failure_score:  # 曾经失败的 chat 恢复正常
+            health.recovered.add(job.chat_id)
+        return finish(item, BroadcastOutcome(template_name=job.template_name, chat_id=job.chat_id, ok=True, text=text))  # 返回成功结果
+
+    async def worker(bot: Bot | None) -> None:  # 从就绪队列中持续取任务
+        while True:
+            item = await ready.get()  # 等待下一条任务
+            with logger.contextualize(correlation_id=item.correlation_id):  # 本次尝试内的日志（含限速、数据库）都带上关联 ID
+                try:
+                    await attempt(item, bot)  # 执行一次尝试
+                except Exception as exc:  # noqa: BLE001 - 如数据库异常，保证 worker 不退出
+                    logger.exception("delivery crashed", chat_id=item.job.chat_id)  # 带堆栈记录意外异常
+                    finish(item, BroadcastOutcome(template_name=item.job.template_name, chat_id=item.job.chat_id, ok=False, error=f"{type(exc).__name__}: {exc}", exception=exc))  # 记录失败原因
+
+    workers = [asyncio.create_task(worker(client.bot() if client else None)) for _ in range(limit)]  # 启动固定数量的 worker，轮流绑定共享客户端的分片
+    try:
+        for index, job in enumerate(jobs):  # 流式读取输入任务
+            await window.acquire()  # 窗口已满时在此等待
+            remaining += 1
+            ready.put_nowait(_PendingJob(index=index, job=job, correlation_id=job.correlation_id or new_correlation_id()))
+        producing = False  # 输入读取完毕
+        if remaining == 0:  # 所有任务已经结束（或输入为空）
+            finished.set()
+        await finished.wait()  # 等待全部任务得出最终结果
+    finally:
+        for task in workers:  # 停止 worker
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await parked.aclose()  # 停止延迟队列的定时任务
+
+    await _flush_health(health)  # 整批的 chat 状态变化一次写回
+    if attempt_log:  # 整批的尝试记录一次写入
+        await asyncio.to_thread(_record_attempts, attempt_log)
+    return [outcomes[index] for index in sorted(outcomes)]  # 按输入顺序返回结果
 
-    with session_scope() as session:  # 在数据库会话中读取模板
-        service = TemplateService(session)  # 实例化模板服务
-        template = service.get_template(template_name)  # 获取模板，找不到会抛出 TemplateNotFoundError
 
-    message_text = override_text or template.text  # 优先使用覆盖文本，否则采用模板内容
-    parse_mode = template.parse_mode  # 保留模板指定的 parse_mode
+async def broadcast_matrix(template_names: Sequence[str], chat_ids: Sequence[int], *, override_text: str | None = None, concurrency: int | None = None, dry_run: bool = False, limiter: RateLimiter | None = None, retry_policy: RetryPolicy | None = None) -> list[BroadcastOutcome]:  # 模板 × chat 的批量广播
+    """把每个模板发送到每个 chat，整批并发执行。"""  # API 与 CLI 共用的入口
 
-    if dry_run:  # 预览模式下不调用 Telegram API
-        return ManualBroadcastResult(template_name=template_name, chat_id=chat_id, text=message_text, dry_run=True)  # 返回预览结果
+    return await broadcast_many(iter_matrix(template_names, chat_ids, override_text=override_text), concurrency=concurrency, dry_run=dry_run, limiter=limiter, retry_policy=retry_policy)  # 委托给通用引擎
 
-    bot = Bot(token=get_settings().bot_token)  # 根据配置创建 Telegram Bot 客户端
-    await bot.send_message(chat_id=chat_id, text=message_text, parse_mode=parse_mode)  # 异步调用 Telegram 发送消息
 
-    return ManualBroadcastResult(template_name=template_name, chat_id=chat_id, text=message_text, dry_run=False)  # 返回发送成功的数据
+async def _run_with_client(coro: Awaitable[T]) -> T:  # 在客户端生命周期内执行协程
+    async with bot_client_lifespan():  # 退出时关闭连接池
+        return await coro
 
 
 def run_manual_broadcast(*, template_name: str, chat_id: int, override_text: str | None = None, dry_run: bool = False) -> ManualBroadcastResult:  # 提供同步封装，方便 CLI 使用
     """同步封装的手动广播入口，供命令行调用。"""  # 内部调用异步函数
 
     try:
-        return asyncio.run(send_manual_broadcast(template_name=template_name, chat_id=chat_id, override_text=override_text, dry_run=dry_run))  # 通过 asyncio.run 执行协程
+        return asyncio.run(_run_with_client(send_manual_broadcast(template_name=template_name, chat_id=chat_id, override_text=override_text, dry_run=dry_run)))  # 通过 asyncio.run 执行协程
     except TemplateNotFoundError as exc:  # pragma: no cover - 防御性分支
-        raise SystemExit(f"未找到模板：{exc}") from exc  # 提示用户模板缺失
+        raise SystemExit(f"未找到模板：{exc}") from exc  # 提示用户模板缺失
@@ -0,0 +1,143 @@
+"""进程级 Telegram Bot 客户端管理。"""  # 复用连接池，避免每条消息重新握手
+from __future__ import annotations  # 允许在注解中引用后定义的类型
+
+import importlib.util  # 探测可选的 h2 依赖
+import itertools  # 轮询分片客户端
+from contextlib import asynccontextmanager  # 提供生命周期上下文
+from typing import AsyncIterator  # 上下文管理器的返回类型
+
+import httpx  # 调整 keep-alive 参数
+from loguru import logger  # 结构化日志
+from telegram import Bot  # Telegram 官方 Bot 客户端
+from telegram.request import HTTPXRequest  # 可配置连接池的 HTTP 请求实现
+
+from app.config import Settings, get_settings  # 读取 token、Bot API 地址与连接池配置
+
+CONNECTIONS_PER_CLIENT = 8  # HTTP/1.1 下单个连接池的连接数；httpcore 分配连接的开销随池大小平方增长
+KEEPALIVE_EXPIRY_SECONDS = 60.0  # 空闲连接保留时长，批次之间不必重新握手
+POOL_TIMEOUT_SECONDS = 30.0  # 等待空闲连接的上限；并发已由调用方限制，不应因排队而失败
+
+
+def resolve_http_version(setting: str, base_url: str) -> str:  # 计算实际使用的 HTTP 版本
+    """`auto` 时仅在 HTTPS 且安装了 h2 的情况下启用 HTTP/2。"""  # 明文地址下 HTTP/2 需要服务端支持 prior knowledge，不默认启用
+
+    if setting != "auto":  # 显式配置优先
+        return setting
+    if base_url.startswith("https://") and importlib.util.find_spec("h2") is not None:  # HTTPS + h2 可用
+        return "2"
+    return "1.1"  # 其他情况回退到 HTTP/1.1
+
+
+def shard_sizes(total: int, per_shard: int = CONNECTIONS_PER_CLIENT) -> list[int]:  # 把连接总数拆成多个小连接池
+    """返回各分片的连接数，每片不超过 per_shard；Bot 客户端与订阅源轮询共用。"""
+
+    total = max(1, total)  # 至少一个连接
+    return [min(per_shard, total - start) for start in range(0, total, per_shard)]
+
+
+class BotClientManager:
+    """持有长生命周期的 Bot 与连接池，供所有发送路径复用。"""  # 一个进程一份
+
+    def __init__(self, settings: Settings):  # 根据配置构造客户端
+        self.token = settings.bot_token  # 记录构造时的 token
+        self.base_url = settings.bot_api_base_url  # 记录构造时的 Bot API 地址
+        self.http_version = resolve_http_version(settings.bot_http_version, self.base_url)  # 确定协议版本
+        pool_size = max(1, settings.bot_pool_size)  # 连接总数上限
+        if self.http_version == "1.1":  # HTTP/1.1 每个连接同时只能处理一个请求，按分片拆成多个小连接池
+            sizes = shard_sizes(pool_size)
+        else:  # HTTP/2 在单个连接上多路复用，一个客户端即可
+            sizes = [pool_size]
+        self._requests = [self._build_request(size) for size in sizes]  # 每个分片一个请求对象
+        self._bots = [Bot(token=self.token, base_url=self.base_url, request=request) for request in self._requests]  # 每个分片一个 Bot
+        self._cycle = itertools.cycle(self._bots)  # 轮询分配
+
+    def _build_request(self, size: int) -> HTTPXRequest:  # 构造调优过的请求对象
+        return HTTPXRequest(
+            connection_pool_size=size,  # 分片内连接数
+            pool_timeout=POOL_TIMEOUT_SECONDS,  # 排队等待连接而不是立即失败
+            http_version=self.http_version,  # HTTP/1.1 或 HTTP/2
+            httpx_kwargs={"limits": httpx.Limits(max_connections=size, max_keepalive_connections=size, keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS)},  # 延长 keep-alive
+        )
+
+    def matches(self, settings: Settings) -> bool:  # 判断配置是否变化
+        return self.token == settings.bot_token and self.base_url == settings.bot_api_base_url
+
+    @property
+    def size(self) -> int:  # 分片数量
+        return len(self._bots)
+
+    def bot(self) -> Bot:  # 获取一个共享 Bot
+        """轮询返回一个分片上的 Bot；同一 worker 应持有同一个 Bot 以复用连接。"""
+
+        return next(self._cycle)
+
+    async def start(self) -> None:  # 预先打开连接池
+        for request in self._requests:  # 已关闭的连接池会被重建
+            await request.initialize()
+
+    async def aclose(self) -> None:  # 释放全部连接
+        for request in self._requests:
+            await request.shutdown()
+
+
+_MANAGER: BotClientManager | None = None  # 进程级单例
+
+
+def get_bot_client() -> BotClientManager:  # 获取进程级客户端
+    """返回当前配置对应的客户端管理器，配置变化时重新构建。"""
+
+    global _MANAGER
+    settings = get_settings()  # 读取当前配置
+    if _MANAGER is None or not _MANAGER.matches(settings):  # 首次使用或配置变化
+        _MANAGER = BotClientManager(settings)  # 构造新的管理器
+    return _MANAGER
+
+
+def get_bot() -> Bot:  # 便捷函数
+    """返回一个共享的 Bot 实例。"""
+
+    return get_bot_client().bot()
+
+
+def build_polling_bot(settings: Settings | None = None) -> Bot:  # 长轮询专用客户端
+    """返回只有一个连接的独立 Bot：getUpdates 长时间占用连接，不应挤占发送用的连接池。"""
+
+    settings = settings or get_settings()  # 默认读取当前配置
+    request = HTTPXRequest(connection_pool_size=1, http_version="1.1")  # PTB 会把长轮询的 timeout 加到读超时上
+    return Bot(token=settings.bot_token, base_url=settings.bot_api_base_url, request=request)
+
+
+async def start_bot_client() -> BotClientManager:  # 启动钩子
+    """在服务或命令启动时调用，提前准备连接池。"""
+
+    manager = get_bot_client()
+    await manager.start()
+    logger.info("bot client started", shards=manager.size, base_url=manager.base_url)  # 记录分片数与 Bot API 地址（不含 token）
+    return manager
+
+
+async def close_bot_client() -> None:  # 关闭钩子
+    """在服务或命令退出时调用，关闭所有连接。"""
+
+    global _MANAGER
+    if _MANAGER is not None:
+        await _MANAGER.aclose()
+        _MANAGER = None
+
+
+def reset_bot_client() -> None:  # 测试辅助
+    """丢弃缓存的管理器，下次使用时按当前配置重建（主要用于测试）。"""
+
+    global _MANAGER
+    _MANAGER = None
+
+
+@asynccontextmanager
+async def bot_client_lifespan() -> AsyncIterator[BotClientManager]:  # 组合启动与关闭
+    """在上下文内保持客户端可用，退出时关闭连接池。"""
+
+    manager = await start_bot_client()
+    try:
+        yield manager
+    finally:
+        await close_bot_client()
@@ -0,0 +1,181 @@
+"""RSS/Atom 订阅源轮询。"""  # 共享连接池并发抓取，条件请求跳过未变化的源，新条目批量写成模板
+from __future__ import annotations  # 允许在注解中引用后定义的类型
+
+import asyncio  # 并发抓取与常驻轮询
+import hashlib  # 响应体摘要
+import time  # 轮询耗时
+from typing import Sequence  # 指定订阅源
+
+import httpx  # 异步 HTTP 客户端
+from loguru import logger  # 结构化日志
+
+from app.bot.client import shard_sizes  # 与 Bot 客户端相同的连接池分片
+from app.config import get_settings  # 并发数、超时与轮询间隔
+from app.db.session import session_scope  # 数据库会话
+from app.metrics import FEED_ENTRIES_TOTAL, FEED_FETCHES_TOTAL  # 抓取与条目计数
+from app.services.feeds import FeedError, FeedPollResult, FeedService, FeedTarget, FetchResult, parse_items  # 解析、筛选与批量写入
+
+USER_AGENT = "tg-auto-bot feed poller"  # 部分站点拒绝没有 User-Agent 的请求
+ACCEPT = "application/rss+xml, application/atom+xml, application/xml;q=0.9, text/xml;q=0.9, */*;q=0.1"  # 优先请求订阅格式
+ERROR_RETRY_SECONDS = 30.0  # 写库失败后的重试间隔
+
+
+def _load_targets(feed_ids: Sequence[int] | None) -> list[FeedTarget]:  # 在线程中读取启用的订阅源
+    with session_scope() as session:
+        return FeedService(session).load_targets(feed_ids)
+
+
+def _apply(targets: list[FeedTarget], results: list[FetchResult]) -> FeedPollResult:  # 在线程中写回整轮结果
+    with session_scope() as session:
+        return FeedService(session).apply_results(targets, results)
+
+
+def _observe(result: FeedPollResult) -> None:  # 记录指标
+    FEED_FETCHES_TOTAL.labels("modified").inc(result.modified)
+    FEED_FETCHES_TOTAL.labels("not_modified").inc(result.not_modified)
+    FEED_FETCHES_TOTAL.labels("failed").inc(result.failed)
+    FEED_ENTRIES_TOTAL.labels("created").inc(result.created)
+    FEED_ENTRIES_TOTAL.labels("filtered").inc(result.filtered)
+
+
+class FeedPoller:
+    """并发抓取全部启用的订阅源，整轮结果在一个事务中写回。
+
+    请求带上次的 ETag / Last-Modified，未变化的源返回 304，不传输也不解析正文；
+    不支持条件请求的源按响应体摘要判断，内容相同时同样跳过解析。
+    """
+
+    def __init__(self, *, concurrency: int | None = None, timeout: float | None = None, interval: float | None = None):
+        settings = get_settings()  # 未指定时使用配置
+        self.concurrency = max(1, concurrency or settings.feed_concurrency)  # 同时进行的请求数，也是连接总数
+        self.timeout = settings.feed_timeout if timeout is None else timeout  # 单个请求的超时
+        self.interval = settings.feed_poll_interval if interval is None else interval  # 常驻轮询的间隔
+        self._clients: list[httpx.AsyncClient] = []  # 首次轮询时创建，跨轮次复用连接
+        self._lock = asyncio.Lock()  # 同一时间只进行一轮，避免重复生成模板
+        self._task: asyncio.Task | None = None  # 常驻轮询任务
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def clients(self) -> list[httpx.AsyncClient]:  # 所有订阅源共享的分片连接池
+        if not self._clients:
+            self._clients = [
+                httpx.AsyncClient(
+                    timeout=self.timeout,
+                    limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),  # 同一站点的多个源复用连接
+                    follow_redirects=True,
+                    headers={"User-Agent": USER_AGENT, "Accept": ACCEPT},
+                )
+                for size in shard_sizes(self.concurrency)
+            ]
+        return self._clients
+
+    async def fetch(self, target: FeedTarget, client: httpx.AsyncClient | None = None) -> FetchResult:  # 抓取并解析单个订阅源
+        """条件请求一个订阅源；网络错误、非 2xx 状态与无法解析的内容都记录在结果中，不抛出。"""
+
+        headers = {}  # 条件请求头
+        if target.etag:
+            headers["If-None-Match"] = target.etag
+        if target.last_modified:
+            headers["If-Modified-Since"] = target.last_modified
+        try:
+            response = await (client or self.clients()[0]).get(target.url, headers=headers)
+        except httpx.HTTPError as exc:  # 超时、连接失败等
+            return FetchResult(feed_id=target.id, status=None, error=f"{type(exc).__name__}: {exc}")
+        if response.status_code == 304:  # 未变化：没有正文
+            return FetchResult(feed_id=target.id, status=304)
+        if response.status_code != 200:
+            return FetchResult(feed_id=target.id, status=response.status_code, error=f"HTTP {response.status_code}")
+        content_hash = hashlib.sha1(response.content).hexdigest()  # 不支持条件请求的源按内容判断
+        result = FetchResult(
+            feed_id=target.id,
+            status=200,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            content_hash=content_hash,
+        )
+        if content_hash == target.content_hash:  # 内容与上次相同，跳过解析
+            return result
+        try:
+            result.items = await asyncio.to_thread(parse_items, response.content)  # 解析不阻塞事件循环
+        except FeedError as exc:
+            result.error = str(exc)
+        return result
+
+    async def run_once(self, feed_ids: Sequence[int] | None = None) -> FeedPollResult:  # 轮询一轮
+        """抓取全部（或指定的）启用订阅源，新条目筛选后批量生成模板，返回本轮汇总。"""
+
+        async with self._lock:
+            started = time.perf_counter()  # 整轮耗时
+            targets = await asyncio.to_thread(_load_targets, feed_ids)  # 一次查询读取全部订阅源
+            pending = iter(targets)  # worker 共享的任务序列
+            results: list[FetchResult] = []
+
+            async def worker(client: httpx.AsyncClient) -> None:  # 固定绑定一个分片，复用其中的连接
+                for target in pending:
+                    results.append(await self.fetch(target, client))
+
+            clients = self.clients()
+            await asyncio.gather(*(worker(clients[index % len(clients)]) for index in range(min(self.concurrency, len(targets)))))
+            result = await asyncio.to_thread(_apply, targets, results)  # 整轮一个事务
+        _observe(result)
+        logger.info(
+            "feeds polled",
+            feeds=result.feeds,
+            modified=result.modified,
+            not_modified=result.not_modified,
+            failed=result.failed,
+            created=result.created,
+            filtered=result.filtered,
+            elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+        )
+        return result
+
+    async def _loop(self) -> None:  # 常驻轮询
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: BLE001 - 数据库被锁等情况下稍后重试，校验信息未写回的源下一轮重新抓取
+                logger.exception("feed polling failed")
+                await asyncio.sleep(ERROR_RETRY_SECONDS)
+                continue
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:  # 启动常驻轮询；interval 不大于 0 时不启动
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+            logger.info("feed polling started", interval=self.interval, concurrency=self.concurrency)
+
+    async def stop(self) -> None:  # 停止轮询并关闭连接池
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for client in self._clients:
+            await client.aclose()
+        self._clients = []
+
+
+_POLLER: FeedPoller | None = None  # 进程级订阅源轮询
+
+
+def get_feed_poller() -> FeedPoller:
+    """返回进程级订阅源轮询（不会自动启动）。"""
+
+    global _POLLER
+    if _POLLER is None:
+        _POLLER = FeedPoller()
+    return _POLLER
+
+
+async def stop_feed_poller() -> None:
+    global _POLLER
+    if _POLLER is not None:
+        await _POLLER.stop()
+        _POLLER = None
@@ -1,9 +1,21 @@
-"""Stage 1 指令处理器占位。"""  # 未来会注册 Telegram Bot 指令
+"""Stage 1 指令处理器注册。"""  # 把更新接入 Chat 表的自动登记
 from __future__ import annotations  # 兼容未来注解写法
 
 from typing import Any  # 使用 Any 适配 PTB 的 Application 对象
 
+from telegram import Update  # Telegram 更新对象
+from telegram.ext import TypeHandler  # 接收所有类型的更新
 
-def register_handlers(application: Any) -> None:  # 后续将把各类处理器挂载到 bot 实例
-    """Stage 2 及以后再实现指令注册。"""  # 当前阶段仅声明接口
-    raise NotImplementedError("处理器将在下一阶段补全。")  # 显式提醒开发者
+from app.bot.updates import get_update_batcher  # 与 webhook 共用合并提交
+
+
+async def _record_chat(update: Update, _context: Any) -> None:  # 每条更新交给合并提交器
+    """把更新中的 chat 信息写入 Chat 表，提交后返回。"""
+
+    await get_update_batcher().submit(update)  # 同一时间段内的更新共用一次事务
+
+
+def register_handlers(application: Any) -> None:  # 把处理器挂载到 PTB Application
+    """在最前面的分组注册 chat 登记处理器，不影响其他分组中的指令处理器。"""
+
+    application.add_handler(TypeHandler(Update, _record_chat), group=-1)  # group=-1 先于默认分组执行
@@ -2,52 +2,263 @@
 from __future__ import annotations  # 启用未来注解语法
 
 import argparse  # 解析命令行参数
-from typing import Sequence  # 表示 argv 形态的序列类型
+import pathlib  # 检查清单文件
+from typing import TYPE_CHECKING, Iterator, Sequence  # 表示 argv 形态的序列类型与惰性任务流
 
-from app.bot.broadcast import run_manual_broadcast  # 引入手动广播同步入口
-from app.config import get_settings  # 提前加载配置，校验必需变量
-from app.db.session import init_db  # 提供数据库初始化能力
+from app.config import get_settings  # 轻量模块：只读取环境变量
+
+if TYPE_CHECKING:  # 仅供类型检查，运行时按子命令延迟导入
+    from app.bot.broadcast import BroadcastJob, BroadcastOutcome
+
+# 重量级依赖（asyncio、python-telegram-bot、SQLModel/SQLAlchemy、loguru）在子命令函数内部导入：
+# --help 与参数错误不加载它们，init-db 不加载 telegram；tests/test_startup.py 约束导入集合与耗时。
 
 
 def build_parser() -> argparse.ArgumentParser:  # 构建命令行解析器
-    """创建命令行参数解析器。"""  # 目前支持 init-db 与 broadcast 两种子命令
+    """创建命令行参数解析器。"""  # 支持 init-db、broadcast 与 run-worker 子命令
 
     parser = argparse.ArgumentParser(description="TG Auto Messenger 机器人工具集")  # 设置描述信息
     subparsers = parser.add_subparsers(dest="command")  # 创建子命令分组
 
-    subparsers.add_parser("init-db", help="初始化数据库结构")  # 注册 init-db 子命令
+    subparsers.add_parser("init-db", help="初始化数据库并执行结构迁移")  # 注册 init-db 子命令
+
+    broadcast_parser = subparsers.add_parser("broadcast", help="使用模板执行手动广播（模板 × chat 或清单文件）")  # 注册 broadcast 子命令
+    broadcast_parser.add_argument("--template", action="extend", nargs="+", default=[], help="要加载的模板名称，可重复或一次给出多个")  # 模板名列表
+    broadcast_parser.add_argument("--chat-id", action="extend", nargs="+", type=int, default=[], help="目标 chat 的 ID，可重复或一次给出多个")  # 目标 chat 列表
+    broadcast_parser.add_argument("--chat-file", action="append", default=[], help="chat 列表文件：每行一个 ID，# 之后为注释")  # 从文件读取 chat
+    broadcast_parser.add_argument("--all-chats", action="store_true", help="发送到 Chat 表中全部活跃的 chat")  # 使用登记的活跃 chat
+    broadcast_parser.add_argument("--manifest", help="CSV（表头 template,chat_id[,text]）或 JSONL 清单，逐行读取")  # 清单文件
+    broadcast_parser.add_argument("--text", help="可选的消息覆盖文本（不作用于清单中的行）")  # 可选：覆盖模板内容
+    broadcast_parser.add_argument("--concurrency", type=int, help="最大并发请求数，默认 BROADCAST_CONCURRENCY")  # 并发上限
+    broadcast_parser.add_argument("--dry-run", action="store_true", help="仅渲染并汇总，不访问网络")  # dry-run 开关
+    broadcast_parser.add_argument("--quiet", action="store_true", help="只输出失败记录与汇总")  # 大批量时省略逐条输出
 
-    broadcast_parser = subparsers.add_parser("broadcast", help="使用模板执行手动广播")  # 注册 broadcast 子命令
-    broadcast_parser.add_argument("--template", required=True, help="要加载的模板名称")  # 必填参数：模板名
-    broadcast_parser.add_argument("--chat-id", required=True, type=int, help="目标 chat 的 ID")  # 必填参数：目标 chat
-    broadcast_parser.add_argument("--text", help="可选的消息覆盖文本")  # 可选：覆盖模板内容
-    broadcast_parser.add_argument("--dry-run", action="store_true", help="仅预览，不真正发送")  # dry-run 开关
+    subparsers.add_parser("run-worker", help="持续消费持久化投递队列并执行定时广播（UPDATES_MODE=poll 时同时轮询更新，FEED_POLL_INTERVAL>0 时同时轮询订阅源）")  # 注册 run-worker 子命令
+
+    updates_parser = subparsers.add_parser("poll-updates", help="长轮询 Telegram 更新，自动登记 chat")  # 注册 poll-updates 子命令
+    updates_parser.add_argument("--once", action="store_true", help="处理完积压的更新后退出，适合 cron")  # 单次模式
+
+    feeds_parser = subparsers.add_parser("poll-feeds", help="轮询 RSS/Atom 订阅源，新条目生成模板")  # 注册 poll-feeds 子命令
+    feeds_parser.add_argument("--once", action="store_true", help="轮询一轮后退出，适合 cron")  # 单次模式
+    feeds_parser.add_argument("--interval", type=float, help="常驻模式的轮询间隔（秒），默认 FEED_POLL_INTERVAL，未设置时为 900")  # 常驻间隔
 
     return parser  # 返回组装好的解析器
 
 
+def resolve_chat_ids(args: argparse.Namespace) -> list[int]:  # 合并各来源的 chat
+    """按 --chat-id、--chat-file、--all-chats 的顺序合并目标 chat，并去除重复。"""
+
+    from app.bot.manifest import load_active_chat_ids, read_chat_file  # 读取数据库需要 SQLModel
+
+    chat_ids = list(args.chat_id)  # 命令行直接给出的 chat
+    for path in args.chat_file:  # 逐个读取列表文件
+        chat_ids.extend(read_chat_file(path))
+    if args.all_chats:  # 追加全部活跃 chat
+        chat_ids.extend(load_active_chat_ids())
+    return list(dict.fromkeys(chat_ids))  # 保持首次出现的顺序
+
+
+def iter_jobs(args: argparse.Namespace, chat_ids: Sequence[int], errors: list[str]) -> Iterator[BroadcastJob]:  # 组合全部广播任务
+    """先产出模板 × chat 组合，再逐行产出清单任务。
+
+    清单中出现无法解析的行时停止读取并把错误写入 errors，已产出的任务照常完成。
+    """
+
+    from app.bot.broadcast import iter_matrix  # 广播子命令才需要
+    from app.bot.manifest import ManifestError, iter_manifest  # 清单解析
+
+    yield from iter_matrix(list(dict.fromkeys(args.template)), chat_ids, override_text=args.text)  # 模板 × chat
+    if args.manifest:  # 清单任务
+        try:
+            yield from iter_manifest(args.manifest)
+        except ManifestError as exc:  # 坏行之前的任务不受影响
+            errors.append(str(exc))
+
+
+async def run_broadcast(args: argparse.Namespace, chat_ids: Sequence[int], errors: list[str]) -> list[BroadcastOutcome]:  # 在单个事件循环内执行广播
+    """启动共享 Bot 客户端，整批任务经同一个并发引擎执行后关闭连接池。"""
+
+    from app.bot.broadcast import broadcast_many  # 加载 telegram 与数据库栈
+    from app.bot.client import bot_client_lifespan  # 管理共享 Bot 客户端的生命周期
+
+    async with bot_client_lifespan():  # 整个命令只建立一次连接池
+        return await broadcast_many(iter_jobs(args, chat_ids, errors), concurrency=args.concurrency, dry_run=args.dry_run)  # 清单边读边发
+
+
+def summarize(outcomes: Sequence[BroadcastOutcome], *, dry_run: bool) -> str:  # 汇总整批结果
+    """返回一行汇总：消息数、模板数、chat 数、成功与失败数；dry-run 额外给出渲染后的总字符数。"""
+
+    ok = sum(1 for outcome in outcomes if outcome.ok)  # 成功（或预览成功）的条数
+    templates = len({outcome.template_name for outcome in outcomes})  # 涉及的模板数
+    chats = len({outcome.chat_id for outcome in outcomes})  # 涉及的 chat 数
+    if dry_run:  # 预览只报告渲染结果
+        chars = sum(len(outcome.text or "") for outcome in outcomes if outcome.ok)  # 渲染后的总字符数
+        return f"[dry-run] 共 {len(outcomes)} 条消息（{templates} 个模板，{chats} 个 chat）：可发送 {ok}，失败 {len(outcomes) - ok}，合计 {chars} 字符。"
+    return f"共 {len(outcomes)} 条消息（{templates} 个模板，{chats} 个 chat）：已发送 {ok}，失败 {len(outcomes) - ok}。"
+
+
+async def run_worker() -> None:  # 常驻消费投递队列
+    """在当前进程中运行投递 worker 池与调度器，直到被中断。"""
+
+    import asyncio  # 等待取消信号
+
+    from app.bot.client import bot_client_lifespan  # 管理共享 Bot 客户端的生命周期
+    from app.bot.scheduler import get_scheduler, stop_scheduler  # 定时广播调度器
+    from app.bot.worker import get_delivery_pool, stop_delivery_pool  # 持久化投递队列的 worker 池
+    from app.bot.updates import get_update_poller, stop_update_poller  # 可选的更新轮询
+    from app.bot.feeds import get_feed_poller, stop_feed_poller  # 可选的订阅源轮询
+    from app.db.session import ensure_schema  # 一次性结构检查
+
+    ensure_schema()  # 确保结构已迁移到最新版本
+    async with bot_client_lifespan():  # worker 共享同一个连接池
+        await get_delivery_pool().start()  # 回收崩溃遗留记录并启动领取循环
+        await get_scheduler().start()  # 从数据库重建调度堆，补发停机期间错过的触发
+        if get_settings().updates_mode == "poll":  # 同一个 Bot 只能有一个进程轮询
+            await get_update_poller().start()
+        await get_feed_poller().start()  # FEED_POLL_INTERVAL 不大于 0 时不启动
+        try:
+            await asyncio.Event().wait()  # 一直运行到被取消
+        finally:
+            await stop_feed_poller()  # 停止生成模板
+            await stop_update_poller()  # 停止登记 chat
+            await stop_scheduler()  # 先停止产生新任务
+            await stop_delivery_pool()  # 等待当前批次完成后退出
+
+
+async def poll_updates(once: bool) -> int:  # 独立的更新轮询
+    """长轮询更新并登记 chat；once 为真时处理完积压后返回处理条数。"""
+
+    import asyncio  # 等待取消信号
+
+    from app.bot.updates import UpdatePoller  # 加载 telegram 与数据库栈
+    from app.db.session import ensure_schema  # 一次性结构检查
+
+    ensure_schema()  # 确保结构已迁移到最新版本
+    poller = UpdatePoller()  # 不使用进程级单例，退出时关闭自己的连接
+    if once:  # 单次模式
+        try:
+            return await poller.drain()
+        finally:
+            await poller.stop()
+    await poller.start()  # 常驻模式
+    try:
+        await asyncio.Event().wait()  # 一直运行到被取消
+    finally:
+        await poller.stop()
+    return 0
+
+
+async def poll_feeds(once: bool, interval: float | None) -> int:  # 独立的订阅源轮询
+    """轮询订阅源；once 为真时轮询一轮后返回新生成的模板数。"""
+
+    import asyncio  # 等待取消信号
+
+    from app.bot.feeds import FeedPoller  # 加载 httpx 与数据库栈
+    from app.db.session import ensure_schema  # 一次性结构检查
+
+    ensure_schema()  # 确保结构已迁移到最新版本
+    poller = FeedPoller(interval=interval or get_settings().feed_poll_interval or 900)  # 不使用进程级单例，退出时关闭自己的连接池
+    try:
+        if once:  # 单次模式
+            result = await poller.run_once()
+            print(f"轮询 {result.feeds} 个订阅源：{result.modified} 个有更新，{result.not_modified} 个未变化，{result.failed} 个失败；新建模板 {result.created} 个，筛掉 {result.filtered} 条。")
+            return result.created
+        await poller.start()  # 常驻模式
+        await asyncio.Event().wait()  # 一直运行到被取消
+    finally:
+        await poller.stop()
+    return 0
+
+
 def main(argv: Sequence[str] | None = None) -> None:  # 主函数供 poetry run 调用
     """命令行入口，处理初始化与广播需求。"""
 
-    get_settings()  # 提前加载配置，若缺少 token 会直接报错
     parser = build_parser()  # 初始化解析器
-    args = parser.parse_args(argv)  # 解析外部传入的参数
+    args = parser.parse_args(argv)  # 解析外部传入的参数，--help 在此退出
+    get_settings()  # 加载 .env 与环境变量，若缺少 token 会直接报错
+    from app.log import configure_logging, shutdown_logging  # 结构化日志依赖 loguru
+
+    configure_logging()  # 结构化日志写入 stderr 或 LOG_FILE，命令结果仍打印到 stdout
+    try:
+        run_command(parser, args)  # 执行子命令
+    finally:
+        shutdown_logging()  # 写出队列中剩余的日志
+
+
+def run_command(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:  # 分发子命令
+    """执行解析后的子命令。"""
 
     if args.command == "init-db":  # 处理 init-db 场景
-        init_db()  # 创建数据库表结构
-        print("数据库初始化完成。")  # 告知用户
+        from app.db.migrations import LATEST_VERSION  # 报告迁移后的结构版本
+        from app.db.session import init_db  # 只加载数据库栈，不加载 telegram
+
+        applied = init_db()  # 执行尚未应用的结构迁移
+        print(f"数据库已迁移到版本 {LATEST_VERSION}（本次执行 {len(applied)} 个步骤）。")  # 告知用户
         return  # 任务结束
 
     if args.command == "broadcast":  # 处理广播指令
-        result = run_manual_broadcast(template_name=args.template, chat_id=args.chat_id, override_text=args.text, dry_run=args.dry_run)  # 调用同步封装
-        if result.dry_run:  # dry-run 模式
-            print(f"[dry-run] 将向 {result.chat_id} 发送模板 '{result.template_name}':\n{result.text}")  # 输出预览
-        else:  # 实际发送模式
-            print(f"已向 {result.chat_id} 发送模板 '{result.template_name}'。")  # 输出结果
+        from app.bot.manifest import ManifestError  # 文件与清单错误
+
+        try:
+            chat_ids = resolve_chat_ids(args)  # 合并 chat 来源
+        except (OSError, ManifestError) as exc:  # 文件不存在或内容无效
+            parser.error(str(exc))
+        if not args.manifest and not (args.template and chat_ids):  # 没有任何任务来源
+            parser.error("broadcast 需要 --manifest，或至少一个 --template 与一个目标 chat（--chat-id / --chat-file / --all-chats）")
+        if args.manifest and not pathlib.Path(args.manifest).is_file():  # 清单在发送开始前检查
+            parser.error(f"清单文件不存在：{args.manifest}")
+        errors: list[str] = []  # 清单解析错误
+        import asyncio  # 驱动异步广播流程，--help 与 init-db 不需要
+
+        outcomes = asyncio.run(run_broadcast(args, chat_ids, errors))  # 执行广播
+        failed = [outcome for outcome in outcomes if not outcome.ok]  # 收集失败的任务
+        for outcome in outcomes:  # 逐条输出结果
+            if not outcome.ok:  # 失败任务
+                print(f"向 {outcome.chat_id} 发送模板 '{outcome.template_name}' 失败：{outcome.error}")  # 输出失败原因
+            elif args.quiet:  # 安静模式只输出失败
+                continue
+            elif outcome.dry_run:  # dry-run 模式
+                print(f"[dry-run] 将向 {outcome.chat_id} 发送模板 '{outcome.template_name}':\n{outcome.text}")  # 输出预览
+            else:  # 实际发送模式
+                print(f"已向 {outcome.chat_id} 发送模板 '{outcome.template_name}'。")  # 输出结果
+        for error in errors:  # 清单在此处停止读取
+            print(f"清单解析失败，已停止读取：{error}")
+        print(summarize(outcomes, dry_run=args.dry_run))  # 输出整批汇总
+        if failed or errors:  # 存在失败任务时以非零状态退出
+            raise SystemExit(1)
         return  # 广播结束
 
+    if args.command == "run-worker":  # 处理投递队列
+        import asyncio  # 驱动常驻事件循环
+
+        try:
+            asyncio.run(run_worker())  # 阻塞运行
+        except KeyboardInterrupt:  # Ctrl+C 正常退出
+            print("投递 worker 已停止。")
+        return
+
+    if args.command == "poll-updates":  # 处理更新轮询
+        import asyncio  # 驱动事件循环
+
+        try:
+            processed = asyncio.run(poll_updates(args.once))  # 阻塞运行
+        except KeyboardInterrupt:  # Ctrl+C 正常退出
+            print("更新轮询已停止。")
+            return
+        print(f"已处理 {processed} 条更新。")  # 单次模式的结果
+        return
+
+    if args.command == "poll-feeds":  # 处理订阅源轮询
+        import asyncio  # 驱动事件循环
+
+        try:
+            asyncio.run(poll_feeds(args.once, args.interval))  # 阻塞运行
+        except KeyboardInterrupt:  # Ctrl+C 正常退出
+            print("订阅源轮询已停止。")
+        return
+
     parser.print_help()  # 未提供子命令时显示帮助
 
 
 if __name__ == "__main__":  # pragma: no cover - 供直接运行调试使用
-    main()  # 执行命令行入口
+    main()  # 执行命令行入口
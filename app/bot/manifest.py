@@ -0,0 +1,81 @@
+"""命令行批量广播的输入解析：chat 列表文件与 CSV/JSONL 清单。"""  # 逐行读取，清单不会整体载入内存
+from __future__ import annotations  # 启用未来注解语法
+
+import csv  # 解析 CSV 清单
+import json  # 解析 JSONL 清单
+import pathlib  # 处理文件路径
+from typing import Iterator  # 惰性产出任务
+
+from sqlmodel import select  # 查询活跃 chat
+
+from app.bot.broadcast import BroadcastJob  # 清单中的每一行对应一个广播任务
+from app.db.models import Chat  # chat 登记表
+from app.db.session import ensure_schema, session_scope  # 读取 chat 前确保结构已迁移
+
+JSONL_SUFFIXES = {".jsonl", ".ndjson"}  # 按扩展名识别 JSONL，其余按 CSV 处理
+
+
+class ManifestError(ValueError):
+    """清单或 chat 列表中的某一行无法解析。"""  # 携带文件名与行号，便于定位
+
+
+def read_chat_file(path: str | pathlib.Path) -> list[int]:  # 读取 chat 列表文件
+    """每行一个 chat ID，忽略空行与 # 之后的注释。"""
+
+    chat_ids: list[int] = []  # 按文件顺序保存
+    with open(path, encoding="utf-8") as handle:  # 逐行读取
+        for number, line in enumerate(handle, start=1):  # 行号从 1 开始
+            value = line.split("#", 1)[0].strip()  # 去掉注释与空白
+            if not value:  # 空行或纯注释
+                continue
+            try:
+                chat_ids.append(int(value))  # chat ID 必须是整数
+            except ValueError:
+                raise ManifestError(f"{path}:{number}: 无效的 chat ID {value!r}") from None
+    return chat_ids
+
+
+def load_active_chat_ids() -> list[int]:  # 读取全部活跃 chat
+    """返回 Chat 表中 is_active 为真的 chat ID，按 ID 排序。"""
+
+    ensure_schema()  # 进程内只迁移一次
+    with session_scope() as session:  # 打开短会话
+        return list(session.exec(select(Chat.chat_id).where(Chat.is_active).order_by(Chat.chat_id)).all())  # 只取一列
+
+
+def _job(path: str | pathlib.Path, number: int, row: dict) -> BroadcastJob:  # 把一行清单转换为任务
+    template = str(row.get("template") or "").strip()  # 模板名称
+    chat_id = row.get("chat_id")  # 目标 chat
+    if not template or chat_id in (None, ""):  # 两列都是必填
+        raise ManifestError(f"{path}:{number}: 缺少 template 或 chat_id")
+    try:
+        chat_id = int(chat_id)  # CSV 中是字符串
+    except (TypeError, ValueError):
+        raise ManifestError(f"{path}:{number}: 无效的 chat ID {chat_id!r}") from None
+    text = row.get("text") or None  # 可选的覆盖文本，空值表示使用模板
+    return BroadcastJob(template_name=template, chat_id=chat_id, override_text=text)
+
+
+def iter_manifest(path: str | pathlib.Path) -> Iterator[BroadcastJob]:  # 流式读取清单
+    """逐行产出 (模板, chat[, 覆盖文本]) 任务。
+
+    CSV 需要表头 template,chat_id[,text]；.jsonl/.ndjson 每行一个含相同字段的对象，空行被忽略。
+    遇到无法解析的行时抛出 ManifestError，之前产出的任务不受影响。
+    """
+
+    with open(path, encoding="utf-8", newline="") as handle:  # 逐行读取，不整体载入
+        if pathlib.Path(path).suffix.lower() in JSONL_SUFFIXES:  # JSONL 清单
+            for number, line in enumerate(handle, start=1):
+                if not line.strip():  # 跳过空行
+                    continue
+                try:
+                    row = json.loads(line)  # 每行一个对象
+                except json.JSONDecodeError as exc:
+                    raise ManifestError(f"{path}:{number}: {exc.msg}") from None
+                if not isinstance(row, dict):  # 数组或标量不是合法任务
+                    raise ManifestError(f"{path}:{number}: 每行必须是 JSON 对象")
+                yield _job(path, number, row)
+            return
+        reader = csv.DictReader(handle)  # CSV 清单按表头取列
+        for row in reader:
+            yield _job(path, reader.line_num, row)  # line_num 是文件中的物理行号
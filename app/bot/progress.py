@@ -0,0 +1,136 @@
+"""投递进度的进程内发布/订阅中心。"""  # worker 发布逐条结果，SSE 连接按批次订阅
+from __future__ import annotations  # 允许在注解中引用后定义的类型
+
+import asyncio  # 唤醒等待中的订阅者
+import time  # 事件时间戳
+from collections import deque  # 有界的最近事件缓冲
+from dataclasses import dataclass, field  # 事件与合并批次的数据结构
+
+SENT = "sent"  # 发送成功
+FAILED = "failed"  # 最终失败
+RETRYING = "retrying"  # 网络等可重试错误，稍后重试
+RATE_LIMITED = "rate_limited"  # 收到 429，按 retry_after 暂停后重试
+
+MAX_BUFFERED_EVENTS = 200  # 每个订阅者最多保留的逐条事件数，超出时丢弃最旧的
+COALESCE_INTERVAL = 0.25  # 合并窗口（秒）：每个订阅者每秒最多收到约 4 次更新
+
+
+@dataclass(slots=True)  # 单条投递的一次状态变化
+class ProgressEvent:
+    """一条投递的状态变化，由 worker 在发送过程中发布。"""
+
+    job_id: str  # 所属批次
+    template_id: int | None  # 模板 ID
+    chat_id: int  # 目标 chat
+    status: str  # sent / failed / retrying / rate_limited
+    error: str | None = None  # 失败或重试的原因
+    retry_after: float | None = None  # 429 时 Telegram 要求等待的秒数
+    at: float = field(default_factory=time.time)  # 发生时间（Unix 时间戳）
+
+
+@dataclass(slots=True)  # 一个合并窗口内的增量
+class ProgressBatch:
+    """订阅者一次取出的合并结果：各状态计数、最近事件与是否有批次已落库。"""
+
+    counts: dict[str, int]  # 本窗口内各状态的事件数
+    events: list[ProgressEvent]  # 本窗口内最近的事件（最多 MAX_BUFFERED_EVENTS 条）
+    dropped: int  # 因缓冲已满而只计数未保留的事件数
+    committed: bool  # 期间是否有结果写回数据库（此时应重新读取批次汇总）
+
+
+class ProgressSubscription:
+    """单个订阅者的有界缓冲；消费者再慢，占用内存也只有计数器与定长队列。"""
+
+    def __init__(self, hub: ProgressHub, job_id: str, *, max_events: int = MAX_BUFFERED_EVENTS):
+        self.hub = hub  # 取消订阅时使用
+        self.job_id = job_id  # 订阅的批次
+        self._events: deque[ProgressEvent] = deque(maxlen=max_events)  # 超出上限时自动丢弃最旧的事件
+        self._counts: dict[str, int] = {}  # 各状态累计数
+        self._dropped = 0  # 被挤出缓冲的事件数
+        self._committed = False  # 是否有新的落库通知
+        self._ready = asyncio.Event()  # 有新内容时置位
+
+    def push(self, event: ProgressEvent) -> None:  # 由 hub 调用，O(1)
+        if len(self._events) == self._events.maxlen:  # 缓冲已满，最旧的事件将被挤出
+            self._dropped += 1
+        self._events.append(event)
+        self._counts[event.status] = self._counts.get(event.status, 0) + 1
+        self._ready.set()
+
+    def mark_committed(self) -> None:  # 批次结果已写回数据库
+        self._committed = True
+        self._ready.set()
+
+    async def next_batch(self, *, timeout: float | None = None, interval: float = COALESCE_INTERVAL) -> ProgressBatch | None:
+        """等待新内容并在合并窗口结束后取出；timeout 内没有任何内容时返回 None。"""
+
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)  # 等待第一条新内容
+        except asyncio.TimeoutError:
+            return None
+        if interval > 0:  # 让窗口内的后续事件合并进同一次更新
+            await asyncio.sleep(interval)
+        self._ready.clear()
+        batch = ProgressBatch(counts=self._counts, events=list(self._events), dropped=self._dropped, committed=self._committed)
+        self._events.clear()  # 重置缓冲，开始下一个窗口
+        self._counts = {}
+        self._dropped = 0
+        self._committed = False
+        return batch
+
+    def close(self) -> None:  # 连接断开时调用
+        self.hub.unsubscribe(self)
+
+
+class ProgressHub:
+    """按批次 ID 分发进度事件；没有订阅者时发布只是一次字典查找。"""
+
+    def __init__(self, *, max_events: int = MAX_BUFFERED_EVENTS):
+        self.max_events = max_events  # 新订阅者的缓冲上限
+        self._subscribers: dict[str, set[ProgressSubscription]] = {}  # job_id -> 订阅者集合
+
+    def subscribe(self, job_id: str) -> ProgressSubscription:
+        subscription = ProgressSubscription(self, job_id, max_events=self.max_events)
+        self._subscribers.setdefault(job_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ProgressSubscription) -> None:
+        subscribers = self._subscribers.get(subscription.job_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:  # 最后一个订阅者离开时释放条目
+            del self._subscribers[subscription.job_id]
+
+    def subscriber_count(self, job_id: str | None = None) -> int:
+        if job_id is not None:
+            return len(self._subscribers.get(job_id, ()))
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, event: ProgressEvent) -> None:  # 在事件循环线程中调用
+        for subscription in self._subscribers.get(event.job_id, ()):
+            subscription.push(event)
+
+    def commit(self, job_ids) -> None:  # worker 写回一批结果后调用
+        for job_id in job_ids:
+            for subscription in self._subscribers.get(job_id, ()):
+                subscription.mark_committed()
+
+
+_HUB: ProgressHub | None = None  # 进程级进度中心
+
+
+def get_progress_hub() -> ProgressHub:
+    """返回进程级进度中心。"""
+
+    global _HUB
+    if _HUB is None:
+        _HUB = ProgressHub()
+    return _HUB
+
+
+def reset_progress_hub() -> None:
+    """丢弃进程级进度中心（测试使用）。"""
+
+    global _HUB
+    _HUB = None
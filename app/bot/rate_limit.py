@@ -1,15 +1,213 @@
-"""Stage 1 速率限制配置。"""  # 存放速率桶相关默认值
+"""Stage 1 速率限制配置。"""  # 存放速率桶相关默认值与 asyncio 限速器
 from __future__ import annotations  # 保留未来注解特性
 
+import asyncio  # 等待令牌时让出事件循环
+import time  # 使用单调时钟计算令牌
+from collections import OrderedDict  # 按最近使用顺序保存单聊令牌桶
 from dataclasses import dataclass  # 使用 dataclass 表达配置结构
 
+from app.config import Settings, get_settings  # 读取环境变量中的限速覆盖值
+
+GROUP_CHAT_TYPES = frozenset({"group", "supergroup", "channel"})  # 按群组限速的 chat 类型
+
 
 @dataclass  # 定义速率限制配置实体
 class RateLimitConfig:
     """描述全局与单聊的限速阈值。"""  # 方便在不同模块引用
 
-    global_interval_seconds: float = 5.0  # 全局最短发送间隔（秒）
-    chat_interval_seconds: float = 10.0  # 同一 chat 最短发送间隔（秒）
+    global_interval_seconds: float = 1 / 30  # 全局最短发送间隔（秒），Telegram 文档约 30 条/秒
+    chat_interval_seconds: float = 1.0  # 同一 chat 最短发送间隔（秒），用于私聊，约 1 条/秒
+    group_interval_seconds: float = 3.0  # 同一群组/频道最短发送间隔（秒），约 20 条/分钟
+    global_burst: int = 1  # 全局桶容量，允许的瞬时突发条数
+    chat_burst: int = 1  # 单聊桶容量
+    max_chat_buckets: int = 10_000  # 单聊桶数量上限，超出时优先淘汰空闲桶
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "RateLimitConfig":  # 合并环境变量覆盖值
+        """未配置的项沿用默认值。"""
+
+        config = cls()  # 从默认值开始
+        overrides = {
+            "global_interval_seconds": settings.rate_limit_global_interval,  # RATE_LIMIT_GLOBAL_INTERVAL
+            "chat_interval_seconds": settings.rate_limit_chat_interval,  # RATE_LIMIT_CHAT_INTERVAL
+            "group_interval_seconds": settings.rate_limit_group_interval,  # RATE_LIMIT_GROUP_INTERVAL
+        }
+        for name, value in overrides.items():  # 仅覆盖显式配置的值
+            if value is not None:
+                setattr(config, name, value)
+        return config
+
+    def chat_interval_for(self, chat_type: str) -> float:  # 根据 chat 类型选择间隔
+        return self.group_interval_seconds if chat_type in GROUP_CHAT_TYPES else self.chat_interval_seconds
+
+
+DEFAULT_RATE_LIMITS = RateLimitConfig()  # 提供默认限速实例供运行时引用
+
+
+def infer_chat_type(chat_id: int) -> str:  # Chat 表中没有记录时的兜底
+    """Telegram 中群组与频道的 ID 为负数，私聊为正数。"""
+
+    return "group" if chat_id < 0 else "private"
+
+
+class TokenBucket:
+    """基于 GCRA（虚拟调度）的令牌桶：只记录理论到达时间，无需定时补充令牌。"""
+
+    __slots__ = ("interval", "tolerance", "tat", "paused_until")  # 桶数量可能很多，节省内存
+
+    def __init__(self, interval: float, burst: int = 1):  # interval<=0 表示不限速
+        self.interval = max(0.0, interval)  # 两次发送的最短间隔
+        self.tolerance = self.interval * (max(1, burst) - 1)  # 允许提前的时间，对应突发容量
+        self.tat = float("-inf")  # 理论到达时间（theoretical arrival time）
+        self.paused_until = float("-inf")  # 收到 429 等情况时的暂停截止时间
+
+    def earliest(self, now: float) -> float:  # 计算最早可发送时间，不消耗令牌
+        return max(now, self.tat - self.tolerance, self.paused_until)
+
+    def commit(self, at: float) -> None:  # 在 at 时刻消耗一个令牌
+        self.tat = max(self.tat, at) + self.interval
+
+    def pause(self, until: float) -> None:  # 暂停到指定时间
+        self.paused_until = max(self.paused_until, until)
+
+    def is_idle(self, now: float) -> bool:  # 空闲桶与新建桶等价，可以安全淘汰
+        return self.tat <= now and self.paused_until <= now
+
+    def backlog(self, now: float) -> float:  # 已预约但尚未到期的时长
+        return max(0.0, self.tat - now)
+
+
+@dataclass(slots=True)
+class RateLimitSnapshot:
+    """限速器当前状态，用于调优限速参数。"""
+
+    global_utilization: float  # 最近窗口内全局速率的占用比例（0~1）
+    global_backlog_seconds: float  # 全局桶已排队的等待时长
+    chat_buckets: int  # 当前保留的单聊桶数量
+    acquired: int  # 累计放行次数
+    delayed: int  # 其中需要等待的次数
+    total_wait_seconds: float  # 累计等待时长
+
+
+class RateLimiter:
+    """asyncio 限速器：全局桶 + 单聊桶，发送前 `await acquire(chat_id, chat_type)`。"""
+
+    UTILIZATION_WINDOW = 60  # 统计利用率的窗口（秒）
+
+    def __init__(self, config: RateLimitConfig | None = None, *, clock=time.monotonic):
+        self.config = config or RateLimitConfig()  # 限速参数
+        self._clock = clock  # 可注入的时钟，便于测试
+        self._global = TokenBucket(self.config.global_interval_seconds, self.config.global_burst)  # 全局桶
+        self._chats: OrderedDict[int, TokenBucket] = OrderedDict()  # 单聊桶，按最近使用排序
+        self._ring = [0] * self.UTILIZATION_WINDOW  # 每秒放行次数的环形计数
+        self._ring_stamp = [0] * self.UTILIZATION_WINDOW  # 每个槽位对应的秒数
+        self.acquired = 0  # 累计放行
+        self.delayed = 0  # 累计等待次数
+        self.total_wait = 0.0  # 累计等待时长
+
+    def _chat_bucket(self, chat_id: int, chat_type: str) -> TokenBucket:  # 获取或创建单聊桶
+        bucket = self._chats.get(chat_id)
+        if bucket is None:  # 首次发送到该 chat
+            bucket = TokenBucket(self.config.chat_interval_for(chat_type), self.config.chat_burst)
+            self._chats[chat_id] = bucket
+        else:  # 标记为最近使用
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    def _evict(self, now: float) -> None:  # 淘汰空闲桶，保持内存有界
+        while self._chats:  # 从最久未使用的桶开始
+            chat_id, bucket = next(iter(self._chats.items()))
+            if not bucket.is_idle(now) and len(self._chats) <= self.config.max_chat_buckets:  # 遇到仍在限速中的桶即停止
+                break
+            del self._chats[chat_id]
+
+    def _record(self, at: float) -> None:  # 记录放行时刻用于利用率统计
+        second = int(at)
+        slot = second % self.UTILIZATION_WINDOW
+        if self._ring_stamp[slot] != second:  # 槽位属于旧的秒数时重置
+            self._ring_stamp[slot] = second
+            self._ring[slot] = 0
+        self._ring[slot] += 1
+
+    def _reserve(self, chat_id: int, chat_type: str | None) -> tuple[float, bool]:  # 尝试预约，返回 (等待秒数, 是否已预约)
+        now = self._clock()
+        chat = self._chat_bucket(chat_id, chat_type or infer_chat_type(chat_id))
+        chat_ready = chat.earliest(now)  # 单聊桶允许的最早时刻
+        global_ready = self._global.earliest(now)  # 全局桶允许的最早时刻
+        if chat_ready > global_ready:  # 单聊限制更紧：不占用全局令牌，避免阻塞其他 chat
+            return chat_ready - now, False
+        self._global.commit(global_ready)  # 全局桶按先来后到预约
+        chat.commit(global_ready)
+        self._record(global_ready)
+        self.acquired += 1
+        self._evict(now)  # 摊还 O(1)：只检查最久未使用的桶
+        return global_ready - now, True
+
+    def reserve(self, chat_id: int, chat_type: str | None = None) -> float:  # 预约发送时刻并返回需要等待的秒数
+        """返回需要等待的秒数（0 表示令牌已取得，可立即发送）。
+
+        仅当全局桶是瓶颈时才预约未来的全局令牌；单聊桶是瓶颈时只返回等待时长，
+        调用方睡眠后需重新预约，这样某个 chat 的间隔不会拖慢其他 chat。
+        """
+
+        return self._reserve(chat_id, chat_type)[0]
+
+    async def acquire(self, chat_id: int, chat_type: str | None = None) -> float:  # 等待直到可以发送
+        """令牌充足时不让出事件循环；否则睡眠到预约时刻。返回实际等待的秒数。"""
+
+        waited = 0.0
+        while True:
+            delay, reserved = self._reserve(chat_id, chat_type)
+            if delay <= 0 and reserved:  # 快路径：直接放行
+                return waited
+            self.delayed += 1
+            self.total_wait += delay
+            waited += delay
+            await asyncio.sleep(delay)
+            if not reserved:  # 等待的是单聊桶，醒来后重新预约
+                continue
+            now = self._clock()
+            chat = self._chats.get(chat_id)
+            if self._global.paused_until <= now and (chat is None or chat.paused_until <= now):  # 等待期间未被暂停
+                return waited
+
+    def pause_chat(self, chat_id: int, seconds: float, chat_type: str | None = None) -> None:  # 暂停单个 chat
+        self._chat_bucket(chat_id, chat_type or infer_chat_type(chat_id)).pause(self._clock() + seconds)
+
+    def pause_global(self, seconds: float) -> None:  # 暂停全部发送
+        self._global.pause(self._clock() + seconds)
+
+    def snapshot(self) -> RateLimitSnapshot:  # 导出当前状态
+        now = self._clock()
+        current = int(now)
+        window = self.UTILIZATION_WINDOW
+        recent = sum(count for count, stamp in zip(self._ring, self._ring_stamp) if current - window < stamp <= current)  # 最近窗口内的放行次数
+        interval = self.config.global_interval_seconds
+        capacity = window / interval if interval > 0 else 0  # 窗口内全局桶的理论容量
+        return RateLimitSnapshot(
+            global_utilization=min(1.0, recent / capacity) if capacity else 0.0,
+            global_backlog_seconds=self._global.backlog(now),
+            chat_buckets=len(self._chats),
+            acquired=self.acquired,
+            delayed=self.delayed,
+            total_wait_seconds=self.total_wait,
+        )
+
+
+_LIMITER: RateLimiter | None = None  # 进程级限速器，所有发送路径共享同一组令牌桶
+
+
+def get_rate_limiter() -> RateLimiter:
+    """返回进程级限速器，首次调用时按当前配置创建。"""
+
+    global _LIMITER
+    if _LIMITER is None:
+        _LIMITER = RateLimiter(RateLimitConfig.from_settings(get_settings()))
+    return _LIMITER
+
 
+def reset_rate_limiter() -> None:
+    """丢弃进程级限速器（主要用于测试或修改配置后）。"""
 
-DEFAULT_RATE_LIMITS = RateLimitConfig()  # 提供默认限速实例供运行时引用
+    global _LIMITER
+    _LIMITER = None
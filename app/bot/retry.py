@@ -0,0 +1,179 @@
+"""429 与网络错误的重试策略及延迟队列。"""  # 失败任务停放在延迟队列中，不占用 worker
+from __future__ import annotations  # 允许在注解中引用后定义的类型
+
+import asyncio  # 延迟队列的定时唤醒
+import heapq  # 按截止时间排序的最小堆
+import itertools  # 为同一截止时间的任务提供稳定顺序
+import random  # 退避抖动
+import time  # 单调时钟
+from collections import deque  # 记录最近的 429
+from dataclasses import dataclass, field  # 描述重试决策与尝试记录
+from datetime import datetime, timedelta  # 尝试时间；兼容以 timedelta 表示的 retry_after
+from typing import Callable, Generic, TypeVar  # 延迟队列的泛型元素
+
+from telegram.error import BadRequest, ChatMigrated, Forbidden, InvalidToken, NetworkError, RetryAfter  # Telegram 错误类型
+
+T = TypeVar("T")  # 延迟队列元素类型
+
+RATE_LIMITED = "rate_limited"  # 收到 429
+TRANSIENT = "transient"  # 网络抖动、超时等可重试错误
+PERMANENT = "permanent"  # 重试也不会成功的错误
+
+
+def classify_error(exc: BaseException) -> str:  # 将异常归类
+    """区分 429、临时网络错误与永久错误。"""  # BadRequest 继承自 NetworkError，需要先判断
+
+    if isinstance(exc, RetryAfter):
+        return RATE_LIMITED
+    if isinstance(exc, (BadRequest, Forbidden, ChatMigrated, InvalidToken)):
+        return PERMANENT
+    if isinstance(exc, (NetworkError, OSError, asyncio.TimeoutError)):
+        return TRANSIENT
+    return PERMANENT
+
+
+CHAT_GONE = "gone"  # Bot 被移出、被拉黑或 chat 不存在，今后不应再向该 chat 发送
+CHAT_MIGRATED = "migrated"  # 群组已升级为超级群组，需改用新的 chat ID
+
+
+@dataclass(slots=True)
+class ChatFailure:
+    """由发送错误推断出的 chat 状态变化。"""
+
+    kind: str  # CHAT_GONE / CHAT_MIGRATED
+    migrate_to: int | None = None  # 升级后的新 chat ID
+
+
+def chat_failure(exc: BaseException) -> ChatFailure | None:  # 识别与 chat 本身相关的永久错误
+    """Forbidden 与 “chat not found” 视为 chat 已失效，ChatMigrated 给出新 ID；其余错误与 chat 无关。"""
+
+    if isinstance(exc, ChatMigrated):  # 新 ID 随错误返回
+        return ChatFailure(CHAT_MIGRATED, exc.new_chat_id)
+    if isinstance(exc, Forbidden):  # bot was kicked / blocked by the user / user is deactivated
+        return ChatFailure(CHAT_GONE)
+    if isinstance(exc, BadRequest) and "chat not found" in exc.message.lower():  # chat 已被删除
+        return ChatFailure(CHAT_GONE)
+    return None
+
+
+def retry_after_seconds(exc: RetryAfter) -> float:  # 兼容 int 与 timedelta
+    value = exc.retry_after
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+@dataclass(slots=True)
+class RetryDecision:
+    """一次失败后的处理决定。"""
+
+    retry: bool  # 是否重试
+    delay: float = 0.0  # 距离下次尝试的秒数
+    kind: str = PERMANENT  # 错误类别
+    retry_after: float | None = None  # Telegram 返回的 retry_after
+
+
+@dataclass(slots=True)
+class DeliveryAttempt:
+    """单次发送尝试的记录。"""
+
+    attempt: int  # 第几次尝试，从 1 开始
+    ok: bool  # 是否成功
+    error: str | None = None  # 失败原因
+    kind: str | None = None  # 错误类别
+    retry_after: float | None = None  # 429 时 Telegram 要求的等待秒数
+    next_delay: float | None = None  # 计划的重试等待秒数，不重试时为 None
+    chat_id: int | None = None  # 本次尝试的目标 chat，群组迁移前后不同
+    at: datetime = field(default_factory=datetime.utcnow)  # 尝试结束的时间（UTC）
+
+
+@dataclass
+class RetryPolicy:
+    """重试策略：默认最多重试 2 次（需求：429 时根据 retry_after 重试，不超过 2 次）。"""
+
+    max_retries: int = 2  # 首次失败后的最大重试次数
+    base_delay: float = 1.0  # 网络错误的初始退避（秒）
+    max_delay: float = 30.0  # 网络错误退避上限（秒）
+    retry_after_jitter: float = 0.5  # 429 重试时额外加入的随机等待上限（秒），避免同时醒来
+    rng: Callable[[float, float], float] = random.uniform  # 可注入的随机函数
+
+    def decide(self, exc: BaseException, attempt: int) -> RetryDecision:  # attempt 为刚失败的第几次尝试
+        """根据错误类型与已尝试次数给出重试决定。"""
+
+        kind = classify_error(exc)
+        if kind == PERMANENT or attempt > self.max_retries:  # 永久错误或次数用尽
+            retry_after = retry_after_seconds(exc) if isinstance(exc, RetryAfter) else None
+            return RetryDecision(retry=False, kind=kind, retry_after=retry_after)
+        if kind == RATE_LIMITED:  # 遵守 Telegram 给出的等待时间
+            retry_after = retry_after_seconds(exc)
+            return RetryDecision(retry=True, delay=retry_after + self.rng(0.0, self.retry_after_jitter), kind=kind, retry_after=retry_after)
+        backoff = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))  # 指数退避
+        return RetryDecision(retry=True, delay=self.rng(backoff / 2, backoff), kind=kind)  # 等值抖动（equal jitter）
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()  # 默认策略
+
+
+class FloodDetector:
+    """短时间内多个不同 chat 同时收到 429 时，视为触发了全局限流。"""
+
+    def __init__(self, *, threshold: int = 3, window: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold  # 判定为全局限流所需的不同 chat 数
+        self.window = window  # 统计窗口（秒）
+        self._clock = clock
+        self._events: deque[tuple[float, int]] = deque()  # (时间, chat_id)
+
+    def record(self, chat_id: int) -> bool:  # 记录一次 429，返回是否判定为全局限流
+        now = self._clock()
+        self._events.append((now, chat_id))
+        while self._events and self._events[0][0] < now - self.window:  # 丢弃窗口外的记录
+            self._events.popleft()
+        return len({chat for _, chat in self._events}) >= self.threshold
+
+
+class DelayQueue(Generic[T]):
+    """按截止时间排序的延迟队列：到期元素交给回调，等待期间不占用任何 worker。"""
+
+    def __init__(self, on_due: Callable[[T], None], *, clock: Callable[[], float] = time.monotonic):
+        self._on_due = on_due  # 到期回调（通常是放回就绪队列）
+        self._clock = clock
+        self._heap: list[tuple[float, int, T]] = []  # (截止时间, 序号, 元素)
+        self._seq = itertools.count()  # 截止时间相同时保持先进先出
+        self._wakeup = asyncio.Event()  # 有更早的元素加入时唤醒定时器
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, item: T, delay: float) -> None:  # 停放一个元素
+        deadline = self._clock() + max(0.0, delay)
+        if not self._heap or deadline < self._heap[0][0]:  # 新元素成为最早到期者
+            self._wakeup.set()
+        heapq.heappush(self._heap, (deadline, next(self._seq), item))
+        if self._task is None:  # 懒启动定时任务
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:  # 单个定时任务负责所有元素
+        while True:
+            if not self._heap:  # 空闲时等待新元素
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            now = self._clock()
+            deadline = self._heap[0][0]
+            if deadline <= now:  # 弹出所有到期元素
+                while self._heap and self._heap[0][0] <= now:
+                    self._on_due(heapq.heappop(self._heap)[2])
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=deadline - now)  # 睡到最早截止时间或被更早的元素唤醒
+            except asyncio.TimeoutError:
+                pass
+
+    async def aclose(self) -> None:  # 停止定时任务
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
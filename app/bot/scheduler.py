@@ -1,14 +1,179 @@
-"""Stage 1 调度模块占位。"""  # 当前仅占位，尚未提供调度功能
+"""定时广播调度器。"""  # 下次触发时间保存在内存最小堆中，到期任务写入投递队列
 from __future__ import annotations  # 继续支持未来注解
 
+import asyncio  # 单个定时任务负责所有唤醒
+import heapq  # 按下次触发时间排序的最小堆
+from datetime import datetime  # 数据库中的时间均为 UTC naive
+from typing import Callable  # 可注入的时钟
 
-class SchedulerService:  # 计划在 Stage 2 接入的调度包装类
-    """后续会封装 PTB JobQueue 等调度逻辑。"""  # 提示当前为空实现
+from loguru import logger  # 结构化日志
 
-    def start(self) -> None:  # 启动调度器的接口
-        """Stage 2 时实现定时任务启动。"""  # 注明时间线
-        raise NotImplementedError("调度逻辑尚未开发")  # 明确状态
+from app.bot.worker import notify_delivery_workers  # 入队后唤醒投递 worker
+from app.db.session import session_scope  # 数据库会话
+from app.services.schedules import FiredSchedule, ScheduleService  # 定时任务持久化与触发逻辑
 
-    def stop(self) -> None:  # 停止调度器的接口
-        """Stage 2 时提供优雅停止逻辑。"""  # 注明未来工作
-        raise NotImplementedError("调度逻辑尚未开发")  # 明确状态
+FIRE_BATCH_SIZE = 500  # 同一时刻大量任务到期时，每次在线程中处理的条数
+MAX_SLEEP_SECONDS = 300.0  # 最长睡眠时长，防止系统时间跳变后长时间不醒
+ERROR_RETRY_SECONDS = 5.0  # 处理失败（如数据库被锁）后的重试间隔
+
+
+def _load_next_runs() -> list[tuple[int, datetime]]:  # 在线程中读取全部启用任务的下次触发时间
+    with session_scope() as session:
+        return ScheduleService(session).load_next_runs()
+
+
+def _fire(schedule_ids: list[int], now: datetime) -> list[FiredSchedule]:  # 在线程中处理一批到期任务
+    with session_scope() as session:
+        return ScheduleService(session).fire_due(schedule_ids, now)
+
+
+class SchedulerService:
+    """基于最小堆的调度器：启动时从数据库重建堆，空闲时只睡到最早的触发时间。"""
+
+    def __init__(self, *, clock: Callable[[], datetime] = datetime.utcnow):
+        self._clock = clock  # 可注入的时钟，便于测试
+        self._heap: list[tuple[datetime, int]] = []  # (下次触发时间, 任务 ID)
+        self._next: dict[int, datetime] = {}  # 任务 ID → 当前有效的下次触发时间，堆中不一致的条目视为过期
+        self._wakeup = asyncio.Event()  # 有更早的任务加入时唤醒定时任务
+        self._task: asyncio.Task | None = None  # 定时任务
+        self.fired = 0  # 累计写入投递队列的触发次数
+
+    def __len__(self) -> int:  # 当前等待触发的任务数
+        return len(self._next)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def next_run_at(self) -> datetime | None:  # 最早的有效触发时间
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def schedule(self, schedule_id: int, next_run_at: datetime | None) -> None:  # 新增或更新任务的触发时间，O(log n)
+        """next_run_at 为 None 时移除任务；旧的堆条目不立即删除，弹出时跳过。"""
+
+        if next_run_at is None:
+            self._next.pop(schedule_id, None)
+            return
+        self._next[schedule_id] = next_run_at
+        if not self._heap or next_run_at < self._heap[0][0]:  # 成为最早的任务时唤醒定时任务重新计算睡眠时长
+            self._wakeup.set()
+        heapq.heappush(self._heap, (next_run_at, schedule_id))
+        if len(self._heap) > 2 * len(self._next) + 64:  # 过期条目过多时重建，保持内存有界
+            self._heap = [(when, sid) for sid, when in self._next.items()]
+            heapq.heapify(self._heap)
+
+    def remove(self, schedule_id: int) -> None:  # 删除任务
+        self.schedule(schedule_id, None)
+
+    def _discard_stale(self) -> None:  # 弹出堆顶的过期条目
+        while self._heap and self._next.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _pop_due(self, now: datetime) -> list[tuple[datetime, int]]:  # 取出所有已到期的任务
+        due: list[tuple[datetime, int]] = []
+        while True:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            entry = heapq.heappop(self._heap)
+            del self._next[entry[1]]  # 处理完成后按新的触发时间重新加入
+            due.append(entry)
+
+    def load(self, entries: list[tuple[int, datetime]]) -> None:  # 用数据库中的触发时间重建堆，O(n)
+        self._next = dict(entries)
+        self._heap = [(when, schedule_id) for schedule_id, when in self._next.items()]
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    async def run_due(self) -> int:  # 处理当前所有到期任务，返回写入投递队列的次数
+        """错过的触发（例如进程停机期间）在这里按各任务的补发策略处理。"""
+
+        now = self._clock()
+        due = self._pop_due(now)
+        fired = 0
+        for start in range(0, len(due), FIRE_BATCH_SIZE):  # 分批处理，避免单个事务过大
+            batch = due[start:start + FIRE_BATCH_SIZE]
+            try:
+                results = await asyncio.to_thread(_fire, [schedule_id for _, schedule_id in batch], now)  # 数据库操作放到线程中
+            except BaseException:
+                for when, schedule_id in due[start:]:  # 未处理的任务放回堆中，稍后重试
+                    self.schedule(schedule_id, when)
+                raise
+            for result in results:
+                self.schedule(result.schedule_id, result.next_run_at)  # 推进到下一次触发
+                if result.job_id is not None:
+                    fired += 1
+                    logger.info("schedule fired", schedule_id=result.schedule_id, job_id=result.job_id, next_run_at=result.next_run_at)
+                elif result.skipped:
+                    logger.warning("schedule fire skipped", schedule_id=result.schedule_id, next_run_at=result.next_run_at)
+        if fired:
+            notify_delivery_workers()  # 让投递 worker 立即领取
+        self.fired += fired
+        return fired
+
+    async def _run(self) -> None:  # 单个定时任务负责所有定时广播
+        while True:
+            failed = False
+            try:
+                await self.run_due()
+            except Exception:  # noqa: BLE001 - 数据库短暂不可用时稍后重试
+                logger.exception("scheduler iteration failed")
+                failed = True
+            next_run = self.next_run_at()
+            timeout = MAX_SLEEP_SECONDS
+            if failed:  # 到期任务已放回堆中，等待一段时间再试，避免忙等
+                timeout = ERROR_RETRY_SECONDS
+            elif next_run is not None:
+                timeout = min(MAX_SLEEP_SECONDS, max(0.0, (next_run - self._clock()).total_seconds()))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)  # 空闲时不轮询数据库
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:  # 启动调度器
+        """从数据库重建堆并启动定时任务；错过的触发在第一次唤醒时处理。"""
+
+        if self._task is not None:
+            return
+        self.load(await asyncio.to_thread(_load_next_runs))
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:  # 停止调度器
+        """取消定时任务；触发状态已持久化，重启后从数据库恢复。"""
+
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+_SCHEDULER: SchedulerService | None = None  # 进程级调度器
+
+
+def get_scheduler() -> SchedulerService:
+    """返回进程级调度器（不会自动启动）。"""
+
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        _SCHEDULER = SchedulerService()
+    return _SCHEDULER
+
+
+def notify_scheduler(schedule_id: int, next_run_at: datetime | None) -> None:
+    """定时任务新增、修改或删除后同步到运行中的调度器。"""
+
+    if _SCHEDULER is not None:
+        _SCHEDULER.schedule(schedule_id, next_run_at)
+
+
+async def stop_scheduler() -> None:
+    global _SCHEDULER
+    if _SCHEDULER is not None:
+        await _SCHEDULER.stop()
+        _SCHEDULER = None
@@ -0,0 +1,236 @@
+"""Telegram 更新消费：长轮询或 webhook 收到的更新批量写入 Chat 表。"""  # 自动登记 chat，Bot 被移出时标记为不活跃
+from __future__ import annotations  # 允许在注解中引用后定义的类型
+
+import asyncio  # 轮询循环与 webhook 合并提交
+from typing import Iterable  # 更新序列
+
+from loguru import logger  # 结构化日志
+from telegram import Bot, ChatMember, Update  # Telegram 更新对象
+
+from app.bot.client import build_polling_bot  # 长轮询专用的单连接客户端
+from app.config import get_settings  # 读取长轮询超时与 token
+from app.db.session import session_scope  # 数据库会话
+from app.metrics import CHAT_UPSERTS_TOTAL, UPDATES_TOTAL  # 更新与 chat 写入计数
+from app.services.chats import ChatChange, ChatService, ChatUpsertResult  # Chat 表批量维护
+
+ALLOWED_UPDATES = (Update.MESSAGE, Update.EDITED_MESSAGE, Update.CHANNEL_POST, Update.EDITED_CHANNEL_POST, Update.MY_CHAT_MEMBER)  # 只订阅携带 chat 信息的更新
+ACTIVE_STATUSES = frozenset({ChatMember.OWNER, ChatMember.ADMINISTRATOR, ChatMember.MEMBER})  # Bot 仍在 chat 中的成员状态
+POLL_LIMIT = 100  # getUpdates 单次最多返回的条数（Bot API 上限）
+ERROR_RETRY_SECONDS = 5.0  # 轮询或写库失败后的重试间隔
+WEBHOOK_BATCH_SIZE = 500  # webhook 合并提交的最大条数
+WEBHOOK_FLUSH_SECONDS = 0.05  # webhook 更新最多等待多久与后续更新合并提交
+
+
+def bot_id_from_token(token: str) -> str:  # 更新位置按 Bot 区分
+    """token 形如 `<bot_id>:<secret>`，只保存冒号前的部分。"""
+
+    return token.split(":", 1)[0][:32]
+
+
+def _change(chat, is_active: bool | None) -> ChatChange:  # telegram.Chat → ChatChange
+    return ChatChange(chat_id=chat.id, type=chat.type, title=chat.effective_name, is_active=is_active)  # 私聊没有 title，使用对方姓名
+
+
+def chat_changes(updates: Iterable[Update]) -> list[ChatChange]:  # 从更新中提取 chat 变更
+    """my_chat_member 决定 Bot 是否仍在 chat 中；消息类更新只刷新类型与标题。
+
+    群组升级为超级群组时（migrate_to_chat_id），旧 chat 标记为不活跃并登记新 chat。
+    """
+
+    changes: list[ChatChange] = []  # 保持更新顺序，合并由服务层完成
+    for update in updates:
+        member = update.my_chat_member  # Bot 自身成员状态的变化
+        if member is not None:
+            status = member.new_chat_member  # 变化后的状态
+            active = status.status in ACTIVE_STATUSES or (status.status == ChatMember.RESTRICTED and status.is_member)  # 受限成员仍在 chat 中
+            changes.append(_change(member.chat, active))
+            continue
+        message = update.effective_message  # message / edited_message / channel_post / edited_channel_post
+        if message is None:  # 未订阅的更新类型
+            continue
+        changes.append(_change(message.chat, None))  # 不改变成员状态
+        if message.migrate_to_chat_id:  # 旧群组已升级，今后只能向新 ID 发送
+            changes.append(ChatChange(chat_id=message.chat.id, type=message.chat.type, title=message.chat.effective_name, is_active=False))
+            changes.append(ChatChange(chat_id=message.migrate_to_chat_id, type="supergroup", title=message.chat.effective_name))
+    return changes
+
+
+def _load_offset(bot_id: str) -> int:  # 在线程中读取更新位置
+    with session_scope() as session:
+        return ChatService(session).get_offset(bot_id)
+
+
+def _apply(changes: list[ChatChange], bot_id: str | None, next_offset: int | None) -> ChatUpsertResult:  # 在线程中执行的批量写入
+    with session_scope() as session:
+        return ChatService(session).apply_changes(changes, bot_id=bot_id, next_offset=next_offset)  # chat 变更与 offset 同一事务提交
+
+
+def _observe(source: str, count: int, result: ChatUpsertResult) -> None:  # 记录指标与日志
+    UPDATES_TOTAL.labels(source).inc(count)
+    CHAT_UPSERTS_TOTAL.labels("inserted").inc(result.inserted)
+    CHAT_UPSERTS_TOTAL.labels("updated").inc(result.updated)
+    if result.inserted or result.updated:  # 纯消息流量不刷日志
+        logger.info("chats updated", source=source, updates=count, inserted=result.inserted, updated=result.updated)
+
+
+class UpdatePoller:
+    """长轮询 getUpdates：每页更新的 chat 变更与下一个 offset 在同一事务中提交。
+
+    先提交本页再用新 offset 请求下一页（新 offset 会让 Telegram 丢弃之前的更新），
+    因此重启后既不会重复处理，也不会丢失更新。
+    """
+
+    def __init__(self, *, bot: Bot | None = None, timeout: int | None = None, limit: int = POLL_LIMIT):
+        settings = get_settings()  # 未指定时使用配置
+        self._owns_bot = bot is None  # 自行创建的客户端由本对象关闭
+        self.bot = bot or build_polling_bot(settings)  # 独立连接，不占用发送连接池
+        self.bot_id = bot_id_from_token(settings.bot_token)  # 更新位置的主键
+        self.timeout = settings.updates_poll_timeout if timeout is None else timeout  # 长轮询等待秒数
+        self.limit = limit  # 每页条数
+        self._offset: int | None = None  # 首次轮询前从数据库读取
+        self._task: asyncio.Task | None = None  # 常驻轮询任务
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def run_once(self, *, timeout: int | None = None) -> int:  # 处理一页，返回更新条数
+        """拉取并处理一页更新，没有新更新时返回 0。"""
+
+        if self._offset is None:  # 重启后从持久化的位置继续
+            self._offset = await asyncio.to_thread(_load_offset, self.bot_id)
+        updates = await self.bot.get_updates(
+            offset=self._offset or None,
+            limit=self.limit,
+            timeout=self.timeout if timeout is None else timeout,
+            allowed_updates=ALLOWED_UPDATES,
+        )
+        if not updates:
+            return 0
+        next_offset = max(update.update_id for update in updates) + 1  # 确认本页全部更新
+        result = await asyncio.to_thread(_apply, chat_changes(updates), self.bot_id, next_offset)  # 提交后才推进内存中的 offset
+        self._offset = next_offset
+        _observe("poll", len(updates), result)
+        return len(updates)
+
+    async def drain(self) -> int:  # 处理完当前积压的更新
+        """不等待新更新，逐页处理到没有积压为止，返回处理条数。"""
+
+        total = 0
+        while processed := await self.run_once(timeout=0):
+            total += processed
+        return total
+
+    async def _loop(self) -> None:  # 常驻轮询
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: BLE001 - 网络错误或数据库被锁时稍后重试，offset 未推进的页会重新拉取
+                logger.exception("update polling failed")
+                await asyncio.sleep(ERROR_RETRY_SECONDS)
+
+    async def start(self) -> None:  # 启动轮询任务
+        if self._task is None:
+            await self.bot.initialize()  # 打开连接并校验 token
+            self._task = asyncio.create_task(self._loop())
+            logger.info("update polling started", bot_id=self.bot_id, timeout=self.timeout)
+
+    async def stop(self) -> None:  # 停止轮询；进行中的请求被取消，未提交的页下次重新拉取
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._owns_bot:
+            await self.bot.shutdown()
+
+
+class UpdateBatcher:
+    """webhook 更新的合并提交：短时间内到达的更新共用一次事务，每个请求在提交后才返回。
+
+    Telegram 收到非 2xx 响应会重试，写库失败时对应请求全部失败；chat 变更是幂等的，重试无副作用。
+    """
+
+    def __init__(self, *, max_batch: int = WEBHOOK_BATCH_SIZE, max_delay: float = WEBHOOK_FLUSH_SECONDS):
+        self.max_batch = max_batch  # 达到条数后立即提交
+        self.max_delay = max_delay  # 最长等待时间
+        self._pending: list[tuple[Update, asyncio.Future]] = []  # 等待提交的更新
+        self._timer: asyncio.TimerHandle | None = None  # 延迟提交的定时器
+        self._lock = asyncio.Lock()  # 批次按到达顺序依次提交
+        self._flushes: set[asyncio.Task] = set()  # 持有进行中的提交任务
+
+    async def submit(self, update: Update) -> None:  # 加入当前批次并等待提交
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((update, future))
+        if len(self._pending) >= self.max_batch:  # 批次已满，立即提交
+            self._start_flush()
+        elif self._timer is None:  # 批次的第一条，开始计时
+            self._timer = loop.call_later(self.max_delay, self._start_flush)
+        await future
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        task = asyncio.create_task(self._flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self) -> None:
+        async with self._lock:  # 上一批提交期间到达的更新在此合并为一批
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                result = await asyncio.to_thread(_apply, chat_changes(update for update, _ in batch), None, None)
+            except Exception as exc:  # noqa: BLE001 - 交给各个请求返回错误，由 Telegram 重试
+                logger.exception("webhook batch failed", updates=len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                return
+            for _, future in batch:
+                if not future.done():  # 请求可能已被取消
+                    future.set_result(None)
+            _observe("webhook", len(batch), result)
+
+
+_POLLER: UpdatePoller | None = None  # 进程级长轮询
+_BATCHER: UpdateBatcher | None = None  # 进程级 webhook 合并提交
+
+
+def get_update_poller() -> UpdatePoller:
+    """返回进程级长轮询（不会自动启动）。"""
+
+    global _POLLER
+    if _POLLER is None:
+        _POLLER = UpdatePoller()
+    return _POLLER
+
+
+async def stop_update_poller() -> None:
+    global _POLLER
+    if _POLLER is not None:
+        await _POLLER.stop()
+        _POLLER = None
+
+
+def get_update_batcher() -> UpdateBatcher:
+    """返回进程级 webhook 合并提交器。"""
+
+    global _BATCHER
+    if _BATCHER is None:
+        _BATCHER = UpdateBatcher()
+    return _BATCHER
+
+
+def reset_update_batcher() -> None:
+    """丢弃合并提交器（主要用于测试，每个事件循环需要新的实例）。"""
+
+    global _BATCHER
+    _BATCHER = None
@@ -0,0 +1,197 @@
+"""持久化投递队列的 asyncio worker 池。"""  # 从 deliveries 表批量领取任务并发送
+from __future__ import annotations  # 允许在注解中引用后定义的类型
+
+import asyncio  # 调度 worker 任务
+import os  # 进程号，组成 worker 池标识
+import socket  # 主机名，组成 worker 池标识
+import time  # 限制回收过期租约的频率
+import uuid  # 同一进程内多个 worker 池互不混淆
+from datetime import timedelta  # 租约时长
+
+from loguru import logger  # 结构化日志
+
+from app.bot.broadcast import BroadcastJob, attempt_rows, broadcast_many  # 复用并发广播引擎
+from app.bot.progress import ProgressEvent, get_progress_hub  # 向 SSE 订阅者推送逐条进度
+from app.bot.rate_limit import get_rate_limiter  # 按全局发送间隔估算一批的最长耗时
+from app.config import get_settings  # 读取批量大小与 worker 数量
+from app.db.session import session_scope  # 数据库会话
+from app.profiling import profiling_broadcasts  # 可选的批次剖析
+from app.services.deliveries import ClaimedDelivery, DeliveryResult, DeliveryService  # 投递队列服务
+from app.services.templates import TemplateService  # 标记模板已发送
+
+MIN_LEASE = timedelta(minutes=2)  # 租约最短时长
+RELEASE_INTERVAL_SECONDS = 60.0  # 空闲时回收过期租约的最短间隔
+STOP_GRACE_SECONDS = 10.0  # 停止时等待当前批次完成的时长
+
+
+def _claim(limit: int, owner: str, lease: timedelta) -> list[ClaimedDelivery]:  # 在线程中执行的领取操作
+    with session_scope() as session:
+        return DeliveryService(session).claim_batch(limit, owner=owner, lease=lease)
+
+
+def _renew(delivery_ids: list[int], owner: str, lease: timedelta) -> int:  # 在线程中执行的续期操作
+    with session_scope() as session:
+        return DeliveryService(session).renew_leases(delivery_ids, owner, lease)
+
+
+def _complete(results: list[DeliveryResult]) -> None:  # 在线程中执行的回写操作
+    with session_scope() as session:
+        template_ids = DeliveryService(session).complete_batch(results)  # 一次 executemany 回写整批
+        if template_ids:  # 至少成功一次的模板标记为已发送
+            TemplateService(session).mark_templates_sent(template_ids)
+
+
+def _release_expired() -> int:
+    with session_scope() as session:
+        return DeliveryService(session).release_expired()
+
+
+def lease_for(batch_size: int) -> timedelta:  # 租约覆盖一整批按全局间隔串行发送的耗时
+    """一批最坏情况下按全局间隔逐条发送，租约取其两倍且不短于 MIN_LEASE；发送期间每三分之一租约续期一次。"""
+
+    interval = get_rate_limiter().config.global_interval_seconds
+    return max(MIN_LEASE, timedelta(seconds=batch_size * interval * 2))
+
+
+class DeliveryWorkerPool:
+    """若干个领取循环并行运行：领取一批 → 并发发送 → 批量回写。
+
+    领取的记录带本池标识与租约，发送期间持续续期；其他进程只回收租约已过期的记录，
+    API 内嵌的 worker 与 run-worker 同时运行、其中一个重启时不会重复发送对方正在处理的记录。
+    """
+
+    def __init__(self, *, workers: int | None = None, batch_size: int | None = None, poll_interval: float | None = None, concurrency: int | None = None):
+        settings = get_settings()  # 未指定时使用配置
+        self.workers = workers or settings.delivery_workers  # 领取循环数量，让领取/回写与发送重叠
+        self.batch_size = batch_size or settings.delivery_batch_size  # 每次领取的记录数
+        self.poll_interval = poll_interval if poll_interval is not None else settings.delivery_poll_interval  # 空闲时的轮询间隔
+        self.concurrency = concurrency  # 单批内的发送并发，None 时沿用广播配置
+        self._wakeup = asyncio.Event()  # 新任务入队时提前唤醒
+        self._tasks: list[asyncio.Task] = []  # 正在运行的领取循环
+        self._stopping = False  # 停止标记，当前批次完成后退出
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"[-64:]  # 写入 claimed_by 的池标识
+        self.lease = lease_for(self.batch_size)  # 单批租约时长
+        self._released_at = 0.0  # 上次回收过期租约的时间（单调时钟）
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def notify(self) -> None:  # 入队后调用，避免等待下一次轮询
+        self._wakeup.set()
+
+    async def run_once(self) -> int:  # 处理一批，返回处理条数
+        """领取并处理一批投递，没有到期任务时返回 0。"""
+
+        claimed = await asyncio.to_thread(_claim, self.batch_size, self.owner, self.lease)  # 数据库操作放到线程中，避免阻塞事件循环
+        if not claimed:
+            return 0
+        heartbeat = asyncio.create_task(self._keep_leases([row.delivery_id for row in claimed]))  # 发送期间续期
+        jobs = [BroadcastJob(template_name="", chat_id=row.chat_id, template_id=row.template_id, correlation_id=f"{row.job_id}/{row.delivery_id}") for row in claimed]  # 按模板 ID 投递，关联 ID 指向批次与投递记录
+        hub = get_progress_hub()  # 进程级进度中心
+
+        def on_progress(index: int, status: str, error: str | None, retry_after: float | None) -> None:  # 把序号映射回投递记录
+            row = claimed[index]
+            hub.publish(ProgressEvent(job_id=row.job_id, template_id=row.template_id, chat_id=row.chat_id, status=status, error=error, retry_after=retry_after))
+
+        try:
+            with profiling_broadcasts("delivery_batch"):  # PROFILE_BROADCASTS 开启时把发送与回写计入一次剖析；空轮询不产生输出
+                outcomes = await broadcast_many(jobs, concurrency=self.concurrency, on_progress=on_progress, record_attempts=False)  # 结果顺序与输入一致；尝试记录随结果回写
+                results = [
+                    DeliveryResult(delivery_id=row.delivery_id, ok=outcome.ok, attempts=row.attempts + len(outcome.attempts), error=outcome.error, history=attempt_rows(outcome.attempts, row.template_id))
+                    for row, outcome in zip(claimed, outcomes)
+                ]
+                await asyncio.to_thread(_complete, results)  # 批量回写结果与逐次尝试，同时清除租约
+        finally:
+            heartbeat.cancel()
+        sent = sum(result.ok for result in results)  # 本批成功数
+        logger.info("delivery batch completed", claimed=len(claimed), sent=sent, failed=len(results) - sent)
+        hub.commit({row.job_id for row in claimed})  # 通知订阅者重新读取批次汇总
+        return len(claimed)
+
+    async def _keep_leases(self, delivery_ids: list[int]) -> None:  # 周期性续期，直到批次回写完成
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            try:
+                await asyncio.to_thread(_renew, delivery_ids, self.owner, self.lease)
+            except Exception:  # noqa: BLE001 - 续期失败时下一次再试，租约仍有剩余时间
+                logger.exception("delivery lease renewal failed")
+
+    async def release_expired(self) -> int:  # 回收租约过期的记录
+        self._released_at = time.monotonic()
+        released = await asyncio.to_thread(_release_expired)
+        if released:
+            logger.warning("re-queued deliveries with expired leases", count=released)
+        return released
+
+    async def drain(self) -> int:  # 处理完当前所有到期任务
+        total = 0
+        while processed := await self.run_once():
+            total += processed
+        return total
+
+    async def _loop(self) -> None:  # 单个领取循环
+        while not self._stopping:
+            try:
+                processed = await self.run_once()
+            except Exception:  # noqa: BLE001 - 数据库短暂不可用时稍后重试，未回写的记录在租约过期后回收
+                logger.exception("delivery worker iteration failed")
+                processed = 0
+            if processed or self._stopping:  # 还有积压时立即继续
+                continue
+            if time.monotonic() - self._released_at >= RELEASE_INTERVAL_SECONDS:  # 空闲时顺带回收其他进程遗留的记录
+                try:
+                    await self.release_expired()
+                except Exception:  # noqa: BLE001 - 下一次空闲时再试
+                    logger.exception("releasing expired deliveries failed")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:  # 启动领取循环
+        if self._tasks:
+            return
+        await self.release_expired()  # 回收崩溃遗留且租约已过期的记录
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._loop()) for _ in range(max(1, self.workers))]
+
+    async def stop(self, grace: float = STOP_GRACE_SECONDS) -> None:  # 停止领取循环
+        """等待当前批次完成；超时仍未完成的批次保持 sending，租约过期后被回收。"""
+
+        if not self._tasks:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=grace)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+_POOL: DeliveryWorkerPool | None = None  # 进程级 worker 池
+
+
+def get_delivery_pool() -> DeliveryWorkerPool:
+    """返回进程级 worker 池（不会自动启动）。"""
+
+    global _POOL
+    if _POOL is None:
+        _POOL = DeliveryWorkerPool()
+    return _POOL
+
+
+def notify_delivery_workers() -> None:
+    """有新任务入队时唤醒 worker 池。"""
+
+    if _POOL is not None:
+        _POOL.notify()
+
+
+async def stop_delivery_pool() -> None:
+    global _POOL
+    if _POOL is not None:
+        await _POOL.stop()
+        _POOL = None
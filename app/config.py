@@ -4,9 +4,13 @@ from __future__ import annotations  # 支持前向引用的类型注解
 import os  # 访问系统环境变量
 from dataclasses import dataclass, field  # 使用 dataclass 定义结构化配置对象
 from functools import lru_cache  # 通过缓存避免重复解析
-from dotenv import load_dotenv
 
-load_dotenv()
+
+def _optional_float(name: str) -> float | None:
+    """读取可选的浮点型环境变量，未设置时返回 None。"""
+
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else None
 
 
 @dataclass(slots=True)  # 使用 slots 限制属性
@@ -16,12 +20,59 @@ class Settings:  # 封装所有运行时配置项
     bot_token: str = field(default_factory=lambda: os.getenv("BOT_TOKEN", "CHANGE_ME"))  # 默认占位 token，可被外部覆盖
     database_url: str = field(default_factory=lambda: os.getenv("DATABASE_URL", "sqlite:///data/app.db"))  # 默认指向本地 SQLite
     timezone: str = field(default_factory=lambda: os.getenv("TIMEZONE", "UTC"))  # 默认时区
+    bot_api_base_url: str = field(default_factory=lambda: os.getenv("BOT_API_BASE_URL", "https://api.telegram.org/bot"))  # Bot API 地址，可指向本地 Bot API 服务或测试桩
+    broadcast_concurrency: int = field(default_factory=lambda: int(os.getenv("BROADCAST_CONCURRENCY", "8")))  # 批量广播时的最大并发请求数
+    bot_pool_size: int = field(default_factory=lambda: int(os.getenv("BOT_POOL_SIZE", "16")))  # 共享 Bot 客户端的最大连接数
+    bot_http_version: str = field(default_factory=lambda: os.getenv("BOT_HTTP_VERSION", "auto"))  # auto / 1.1 / 2，auto 时在 HTTPS 且安装 h2 时启用 HTTP/2
+    delivery_workers: int = field(default_factory=lambda: int(os.getenv("DELIVERY_WORKERS", "2")))  # 投递队列的领取循环数量
+    delivery_batch_size: int = field(default_factory=lambda: int(os.getenv("DELIVERY_BATCH_SIZE", "100")))  # 每次领取的投递记录数
+    delivery_poll_interval: float = field(default_factory=lambda: float(os.getenv("DELIVERY_POLL_INTERVAL", "1.0")))  # 队列空闲时的轮询间隔（秒）
+    delivery_key_cache_size: int = field(default_factory=lambda: int(os.getenv("DELIVERY_KEY_CACHE_SIZE", "100000")))  # 进程内记住的投递幂等键数量上限
+    delivery_key_cache_ttl: float = field(default_factory=lambda: float(os.getenv("DELIVERY_KEY_CACHE_TTL", "60")))  # 未发送完成的键在内存中判重的有效秒数
+    template_cache_size: int = field(default_factory=lambda: int(os.getenv("TEMPLATE_CACHE_SIZE", "1024")))  # 进程级模板缓存的条目上限
+    template_cache_ttl: float = field(default_factory=lambda: float(os.getenv("TEMPLATE_CACHE_TTL", "30")))  # 缓存条目超过该秒数后按版本号与更新时间校验一次
+    rate_limit_global_interval: float | None = field(default_factory=lambda: _optional_float("RATE_LIMIT_GLOBAL_INTERVAL"))  # 覆盖全局发送间隔（秒）
+    rate_limit_chat_interval: float | None = field(default_factory=lambda: _optional_float("RATE_LIMIT_CHAT_INTERVAL"))  # 覆盖私聊发送间隔（秒）
+    rate_limit_group_interval: float | None = field(default_factory=lambda: _optional_float("RATE_LIMIT_GROUP_INTERVAL"))  # 覆盖群组/频道发送间隔（秒）
+    db_profile: str = field(default_factory=lambda: os.getenv("DB_PROFILE", "tuned"))  # tuned：SQLite 启用 WAL 等 PRAGMA；default：保持驱动默认行为
+    db_pool_size: int = field(default_factory=lambda: int(os.getenv("DB_POOL_SIZE", "5")))  # 连接池常驻连接数
+    db_max_overflow: int = field(default_factory=lambda: int(os.getenv("DB_MAX_OVERFLOW", "10")))  # 连接池允许临时超出的连接数
+    sqlite_busy_timeout_ms: int = field(default_factory=lambda: int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")))  # 遇到写锁时等待的毫秒数
+    sqlite_synchronous: str = field(default_factory=lambda: os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"))  # WAL 下 NORMAL 只在检查点时 fsync
+    sqlite_mmap_size: int = field(default_factory=lambda: int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))))  # 内存映射读取的字节上限
+    sqlite_cache_size: int = field(default_factory=lambda: int(os.getenv("SQLITE_CACHE_SIZE", "-65536")))  # 页缓存大小，负数表示 KiB
+    chat_failure_threshold: int = field(default_factory=lambda: int(os.getenv("CHAT_FAILURE_THRESHOLD", "5")))  # 连续失败达到该次数的 chat 在冷却期内不再发送
+    chat_failure_cooldown: float = field(default_factory=lambda: float(os.getenv("CHAT_FAILURE_COOLDOWN", "3600")))  # 冷却期（秒），之后再试一次，成功即恢复
+    updates_mode: str = field(default_factory=lambda: os.getenv("UPDATES_MODE", "off"))  # off / poll（长轮询 getUpdates）/ webhook（由 API 接收推送）
+    updates_poll_timeout: int = field(default_factory=lambda: int(os.getenv("UPDATES_POLL_TIMEOUT", "30")))  # getUpdates 长轮询等待秒数
+    webhook_secret: str = field(default_factory=lambda: os.getenv("WEBHOOK_SECRET", ""))  # 与 setWebhook 的 secret_token 一致，为空时拒绝所有推送
+    feed_poll_interval: float = field(default_factory=lambda: float(os.getenv("FEED_POLL_INTERVAL", "0")))  # 订阅源轮询间隔（秒），0 表示 API 与 run-worker 不常驻轮询
+    feed_concurrency: int = field(default_factory=lambda: int(os.getenv("FEED_CONCURRENCY", "32")))  # 同时抓取的订阅源数量，也是共享连接池的连接上限
+    feed_timeout: float = field(default_factory=lambda: float(os.getenv("FEED_TIMEOUT", "15")))  # 单个订阅源请求的超时（秒）
+    log_level: str = field(default_factory=lambda: os.getenv("LOG_LEVEL", "INFO"))  # 日志级别
+    log_json: bool = field(default_factory=lambda: os.getenv("LOG_JSON", "1").lower() in ("1", "true", "yes"))  # 每行一条 JSON；设为 0 输出可读文本
+    log_file: str = field(default_factory=lambda: os.getenv("LOG_FILE", ""))  # 为空时输出到 stderr，否则写入文件并按大小轮转
+    metrics_sql_timing: bool = field(default_factory=lambda: os.getenv("METRICS_SQL_TIMING", "0").lower() in ("1", "true", "yes"))  # 逐条 SQL 计时；游标事件每条语句约多 10–20µs，默认关闭
+    profile_broadcasts: bool = field(default_factory=lambda: os.getenv("PROFILE_BROADCASTS", "0").lower() in ("1", "true", "yes"))  # 剖析每次广播/投递批次，输出写入 profile_dir
+    profile_api_sample_rate: float = field(default_factory=lambda: float(os.getenv("PROFILE_API_SAMPLE_RATE", "0")))  # 按比例剖析 API 请求，0 表示关闭
+    profile_dir: str = field(default_factory=lambda: os.getenv("PROFILE_DIR", "data/profiles"))  # 阶段汇总与折叠栈的输出目录
+    profile_sample_interval: float = field(default_factory=lambda: float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005")))  # 调用栈采样间隔（秒）
+
+
+@lru_cache(maxsize=1)  # 整个进程只读取一次 .env
+def _load_env_file() -> None:
+    """首次构建配置时加载 .env，不覆盖已有环境变量；导入本模块本身不做任何 I/O。"""
+
+    from dotenv import load_dotenv  # 只有真正读取配置的命令才需要
+
+    load_dotenv()
 
 
 @lru_cache(maxsize=1)  # 缓存配置实例
 def _settings_cache() -> Settings:
     """返回缓存的配置对象。"""
 
+    _load_env_file()  # 首次调用时加载 .env
     return Settings()  # 每次调用都会重新读取环境变量
 
 
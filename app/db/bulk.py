@@ -0,0 +1,15 @@
+"""批量 SQL 语句的辅助工具。"""
+from __future__ import annotations
+
+from typing import Iterator, Sequence, TypeVar
+
+T = TypeVar("T")
+
+MAX_IN_PARAMS = 900  # 旧版 SQLite 单条语句最多 999 个绑定参数，IN 列表按此分块并为其他参数留出余量
+
+
+def chunked(items: Sequence[T], size: int = MAX_IN_PARAMS) -> Iterator[Sequence[T]]:
+    """按固定大小切分序列，用于把大 IN 列表拆成多条语句。"""
+
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -1 +1,5 @@
-"""Stage 1 迁移脚本占位目录。"""  # 未来接入 Alembic 时会使用
+"""数据库结构迁移：版本化步骤与执行器。"""  # 由 init_db 在启动时调用
+from app.db.migrations.runner import Migration, current_version, migrate
+from app.db.migrations.versions import LATEST_VERSION, MIGRATIONS
+
+__all__ = ["LATEST_VERSION", "MIGRATIONS", "Migration", "current_version", "migrate"]
@@ -0,0 +1,118 @@
+"""版本化的数据库迁移执行器。
+
+当前版本号保存在单行表 ``schema_version`` 中，启动时只需一次查询即可判断
+是否需要迁移，不反射整个库。每个迁移步骤都应当幂等（建表、加列、建索引前
+先检查），即使中途失败或被两个进程同时执行，重跑也能收敛到同一结构。
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Sequence
+
+from loguru import logger
+from sqlalchemy import Column, Engine, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+from sqlmodel import SQLModel
+
+VERSION_TABLE = "schema_version"
+
+
+@dataclass(frozen=True, slots=True)
+class Migration:
+    """单个迁移步骤；transactional=False 时在自动提交连接上执行（PostgreSQL 并发建索引需要）。"""
+
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+    transactional: bool = True
+
+
+def current_version(connection: Connection) -> int:
+    """返回数据库当前的结构版本，尚未迁移过的库为 0。"""
+
+    if not inspect(connection).has_table(VERSION_TABLE):
+        return 0
+    return connection.execute(text(f"SELECT version FROM {VERSION_TABLE}")).scalar() or 0
+
+
+def _ensure_version_table(connection: Connection) -> None:
+    connection.execute(
+        text(f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)")
+    )
+    connection.execute(
+        text(f"INSERT INTO {VERSION_TABLE} (id, version) SELECT 1, 0 WHERE NOT EXISTS (SELECT 1 FROM {VERSION_TABLE})")
+    )
+
+
+def _set_version(connection: Connection, version: int) -> None:
+    connection.execute(text(f"UPDATE {VERSION_TABLE} SET version = :version WHERE version < :version"), {"version": version})
+
+
+def migrate(engine: Engine, migrations: Sequence[Migration]) -> list[int]:
+    """把数据库升级到 migrations 中的最新版本，返回本次实际执行的版本号。"""
+
+    ordered = sorted(migrations, key=lambda migration: migration.version)
+    if not ordered:
+        return []
+    with engine.connect() as connection:
+        if current_version(connection) >= ordered[-1].version:
+            return []
+    with engine.begin() as connection:
+        _ensure_version_table(connection)
+
+    applied: list[int] = []
+    for migration in ordered:
+        with engine.connect() as connection:
+            if current_version(connection) >= migration.version:
+                continue
+        if migration.transactional:
+            with engine.begin() as connection:
+                migration.upgrade(connection)
+                _set_version(connection, migration.version)
+        else:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                migration.upgrade(connection)
+                _set_version(connection, migration.version)
+        logger.info("migration applied", version=migration.version, name=migration.name)
+        applied.append(migration.version)
+    return applied
+
+
+def create_table(connection: Connection, table_name: str) -> bool:
+    """按当前模型元数据建表（连同表上的索引），表已存在时跳过。"""
+
+    if inspect(connection).has_table(table_name):
+        return False
+    SQLModel.metadata.tables[table_name].create(connection)
+    return True
+
+
+def add_column(connection: Connection, table_name: str, column: Column) -> bool:
+    """为已有表追加一列，列已存在时跳过。NOT NULL 列必须带 server_default。"""
+
+    if column.name in {item["name"] for item in inspect(connection).get_columns(table_name)}:
+        return False
+    definition = CreateColumn(column).compile(dialect=connection.dialect)
+    connection.execute(text(f"ALTER TABLE {connection.dialect.identifier_preparer.quote(table_name)} ADD COLUMN {definition}"))
+    return True
+
+
+def create_index(connection: Connection, name: str, table_name: str, columns: Sequence[str], *, unique: bool = False) -> bool:
+    """在线创建索引，索引已存在时跳过。
+
+    PostgreSQL 使用 CREATE INDEX CONCURRENTLY，不阻塞写入，需在 transactional=False
+    的迁移中调用；SQLite 没有并发建索引，建索引期间只短暂阻塞写入，读取不受影响。
+    """
+
+    if name in {item["name"] for item in inspect(connection).get_indexes(table_name)}:
+        return False
+    quote = connection.dialect.identifier_preparer.quote
+    concurrently = " CONCURRENTLY" if connection.dialect.name == "postgresql" else ""
+    connection.execute(
+        text(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX{concurrently} IF NOT EXISTS {quote(name)} "
+            f"ON {quote(table_name)} ({', '.join(quote(column) for column in columns)})"
+        )
+    )
+    return True
@@ -0,0 +1,92 @@
+"""按顺序排列的结构迁移步骤。
+
+新增表时直接按当前模型建表；给已有表加列、加索引时写成新的步骤，只追加不修改，
+已部署的库会从各自的版本号继续执行。
+"""
+from __future__ import annotations
+
+from sqlalchemy import Boolean, Column, DateTime, Integer, String, false, text
+from sqlalchemy.engine import Connection
+
+from app.db import models  # noqa: F401 - 注册所有表到 SQLModel.metadata
+from app.db.migrations.runner import Migration, add_column, create_index, create_table
+
+
+def _initial(connection: Connection) -> None:
+    create_table(connection, "messagetemplate")
+    create_table(connection, "chat")
+
+
+def _template_sent_columns(connection: Connection) -> None:
+    add_column(connection, "messagetemplate", Column("was_sent", Boolean, nullable=False, server_default=false()))
+    add_column(connection, "messagetemplate", Column("sent_at", DateTime, nullable=True))
+
+
+def _template_list_indexes(connection: Connection) -> None:
+    create_index(connection, "ix_messagetemplate_updated_id", "messagetemplate", ["updated_at", "id"])
+    create_index(connection, "ix_messagetemplate_sent_updated_id", "messagetemplate", ["was_sent", "updated_at", "id"])
+
+
+def _delivery_queue(connection: Connection) -> None:
+    create_table(connection, "delivery")
+
+
+def _schedules(connection: Connection) -> None:
+    create_table(connection, "schedule")
+
+
+def _delivery_request_id(connection: Connection) -> None:
+    add_column(connection, "delivery", Column("request_id", String(64), nullable=False, server_default=""))
+    # 旧数据中重复的 (模板, 版本, chat) 只保留最早一条参与去重，其余各自编号，唯一索引才能建立
+    connection.execute(
+        text(
+            "UPDATE delivery SET request_id = 'legacy:' || id WHERE request_id = '' AND id NOT IN "
+            "(SELECT min(id) FROM delivery WHERE request_id = '' GROUP BY template_id, template_version, chat_id)"
+        )
+    )
+
+
+def _delivery_key_index(connection: Connection) -> None:
+    create_index(connection, "ux_delivery_key", "delivery", ["template_id", "template_version", "chat_id", "request_id"], unique=True)
+
+
+def _update_offsets(connection: Connection) -> None:
+    create_table(connection, "updateoffset")
+
+
+def _chat_health(connection: Connection) -> None:
+    add_column(connection, "chat", Column("failure_score", Integer, nullable=False, server_default="0"))
+    add_column(connection, "chat", Column("last_failure_at", DateTime, nullable=True))
+    add_column(connection, "chat", Column("last_error", String(255), nullable=True))
+
+
+def _delivery_lease(connection: Connection) -> None:
+    add_column(connection, "delivery", Column("claimed_by", String(64), nullable=True))
+    add_column(connection, "delivery", Column("lease_expires_at", DateTime, nullable=True))
+
+
+def _send_attempts(connection: Connection) -> None:
+    create_table(connection, "sendattempt")
+
+
+def _feeds(connection: Connection) -> None:
+    create_table(connection, "feed")
+    create_table(connection, "feedentry")
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(1, "initial", _initial),
+    Migration(2, "template_sent_columns", _template_sent_columns),
+    Migration(3, "template_list_indexes", _template_list_indexes, transactional=False),
+    Migration(4, "delivery_queue", _delivery_queue),
+    Migration(5, "schedules", _schedules),
+    Migration(6, "delivery_request_id", _delivery_request_id),
+    Migration(7, "delivery_key_index", _delivery_key_index, transactional=False),
+    Migration(8, "update_offsets", _update_offsets),
+    Migration(9, "chat_health", _chat_health),
+    Migration(10, "feeds", _feeds),
+    Migration(11, "delivery_lease", _delivery_lease),
+    Migration(12, "send_attempts", _send_attempts),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
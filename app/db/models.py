@@ -1,14 +1,20 @@
-"""Stage 1 SQLModel 数据模型定义。"""  # 集中声明模板与聊天表
+"""Stage 1 SQLModel 数据模型定义。"""  # 集中声明模板、聊天、投递记录、发送尝试、定时任务、更新位置与订阅源表
 from __future__ import annotations  # 支持前向引用的类型注解
 
 from datetime import datetime
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
 class MessageTemplate(SQLModel, table=True):
     """保存群发模板及版本信息。"""
 
+    __table_args__ = (
+        Index("ix_messagetemplate_updated_id", "updated_at", "id"),  # 列表按 (updated_at, id) 游标分页
+        Index("ix_messagetemplate_sent_updated_id", "was_sent", "updated_at", "id"),  # 按发送状态筛选后分页
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     name: str = Field(index=True, unique=True, min_length=1, max_length=100)
     version: int = Field(default=1, ge=1)
@@ -29,6 +35,112 @@ class Chat(SQLModel, table=True):
     is_active: bool = Field(default=True)
     joined_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
     notes: str | None = Field(default=None, max_length=255)
+    failure_score: int = Field(default=0, nullable=False)  # 连续发送失败次数，成功后清零；达到阈值后在冷却期内跳过
+    last_failure_at: datetime | None = Field(default=None, nullable=True)
+    last_error: str | None = Field(default=None, max_length=255)  # 最近一次失败或停用的原因
+
+
+class Delivery(SQLModel, table=True):
+    """持久化的投递队列：每行代表一个 (模板, chat) 的发送任务及其结果。"""
+
+    __table_args__ = (
+        Index("ix_delivery_claim", "status", "next_attempt_at", "id"),  # 领取任务时按状态与到期时间扫描
+        Index("ux_delivery_key", "template_id", "template_version", "chat_id", "request_id", unique=True),  # 幂等键：同一版本模板对同一 chat 每个请求只投递一次
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    job_id: str = Field(index=True, max_length=32)  # 同一次提交的批次 ID
+    template_id: int = Field(index=True)
+    template_version: int = Field(ge=1)  # 入队时的模板版本
+    chat_id: int
+    request_id: str = Field(default="", max_length=64)  # 调用方提供的请求 ID（如定时任务的触发时刻），为空表示按模板版本与 chat 去重
+    status: str = Field(default="pending", max_length=16)  # pending / sending / sent / failed
+    attempts: int = Field(default=0, nullable=False)  # 累计发送尝试次数
+    error: str | None = Field(default=None, max_length=500)
+    next_attempt_at: datetime | None = Field(default=None, nullable=True)  # 为空表示立即可领取
+    claimed_by: str | None = Field(default=None, max_length=64)  # 领取该记录的 worker 池标识
+    lease_expires_at: datetime | None = Field(default=None, nullable=True)  # sending 记录的租约到期时间，发送期间持续续期
+    sent_at: datetime | None = Field(default=None, nullable=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+
+class SendAttempt(SQLModel, table=True):
+    """每一次 sendMessage 尝试的结果；队列投递关联 delivery_id，手动与批量广播为空。"""
+
+    id: int | None = Field(default=None, primary_key=True)
+    delivery_id: int | None = Field(default=None, index=True)  # 所属的投递记录
+    template_id: int | None = Field(default=None)
+    chat_id: int
+    attempt: int  # 第几次尝试，从 1 开始
+    ok: bool
+    kind: str | None = Field(default=None, max_length=16)  # rate_limited / transient / permanent / migrated
+    error: str | None = Field(default=None, max_length=500)
+    retry_after: float | None = Field(default=None)  # 429 时 Telegram 要求的等待秒数
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)  # 尝试结束的时间
+
+
+class Schedule(SQLModel, table=True):
+    """定时广播：一次性、固定间隔或 cron 表达式触发，到期时写入投递队列。"""
+
+    __table_args__ = (Index("ix_schedule_due", "enabled", "next_run_at"),)  # 启动时按下次触发时间加载
+
+    id: int | None = Field(default=None, primary_key=True)
+    name: str = Field(index=True, unique=True, min_length=1, max_length=100)
+    template_id: int = Field(index=True)
+    chat_ids: str = Field(max_length=4000)  # 逗号分隔的目标 chat ID
+    kind: str = Field(max_length=16)  # once / interval / cron
+    run_at: datetime | None = Field(default=None, nullable=True)  # once 的触发时间，interval 的起始时间（UTC）
+    interval_seconds: int | None = Field(default=None, ge=1)
+    cron: str | None = Field(default=None, max_length=100)  # 按 Settings.timezone 解释的 crontab 表达式
+    misfire_policy: str = Field(default="once", max_length=16)  # 错过触发时：once 补发一次 / skip 超出宽限则跳过
+    misfire_grace_seconds: int = Field(default=300, ge=0)
+    enabled: bool = Field(default=True)
+    next_run_at: datetime | None = Field(default=None, nullable=True)  # 为空表示不再触发
+    last_run_at: datetime | None = Field(default=None, nullable=True)
+    last_job_id: str | None = Field(default=None, max_length=32)  # 最近一次写入投递队列的批次 ID
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+
+class UpdateOffset(SQLModel, table=True):
+    """每个 Bot 已处理到的 Telegram 更新位置，与 chat 变更在同一事务中提交。"""
+
+    bot_id: str = Field(primary_key=True, max_length=32)  # token 中冒号前的 Bot ID
+    next_offset: int = Field(default=0)  # 下一次 getUpdates 使用的 offset（已处理的最大 update_id + 1）
+    updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+
+class Feed(SQLModel, table=True):
+    """RSS/Atom 订阅源：条件请求所需的校验信息、条目筛选规则与生成模板的格式。"""
+
+    id: int | None = Field(default=None, primary_key=True)
+    url: str = Field(unique=True, max_length=2000)
+    name: str = Field(unique=True, min_length=1, max_length=60)  # 生成的模板名前缀
+    include: str | None = Field(default=None, max_length=500)  # 逗号分隔的关键词，标题或摘要命中任意一个才生成模板；为空表示不限
+    exclude: str | None = Field(default=None, max_length=500)  # 逗号分隔的关键词，命中任意一个即跳过
+    text_format: str | None = Field(default=None, max_length=2000)  # 模板正文格式，{{ title }} 等变量按 parse_mode 转义；为空时使用默认格式
+    parse_mode: str = Field(default="HTML", max_length=16)
+    enabled: bool = Field(default=True)
+    etag: str | None = Field(default=None, max_length=255)  # 上次响应的 ETag，用于 If-None-Match
+    last_modified: str | None = Field(default=None, max_length=64)  # 上次响应的 Last-Modified，用于 If-Modified-Since
+    content_hash: str | None = Field(default=None, max_length=40)  # 上次响应体的摘要，服务端不支持条件请求时据此跳过解析
+    last_checked_at: datetime | None = Field(default=None, nullable=True)
+    last_status: int | None = Field(default=None)  # 最近一次 HTTP 状态码，网络错误时为空
+    last_error: str | None = Field(default=None, max_length=255)
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+
+class FeedEntry(SQLModel, table=True):
+    """已处理的订阅条目，按 guid 摘要去重；被筛掉的条目同样记录，之后不再重复判断。"""
+
+    __table_args__ = (Index("ux_feedentry_guid", "guid_hash", "feed_id", unique=True),)  # 按摘要批量查询已处理的条目
+
+    id: int | None = Field(default=None, primary_key=True)
+    feed_id: int
+    guid_hash: str = Field(max_length=40)  # guid（缺失时为链接或标题）的 SHA-1
+    template_id: int | None = Field(default=None)  # 被筛掉的条目为空
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
 
 
 def touch_template(template: MessageTemplate) -> None:
@@ -40,4 +152,4 @@ def touch_template(template: MessageTemplate) -> None:
 def init_models() -> None:
     """保留模型初始化钩子，当前未使用。"""
 
-    return None
+    return None
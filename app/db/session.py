@@ -1,15 +1,108 @@
 """Stage 1 database session helpers."""  # Module docstring indicating session management utilities
 from __future__ import annotations  # Enable postponed annotations for typing flexibility
 
-from contextlib import contextmanager  # Provide decorator to build session scope context manager
-from typing import Iterator  # Type hint representing generator output of context manager
-
-from sqlmodel import Session, SQLModel, create_engine  # Import ORM session, metadata base, and engine factory
-
-from app.config import get_settings  # Access configuration to retrieve current DATABASE_URL value
+import threading  # Guard one-time schema readiness across worker threads
+import time  # Measure session and statement durations for metrics
+from contextlib import asynccontextmanager, contextmanager  # Provide decorators to build sync/async session scopes
+from typing import AsyncIterator, Iterator  # Type hints representing generator output of context managers
+
+from sqlalchemy import event  # Hook connection creation to apply SQLite pragmas
+from sqlalchemy.engine import Engine, make_url  # Engine type and URL parser for dialect detection
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine  # Async engine used by the FastAPI handlers
+from sqlalchemy.pool import StaticPool  # Single shared connection for in-memory SQLite
+from sqlmodel import Session, create_engine  # Import ORM session and engine factory
+from sqlmodel.ext.asyncio.session import AsyncSession  # SQLModel-flavoured async session exposing exec()
+
+from app.config import Settings, get_settings  # Access configuration to retrieve current DATABASE_URL and engine profile
+from app.db.migrations import MIGRATIONS, migrate  # Versioned schema migrations applied by init_db
+from app.metrics import DB_QUERY_SECONDS, DB_SESSION_SECONDS  # Session lifetime and per-statement latency histograms
+from app.profiling import profiling_enabled, record, span  # Stage spans for opt-in profiling
 
 _ENGINE = None  # Cache SQLModel engine instance for reuse across calls
 _CURRENT_URL = None  # Track database URL used to build cached engine
+_ASYNC_ENGINE: AsyncEngine | None = None  # Cache async engine instance separately from the sync one
+_ASYNC_URL = None  # Track database URL used to build cached async engine
+_SCHEMA_READY_ENGINE = None  # Engine whose database has been migrated by this process
+_SCHEMA_LOCK = threading.Lock()  # Serialise the first migration when several threads race to ensure_schema
+_SYNC_SESSION_SECONDS = DB_SESSION_SECONDS.labels("sync")  # Pre-resolved histogram child for session_scope
+_ASYNC_SESSION_SECONDS = DB_SESSION_SECONDS.labels("async")  # Pre-resolved histogram child for async_session_scope
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "postgresql+psycopg2": "postgresql+asyncpg"}  # Sync dialect prefix -> asyncio driver
+
+
+def to_async_url(url: str) -> str:  # Translate a sync DATABASE_URL into its asyncio driver form
+    """Return the asyncio-driver URL for ``url`` (aiosqlite for SQLite, asyncpg for PostgreSQL)."""  # Docstring listing supported mappings
+
+    scheme, sep, rest = url.partition("://")  # Split dialect[+driver] from the remainder
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"  # Unknown or already-async schemes pass through unchanged
+
+
+def _is_sqlite_memory(url: str) -> bool:  # Detect SQLite databases that live only inside one connection
+    parsed = make_url(url)  # Parse URL so driver suffixes and query strings do not matter
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")  # Empty path also means in-memory
+
+
+def sqlite_pragmas(url: str, settings: Settings) -> list[str]:  # Build the PRAGMA statements run on every new connection
+    """Return the PRAGMA statements for ``url`` under the configured profile (empty for non-SQLite or ``default``)."""  # Docstring explaining when pragmas apply
+
+    if make_url(url).get_backend_name() != "sqlite" or settings.db_profile != "tuned":  # Only SQLite under the tuned profile
+        return []  # Leave driver defaults untouched
+    pragmas = [  # Settings that are per-connection and valid for every SQLite database
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",  # Wait for locks instead of failing with "database is locked"
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",  # NORMAL is durable across app crashes in WAL mode
+        f"PRAGMA cache_size={settings.sqlite_cache_size}",  # Larger page cache for listing queries
+    ]
+    if not _is_sqlite_memory(url):  # WAL and mmap need a real file
+        pragmas.insert(0, "PRAGMA journal_mode=WAL")  # Readers no longer block the writer and vice versa
+        pragmas.append(f"PRAGMA mmap_size={settings.sqlite_mmap_size}")  # Serve reads from the OS page cache without copying
+    return pragmas  # Statements executed in order by the connect listener
+
+
+def engine_options(url: str, settings: Settings) -> dict:  # Pool arguments shared by the sync and async engines
+    """Return create_engine keyword arguments for ``url`` under the configured profile."""  # Docstring describing option selection
+
+    if make_url(url).get_backend_name() != "sqlite":  # Networked databases benefit from pre-ping and explicit sizing
+        return {"pool_pre_ping": True, "pool_size": settings.db_pool_size, "max_overflow": settings.db_max_overflow}  # Detect dropped server connections
+    if _is_sqlite_memory(url):  # Every new connection would see an empty database
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}  # Share one connection across threads
+    if settings.db_profile != "tuned":  # Legacy behaviour kept for comparison benchmarks
+        return {"pool_pre_ping": True}  # Original engine arguments
+    return {"pool_size": settings.db_pool_size, "max_overflow": settings.db_max_overflow}  # Default QueuePool for files; pre-ping would only add a round-trip
+
+
+def _install_pragmas(engine: Engine, pragmas: list[str]) -> None:  # Register a connect listener applying pragmas
+    if not pragmas:  # Nothing to install for non-SQLite or default profile
+        return  # Keep engine free of listeners
+
+    @event.listens_for(engine, "connect")  # Runs once per new DBAPI connection, not per checkout
+    def _apply_pragmas(dbapi_connection, _record) -> None:  # Execute pragmas on the raw connection
+        cursor = dbapi_connection.cursor()  # Works for both sqlite3 and the aiosqlite adapter
+        try:  # Ensure the cursor is released even when a pragma fails
+            for pragma in pragmas:  # Apply statements in the declared order
+                cursor.execute(pragma)  # PRAGMA statements do not open a transaction
+        finally:  # Always close the cursor
+            cursor.close()  # Release cursor resources
+
+
+def _install_query_timer(engine: Engine) -> None:  # Observe every statement's execution time in DB_QUERY_SECONDS
+    observe = DB_QUERY_SECONDS.labels().observe  # Resolve the child once instead of per statement
+
+    @event.listens_for(engine, "before_cursor_execute")  # Fires right before the DBAPI execute call
+    def _start_timer(conn, _cursor, _statement, _parameters, _context, _executemany) -> None:  # Push a start timestamp
+        conn.info.setdefault("query_started", []).append(time.perf_counter())  # Stack handles nested executes on one connection
+
+    @event.listens_for(engine, "after_cursor_execute")  # Fires once the DBAPI execute call returned
+    def _stop_timer(conn, _cursor, _statement, _parameters, _context, _executemany) -> None:  # Pop and record duration
+        observe(time.perf_counter() - conn.info["query_started"].pop())  # Failed statements never reach here and leave no observation
+
+
+def _install_query_spans(engine: Engine) -> None:  # Attribute every statement's execution time to the active profile
+    @event.listens_for(engine, "before_cursor_execute")  # Fires right before the DBAPI execute call
+    def _start_span(conn, _cursor, _statement, _parameters, _context, _executemany) -> None:  # Push a start timestamp
+        conn.info.setdefault("span_started", []).append(time.perf_counter())  # Stack handles nested executes on one connection
+
+    @event.listens_for(engine, "after_cursor_execute")  # Fires once the DBAPI execute call returned
+    def _stop_span(conn, _cursor, _statement, _parameters, _context, _executemany) -> None:  # Pop and record under the current span
+        record("sql", time.perf_counter() - conn.info["span_started"].pop())  # No-op outside a profiled run
 
 
 def get_engine():  # Retrieve or build SQLModel engine respecting cached values
@@ -20,35 +113,104 @@ def get_engine():  # Retrieve or build SQLModel engine respecting cached values
     if _ENGINE is None or _CURRENT_URL != settings.database_url:  # Rebuild engine when missing or URL changed
         if _ENGINE is not None:  # If existing engine present dispose connections cleanly
             _ENGINE.dispose()  # Release pooled connections prior to replacement
-        _ENGINE = create_engine(settings.database_url, echo=False, pool_pre_ping=True)  # Construct new engine using SQLModel helper
+        _ENGINE = create_engine(settings.database_url, echo=False, **engine_options(settings.database_url, settings))  # Construct new engine using SQLModel helper
+        _install_pragmas(_ENGINE, sqlite_pragmas(settings.database_url, settings))  # Apply the SQLite profile to each new connection
+        if settings.metrics_sql_timing:  # Cursor events add ~10-20µs per statement, so timing is opt-in
+            _install_query_timer(_ENGINE)  # Feed per-statement latency into /metrics
+        if profiling_enabled(settings):  # Same cost as the metrics timer, only paid when profiling is configured
+            _install_query_spans(_ENGINE)  # Show SQL time as "sql" frames inside profile spans
         _CURRENT_URL = settings.database_url  # Record URL used to construct engine for future comparisons
     return _ENGINE  # Return cached or newly created engine to caller
 
 
+def get_async_engine() -> AsyncEngine:  # Retrieve or build the asyncio engine for the current URL
+    """Return an async engine for the current database URL, rebuilding it when the URL changes."""  # Docstring clarifying caching behaviour
+
+    global _ASYNC_ENGINE, _ASYNC_URL  # Mutate module-level cache variables when necessary
+    settings = get_settings()  # Load current configuration including database URL
+    if _ASYNC_ENGINE is None or _ASYNC_URL != settings.database_url:  # Rebuild engine when missing or URL changed
+        if _ASYNC_ENGINE is not None:  # Forget the previous engine's pool
+            _ASYNC_ENGINE.sync_engine.dispose(close=False)  # Connections cannot be awaited closed from sync code
+        async_url = to_async_url(settings.database_url)  # Same database reached through the asyncio driver
+        _ASYNC_ENGINE = create_async_engine(async_url, echo=False, **engine_options(async_url, settings))  # Build engine on the asyncio driver
+        _install_pragmas(_ASYNC_ENGINE.sync_engine, sqlite_pragmas(async_url, settings))  # Connect events are registered on the sync facade
+        if settings.metrics_sql_timing:  # Same opt-in as the sync engine
+            _install_query_timer(_ASYNC_ENGINE.sync_engine)  # Cursor events are also registered on the sync facade
+        if profiling_enabled(settings):  # Same opt-in as the sync engine
+            _install_query_spans(_ASYNC_ENGINE.sync_engine)  # Profiled API requests see their SQL time
+        _ASYNC_URL = settings.database_url  # Record URL used to construct engine for future comparisons
+    return _ASYNC_ENGINE  # Return cached or newly created engine to caller
+
+
+async def close_async_engine() -> None:  # Shutdown hook for async callers
+    """Close all pooled async connections (call from the application's shutdown hook)."""  # Docstring documenting lifecycle
+
+    global _ASYNC_ENGINE, _ASYNC_URL  # Reference cache variables declared at module scope
+    if _ASYNC_ENGINE is not None:  # Nothing to do when the async engine was never used
+        await _ASYNC_ENGINE.dispose()  # Await connection close on the running loop
+    _ASYNC_ENGINE = None  # Next use rebuilds the engine
+    _ASYNC_URL = None  # Reset stored async URL
+
+
 def reset_engine() -> None:  # Exposed utility to force engine rebuild (mainly for tests)
-    """Drop the cached engine so tests can force a rebuild."""  # Docstring documenting reset intention
+    """Drop the cached engines so tests can force a rebuild."""  # Docstring documenting reset intention
 
-    global _ENGINE, _CURRENT_URL  # Reference cache variables declared at module scope
+    global _ENGINE, _CURRENT_URL, _ASYNC_ENGINE, _ASYNC_URL, _SCHEMA_READY_ENGINE  # Reference cache variables declared at module scope
     if _ENGINE is not None:  # If engine exists dispose resources before clearing
         _ENGINE.dispose()  # Close pooled connections to avoid locked SQLite files
+    if _ASYNC_ENGINE is not None:  # Async engine holds its own pool
+        _ASYNC_ENGINE.sync_engine.dispose(close=False)  # Drop the pool; closing async connections needs a running loop (see close_async_engine)
     _ENGINE = None  # Clear engine reference so next get_engine call recreates one
     _CURRENT_URL = None  # Reset stored URL to ensure mismatch triggers rebuild
+    _ASYNC_ENGINE = None  # Clear async engine reference
+    _ASYNC_URL = None  # Reset stored async URL
+    _SCHEMA_READY_ENGINE = None  # A rebuilt engine may point at a fresh database
+
+
+def init_db() -> list[int]:  # Bring the schema up to the latest migration
+    """Apply pending schema migrations and return the versions that ran (empty when already current)."""  # Docstring summarising schema initialisation
 
+    global _SCHEMA_READY_ENGINE  # Record readiness for ensure_schema
+    engine = get_engine()  # Migrate the database behind the current engine
+    applied = migrate(engine, MIGRATIONS)  # Single-row version check, then only the missing steps
+    _SCHEMA_READY_ENGINE = engine  # Later ensure_schema calls on this engine are free
+    return applied  # Versions applied by this call
 
-def init_db() -> None:  # Create tables defined in SQLModel metadata
-    """Create database tables for the current metadata."""  # Docstring summarising schema initialisation
 
-    SQLModel.metadata.create_all(get_engine())  # Use ORM metadata to create tables on configured engine
+def ensure_schema() -> None:  # Cheap guard for hot paths that need the schema to exist
+    """Migrate the current database once per process and engine; subsequent calls are an identity check."""  # Docstring describing one-time semantics
+
+    if _SCHEMA_READY_ENGINE is not None and _SCHEMA_READY_ENGINE is get_engine():  # Fast path without locking
+        return  # Schema already verified for this engine
+    with _SCHEMA_LOCK:  # Only one thread runs the migration check
+        if _SCHEMA_READY_ENGINE is None or _SCHEMA_READY_ENGINE is not get_engine():  # Re-check after acquiring the lock
+            init_db()  # Migrate and mark the engine ready
 
 
 @contextmanager  # Convert generator function into context manager for session handling
 def session_scope() -> Iterator[Session]:  # Provide caller with session that automatically closes/commits
     """Provide a transactional scope around a series of operations."""  # Docstring describing transactional behaviour
 
-    with Session(get_engine()) as session:  # Open SQLModel session bound to cached engine
-        yield session  # Expose session to caller, automatically closing afterwards
+    started = time.perf_counter()  # Session lifetime feeds DB_SESSION_SECONDS{kind="sync"}
+    try:  # Record the duration even when the caller raises
+        with span("db"), Session(get_engine()) as session:  # Open SQLModel session bound to cached engine; counted as a "db" stage when profiling
+            yield session  # Expose session to caller, automatically closing afterwards
+    finally:  # Runs after the session has been closed
+        _SYNC_SESSION_SECONDS.observe(time.perf_counter() - started)  # Observe open-to-close time
+
+
+@asynccontextmanager  # Async counterpart of session_scope for coroutine callers
+async def async_session_scope() -> AsyncIterator[AsyncSession]:  # Provide caller with an AsyncSession bound to the async engine
+    """Provide an async session; attributes stay loaded after commit so results can be used outside the session."""  # Docstring describing expire_on_commit choice
+
+    started = time.perf_counter()  # Session lifetime feeds DB_SESSION_SECONDS{kind="async"}
+    try:  # Record the duration even when the caller raises
+        async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:  # Lazy loads are unavailable under asyncio, so do not expire on commit
+            yield session  # Expose session to caller, automatically closing afterwards
+    finally:  # Runs after the session has been closed
+        _ASYNC_SESSION_SECONDS.observe(time.perf_counter() - started)  # Observe open-to-close time
 
 
 if __name__ == "__main__":  # pragma: no cover - CLI helper  # Allow module to act as script for initialisation
     init_db()  # Initialise database schema when run as standalone script
-    print("Database initialised.")  # Display confirmation message in console
+    print("Database migrated.")  # Display confirmation message in console
@@ -0,0 +1,160 @@
+"""结构化日志：loguru JSON 输出、队列化 sink 与关联 ID。"""  # 各模块直接 from loguru import logger，入口处调用 configure_logging
+from __future__ import annotations  # 支持前向引用的类型注解
+
+import json  # 紧凑的单行 JSON
+import sys  # 默认输出到 stderr
+import threading  # 后台写出线程
+import traceback  # 异常堆栈写入 JSON 字段
+import uuid  # 生成关联 ID
+from collections import deque  # 调用方与写出线程之间的行队列
+from typing import Any, TextIO  # 类型注解
+
+from loguru import logger  # 全局 logger，handler 由本模块统一配置
+
+from app.config import Settings, get_settings  # 读取日志级别、格式与输出文件
+
+TEXT_FORMAT = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {extra[correlation_id]} | {name}:{function} - {message} | {extra}"  # LOG_JSON=0 时的可读格式；loguru 会自动追加异常堆栈
+MAX_PENDING_LINES = 100_000  # 队列上限；写出跟不上时丢弃新行并计数，而不是阻塞调用方
+WRITE_BATCH_LINES = 512  # 写出线程每次合并写入的最大行数
+FLUSH_INTERVAL = 0.05  # 写出线程的唤醒间隔（秒）
+
+
+def new_correlation_id() -> str:  # 每条投递、每个 HTTP 请求一个
+    """返回 16 位十六进制的关联 ID。"""
+
+    return uuid.uuid4().hex[:16]
+
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False, default=str)  # 复用编码器，避免每条记录重复解析参数
+
+
+def _json_line(record: dict[str, Any]) -> str:
+    """把一条记录格式化为单行 JSON：固定字段在前，调用方传入的字段（含 correlation_id）平铺在后。"""
+
+    payload: dict[str, Any] = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "logger": record["name"],
+        "function": record["function"],
+    }
+    payload.update(record["extra"])
+    if record["exception"] is not None:
+        error_type, error, tb = record["exception"]
+        payload["exception"] = "".join(traceback.format_exception(error_type, error, tb))
+    record["extra"]["_json"] = _ENCODER.encode(payload)
+    return "{extra[_json]}\n"  # loguru 会对返回值再做一次 format_map，JSON 本身放在 extra 中避免花括号被解析
+
+
+class QueuedSink:
+    """loguru sink：调用方只把格式化好的行追加到内存队列，由后台线程定期批量写出。
+
+    loguru 自带的 enqueue=True 面向多进程，每条记录都要 pickle 并经过管道，实测比直接写文件更慢；
+    这里只在进程内传递字符串，追加不加锁也不唤醒线程，写出线程每 flush_interval 秒才抢一次 GIL。
+    队列满时丢弃新行并计数，保证日志调用不会阻塞事件循环。
+    """
+
+    def __init__(self, stream: TextIO, *, max_pending: int = MAX_PENDING_LINES, flush_interval: float = FLUSH_INTERVAL, close_stream: bool = False):
+        self.stream = stream  # 实际写出的目标
+        self.max_pending = max_pending  # 队列上限
+        self.flush_interval = flush_interval  # 写出线程的唤醒间隔（秒）
+        self.dropped = 0  # 因队列已满而丢弃的行数
+        self._close_stream = close_stream  # 由本对象打开的文件在关闭时一并关闭
+        self._lines: deque[str] = deque()  # append/popleft 在 GIL 下是原子的
+        self._waiters: list[threading.Event] = []  # 等待下一次写出完成的 flush 调用
+        self._wakeup = threading.Event()  # flush/close 时提前唤醒写出线程
+        self._stopping = False  # close 后写完剩余的行即退出
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)  # 进程退出时不阻塞
+        self._thread.start()
+
+    def write(self, message: str) -> None:  # 由 loguru 在调用方线程中调用
+        if len(self._lines) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._lines.append(message)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            waiters, self._waiters = self._waiters, []  # 先取出等待者，保证其调用前追加的行包含在本次写出中
+            stopping = self._stopping
+            self._write_pending()
+            for waiter in waiters:
+                waiter.set()
+            if stopping:
+                return
+
+    def _write_pending(self) -> None:
+        while self._lines:
+            lines = [self._lines.popleft() for _ in range(min(len(self._lines), WRITE_BATCH_LINES))]
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                lines.append(json.dumps({"level": "WARNING", "message": "log lines dropped", "dropped": dropped}) + "\n")
+            try:
+                self.stream.write("".join(lines))
+            except Exception:  # noqa: BLE001 - 日志写出失败不能影响业务，也不能让写出线程退出
+                pass
+        try:
+            self.stream.flush()
+        except Exception:  # noqa: BLE001
+            pass
+
+    def flush(self, timeout: float | None = None) -> None:
+        """等待此前追加的行全部写出。"""
+
+        waiter = threading.Event()
+        self._waiters.append(waiter)
+        self._wakeup.set()
+        waiter.wait(timeout)
+
+    def close(self) -> None:
+        """写出剩余的行并停止后台线程。"""
+
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join()
+        if self._close_stream:
+            self.stream.close()
+
+
+_SINK: QueuedSink | None = None  # 当前生效的队列化 sink
+
+
+def configure_logging(settings: Settings | None = None, *, sink: TextIO | None = None) -> None:
+    """替换 loguru 的默认 handler：按配置输出 JSON 或文本，写出由后台线程完成。"""
+
+    global _SINK
+    settings = settings or get_settings()  # 未传入时读取当前配置
+    shutdown_logging()  # 移除默认的同步 stderr handler 及此前的配置
+    logger.configure(extra={"correlation_id": "-"})  # 没有关联 ID 的记录也能按格式输出
+    if sink is not None:
+        _SINK = QueuedSink(sink)
+    elif settings.log_file:
+        _SINK = QueuedSink(open(settings.log_file, "a", encoding="utf-8"), close_stream=True)  # 轮转交给 logrotate（copytruncate）
+    else:
+        _SINK = QueuedSink(sys.stderr)
+    logger.add(
+        _SINK.write,
+        level=settings.log_level.upper(),
+        format=_json_line if settings.log_json else TEXT_FORMAT,  # 默认每条记录一行 JSON
+        backtrace=False,  # 不展开调用方以外的堆栈
+        diagnose=False,  # 不在异常中输出变量值，避免泄露 token 与消息正文
+    )
+
+
+def flush_logging(timeout: float | None = None) -> None:
+    """等待已提交的日志全部写出（测试与基准使用）。"""
+
+    if _SINK is not None:
+        _SINK.flush(timeout)
+
+
+def shutdown_logging() -> None:  # 进程退出前调用
+    """移除 handler，写出剩余记录并停止后台线程。"""
+
+    global _SINK
+    logger.remove()
+    if _SINK is not None:
+        _SINK.close()
+        _SINK = None
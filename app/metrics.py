@@ -0,0 +1,236 @@
+"""进程内轻量指标注册表，输出 Prometheus 文本格式。"""  # 不依赖 prometheus_client，热路径只有一次字典查找与加锁累加
+from __future__ import annotations  # 支持前向引用的类型注解
+
+import inspect  # 区分同步与异步函数
+import threading  # 指标可能在 to_thread 的工作线程中更新
+import time  # 计时装饰器
+from bisect import bisect_left  # 直方图按上界定位桶
+from functools import wraps  # 保留被装饰函数的元数据
+from typing import Callable, Iterable, Sequence  # 类型注解
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # 秒，覆盖本地查询到慢速网络请求
+
+
+def _escape(value: str) -> str:  # 标签值转义
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:  # 拼接 {a="1",b="2"}
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:  # 整数值不带小数点
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    """带标签的指标基类：labels() 返回按标签值缓存的子指标。"""
+
+    kind = "untyped"  # Prometheus TYPE 名称
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Registry | None = None):
+        self.name = name  # 指标名
+        self.documentation = documentation  # HELP 文本
+        self.labelnames = tuple(labelnames)  # 标签名
+        self._children: dict[tuple[str, ...], object] = {}  # 标签值 -> 子指标
+        self._lock = threading.Lock()  # 创建子指标时加锁
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: object):  # 热路径：命中缓存时只有一次字典查找
+        key = tuple(map(str, values))
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """单调递增计数器。"""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:  # 无标签时直接累加
+        self.labels().inc(amount)
+
+    def _samples(self) -> Iterable[str]:
+        for key, child in sorted(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float) -> None:  # 单次赋值本身是原子的
+        self.value = value
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值，通常在抓取时由回调刷新。"""
+
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def _samples(self) -> Iterable[str]:
+        for key, child in sorted(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # 最后一个为 +Inf 桶
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._bounds, value)  # 第一个 >= value 的上界
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    """固定桶的直方图，输出累计桶计数、总和与次数。"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Registry | None = None, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))  # 桶上界（秒）
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> Iterable[str]:
+        for key, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(child.sum)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+class Registry:
+    """指标集合；collectors 在每次渲染前调用，用于刷新队列深度等抓取时才计算的值。"""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}  # 指标名 -> 指标
+        self._collectors: list[Callable[[], None]] = []  # 渲染前的刷新回调
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标 {metric.name} 已注册")
+        self._metrics[metric.name] = metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def get(self, name: str) -> _Metric | None:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """按 Prometheus 文本格式 0.0.4 输出全部指标。"""
+
+        for collector in self._collectors:
+            collector()
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()  # 进程级默认注册表
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"  # /metrics 的响应类型
+
+
+def timed(histogram: Histogram, *labels: str):
+    """记录同步或异步函数耗时的装饰器；子指标在装饰时解析，调用时无需再查找标签。"""
+
+    child = histogram.labels(*labels)
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    child.observe(time.perf_counter() - started)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+TELEGRAM_REQUEST_SECONDS = Histogram("tg_api_request_seconds", "Telegram Bot API 调用耗时（秒）", ["method", "outcome"])
+SENDS_TOTAL = Counter("tg_sends_total", "消息发送尝试次数，按 chat 类型与结果统计", ["chat_type", "outcome"])
+MANUAL_BROADCASTS_TOTAL = Counter("tg_manual_broadcasts_total", "send_manual_broadcast 调用次数", ["outcome"])
+MANUAL_BROADCAST_SECONDS = Histogram("tg_manual_broadcast_seconds", "send_manual_broadcast 总耗时（秒）")
+TEMPLATE_SERVICE_SECONDS = Histogram("template_service_seconds", "TemplateService 方法耗时（秒）", ["method"])
+DB_SESSION_SECONDS = Histogram("db_session_seconds", "session_scope 从打开到关闭的耗时（秒）", ["kind"])
+DB_QUERY_SECONDS = Histogram("db_query_seconds", "单条 SQL 执行耗时（秒）")
+DELIVERY_QUEUE_DEPTH = Gauge("delivery_queue_depth", "投递队列中各状态的记录数", ["status"])
+TEMPLATE_CACHE_ENTRIES = Gauge("template_cache_entries", "模板缓存当前条目数")
+UPDATES_TOTAL = Counter("tg_updates_total", "已处理的 Telegram 更新数，按来源（poll/webhook）统计", ["source"])
+CHAT_HEALTH_TOTAL = Counter("chat_health_changes_total", "发送路径对 chat 的处理：gone/migrated/failed/recovered 为写回的状态变化，skipped 为跳过的发送", ["change"])
+CHAT_UPSERTS_TOTAL = Counter("chat_upserts_total", "由更新写入 Chat 表的记录数，按 inserted/updated 统计", ["action"])
+FEED_FETCHES_TOTAL = Counter("feed_fetches_total", "订阅源抓取次数，按结果统计：modified 解析了新内容，not_modified 为 304 或内容未变，failed 为网络或解析错误", ["outcome"])
+FEED_ENTRIES_TOTAL = Counter("feed_entries_total", "新出现的订阅条目数，按 created（生成模板）/filtered（被规则筛掉）统计", ["result"])
+DELIVERY_DUPLICATES_TOTAL = Counter("delivery_duplicates_total", "入队时被判定为重复而跳过的投递数，按判定来源统计", ["source"])
+TEMPLATE_CACHE_EVENTS = Counter("template_cache_events_total", "模板缓存累计命中/未命中/重新校验/淘汰次数", ["event"])
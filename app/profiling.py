@@ -0,0 +1,180 @@
+"""可选的性能剖析：分阶段计时 span 与采样式调用栈，输出火焰图可用的折叠栈文件。"""  # 由 PROFILE_* 配置开启，关闭时每个 span 只有一次 ContextVar 读取
+from __future__ import annotations  # 支持前向引用的类型注解
+
+import json  # 阶段汇总
+import os  # 采样线程读取模块路径
+import random  # API 请求按比例采样
+import sys  # sys._current_frames 读取目标线程的调用栈
+import threading  # 采样线程与跨线程的 span 累加
+import time  # 计时
+import uuid  # 输出文件名去重
+from collections import Counter  # 折叠栈计数
+from contextlib import contextmanager, nullcontext  # span 与关闭时的空上下文
+from contextvars import ContextVar  # 当前剖析与 span 路径随 asyncio 任务传递
+from datetime import datetime  # 输出文件名中的时间戳
+from pathlib import Path  # 输出目录
+from typing import Iterator  # 类型注解
+
+from loguru import logger  # 剖析结束时记录输出位置与各阶段耗时
+
+from app.config import Settings, get_settings  # 读取 PROFILE_* 配置
+
+_ACTIVE: ContextVar[Profile | None] = ContextVar("profile", default=None)  # 当前任务所属的剖析
+_PATH: ContextVar[tuple[str, ...]] = ContextVar("profile_path", default=())  # 当前 span 的嵌套路径
+_DISABLED = nullcontext()  # 未开启剖析时 span 返回的共享空上下文
+
+
+class StackSampler:
+    """后台线程定期读取目标线程的调用栈，按 "根;...;叶" 折叠计数（Brendan Gregg 折叠栈格式）。"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id  # 被采样的线程（通常是事件循环所在线程）
+        self.interval = interval  # 采样间隔（秒）
+        self.stacks: Counter[str] = Counter()  # 折叠栈 -> 采样次数
+        self._stop = threading.Event()  # 停止信号
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names: list[str] = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+
+class Profile:
+    """一次剖析：累计各 span 路径的次数与耗时，可附带采样调用栈。"""
+
+    def __init__(self, name: str):
+        self.name = name  # 剖析对象，如 broadcast、GET /api/templates
+        self.started = time.perf_counter()  # 开始时间
+        self.elapsed = 0.0  # 结束后的总耗时（秒）
+        self.spans: dict[tuple[str, ...], list[float]] = {}  # 路径 -> [次数, 累计秒数]
+        self.sampler: StackSampler | None = None  # 采样器，未开启时为 None
+        self._lock = threading.Lock()  # to_thread 中的 span 与事件循环并发累加
+
+    def add(self, path: tuple[str, ...], elapsed: float) -> None:
+        with self._lock:
+            entry = self.spans.setdefault(path, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def stages(self) -> dict[str, dict[str, float]]:
+        """按路径汇总：{"http": {"count": 100, "total_ms": 512.3}, "db;claim": {...}}。"""
+
+        return {";".join(path): {"count": int(count), "total_ms": round(total * 1000, 3)} for path, (count, total) in sorted(self.spans.items())}
+
+    def folded_spans(self) -> list[str]:
+        """以 span 路径为栈、自身耗时（微秒）为权重的折叠栈；并发任务的子 span 可能累计超过父级墙钟时间。"""
+
+        totals = {path: total for path, (_, total) in self.spans.items()}
+        totals[()] = self.elapsed
+        children: dict[tuple[str, ...], float] = {}
+        for path, total in totals.items():
+            if path:
+                children[path[:-1]] = children.get(path[:-1], 0.0) + total
+        lines = []
+        for path, total in sorted(totals.items()):
+            own = max(0.0, total - children.get(path, 0.0))
+            if own > 0:
+                lines.append(f"{';'.join((self.name, *path))} {round(own * 1e6)}")
+        return lines
+
+    def write(self, directory: Path) -> Path:
+        """写出 <名称>-<时间>-<ID>.json（阶段汇总）、.spans.folded 以及采样时的 .folded，返回 JSON 路径。"""
+
+        directory.mkdir(parents=True, exist_ok=True)
+        slug = "".join(char if char.isalnum() else "_" for char in self.name).strip("_") or "profile"
+        base = directory / f"{slug}-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        summary = {"name": self.name, "wall_ms": round(self.elapsed * 1000, 3), "stages": self.stages()}
+        if self.sampler is not None:
+            summary["samples"] = sum(self.sampler.stacks.values())
+            base.with_suffix(".folded").write_text("".join(f"{stack} {count}\n" for stack, count in self.sampler.stacks.most_common()), encoding="utf-8")
+        base.with_suffix(".spans.folded").write_text("".join(f"{line}\n" for line in self.folded_spans()), encoding="utf-8")
+        path = base.with_suffix(".json")
+        path.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+        return path
+
+
+def span(name: str):
+    """标记一个阶段（db、render、rate_limit、http 等）；不在剖析中时返回共享的空上下文。"""
+
+    if _ACTIVE.get() is None:
+        return _DISABLED
+    return _span(name)
+
+
+@contextmanager
+def _span(name: str) -> Iterator[None]:
+    profile = _ACTIVE.get()
+    path = (*_PATH.get(), name)
+    token = _PATH.set(path)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(path, time.perf_counter() - started)
+        _PATH.reset(token)
+
+
+@contextmanager
+def profile_run(name: str, *, sample: bool = True) -> Iterator[Profile]:
+    """在剖析中运行代码块：期间的 span 计入本次剖析，sample=True 时同时采样当前线程的调用栈。"""
+
+    settings = get_settings()
+    profile = Profile(name)
+    if sample:
+        profile.sampler = StackSampler(threading.get_ident(), settings.profile_sample_interval)
+        profile.sampler.start()
+    profile_token = _ACTIVE.set(profile)
+    path_token = _PATH.set(())
+    try:
+        yield profile
+    finally:
+        _PATH.reset(path_token)
+        _ACTIVE.reset(profile_token)
+        profile.elapsed = time.perf_counter() - profile.started
+        if profile.sampler is not None:
+            profile.sampler.stop()
+        output = profile.write(Path(settings.profile_dir))
+        logger.info("profile written", profile=name, path=str(output), wall_ms=round(profile.elapsed * 1000, 1), stages=profile.stages())
+
+
+def record(name: str, elapsed: float) -> None:
+    """把一段已测得的耗时计入当前 span 之下（供 SQL 游标事件等无法包裹代码块的场景使用）。"""
+
+    profile = _ACTIVE.get()
+    if profile is not None:
+        profile.add((*_PATH.get(), name), elapsed)
+
+
+def profiling_enabled(settings: Settings) -> bool:
+    """是否开启了任意一种剖析（决定是否安装 SQL 语句级的计时钩子）。"""
+
+    return settings.profile_broadcasts or settings.profile_api_sample_rate > 0
+
+
+def profiling_broadcasts(name: str = "broadcast"):
+    """PROFILE_BROADCASTS 开启且当前不在剖析中时返回 profile_run(name)，否则返回空上下文。"""
+
+    if _ACTIVE.get() is not None or not get_settings().profile_broadcasts:
+        return _DISABLED
+    return profile_run(name)
+
+
+def should_profile_request() -> bool:
+    """按 PROFILE_API_SAMPLE_RATE 决定是否剖析本次 API 请求。"""
+
+    rate = get_settings().profile_api_sample_rate
+    return rate > 0 and random.random() < rate
@@ -0,0 +1,214 @@
+"""Chat 登记表的批量维护与更新位置持久化。"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import bindparam, insert, update
+from sqlmodel import Session, select
+
+from app.db.bulk import chunked
+from app.db.models import Chat, UpdateOffset
+
+CHAT_TABLE = Chat.__table__  # 按 WHERE 条件批量执行（executemany）的语句使用 Core 表，绕开 ORM 的按主键批量更新
+
+
+@dataclass(slots=True)
+class ChatChange:
+    """从一条 Telegram 更新中提取的 chat 信息；is_active 为 None 表示不改变成员状态。"""
+
+    chat_id: int
+    type: str
+    title: str | None
+    is_active: bool | None = None
+
+
+@dataclass(slots=True)
+class ChatUpsertResult:
+    """一次批量写入的结果。"""
+
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+
+@dataclass(slots=True)
+class ChatHealthReport:
+    """一批发送中收集到的 chat 状态变化，结束时一次性写回。"""
+
+    gone: dict[int, str] = field(default_factory=dict)  # chat_id -> 停用原因
+    migrated: dict[int, int] = field(default_factory=dict)  # 旧 chat_id -> 新 chat_id
+    failed: dict[int, str] = field(default_factory=dict)  # 重试用尽仍失败的 chat -> 错误
+    recovered: set[int] = field(default_factory=set)  # 失败计数大于 0 且本次发送成功的 chat
+
+    def __bool__(self) -> bool:
+        return bool(self.gone or self.migrated or self.failed or self.recovered)
+
+
+@dataclass(slots=True)
+class ChatStatus:
+    """发送前需要的 chat 信息。"""
+
+    type: str
+    title: str | None
+    failure_score: int
+    skip_reason: str | None = None  # 不为空时本次不发送
+
+
+def chat_skip_reason(
+    is_active: bool,
+    failure_score: int,
+    last_failure_at: datetime | None,
+    last_error: str | None,
+    *,
+    threshold: int,
+    cooldown: timedelta,
+    now: datetime,
+) -> str | None:
+    """已停用的 chat，以及连续失败达到阈值且仍在冷却期内的 chat 返回跳过原因。"""
+
+    if not is_active:
+        return f"chat 已停用：{last_error or '未知原因'}"
+    if threshold > 0 and failure_score >= threshold and last_failure_at is not None and now - last_failure_at < cooldown:
+        return f"chat 连续失败 {failure_score} 次，暂停发送至 {(last_failure_at + cooldown):%Y-%m-%d %H:%M:%S} UTC"
+    return None
+
+
+def merge_changes(changes: Iterable[ChatChange]) -> dict[int, ChatChange]:
+    """按更新顺序合并同一 chat 的多次变更：类型与标题取最新值，成员状态取最后一次明确的值。"""
+
+    merged: dict[int, ChatChange] = {}
+    for change in changes:
+        previous = merged.get(change.chat_id)
+        if previous is not None and change.is_active is None:
+            change = ChatChange(change.chat_id, change.type, change.title, previous.is_active)
+        merged[change.chat_id] = change
+    return merged
+
+
+class ChatService:
+    """把一批 chat 变更写入 Chat 表，可选地在同一事务中推进更新位置。"""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def get_offset(self, bot_id: str) -> int:
+        """返回该 Bot 下一次 getUpdates 应使用的 offset，从未处理过更新时为 0。"""
+
+        offset = self.session.get(UpdateOffset, bot_id)
+        return offset.next_offset if offset else 0
+
+    def apply_changes(
+        self,
+        changes: Iterable[ChatChange],
+        *,
+        bot_id: str | None = None,
+        next_offset: int | None = None,
+    ) -> ChatUpsertResult:
+        """批量插入新 chat、更新已变化的 chat，与 offset 一起提交。
+
+        已有记录按主键分块读取一次；内容没有变化的 chat 不产生写入，新增与更新各一次 executemany。
+        重新加入的 chat 刷新 joined_at 并清空失败计数。
+        """
+
+        merged = merge_changes(changes)
+        existing: dict[int, tuple[str, str | None, bool]] = {}
+        for chunk in chunked(list(merged)):
+            rows = self.session.exec(select(Chat.chat_id, Chat.type, Chat.title, Chat.is_active).where(Chat.chat_id.in_(chunk))).all()
+            existing.update((chat_id, (chat_type, title, is_active)) for chat_id, chat_type, title, is_active in rows)
+
+        now = datetime.utcnow()
+        result = ChatUpsertResult()
+        inserts: list[dict] = []
+        updates: list[dict] = []
+        for chat_id, change in merged.items():
+            current = existing.get(chat_id)
+            if current is None:
+                active = True if change.is_active is None else change.is_active
+                inserts.append({"chat_id": chat_id, "type": change.type, "title": change.title, "is_active": active, "joined_at": now})
+                continue
+            chat_type, title, is_active = current
+            active = is_active if change.is_active is None else change.is_active
+            if (chat_type, title, is_active) == (change.type, change.title, active):
+                result.unchanged += 1
+                continue
+            values = {"chat_id": chat_id, "type": change.type, "title": change.title, "is_active": active}
+            if active and not is_active:
+                values.update(joined_at=now, failure_score=0, last_failure_at=None, last_error=None)
+            updates.append(values)
+        if inserts:
+            self.session.exec(insert(Chat), params=inserts)
+        if updates:
+            self.session.exec(update(Chat), params=updates)
+        if bot_id is not None and next_offset is not None:
+            self._advance_offset(bot_id, next_offset, now)
+        self.session.commit()
+        result.inserted = len(inserts)
+        result.updated = len(updates)
+        return result
+
+    def _advance_offset(self, bot_id: str, next_offset: int, now: datetime) -> None:
+        offset = self.session.get(UpdateOffset, bot_id)
+        if offset is None:
+            self.session.add(UpdateOffset(bot_id=bot_id, next_offset=next_offset, updated_at=now))
+        elif next_offset > offset.next_offset:
+            offset.next_offset = next_offset
+            offset.updated_at = now
+            self.session.add(offset)
+
+    def load_statuses(self, *, threshold: int, cooldown: timedelta, now: datetime | None = None) -> dict[int, ChatStatus]:
+        """一次查询读取全部 chat 的类型、标题与跳过原因。"""
+
+        now = now or datetime.utcnow()
+        rows = self.session.exec(
+            select(Chat.chat_id, Chat.type, Chat.title, Chat.is_active, Chat.failure_score, Chat.last_failure_at, Chat.last_error)
+        ).all()
+        return {
+            chat_id: ChatStatus(
+                type=chat_type,
+                title=title,
+                failure_score=score,
+                skip_reason=chat_skip_reason(is_active, score, failed_at, error, threshold=threshold, cooldown=cooldown, now=now),
+            )
+            for chat_id, chat_type, title, is_active, score, failed_at, error in rows
+        }
+
+    def record_health(self, report: ChatHealthReport) -> None:
+        """按类别各用一次 executemany 写回停用、迁移、失败计数与恢复，一次提交。
+
+        迁移时若新 ID 尚未登记，则把原记录改写为新 ID 的超级群组；已登记时停用旧记录。
+        """
+
+        now = datetime.utcnow()
+        gone = dict(report.gone)
+        if report.migrated:
+            targets = set(report.migrated.values())
+            registered: set[int] = set()
+            for chunk in chunked(list(targets)):
+                registered.update(self.session.exec(select(Chat.chat_id).where(Chat.chat_id.in_(chunk))).all())
+            moves = [{"old_id": old, "new_id": new} for old, new in report.migrated.items() if new not in registered]
+            if moves:
+                self.session.exec(
+                    update(CHAT_TABLE)
+                    .where(CHAT_TABLE.c.chat_id == bindparam("old_id"))
+                    .values(chat_id=bindparam("new_id"), type="supergroup", failure_score=0, last_error=None),
+                    params=moves,
+                )
+            gone.update((old, f"已升级为超级群组 {new}") for old, new in report.migrated.items() if new in registered)
+        if gone:
+            self.session.exec(
+                update(CHAT_TABLE).where(CHAT_TABLE.c.chat_id == bindparam("target")).values(is_active=False, last_error=bindparam("error")),
+                params=[{"target": chat_id, "error": error[:255]} for chat_id, error in gone.items()],
+            )
+        if report.failed:
+            self.session.exec(
+                update(CHAT_TABLE)
+                .where(CHAT_TABLE.c.chat_id == bindparam("target"))
+                .values(failure_score=CHAT_TABLE.c.failure_score + 1, last_failure_at=now, last_error=bindparam("error")),
+                params=[{"target": chat_id, "error": error[:255]} for chat_id, error in report.failed.items()],
+            )
+        recovered = sorted(report.recovered - report.failed.keys())
+        for chunk in chunked(recovered):
+            self.session.exec(update(Chat).where(Chat.chat_id.in_(chunk)).values(failure_score=0, last_failure_at=None))
+        self.session.commit()
@@ -0,0 +1,428 @@
+"""投递队列业务服务。"""
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Sequence
+
+from sqlalchemy import and_, func, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.config import get_settings
+from app.db.bulk import chunked
+from app.db.models import Delivery, MessageTemplate, SendAttempt
+from app.metrics import DELIVERY_DUPLICATES_TOTAL
+from app.services.templates import TemplateNotFoundError, get_template_cache
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+DEFAULT_LEASE = timedelta(minutes=10)
+
+DeliveryKey = tuple[int, int, int, str]  # (template_id, template_version, chat_id, request_id)，对应唯一索引 ux_delivery_key
+
+
+class DeliveryKeyCache:
+    """已入队或已发送的投递幂等键的 LRU，重复提交在内存中直接判定，无需查询数据库。
+
+    sent 是终态，条目在被挤出前一直有效；待发送的键之后可能失败并允许重新入队，
+    只在 ttl 内有效，过期后回到数据库判断。本进程回写失败结果时立即移除对应键。
+    """
+
+    def __init__(self, max_size: int = 100_000, ttl: float = 60.0, *, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[DeliveryKey, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: DeliveryKey) -> bool:
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None:
+                return False
+            if expires < self._clock():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def add(self, keys: Iterable[DeliveryKey], *, sent: bool = False) -> None:
+        expires = float("inf") if sent else self._clock() + self.ttl
+        with self._lock:
+            for key in keys:
+                self._entries[key] = expires
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, keys: Iterable[DeliveryKey]) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_KEY_CACHE: DeliveryKeyCache | None = None
+
+
+def get_delivery_key_cache() -> DeliveryKeyCache:
+    """返回进程级投递幂等键缓存，首次调用时按配置创建。"""
+
+    global _KEY_CACHE
+    if _KEY_CACHE is None:
+        settings = get_settings()
+        _KEY_CACHE = DeliveryKeyCache(settings.delivery_key_cache_size, settings.delivery_key_cache_ttl)
+    return _KEY_CACHE
+
+
+def reset_delivery_key_cache() -> None:
+    """丢弃进程级投递幂等键缓存（主要用于测试）。"""
+
+    global _KEY_CACHE
+    _KEY_CACHE = None
+
+
+@dataclass(slots=True)
+class DeliveryResult:
+    """一条投递的最终结果，用于批量回写。"""
+
+    delivery_id: int
+    ok: bool
+    attempts: int
+    error: str | None = None
+    history: list[dict] = field(default_factory=list)  # 本次领取期间的逐次尝试，sendattempt 表的列（不含 delivery_id）
+
+
+@dataclass(slots=True)
+class ClaimedDelivery:
+    """被领取的投递记录中 worker 需要的字段。"""
+
+    delivery_id: int
+    template_id: int
+    chat_id: int
+    attempts: int
+    job_id: str
+
+
+@dataclass(slots=True)
+class JobSummary:
+    """一个批次内各状态的数量。"""
+
+    job_id: str
+    total: int
+    pending: int
+    sending: int
+    sent: int
+    failed: int
+
+    @property
+    def done(self) -> bool:
+        return self.total > 0 and self.pending == 0 and self.sending == 0
+
+
+class DeliveryService:
+    """提供投递任务的入队、领取与结果回写。"""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def enqueue(self, template_ids: Sequence[int], chat_ids: Sequence[int], *, request_id: str | None = None) -> tuple[str, int]:
+        """为每个 (模板, chat) 组合写入一条待发送记录，返回批次 ID 与入队数量（不含被判定为重复的组合）。"""
+
+        return self.enqueue_many([(template_ids, chat_ids)], request_ids=[request_id])[0]
+
+    def enqueue_many(
+        self,
+        batches: Sequence[tuple[Sequence[int], Sequence[int]]],
+        *,
+        request_ids: Sequence[str | None] | None = None,
+    ) -> list[tuple[str, int]]:
+        """一次写入多个批次（每个批次一个 job_id），所有记录共用一次 executemany 与一次提交。
+
+        每条记录以 (模板 ID, 模板版本, chat, 请求 ID) 为幂等键：已入队或已发送的键被跳过，
+        曾经失败的键移入新批次重新发送。先查进程内的键缓存，未命中的键再按唯一索引查询数据库。
+        """
+
+        request_ids = list(request_ids or [None] * len(batches))
+        try:
+            with self.session.begin_nested():
+                jobs, sent, queued = self._enqueue_many(batches, request_ids)
+        except IntegrityError:
+            # 并发请求提交了相同的键：只回滚到保存点，调用方在同一会话中尚未提交的修改（如定时任务的下次触发时间）
+            # 随本次入队一起提交；重新判定一次，此时对方的记录已经可见
+            with self.session.begin_nested():
+                jobs, sent, queued = self._enqueue_many(batches, request_ids)
+        self.session.commit()
+        key_cache = get_delivery_key_cache()
+        key_cache.add(sent, sent=True)
+        key_cache.add(queued)
+        return jobs
+
+    def _template_versions(self, template_ids: set[int]) -> dict[int, int]:
+        cache = get_template_cache()
+        versions: dict[int, int] = {}
+        unknown: list[int] = []
+        for template_id in sorted(template_ids):
+            snapshot = cache.get(template_id)
+            if snapshot is not None:
+                versions[template_id] = snapshot.version
+            else:
+                unknown.append(template_id)
+        for chunk in chunked(unknown):
+            versions.update(
+                self.session.exec(
+                    select(MessageTemplate.id, MessageTemplate.version).where(MessageTemplate.id.in_(chunk))
+                ).all()
+            )
+        missing = sorted(template_ids - versions.keys())
+        if missing:
+            raise TemplateNotFoundError(", ".join(map(str, missing)))
+        return versions
+
+    def _existing(self, keys: Iterable[DeliveryKey]) -> dict[DeliveryKey, tuple[int, str]]:
+        """按唯一索引查询已有记录，返回 键 -> (记录 ID, 状态)。"""
+
+        groups: dict[tuple[int, int, str], list[int]] = {}
+        for template_id, version, chat_id, request_id in keys:
+            groups.setdefault((template_id, version, request_id), []).append(chat_id)
+        existing: dict[DeliveryKey, tuple[int, str]] = {}
+        for (template_id, version, request_id), chat_ids in groups.items():
+            for chunk in chunked(chat_ids):
+                rows = self.session.exec(
+                    select(Delivery.id, Delivery.chat_id, Delivery.status).where(
+                        Delivery.template_id == template_id,
+                        Delivery.template_version == version,
+                        Delivery.request_id == request_id,
+                        Delivery.chat_id.in_(chunk),
+                    )
+                ).all()
+                existing.update(((template_id, version, chat_id, request_id), (row_id, status)) for row_id, chat_id, status in rows)
+        return existing
+
+    def _enqueue_many(
+        self, batches: Sequence[tuple[Sequence[int], Sequence[int]]], request_ids: list[str | None]
+    ) -> tuple[list[tuple[str, int]], set[DeliveryKey], list[DeliveryKey]]:
+        """写入记录但不提交，返回 (批次列表, 已发送的键, 其余已入队的键)，键缓存在提交后由调用方更新。"""
+
+        versions = self._template_versions({template_id for template_ids, _ in batches for template_id in template_ids})
+        key_cache = get_delivery_key_cache()
+        planned: list[tuple[str, list[DeliveryKey]]] = []
+        seen: set[DeliveryKey] = set()
+        cached = 0
+        for (template_ids, chat_ids), request_id in zip(batches, request_ids):
+            keys = []
+            for template_id in template_ids:
+                for chat_id in chat_ids:
+                    key = (template_id, versions[template_id], chat_id, request_id or "")
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    if key in key_cache:
+                        cached += 1
+                        continue
+                    keys.append(key)
+            planned.append((uuid.uuid4().hex, keys))
+        if cached:
+            DELIVERY_DUPLICATES_TOTAL.labels("cache").inc(cached)
+
+        existing = self._existing(key for _, keys in planned for key in keys)
+        now = datetime.utcnow()
+        rows: list[dict] = []
+        requeued: list[dict] = []
+        duplicates: list[DeliveryKey] = []
+        jobs: list[tuple[str, int]] = []
+        for job_id, keys in planned:
+            queued = 0
+            for key in keys:
+                found = existing.get(key)
+                if found is not None and found[1] != FAILED:
+                    duplicates.append(key)
+                    continue
+                queued += 1
+                if found is not None:
+                    requeued.append({"id": found[0], "job_id": job_id, "status": PENDING, "attempts": 0, "error": None, "next_attempt_at": None, "updated_at": now})
+                    continue
+                template_id, version, chat_id, request_id = key
+                rows.append(
+                    {
+                        "job_id": job_id,
+                        "template_id": template_id,
+                        "template_version": version,
+                        "chat_id": chat_id,
+                        "request_id": request_id,
+                        "status": PENDING,
+                        "attempts": 0,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                )
+            jobs.append((job_id, queued))
+        if rows:
+            self.session.exec(insert(Delivery), params=rows)
+        if requeued:
+            self.session.exec(update(Delivery), params=requeued)
+        if duplicates:
+            DELIVERY_DUPLICATES_TOTAL.labels("db").inc(len(duplicates))
+        sent = {key for key in duplicates if existing[key][1] == SENT}
+        return jobs, sent, [key for _, keys in planned for key in keys if key not in sent]
+
+    def claim_batch(self, limit: int, *, owner: str = "", lease: timedelta = DEFAULT_LEASE) -> list[ClaimedDelivery]:
+        """把最多 limit 条到期的待发送记录标记为 sending 并返回，单条语句完成领取。
+
+        记录写入 owner 与租约到期时间；发送期间由领取方调用 renew_leases 续期，租约过期前不会被回收。
+        """
+
+        now = datetime.utcnow()
+        due = (
+            select(Delivery.id)
+            .where(Delivery.status == PENDING)
+            .where((Delivery.next_attempt_at.is_(None)) | (Delivery.next_attempt_at <= now))
+            .order_by(Delivery.id)
+            .limit(limit)
+        )
+        rows = self.session.exec(
+            update(Delivery)
+            .where(Delivery.id.in_(due.scalar_subquery()))
+            .where(Delivery.status == PENDING)
+            .values(status=SENDING, claimed_by=owner, lease_expires_at=now + lease, updated_at=now)
+            .returning(Delivery.id, Delivery.template_id, Delivery.chat_id, Delivery.attempts, Delivery.job_id)
+        ).all()
+        self.session.commit()
+        return sorted((ClaimedDelivery(*row) for row in rows), key=lambda claimed: claimed.delivery_id)
+
+    def renew_leases(self, delivery_ids: Sequence[int], owner: str, lease: timedelta) -> int:
+        """延长 owner 仍持有的 sending 记录的租约，返回续期条数。"""
+
+        expires = datetime.utcnow() + lease
+        renewed = 0
+        for chunk in chunked(list(delivery_ids)):
+            result = self.session.exec(
+                update(Delivery)
+                .where(Delivery.id.in_(chunk), Delivery.status == SENDING, Delivery.claimed_by == owner)
+                .values(lease_expires_at=expires)
+            )
+            renewed += result.rowcount or 0
+        self.session.commit()
+        return renewed
+
+    def complete_batch(self, results: Iterable[DeliveryResult]) -> list[int]:
+        """批量回写发送结果与逐次尝试记录，返回发送成功的模板 ID。"""
+
+        now = datetime.utcnow()
+        results = list(results)
+        params = [
+            {
+                "id": result.delivery_id,
+                "status": SENT if result.ok else FAILED,
+                "attempts": result.attempts,
+                "error": None if result.ok else (result.error or "")[:500],
+                "sent_at": now if result.ok else None,
+                "claimed_by": None,
+                "lease_expires_at": None,
+                "updated_at": now,
+            }
+            for result in results
+        ]
+        if not params:
+            return []
+        self.session.exec(update(Delivery), params=params)
+        self.record_attempts(
+            [{**row, "delivery_id": result.delivery_id} for result in results for row in result.history], commit=False
+        )
+        sent_ids = {param["id"] for param in params if param["status"] == SENT}
+        template_ids: set[int] = set()
+        sent_keys: list[DeliveryKey] = []
+        failed_keys: list[DeliveryKey] = []
+        for chunk in chunked([param["id"] for param in params]):
+            rows = self.session.exec(
+                select(Delivery.id, Delivery.template_id, Delivery.template_version, Delivery.chat_id, Delivery.request_id).where(Delivery.id.in_(chunk))
+            ).all()
+            for row_id, *key in rows:
+                if row_id in sent_ids:
+                    template_ids.add(key[0])
+                    sent_keys.append(tuple(key))
+                else:
+                    failed_keys.append(tuple(key))
+        self.session.commit()
+        key_cache = get_delivery_key_cache()
+        key_cache.add(sent_keys, sent=True)
+        key_cache.discard(failed_keys)
+        return sorted(template_ids)
+
+    def record_attempts(self, rows: Sequence[dict], *, commit: bool = True) -> int:
+        """一条 executemany 写入发送尝试记录，返回写入条数。"""
+
+        if rows:
+            self.session.exec(insert(SendAttempt), params=list(rows))
+        if commit:
+            self.session.commit()
+        return len(rows)
+
+    def release_expired(self) -> int:
+        """把租约已过期的 sending 记录（领取方崩溃或失联）放回待发送队列。
+
+        没有租约的记录来自加入租约之前的版本，按 DEFAULT_LEASE 从最后更新时间起算。
+        """
+
+        now = datetime.utcnow()
+        result = self.session.exec(
+            update(Delivery)
+            .where(Delivery.status == SENDING)
+            .where(
+                or_(
+                    Delivery.lease_expires_at < now,
+                    and_(Delivery.lease_expires_at.is_(None), Delivery.updated_at < now - DEFAULT_LEASE),
+                )
+            )
+            .values(status=PENDING, claimed_by=None, lease_expires_at=None, updated_at=now)
+        )
+        self.session.commit()
+        return result.rowcount or 0
+
+    def job_summary(self, job_id: str) -> JobSummary:
+        counts = dict(
+            self.session.exec(
+                select(Delivery.status, func.count()).where(Delivery.job_id == job_id).group_by(Delivery.status)
+            ).all()
+        )
+        return JobSummary(
+            job_id=job_id,
+            total=sum(counts.values()),
+            pending=counts.get(PENDING, 0),
+            sending=counts.get(SENDING, 0),
+            sent=counts.get(SENT, 0),
+            failed=counts.get(FAILED, 0),
+        )
+
+    def queue_depth(self) -> dict[str, int]:
+        """统计待发送与发送中的记录数；只扫描 ix_delivery_claim 中未完成的部分，与历史记录量无关。"""
+
+        counts = dict(
+            self.session.exec(
+                select(Delivery.status, func.count()).where(Delivery.status.in_((PENDING, SENDING))).group_by(Delivery.status)
+            ).all()
+        )
+        return {PENDING: counts.get(PENDING, 0), SENDING: counts.get(SENDING, 0)}
+
+    def list_failed(self, job_id: str, limit: int = 100) -> list[Delivery]:
+        return list(
+            self.session.exec(
+                select(Delivery)
+                .where(Delivery.job_id == job_id, Delivery.status == FAILED)
+                .order_by(Delivery.id)
+                .limit(limit)
+            ).all()
+        )
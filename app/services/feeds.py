@@ -0,0 +1,291 @@
+"""RSS/Atom 订阅源：条目解析、筛选与批量写入模板。"""
+from __future__ import annotations
+
+import hashlib
+import html
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Mapping, Sequence
+from urllib.parse import urlsplit
+
+from sqlalchemy import bindparam, delete, insert, update
+from sqlmodel import Session, select
+
+from app.db.bulk import chunked
+from app.db.models import Feed, FeedEntry
+from app.services.templates import TemplateService, compile_template
+
+FEED_TABLE = Feed.__table__
+PARSE_MODES = ("HTML", "MarkdownV2")
+DEFAULT_FORMATS = {
+    "HTML": "<b>{{ title }}</b>\n{{ summary }}\n{{ link }}",
+    "MarkdownV2": "*{{ title }}*\n{{ summary }}\n{{ link }}",
+}
+SUMMARY_LENGTH = 300
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+class FeedError(ValueError):
+    """订阅源参数无效或内容无法解析时抛出。"""
+
+
+@dataclass(slots=True)
+class FeedItem:
+    """从订阅源解析出的一个条目。"""
+
+    guid_hash: str
+    title: str
+    link: str
+    summary: str
+
+
+@dataclass(frozen=True, slots=True)
+class FeedTarget:
+    """轮询一个订阅源所需的信息，脱离会话后仍可在事件循环中使用。"""
+
+    id: int
+    url: str
+    name: str
+    include: tuple[str, ...]
+    exclude: tuple[str, ...]
+    text_format: str
+    parse_mode: str
+    etag: str | None
+    last_modified: str | None
+    content_hash: str | None
+
+
+@dataclass(slots=True)
+class FetchResult:
+    """一次抓取的结果；items 为 None 表示没有需要处理的新内容（304、内容未变或出错）。"""
+
+    feed_id: int
+    status: int | None
+    etag: str | None = None
+    last_modified: str | None = None
+    content_hash: str | None = None
+    items: list[FeedItem] | None = None
+    error: str | None = None
+
+
+@dataclass(slots=True)
+class FeedPollResult:
+    """一轮轮询的汇总。"""
+
+    feeds: int = 0
+    modified: int = 0
+    not_modified: int = 0
+    failed: int = 0
+    created: int = 0
+    filtered: int = 0
+    duplicates: int = 0
+    template_ids: list[int] = field(default_factory=list)
+
+
+def guid_hash(entry: Mapping[str, Any]) -> str:
+    """按 guid/id、链接、标题与发布时间的顺序取第一个可用值，返回其 SHA-1。"""
+
+    key = entry.get("id") or entry.get("link") or f"{entry.get('title', '')}|{entry.get('published', '')}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def plain_text(value: str, limit: int = SUMMARY_LENGTH) -> str:
+    """去掉 HTML 标签与实体并合并空白，超过 limit 时截断。"""
+
+    text = " ".join(html.unescape(TAG_PATTERN.sub(" ", value)).split())
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+def parse_items(content: bytes) -> list[FeedItem]:
+    """解析 RSS/Atom 文档，按文档顺序返回条目；完全无法解析时抛出 FeedError。"""
+
+    import feedparser  # 只有抓取到新内容时才需要
+
+    parsed = feedparser.parse(content, sanitize_html=False, resolve_relative_uris=False)  # 摘要会去掉全部标签并在渲染时转义，无需净化 HTML
+    if parsed.bozo and not parsed.entries:
+        raise FeedError(f"无法解析订阅内容：{parsed.get('bozo_exception')}")
+    return [
+        FeedItem(
+            guid_hash=guid_hash(entry),
+            title=plain_text(entry.get("title", ""), 200),
+            link=entry.get("link", ""),
+            summary=plain_text(entry.get("summary", "")),
+        )
+        for entry in parsed.entries
+    ]
+
+
+def parse_keywords(value: str | None) -> tuple[str, ...]:
+    return tuple(keyword.strip().lower() for keyword in (value or "").split(",") if keyword.strip())
+
+
+def matches(item: FeedItem, include: Sequence[str], exclude: Sequence[str]) -> bool:
+    """标题或摘要（不区分大小写）命中 include 中任意一个且不命中 exclude 中任何一个。"""
+
+    haystack = f"{item.title}\n{item.summary}".lower()
+    if include and not any(keyword in haystack for keyword in include):
+        return False
+    return not any(keyword in haystack for keyword in exclude)
+
+
+def template_name(target: FeedTarget, item: FeedItem) -> str:
+    return f"{target.name}-{item.guid_hash[:12]}"
+
+
+def _target(feed: Feed) -> FeedTarget:
+    return FeedTarget(
+        id=feed.id,
+        url=feed.url,
+        name=feed.name,
+        include=parse_keywords(feed.include),
+        exclude=parse_keywords(feed.exclude),
+        text_format=feed.text_format or DEFAULT_FORMATS[feed.parse_mode],
+        parse_mode=feed.parse_mode,
+        etag=feed.etag,
+        last_modified=feed.last_modified,
+        content_hash=feed.content_hash,
+    )
+
+
+class FeedService:
+    """提供订阅源的创建、列表、删除，以及把一轮抓取结果批量写回数据库。"""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def create_feed(
+        self,
+        url: str,
+        name: str,
+        *,
+        include: str | None = None,
+        exclude: str | None = None,
+        text_format: str | None = None,
+        parse_mode: str = "HTML",
+    ) -> Feed:
+        """url 必须是 http(s) 地址；url 与 name 均不能与已有订阅源重复。"""
+
+        if urlsplit(url).scheme not in ("http", "https"):
+            raise FeedError(f"订阅地址必须以 http:// 或 https:// 开头：{url}")
+        if not name or len(name) > 60:
+            raise FeedError("name 长度必须在 1 到 60 之间")
+        if parse_mode not in PARSE_MODES:
+            raise FeedError(f"不支持的 parse_mode：{parse_mode}")
+        duplicate = self.session.exec(select(Feed.id).where((Feed.url == url) | (Feed.name == name))).first()
+        if duplicate is not None:
+            raise FeedError(f"订阅源已存在：{name}")
+        feed = Feed(url=url, name=name, include=include, exclude=exclude, text_format=text_format, parse_mode=parse_mode)
+        self.session.add(feed)
+        self.session.commit()
+        self.session.refresh(feed)
+        return feed
+
+    def list_feeds(self) -> list[Feed]:
+        return list(self.session.exec(select(Feed).order_by(Feed.id)).all())
+
+    def delete_feed(self, feed_id: int) -> bool:
+        """删除订阅源及其条目记录，已生成的模板保留。"""
+
+        feed = self.session.get(Feed, feed_id)
+        if feed is None:
+            return False
+        self.session.exec(delete(FeedEntry).where(FeedEntry.feed_id == feed_id))
+        self.session.delete(feed)
+        self.session.commit()
+        return True
+
+    def load_targets(self, feed_ids: Sequence[int] | None = None) -> list[FeedTarget]:
+        """读取启用的订阅源；给出 feed_ids 时只读取其中的订阅源。"""
+
+        statement = select(Feed).where(Feed.enabled.is_(True)).order_by(Feed.id)
+        if feed_ids is not None:
+            statement = statement.where(Feed.id.in_(list(feed_ids)))
+        return [_target(feed) for feed in self.session.exec(statement).all()]
+
+    def apply_results(self, targets: Sequence[FeedTarget], results: Sequence[FetchResult]) -> FeedPollResult:
+        """在一个事务中写回一轮抓取结果。
+
+        已处理过的条目按 guid 摘要分块查询一次；新条目经筛选后一条 executemany 生成模板，
+        再一条 executemany 记录条目；各订阅源的校验信息与状态同样一条 executemany 更新。
+        """
+
+        by_id = {target.id: target for target in targets}
+        summary = FeedPollResult(feeds=len(results))
+        fresh: dict[tuple[int, str], FeedItem] = {}
+        for result in results:
+            if result.error is not None:
+                summary.failed += 1
+            elif result.items is None:
+                summary.not_modified += 1
+            else:
+                summary.modified += 1
+                for item in result.items:
+                    if (result.feed_id, item.guid_hash) in fresh:
+                        summary.duplicates += 1
+                        continue
+                    fresh[(result.feed_id, item.guid_hash)] = item
+
+        hashes = list({key[1] for key in fresh})
+        for chunk in chunked(hashes):
+            seen = self.session.exec(select(FeedEntry.feed_id, FeedEntry.guid_hash).where(FeedEntry.guid_hash.in_(chunk))).all()
+            for key in seen:
+                if fresh.pop(tuple(key), None) is not None:
+                    summary.duplicates += 1
+
+        now = datetime.utcnow()
+        compiled = {}
+        templates: list[tuple[str, str, str]] = []
+        entries: list[dict] = []
+        names: list[str | None] = []
+        for (feed_id, item_hash), item in fresh.items():
+            target = by_id[feed_id]
+            entries.append({"feed_id": feed_id, "guid_hash": item_hash, "template_id": None, "created_at": now})
+            if not matches(item, target.include, target.exclude):
+                summary.filtered += 1
+                names.append(None)
+                continue
+            if feed_id not in compiled:
+                compiled[feed_id] = compile_template(target.text_format, target.parse_mode)
+            name = template_name(target, item)
+            context = {"title": item.title, "link": item.link, "summary": item.summary, "feed": target.name}
+            templates.append((name, compiled[feed_id].render(context), target.parse_mode))
+            names.append(name)
+        created = TemplateService(self.session).create_templates(templates, commit=False)
+        for entry, name in zip(entries, names):
+            entry["template_id"] = created.get(name) if name else None
+        summary.created = len(created)
+        summary.template_ids = sorted(created.values())
+        if entries:
+            self.session.exec(insert(FeedEntry), params=entries)
+
+        feed_rows = []
+        for result in results:
+            target = by_id[result.feed_id]
+            changed = result.error is None and result.status == 200
+            feed_rows.append(
+                {
+                    "target": result.feed_id,
+                    "new_etag": (result.etag if changed else target.etag),
+                    "new_last_modified": (result.last_modified if changed else target.last_modified),
+                    "new_content_hash": (result.content_hash if changed else target.content_hash),
+                    "status": result.status,
+                    "error": result.error[:255] if result.error else None,
+                }
+            )
+        if feed_rows:
+            self.session.exec(
+                update(FEED_TABLE)
+                .where(FEED_TABLE.c.id == bindparam("target"))
+                .values(
+                    etag=bindparam("new_etag"),
+                    last_modified=bindparam("new_last_modified"),
+                    content_hash=bindparam("new_content_hash"),
+                    last_status=bindparam("status"),
+                    last_error=bindparam("error"),
+                    last_checked_at=now,
+                ),
+                params=feed_rows,
+            )
+        self.session.commit()
+        return summary
@@ -0,0 +1,223 @@
+"""定时广播业务服务。"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Sequence
+from zoneinfo import ZoneInfo
+
+from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.config import get_settings
+from app.db.models import MessageTemplate, Schedule
+from app.services.deliveries import DeliveryService
+from app.services.templates import TemplateNotFoundError
+
+ONCE = "once"
+INTERVAL = "interval"
+CRON = "cron"
+
+MISFIRE_ONCE = "once"
+MISFIRE_SKIP = "skip"
+
+
+class ScheduleError(ValueError):
+    """定时任务参数无效时抛出。"""
+
+
+@dataclass(slots=True)
+class FiredSchedule:
+    """一次到期处理的结果，调度器据此更新内存中的堆。"""
+
+    schedule_id: int
+    next_run_at: datetime | None
+    job_id: str | None = None
+    skipped: bool = False
+
+
+def _to_utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _parse_chat_ids(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def build_cron_trigger(expression: str, tz_name: str) -> CronTrigger:
+    """把 crontab 表达式解析为指定时区的触发器，表达式无效时抛出 ScheduleError。"""
+
+    try:
+        return CronTrigger.from_crontab(expression, timezone=ZoneInfo(tz_name))
+    except ValueError as exc:
+        raise ScheduleError(f"无效的 cron 表达式：{expression}") from exc
+
+
+def next_fire_time(schedule: Schedule, after: datetime, tz_name: str) -> datetime | None:
+    """返回严格晚于 after 的下一次触发时间（UTC naive），没有下一次时返回 None。"""
+
+    if schedule.kind == ONCE:
+        return None
+    if schedule.kind == INTERVAL:
+        anchor = schedule.next_run_at or schedule.run_at or after
+        step = timedelta(seconds=schedule.interval_seconds)
+        if anchor > after:
+            return anchor
+        return anchor + step * (math.floor((after - anchor) / step) + 1)
+    trigger = build_cron_trigger(schedule.cron, tz_name)
+    fire = trigger.get_next_fire_time(None, after.replace(tzinfo=timezone.utc) + timedelta(microseconds=1))
+    return _to_utc_naive(fire) if fire else None
+
+
+class ScheduleService:
+    """提供定时任务的创建、列表、删除，以及到期时写入投递队列。"""
+
+    def __init__(self, session: Session, *, tz_name: str | None = None):
+        self.session = session
+        self.tz_name = tz_name or get_settings().timezone
+
+    def create_schedule(
+        self,
+        name: str,
+        template_id: int,
+        chat_ids: Sequence[int],
+        *,
+        run_at: datetime | None = None,
+        interval_seconds: int | None = None,
+        cron: str | None = None,
+        misfire_policy: str = MISFIRE_ONCE,
+        misfire_grace_seconds: int = 300,
+    ) -> Schedule:
+        """run_at、interval_seconds、cron 三选一（interval 可附带 run_at 作为首次触发时间）。"""
+
+        if not chat_ids:
+            raise ScheduleError("chat_ids 不能为空")
+        if misfire_policy not in (MISFIRE_ONCE, MISFIRE_SKIP):
+            raise ScheduleError(f"未知的补发策略：{misfire_policy}")
+        if cron is not None:
+            if run_at is not None or interval_seconds is not None:
+                raise ScheduleError("cron 不能与 run_at/interval_seconds 同时使用")
+            build_cron_trigger(cron, self.tz_name)
+            kind = CRON
+        elif interval_seconds is not None:
+            if interval_seconds < 1:
+                raise ScheduleError("interval_seconds 必须大于 0")
+            kind = INTERVAL
+        elif run_at is not None:
+            kind = ONCE
+        else:
+            raise ScheduleError("需要提供 run_at、interval_seconds 或 cron")
+        if self.session.get(MessageTemplate, template_id) is None:
+            raise TemplateNotFoundError(str(template_id))
+
+        now = datetime.utcnow()
+        schedule = Schedule(
+            name=name,
+            template_id=template_id,
+            chat_ids=",".join(str(chat_id) for chat_id in chat_ids),
+            kind=kind,
+            run_at=_to_utc_naive(run_at) if run_at else None,
+            interval_seconds=interval_seconds,
+            cron=cron,
+            misfire_policy=misfire_policy,
+            misfire_grace_seconds=misfire_grace_seconds,
+        )
+        if kind == ONCE:
+            schedule.next_run_at = schedule.run_at
+        elif kind == INTERVAL and schedule.run_at is not None:
+            schedule.next_run_at = schedule.run_at
+        else:
+            schedule.next_run_at = next_fire_time(schedule, now, self.tz_name)
+        self.session.add(schedule)
+        self.session.commit()
+        self.session.refresh(schedule)
+        return schedule
+
+    def list_schedules(self) -> list[Schedule]:
+        return list(self.session.exec(select(Schedule).order_by(Schedule.id)).all())
+
+    def delete_schedule(self, schedule_id: int) -> bool:
+        schedule = self.session.get(Schedule, schedule_id)
+        if schedule is None:
+            return False
+        self.session.delete(schedule)
+        self.session.commit()
+        return True
+
+    def load_next_runs(self) -> list[tuple[int, datetime]]:
+        """只读取 (id, next_run_at) 两列，用于重建调度堆。"""
+
+        return list(
+            self.session.exec(
+                select(Schedule.id, Schedule.next_run_at)
+                .where(Schedule.enabled.is_(True))
+                .where(Schedule.next_run_at.is_not(None))
+            ).all()
+        )
+
+    def fire_due(self, schedule_ids: Sequence[int], now: datetime) -> list[FiredSchedule]:
+        """处理一批到期的定时任务：按补发策略写入投递队列并推进下一次触发时间。
+
+        同一批到期任务的投递记录共用一次批量插入。未到期、已停用或已删除的任务原样返回
+        其当前的下一次触发时间，调度器据此修正堆中的过期条目。每次触发以
+        "schedule:<ID>:<计划时间>" 作为请求 ID，同一次触发即使被重复处理也只入队一次。
+        """
+
+        if not schedule_ids:
+            return []
+        schedules = {
+            schedule.id: schedule
+            for schedule in self.session.exec(select(Schedule).where(Schedule.id.in_(schedule_ids))).all()
+        }
+        template_ids = {schedule.template_id for schedule in schedules.values()}
+        existing = set(
+            self.session.exec(select(MessageTemplate.id).where(MessageTemplate.id.in_(template_ids))).all()
+        ) if template_ids else set()
+
+        results: list[FiredSchedule] = []
+        to_enqueue: list[Schedule] = []
+        request_ids: list[str] = []
+        for schedule_id in schedule_ids:
+            schedule = schedules.get(schedule_id)
+            if schedule is None:
+                results.append(FiredSchedule(schedule_id=schedule_id, next_run_at=None, skipped=True))
+                continue
+            if not schedule.enabled or schedule.next_run_at is None or schedule.next_run_at > now:
+                next_run = schedule.next_run_at if schedule.enabled else None
+                results.append(FiredSchedule(schedule_id=schedule_id, next_run_at=next_run, skipped=True))
+                continue
+            late = (now - schedule.next_run_at).total_seconds()
+            request_id = f"schedule:{schedule.id}:{schedule.next_run_at:%Y%m%dT%H%M%S}"
+            fire = schedule.template_id in existing and (
+                schedule.misfire_policy == MISFIRE_ONCE or late <= schedule.misfire_grace_seconds
+            )
+            schedule.next_run_at = next_fire_time(schedule, now, self.tz_name)
+            if schedule.template_id not in existing or schedule.next_run_at is None:
+                schedule.enabled = False
+                schedule.next_run_at = None
+            schedule.updated_at = now
+            self.session.add(schedule)
+            result = FiredSchedule(schedule_id=schedule_id, next_run_at=schedule.next_run_at, skipped=not fire)
+            results.append(result)
+            if fire:
+                schedule.last_run_at = now
+                to_enqueue.append(schedule)
+                request_ids.append(request_id)
+
+        batches = [([schedule.template_id], _parse_chat_ids(schedule.chat_ids)) for schedule in to_enqueue]
+        fired_ids = [schedule.id for schedule in to_enqueue]
+        jobs = DeliveryService(self.session).enqueue_many(batches, request_ids=request_ids)
+        job_by_schedule = {schedule_id: job_id for schedule_id, (job_id, _) in zip(fired_ids, jobs)}
+        if job_by_schedule:
+            self.session.exec(
+                update(Schedule),
+                params=[{"id": schedule_id, "last_job_id": job_id} for schedule_id, job_id in job_by_schedule.items()],
+            )
+            self.session.commit()
+        for result in results:
+            result.job_id = job_by_schedule.get(result.schedule_id)
+        return results
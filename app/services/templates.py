@@ -1,23 +1,420 @@
 """Stage 1 模板业务服务。"""
 from __future__ import annotations
 
+import base64
+import binascii
+import html
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Any, Callable, Mapping, Sequence
 
+from sqlalchemy import delete, func, insert, tuple_, update
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.config import get_settings
+from app.db.bulk import chunked
 from app.db.models import MessageTemplate, touch_template
+from app.metrics import REGISTRY, TEMPLATE_CACHE_ENTRIES, TEMPLATE_CACHE_EVENTS, TEMPLATE_SERVICE_SECONDS, timed
+
+_CACHE_HITS = TEMPLATE_CACHE_EVENTS.labels("hits")
+_CACHE_MISSES = TEMPLATE_CACHE_EVENTS.labels("misses")
+_CACHE_REVALIDATIONS = TEMPLATE_CACHE_EVENTS.labels("revalidations")
+_CACHE_EVICTIONS = TEMPLATE_CACHE_EVENTS.labels("evictions")
 
 
 class TemplateNotFoundError(Exception):
     """请求的模板不存在时抛出。"""
 
 
+class InvalidCursorError(ValueError):
+    """分页游标无法解析时抛出。"""
+
+
+PREVIEW_LENGTH = 120
+
+
+@dataclass(frozen=True, slots=True)
+class TemplateSummary:
+    """列表用的轻量投影：不含完整正文，只带前 PREVIEW_LENGTH 个字符的预览。"""
+
+    id: int
+    name: str
+    version: int
+    parse_mode: str
+    was_sent: bool
+    sent_at: datetime | None
+    updated_at: datetime
+    created_at: datetime
+    preview: str
+
+
+@dataclass(slots=True)
+class TemplatePage:
+    """一页模板及下一页游标（没有更多数据时为 None）。"""
+
+    items: list
+    next_cursor: str | None
+
+
+@dataclass(slots=True)
+class TemplateCounts:
+    total: int
+    sent: int
+    pending: int
+
+
+def encode_cursor(updated_at: datetime, template_id: int) -> str:
+    raw = f"{updated_at.isoformat()}|{template_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_at, template_id = raw.split("|")
+        return datetime.fromisoformat(updated_at), int(template_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursorError(cursor) from exc
+
+
+@dataclass(frozen=True, slots=True)
+class TemplateSnapshot:
+    """模板的只读快照，脱离会话后仍可安全使用。
+
+    updated_at 用于 TTL 过期后的重新校验：删除后重建的模板可能复用 id 且版本同为 1。
+    """
+
+    id: int
+    name: str
+    version: int
+    text: str
+    parse_mode: str
+    updated_at: datetime | None = None
+
+    @classmethod
+    def from_model(cls, template: MessageTemplate) -> "TemplateSnapshot":
+        return cls(
+            id=template.id,
+            name=template.name,
+            version=template.version,
+            text=template.text,
+            parse_mode=template.parse_mode,
+            updated_at=template.updated_at,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class SentTemplate:
+    """mark_templates_sent 更新后的发送状态。"""
+
+    id: int
+    was_sent: bool
+    sent_at: datetime
+
+
+@dataclass(slots=True)
+class TemplateCacheStats:
+    """模板缓存的命中统计。"""
+
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    revalidations: int
+    evictions: int
+
+
+class TemplateCache:
+    """按 ID 与名称索引的 LRU 模板缓存。
+
+    本进程内的修改通过 invalidate 立即失效；超过 ttl 的条目在下次读取时只查询
+    version 做一次轻量校验，以发现其他进程的修改。内容变化必然递增 version，
+    而 mark_templates_sent 只改发送状态，不影响缓存的快照。
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 30.0, *, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[int, tuple[TemplateSnapshot, float]] = OrderedDict()
+        self._ids_by_name: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def _key_to_id(self, key: int | str) -> int | None:
+        return key if isinstance(key, int) else self._ids_by_name.get(key)
+
+    def get(self, key: int | str) -> TemplateSnapshot | None:
+        """返回未过期的快照并计为命中；不存在或需要校验时返回 None（不计数）。"""
+
+        with self._lock:
+            template_id = self._key_to_id(key)
+            entry = self._entries.get(template_id) if template_id is not None else None
+            if entry is None or self._clock() - entry[1] > self.ttl:
+                return None
+            self._entries.move_to_end(template_id)
+            self.hits += 1
+            _CACHE_HITS.inc()
+            return entry[0]
+
+    def peek_stale(self, key: int | str) -> TemplateSnapshot | None:
+        with self._lock:
+            template_id = self._key_to_id(key)
+            entry = self._entries.get(template_id) if template_id is not None else None
+            return entry[0] if entry else None
+
+    def put(self, snapshot: TemplateSnapshot, *, revalidated: bool = False) -> None:
+        with self._lock:
+            if revalidated:
+                self.revalidations += 1
+                self.hits += 1
+                _CACHE_REVALIDATIONS.inc()
+                _CACHE_HITS.inc()
+            else:
+                self.misses += 1
+                _CACHE_MISSES.inc()
+            previous = self._entries.pop(snapshot.id, None)
+            if previous is not None and previous[0].name != snapshot.name:
+                self._ids_by_name.pop(previous[0].name, None)
+            self._entries[snapshot.id] = (snapshot, self._clock())
+            self._ids_by_name[snapshot.name] = snapshot.id
+            while len(self._entries) > self.max_size:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._ids_by_name.pop(evicted.name, None)
+                self.evictions += 1
+                _CACHE_EVICTIONS.inc()
+
+    def invalidate(self, template_ids: list[int] | None = None, names: list[str] | None = None) -> None:
+        with self._lock:
+            ids = set(template_ids or [])
+            ids.update(self._ids_by_name[name] for name in names or [] if name in self._ids_by_name)
+            for template_id in ids:
+                entry = self._entries.pop(template_id, None)
+                if entry is not None:
+                    self._ids_by_name.pop(entry[0].name, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._ids_by_name.clear()
+            self.hits = self.misses = self.revalidations = self.evictions = 0
+
+    def stats(self) -> TemplateCacheStats:
+        with self._lock:
+            return TemplateCacheStats(
+                size=len(self._entries),
+                max_size=self.max_size,
+                hits=self.hits,
+                misses=self.misses,
+                revalidations=self.revalidations,
+                evictions=self.evictions,
+            )
+
+
+_CACHE: TemplateCache | None = None
+
+
+def get_template_cache() -> TemplateCache:
+    """返回进程级模板缓存，首次调用时按配置创建。"""
+
+    global _CACHE
+    if _CACHE is None:
+        settings = get_settings()
+        _CACHE = TemplateCache(settings.template_cache_size, settings.template_cache_ttl)
+    return _CACHE
+
+
+def _collect_cache_metrics() -> None:
+    TEMPLATE_CACHE_ENTRIES.set(get_template_cache().stats().size)
+
+
+REGISTRY.add_collector(_collect_cache_metrics)
+
+
+def reset_template_cache() -> None:
+    """丢弃进程级模板缓存与编译缓存（主要用于测试）。"""
+
+    global _CACHE
+    _CACHE = None
+    with _COMPILED_LOCK:
+        _COMPILED.clear()
+
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+MARKDOWN_V2_SPECIAL = "_*[]()~`>#+-=|{}.!\\"
+_MARKDOWN_V2_TABLE = str.maketrans({char: "\\" + char for char in MARKDOWN_V2_SPECIAL})
+
+
+def escape_markdown_v2(value: str) -> str:
+    return value.translate(_MARKDOWN_V2_TABLE)
+
+
+def escape_html(value: str) -> str:
+    return html.escape(value, quote=False)
+
+
+def escaper_for(parse_mode: str | None) -> Callable[[str], str]:
+    """按 parse_mode 选择变量值的转义函数；模板正文本身由作者负责转义。"""
+
+    mode = (parse_mode or "").upper()
+    if mode == "MARKDOWNV2":
+        return escape_markdown_v2
+    if mode == "HTML":
+        return escape_html
+    return str
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledTemplate:
+    """解析后的模板：literals 比 names 多一项，渲染时交替拼接。
+
+    上下文中缺少的变量保留原始占位符（按 parse_mode 转义，避免 MarkdownV2 拒收），
+    因此不含变量的模板始终原样发送。
+    """
+
+    literals: tuple[str, ...]
+    names: tuple[str, ...]
+    placeholders: tuple[str, ...]
+    escape: Callable[[str], str]
+
+    @property
+    def is_static(self) -> bool:
+        return not self.names
+
+    def render(self, context: Mapping[str, Any] | None = None) -> str:
+        if not self.names:
+            return self.literals[0]
+        context = context or {}
+        escape = self.escape
+        parts = [self.literals[0]]
+        for name, placeholder, literal in zip(self.names, self.placeholders, self.literals[1:]):
+            value = context.get(name)
+            parts.append(placeholder if value is None else escape(str(value)))
+            parts.append(literal)
+        return "".join(parts)
+
+
+def compile_template(text: str, parse_mode: str | None = None) -> CompiledTemplate:
+    """把 {{ name }} 占位符解析为字面量与变量名序列。"""
+
+    escape = escaper_for(parse_mode)
+    literals: list[str] = []
+    names: list[str] = []
+    placeholders: list[str] = []
+    position = 0
+    for match in PLACEHOLDER_PATTERN.finditer(text):
+        literals.append(text[position:match.start()])
+        names.append(match.group(1))
+        placeholders.append(escape(match.group(0)))
+        position = match.end()
+    literals.append(text[position:])
+    return CompiledTemplate(tuple(literals), tuple(names), tuple(placeholders), escape)
+
+
+_COMPILED: OrderedDict[tuple[int, int, str | None, str], CompiledTemplate] = OrderedDict()
+_COMPILED_LOCK = threading.Lock()
+
+
+def get_compiled(template: TemplateSnapshot) -> CompiledTemplate:
+    """按 (id, version, parse_mode, text) 缓存编译结果。
+
+    键中包含正文：模板删除后 SQLite 可能复用同一 id，新模板又从版本 1 开始，
+    仅靠 (id, version) 会命中已删除模板的编译结果。
+    """
+
+    key = (template.id, template.version, template.parse_mode, template.text)
+    with _COMPILED_LOCK:
+        compiled = _COMPILED.get(key)
+        if compiled is not None:
+            _COMPILED.move_to_end(key)
+            return compiled
+    compiled = compile_template(template.text, template.parse_mode)
+    with _COMPILED_LOCK:
+        _COMPILED[key] = compiled
+        while len(_COMPILED) > get_settings().template_cache_size:
+            _COMPILED.popitem(last=False)
+    return compiled
+
+
+def render_template(template: TemplateSnapshot, context: Mapping[str, Any] | None = None) -> str:
+    """使用编译缓存渲染模板。"""
+
+    return get_compiled(template).render(context)
+
+
+SUMMARY_COLUMNS = (
+    MessageTemplate.id,
+    MessageTemplate.name,
+    MessageTemplate.version,
+    MessageTemplate.parse_mode,
+    MessageTemplate.was_sent,
+    MessageTemplate.sent_at,
+    MessageTemplate.updated_at,
+    MessageTemplate.created_at,
+    func.substr(MessageTemplate.text, 1, PREVIEW_LENGTH),
+)
+
+COUNT_STATEMENT = select(MessageTemplate.was_sent, func.count()).group_by(MessageTemplate.was_sent)
+
+
+def _page_statement(limit: int, cursor: str | None, was_sent: bool | None, summary: bool):
+    query = select(*SUMMARY_COLUMNS) if summary else select(MessageTemplate)
+    if was_sent is not None:
+        query = query.where(MessageTemplate.was_sent.is_(was_sent))
+    if cursor:
+        updated_at, template_id = decode_cursor(cursor)
+        query = query.where(tuple_(MessageTemplate.updated_at, MessageTemplate.id) < tuple_(updated_at, template_id))
+    return query.order_by(MessageTemplate.updated_at.desc(), MessageTemplate.id.desc()).limit(limit + 1)
+
+
+def _build_page(rows: list, limit: int, summary: bool) -> TemplatePage:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].id)
+    items = [TemplateSummary(*row) for row in rows] if summary else rows
+    return TemplatePage(items=items, next_cursor=next_cursor)
+
+
+def _build_counts(rows) -> TemplateCounts:
+    counts = dict(rows)
+    sent = counts.get(True, 0)
+    pending = counts.get(False, 0)
+    return TemplateCounts(total=sent + pending, sent=sent, pending=pending)
+
+
+def _summaries_statement(template_ids):
+    return select(*SUMMARY_COLUMNS).where(MessageTemplate.id.in_(template_ids))
+
+
+def _mark_sent_statement(template_ids, now: datetime):
+    return (
+        update(MessageTemplate)
+        .where(MessageTemplate.id.in_(template_ids))
+        .values(was_sent=True, sent_at=now, updated_at=now)
+        .returning(MessageTemplate.id, MessageTemplate.was_sent, MessageTemplate.sent_at)
+    )
+
+
+def _delete_statement(template_ids):
+    return delete(MessageTemplate).where(MessageTemplate.id.in_(template_ids)).returning(MessageTemplate.id)
+
+
 class TemplateService:
     """提供模板的创建、读取、列表与删除能力。"""
 
     def __init__(self, session: Session):
         self.session = session
 
+    @timed(TEMPLATE_SERVICE_SECONDS, "create_template")
     def create_template(self, name: str, text: str, *, parse_mode: str = "MarkdownV2") -> MessageTemplate:
         """当模板不存在时创建，存在则更新内容并递增版本号。"""
 
@@ -31,6 +428,7 @@ class TemplateService:
             touch_template(existing)
             self.session.add(existing)
             self.session.commit()
+            get_template_cache().invalidate([existing.id])
             self.session.refresh(existing)
             return existing
 
@@ -40,37 +438,79 @@ class TemplateService:
         self.session.refresh(template)
         return template
 
-    def mark_templates_sent(self, template_ids: list[int]) -> list[MessageTemplate]:
-        """批量标记模板已发送。"""
+    @timed(TEMPLATE_SERVICE_SECONDS, "create_templates")
+    def create_templates(self, items: Sequence[tuple[str, str, str]], *, commit: bool = True) -> dict[str, int]:
+        """批量新建模板（名称、正文、parse_mode）：已存在的名称跳过，其余一条 executemany 插入，返回新模板的名称 → ID。
+
+        commit 为假时由调用方在同一事务中提交，例如与订阅条目记录一起写入。
+        """
+
+        rows: dict[str, dict] = {}
+        for name, text, parse_mode in items:
+            rows.setdefault(name, {"name": name, "text": text, "parse_mode": parse_mode})
+        for chunk in chunked(list(rows)):
+            for name in self.session.exec(select(MessageTemplate.name).where(MessageTemplate.name.in_(chunk))).all():
+                del rows[name]
+        if not rows:
+            return {}
+        now = datetime.utcnow()
+        params = [{**row, "version": 1, "was_sent": False, "created_at": now, "updated_at": now} for row in rows.values()]
+        created = self.session.exec(insert(MessageTemplate).returning(MessageTemplate.id, MessageTemplate.name), params=params).all()
+        if commit:
+            self.session.commit()
+        return {name: template_id for template_id, name in created}
+
+    @timed(TEMPLATE_SERVICE_SECONDS, "mark_templates_sent")
+    def mark_templates_sent(self, template_ids: list[int]) -> list[SentTemplate]:
+        """批量标记模板已发送：每块一条 UPDATE ... RETURNING，只返回更新后的发送状态。"""
 
         if not template_ids:
             return []
-        templates = self.session.exec(
-            select(MessageTemplate).where(MessageTemplate.id.in_(template_ids))
-        ).all()
         now = datetime.utcnow()
-        for tpl in templates:
-            tpl.was_sent = True
-            tpl.sent_at = now
-            touch_template(tpl)
-            self.session.add(tpl)
+        updated: list[SentTemplate] = []
+        for chunk in chunked(list(dict.fromkeys(template_ids))):
+            rows = self.session.exec(_mark_sent_statement(chunk, now)).all()
+            updated.extend(SentTemplate(*row) for row in rows)
         self.session.commit()
-        for tpl in templates:
-            self.session.refresh(tpl)
-        return templates
+        return updated
 
+    @timed(TEMPLATE_SERVICE_SECONDS, "get_template")
     def get_template(self, name: str) -> MessageTemplate:
         template = self.session.exec(select(MessageTemplate).where(MessageTemplate.name == name)).one_or_none()
         if template is None:
             raise TemplateNotFoundError(name)
         return template
 
+    @timed(TEMPLATE_SERVICE_SECONDS, "get_template_by_id")
     def get_template_by_id(self, template_id: int) -> MessageTemplate:
         template = self.session.get(MessageTemplate, template_id)
         if template is None:
             raise TemplateNotFoundError(str(template_id))
         return template
 
+    @timed(TEMPLATE_SERVICE_SECONDS, "get_cached_template")
+    def get_cached_template(self, key: int | str) -> TemplateSnapshot:
+        """按 ID（int）或名称（str）读取模板快照，优先使用进程级缓存。"""
+
+        cache = get_template_cache()
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            return snapshot
+        stale = cache.peek_stale(key)
+        if stale is not None:
+            current = self.session.exec(
+                select(MessageTemplate.version, MessageTemplate.updated_at).where(MessageTemplate.id == stale.id)
+            ).one_or_none()
+            if current is not None and tuple(current) == (stale.version, stale.updated_at):
+                cache.put(stale, revalidated=True)
+                return stale
+            cache.invalidate([stale.id])
+        template = self.get_template_by_id(key) if isinstance(key, int) else self.get_template(key)
+        snapshot = TemplateSnapshot.from_model(template)
+        cache.put(snapshot)
+        return snapshot
+
+    @timed(TEMPLATE_SERVICE_SECONDS, "list_templates")
     def list_templates(self, include_sent: bool = True) -> list[MessageTemplate]:
         """返回按更新时间降序的模板列表。"""
 
@@ -80,20 +520,137 @@ class TemplateService:
         result = self.session.exec(query).all()
         return list(result)
 
+    @timed(TEMPLATE_SERVICE_SECONDS, "list_page")
+    def list_page(
+        self,
+        *,
+        limit: int = 50,
+        cursor: str | None = None,
+        was_sent: bool | None = None,
+        summary: bool = False,
+    ) -> TemplatePage:
+        """按 (updated_at, id) 降序的游标分页，由复合索引直接定位，与页码深度无关。
+
+        summary=True 时返回 TemplateSummary，不读取完整正文。
+        """
+
+        rows = self.session.exec(_page_statement(limit, cursor, was_sent, summary)).all()
+        return _build_page(list(rows), limit, summary)
+
+    @timed(TEMPLATE_SERVICE_SECONDS, "get_summaries")
+    def get_summaries(self, template_ids: list[int]) -> list[TemplateSummary]:
+        """读取指定模板的轻量投影，用于在修改后只刷新受影响的行。"""
+
+        summaries: list[TemplateSummary] = []
+        for chunk in chunked(list(dict.fromkeys(template_ids))):
+            rows = self.session.exec(_summaries_statement(chunk)).all()
+            summaries.extend(TemplateSummary(*row) for row in rows)
+        return summaries
+
+    @timed(TEMPLATE_SERVICE_SECONDS, "count_templates")
+    def count_templates(self) -> TemplateCounts:
+        return _build_counts(self.session.exec(COUNT_STATEMENT).all())
+
     def delete_templates(self, template_ids: list[int]) -> int:
+        """按块执行 DELETE ... WHERE id IN (...)，返回实际删除的数量。"""
+
+        return len(self.delete_templates_returning(template_ids))
+
+    @timed(TEMPLATE_SERVICE_SECONDS, "delete_templates_returning")
+    def delete_templates_returning(self, template_ids: list[int]) -> list[int]:
+        """与 delete_templates 相同，但返回实际删除的模板 ID。"""
+
         if not template_ids:
-            return 0
-        templates = self.session.exec(
-            select(MessageTemplate).where(MessageTemplate.id.in_(template_ids))
-        ).all()
-        for tpl in templates:
-            self.session.delete(tpl)
+            return []
+        deleted: list[int] = []
+        for chunk in chunked(list(dict.fromkeys(template_ids))):
+            deleted.extend(self.session.exec(_delete_statement(chunk)).scalars())
         self.session.commit()
-        return len(templates)
+        get_template_cache().invalidate(deleted)
+        return deleted
 
+    @timed(TEMPLATE_SERVICE_SECONDS, "delete_template")
     def delete_template(self, name: str) -> None:
         template = self.session.exec(select(MessageTemplate).where(MessageTemplate.name == name)).one_or_none()
         if template is None:
             raise TemplateNotFoundError(name)
         self.session.delete(template)
-        self.session.commit()
+        self.session.commit()
+        get_template_cache().invalidate(names=[name])
+
+
+class AsyncTemplateService:
+    """TemplateService 的 asyncio 版本，供 FastAPI 处理函数使用，查询期间不阻塞事件循环。
+
+    与同步版本共用语句构造函数，结果类型相同。
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    @timed(TEMPLATE_SERVICE_SECONDS, "async.get_template")
+    async def get_template(self, name: str) -> MessageTemplate:
+        result = await self.session.exec(select(MessageTemplate).where(MessageTemplate.name == name))
+        template = result.one_or_none()
+        if template is None:
+            raise TemplateNotFoundError(name)
+        return template
+
+    @timed(TEMPLATE_SERVICE_SECONDS, "async.get_template_by_id")
+    async def get_template_by_id(self, template_id: int) -> MessageTemplate:
+        template = await self.session.get(MessageTemplate, template_id)
+        if template is None:
+            raise TemplateNotFoundError(str(template_id))
+        return template
+
+    @timed(TEMPLATE_SERVICE_SECONDS, "async.list_page")
+    async def list_page(
+        self,
+        *,
+        limit: int = 50,
+        cursor: str | None = None,
+        was_sent: bool | None = None,
+        summary: bool = False,
+    ) -> TemplatePage:
+        result = await self.session.exec(_page_statement(limit, cursor, was_sent, summary))
+        return _build_page(list(result.all()), limit, summary)
+
+    @timed(TEMPLATE_SERVICE_SECONDS, "async.get_summaries")
+    async def get_summaries(self, template_ids: list[int]) -> list[TemplateSummary]:
+        summaries: list[TemplateSummary] = []
+        for chunk in chunked(list(dict.fromkeys(template_ids))):
+            result = await self.session.exec(_summaries_statement(chunk))
+            summaries.extend(TemplateSummary(*row) for row in result.all())
+        return summaries
+
+    @timed(TEMPLATE_SERVICE_SECONDS, "async.count_templates")
+    async def count_templates(self) -> TemplateCounts:
+        result = await self.session.exec(COUNT_STATEMENT)
+        return _build_counts(result.all())
+
+    @timed(TEMPLATE_SERVICE_SECONDS, "async.mark_templates_sent")
+    async def mark_templates_sent(self, template_ids: list[int]) -> list[SentTemplate]:
+        if not template_ids:
+            return []
+        now = datetime.utcnow()
+        updated: list[SentTemplate] = []
+        for chunk in chunked(list(dict.fromkeys(template_ids))):
+            result = await self.session.exec(_mark_sent_statement(chunk, now))
+            updated.extend(SentTemplate(*row) for row in result.all())
+        await self.session.commit()
+        return updated
+
+    @timed(TEMPLATE_SERVICE_SECONDS, "async.delete_templates_returning")
+    async def delete_templates_returning(self, template_ids: list[int]) -> list[int]:
+        if not template_ids:
+            return []
+        deleted: list[int] = []
+        for chunk in chunked(list(dict.fromkeys(template_ids))):
+            result = await self.session.exec(_delete_statement(chunk))
+            deleted.extend(result.scalars())
+        await self.session.commit()
+        get_template_cache().invalidate(deleted)
+        return deleted
+
+    async def delete_templates(self, template_ids: list[int]) -> int:
+        return len(await self.delete_templates_returning(template_ids))
@@ -0,0 +1 @@
+"""离线性能基准：基于本地假 Telegram Bot API 测量广播链路。"""
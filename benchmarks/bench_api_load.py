@@ -0,0 +1,101 @@
+"""基准：慢查询进行时，同步 Session 与异步 Session 下其它接口的延迟对比。
+
+在同一事件循环内持续发起慢请求（递归 CTE 模拟重查询）与快请求
+（/api/templates/counts），统计快请求的 p50/p99 与吞吐。同步版本在 async
+处理函数里直接调用同步 Session，会把整个事件循环阻塞到慢查询结束。
+
+用法：python -m benchmarks.bench_api_load --slow 2 --concurrency 10 --duration 5
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import isolated_env
+
+SLOW_SQL = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < :n) SELECT count(*) FROM c"
+
+
+def _percentile(samples: list[float], ratio: float) -> float:
+    return samples[max(int(len(samples) * ratio) - 1, 0)]
+
+
+async def _measure(client, label: str, slow_path: str | None, slow: int, concurrency: int, duration: float) -> None:
+    latencies: list[float] = []
+    slow_done = 0
+    deadline = time.perf_counter() + duration
+
+    async def slow_worker() -> None:
+        nonlocal slow_done
+        while time.perf_counter() < deadline:
+            (await client.get(slow_path)).raise_for_status()
+            slow_done += 1
+
+    async def fast_worker() -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            (await client.get("/api/templates/counts")).raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    workers = [fast_worker() for _ in range(concurrency)]
+    if slow_path:
+        workers += [slow_worker() for _ in range(slow)]
+    await asyncio.gather(*workers)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"{label:<10} 快请求 p50 {_percentile(latencies, 0.5):8.2f}ms  p99 {_percentile(latencies, 0.99):8.2f}ms  "
+        f"吞吐 {len(latencies) / elapsed:8.1f} req/s  完成慢请求 {slow_done}"
+    )
+
+
+async def _run(slow: int, concurrency: int, duration: float, rows: int, templates: int) -> None:
+    import httpx
+    from fastapi import Depends
+    from sqlalchemy import insert, text
+    from sqlmodel import Session
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    from app.db.models import MessageTemplate
+    from app.db.session import close_async_engine, get_engine, init_db, session_scope
+    from visualize.api import app, get_session
+
+    init_db()
+    with session_scope() as session:
+        session.exec(insert(MessageTemplate), params=[{"name": f"bench_{i}", "text": "bench"} for i in range(templates)])
+        session.commit()
+
+    @app.get("/bench/slow-sync")
+    async def slow_sync():
+        with Session(get_engine()) as session:
+            return session.exec(text(SLOW_SQL), params={"n": rows}).scalar()
+
+    @app.get("/bench/slow-async")
+    async def slow_async(session: AsyncSession = Depends(get_session)):
+        return (await session.exec(text(SLOW_SQL), params={"n": rows})).scalar()
+
+    print(f"{templates} 个模板，{slow} 路慢请求（递归 {rows} 行）与 {concurrency} 路快请求并发 {duration:.0f}s")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/api/templates/counts")
+        for label, path in (("无慢请求", None), ("同步 Session", "/bench/slow-sync"), ("异步 Session", "/bench/slow-async")):
+            await _measure(client, label, path, slow, concurrency, duration)
+    await close_async_engine()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="API 负载下的事件循环阻塞基准")
+    parser.add_argument("--slow", type=int, default=2, help="并发慢请求路数")
+    parser.add_argument("--concurrency", type=int, default=10, help="快请求并发度")
+    parser.add_argument("--duration", type=float, default=5.0, help="每轮持续秒数")
+    parser.add_argument("--rows", type=int, default=500_000, help="慢查询递归行数")
+    parser.add_argument("--templates", type=int, default=10_000)
+    args = parser.parse_args()
+    with isolated_env():
+        asyncio.run(_run(args.slow, args.concurrency, args.duration, args.rows, args.templates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""基准：逐行 ORM 与集合式 UPDATE/DELETE 处理大量模板的耗时对比。
+
+用法：python -m benchmarks.bench_bulk_templates --templates 10000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime
+
+from benchmarks.common import isolated_env
+
+
+def _seed(count: int) -> list[int]:
+    from sqlalchemy import delete, insert
+    from sqlmodel import select
+
+    from app.db.models import MessageTemplate
+    from app.db.session import session_scope
+
+    now = datetime.utcnow()
+    with session_scope() as session:
+        session.exec(delete(MessageTemplate))
+        session.exec(
+            insert(MessageTemplate),
+            params=[{"name": f"bench_{i}", "text": "bench", "created_at": now, "updated_at": now} for i in range(count)],
+        )
+        session.commit()
+        return list(session.exec(select(MessageTemplate.id)).all())
+
+
+def _legacy_mark_sent(session, template_ids: list[int]) -> None:
+    """改造前的实现：读取全部行、逐行修改、提交后逐行 refresh。"""
+
+    from sqlmodel import select
+
+    from app.db.models import MessageTemplate, touch_template
+
+    templates = session.exec(select(MessageTemplate).where(MessageTemplate.id.in_(template_ids))).all()
+    now = datetime.utcnow()
+    for tpl in templates:
+        tpl.was_sent = True
+        tpl.sent_at = now
+        touch_template(tpl)
+        session.add(tpl)
+    session.commit()
+    for tpl in templates:
+        session.refresh(tpl)
+
+
+def _legacy_delete(session, template_ids: list[int]) -> None:
+    """改造前的实现：读取全部行后逐行删除。"""
+
+    from sqlmodel import select
+
+    from app.db.models import MessageTemplate
+
+    for tpl in session.exec(select(MessageTemplate).where(MessageTemplate.id.in_(template_ids))).all():
+        session.delete(tpl)
+    session.commit()
+
+
+def _timed(func, ids: list[int]) -> float:
+    from app.db.session import session_scope
+
+    with session_scope() as session:
+        started = time.perf_counter()
+        func(session, ids)
+        return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="模板批量更新/删除基准")
+    parser.add_argument("--templates", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with isolated_env():
+        from app.db.session import init_db
+        from app.services.templates import TemplateService
+
+        init_db()
+        cases = (
+            ("mark_templates_sent", _legacy_mark_sent, lambda session, ids: TemplateService(session).mark_templates_sent(ids)),
+            ("delete_templates", _legacy_delete, lambda session, ids: TemplateService(session).delete_templates(ids)),
+        )
+        print(f"{args.templates} 个模板")
+        print(f"{'操作':<22} {'逐行(s)':>10} {'集合式(s)':>10}")
+        for label, legacy, bulk in cases:
+            legacy_elapsed = _timed(legacy, _seed(args.templates))
+            bulk_elapsed = _timed(bulk, _seed(args.templates))
+            print(f"{label:<22} {legacy_elapsed:>10.3f} {bulk_elapsed:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""基准：每条消息新建 Bot 与复用进程级连接池的单条发送延迟对比。
+
+用法：python -m benchmarks.bench_client --messages 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import isolated_env
+from benchmarks.fake_telegram import FakeTelegramServer
+
+
+async def _measure(label: str, server: FakeTelegramServer, messages: int, send) -> None:
+    connections_before = server.stats.connections
+    samples = []
+    for i in range(messages):
+        started = time.perf_counter()
+        await send(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    print(
+        f"{label:<12} 平均 {statistics.fmean(samples):6.2f}ms  p50 {samples[len(samples) // 2]:6.2f}ms  "
+        f"p99 {samples[int(len(samples) * 0.99) - 1]:6.2f}ms  新建 TCP 连接 {server.stats.connections - connections_before}"
+    )
+
+
+async def _run(messages: int) -> None:
+    from telegram import Bot
+
+    from app.bot.client import bot_client_lifespan, get_bot
+    from app.config import get_settings
+
+    with FakeTelegramServer() as server:
+        with isolated_env(BOT_API_BASE_URL=server.base_url):
+            settings = get_settings()
+
+            async def fresh_bot(i: int) -> None:
+                bot = Bot(token=settings.bot_token, base_url=settings.bot_api_base_url)
+                await bot.send_message(chat_id=1, text=f"msg {i}")
+                await bot.request.shutdown()
+
+            async with bot_client_lifespan():
+                async def pooled_bot(i: int) -> None:
+                    await get_bot().send_message(chat_id=1, text=f"msg {i}")
+
+                await pooled_bot(-1)  # 预热连接
+                await _measure("每次新建 Bot", server, messages, fresh_bot)
+                await _measure("共享连接池", server, messages, pooled_bot)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="共享 Bot 客户端单条延迟基准")
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(_run(args.messages))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""基准：持久化投递队列的入队与消费吞吐（不经过 HTTP 接口）。
+
+用法：python -m benchmarks.bench_delivery_queue --templates 10 --chats 500 --latency 0.005
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import isolated_env
+from benchmarks.fake_telegram import FakeTelegramServer
+
+
+async def _run(templates: int, chats: int, latency: float, workers: int, batch_size: int, concurrency: int) -> None:
+    from app.bot.client import bot_client_lifespan
+    from app.bot.worker import DeliveryWorkerPool
+    from app.db.session import init_db, session_scope
+    from app.services.deliveries import DeliveryService
+    from app.services.templates import TemplateService
+
+    with FakeTelegramServer(latency=latency) as server:
+        with isolated_env(BOT_API_BASE_URL=server.base_url, BOT_POOL_SIZE=str(concurrency)):
+            init_db()
+            with session_scope() as session:
+                service = TemplateService(session)
+                template_ids = [service.create_template(name=f"bench_{i}", text=f"bench {i}").id for i in range(templates)]
+            chat_ids = [-(1000 + i) for i in range(chats)]
+
+            started = time.perf_counter()
+            with session_scope() as session:
+                job_id, queued = DeliveryService(session).enqueue(template_ids, chat_ids)
+            enqueue_elapsed = time.perf_counter() - started
+            print(f"入队 {queued} 条：{enqueue_elapsed:.3f}s（{queued / enqueue_elapsed:.0f} 条/秒）")
+
+            pool = DeliveryWorkerPool(workers=workers, batch_size=batch_size, concurrency=concurrency)
+            async with bot_client_lifespan():
+                started = time.perf_counter()
+                processed = sum(await asyncio.gather(*(pool.drain() for _ in range(workers))))
+                drain_elapsed = time.perf_counter() - started
+
+            with session_scope() as session:
+                summary = DeliveryService(session).job_summary(job_id)
+            assert summary.done and summary.sent == queued, summary
+            print(
+                f"消费 {processed} 条：{drain_elapsed:.3f}s（{processed / drain_elapsed:.0f} 条/秒），"
+                f"workers={workers} batch={batch_size} 并发={concurrency}，请求数 {server.stats.requests}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="投递队列吞吐基准")
+    parser.add_argument("--templates", type=int, default=10)
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.005, help="假服务每次请求的延迟（秒）")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(_run(args.templates, args.chats, args.latency, args.workers, args.batch_size, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
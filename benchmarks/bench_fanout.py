@@ -0,0 +1,52 @@
+"""基准：模板 × chat 批量广播的耗时随并发上限的变化。
+
+用法：python -m benchmarks.bench_fanout --templates 20 --chats 50 --latency 0.02
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import isolated_env
+from benchmarks.fake_telegram import FakeTelegramServer
+
+
+async def _run(templates: int, chats: int, latency: float, levels: list[int]) -> None:
+    from app.bot.broadcast import broadcast_matrix
+    from app.bot.client import bot_client_lifespan
+    from app.db.session import init_db, session_scope
+    from app.services.templates import TemplateService
+
+    with FakeTelegramServer(latency=latency) as server:
+        with isolated_env(BOT_API_BASE_URL=server.base_url, BOT_POOL_SIZE=str(max(levels))):
+            init_db()
+            with session_scope() as session:
+                service = TemplateService(session)
+                names = [service.create_template(name=f"bench_{i}", text=f"bench {i}").name for i in range(templates)]
+            chat_ids = [-(1000 + i) for i in range(chats)]
+            total = templates * chats
+            print(f"{templates} 模板 × {chats} chat = {total} 条，单次延迟 {latency * 1000:.0f}ms")
+            print(f"{'并发':>6} {'耗时(s)':>10} {'条/秒':>10} {'峰值在途':>8}")
+            async with bot_client_lifespan():
+                for level in levels:
+                    server.stats.peak_in_flight = 0
+                    started = time.perf_counter()
+                    outcomes = await broadcast_matrix(names, chat_ids, concurrency=level)
+                    elapsed = time.perf_counter() - started
+                    assert all(outcome.ok for outcome in outcomes), [o.error for o in outcomes if not o.ok][:3]
+                    print(f"{level:>6} {elapsed:>10.3f} {total / elapsed:>10.1f} {server.stats.peak_in_flight:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量广播并发基准")
+    parser.add_argument("--templates", type=int, default=20)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="假服务每次请求的延迟（秒）")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+    asyncio.run(_run(args.templates, args.chats, args.latency, args.levels))
+
+
+if __name__ == "__main__":
+    main()
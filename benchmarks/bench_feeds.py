@@ -0,0 +1,59 @@
+"""基准：本地假订阅源上的首轮抓取（解析并生成模板）与重新轮询（304 / 内容未变）耗时。
+
+用法：python -m benchmarks.bench_feeds --feeds 500 --items 20 --latency 0.05 --concurrency 32
+      python -m benchmarks.bench_feeds --no-conditional   # 模拟不支持 ETag/Last-Modified 的站点
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import isolated_env
+from benchmarks.fake_feeds import FakeFeedServer
+
+
+async def _run(feeds: int, items: int, latency: float, concurrency: int, conditional: bool) -> None:
+    from sqlalchemy import insert
+
+    from app.bot.feeds import FeedPoller
+    from app.db.models import Feed
+    from app.db.session import init_db, session_scope
+
+    with isolated_env(LOG_LEVEL="WARNING"), FakeFeedServer(conditional=conditional, latency=latency) as server:
+        init_db()
+        rows = []
+        for index in range(feeds):
+            url = server.publish(f"f{index}.xml", [(f"f{index}-{item}", f"title {item}", f"summary {item}") for item in range(items)])
+            rows.append({"url": url, "name": f"f{index}", "parse_mode": "HTML", "enabled": True})
+        with session_scope() as session:
+            session.exec(insert(Feed), params=rows)
+            session.commit()
+
+        poller = FeedPoller(concurrency=concurrency)
+        try:
+            for label in ("首轮", "重新轮询"):
+                started = time.perf_counter()
+                result = await poller.run_once()
+                print(
+                    f"{label}：{feeds} 个源 {time.perf_counter() - started:.3f}s，"
+                    f"有更新 {result.modified}，未变化 {result.not_modified}，新建模板 {result.created}"
+                )
+        finally:
+            await poller.stop()
+        print(f"请求 {server.stats.requests} 次，连接 {server.stats.connections} 个，304 {server.stats.not_modified} 次")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--feeds", type=int, default=500)
+    parser.add_argument("--items", type=int, default=20, help="每个源的条目数")
+    parser.add_argument("--latency", type=float, default=0.05, help="假服务每个请求的延迟（秒）")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--no-conditional", dest="conditional", action="store_false", help="响应不带 ETag/Last-Modified")
+    args = parser.parse_args()
+    asyncio.run(_run(args.feeds, args.items, args.latency, args.concurrency, args.conditional))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""基准：每秒数千条投递日志时的发送延迟与吞吐，对比关闭日志、同步 sink 与队列化 sink。
+
+sink 写入临时文件，可用 --write-cost 模拟较慢的磁盘或终端（每条写入额外阻塞）。FakeBot 在事件循环中
+等待 --latency 秒，测得的单次发送耗时包含被其他协程阻塞的时间，因此能反映日志对事件循环的影响。
+
+用法：python -m benchmarks.bench_logging --sends 20000 --concurrency 32 --write-cost 0.0002
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import pathlib
+import statistics
+import time
+
+from benchmarks.common import isolated_env
+
+
+class _FileSink:
+    def __init__(self, path: pathlib.Path, write_cost: float) -> None:
+        self.file = path.open("a", encoding="utf-8")
+        self.write_cost = write_cost
+        self.lines = 0
+
+    def write(self, message: str) -> int:
+        if self.write_cost:
+            time.sleep(self.write_cost)
+        self.lines += message.count("\n")
+        return self.file.write(message)
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _run(mode: str, path: pathlib.Path, sends: int, concurrency: int, latency: float, write_cost: float) -> None:
+    from loguru import logger
+
+    from app import log
+    from app.bot import client
+    from app.bot.broadcast import broadcast_matrix
+    from app.config import get_settings
+
+    latencies: list[float] = []
+
+    class FakeBot:
+        def __init__(self, token: str, **kwargs) -> None:
+            self.token = token
+
+        async def send_message(self, chat_id: int, text: str, parse_mode: str | None = None):
+            started = time.perf_counter()
+            await asyncio.sleep(latency)
+            latencies.append(time.perf_counter() - started)
+
+    client.Bot = FakeBot
+    sink = _FileSink(path, write_cost)
+    logger.remove()
+    if mode == "queued":
+        log.configure_logging(get_settings(), sink=sink)
+    elif mode == "sync":
+        logger.add(sink, level="INFO", format=log._json_line, enqueue=False)
+
+    started = time.perf_counter()
+    outcomes = await broadcast_matrix(["bench"], list(range(1, sends + 1)), concurrency=concurrency)
+    elapsed = time.perf_counter() - started
+    log.flush_logging()
+    log.shutdown_logging()
+    logger.remove()
+    sink.close()
+    await client.close_bot_client()
+    assert all(outcome.ok for outcome in outcomes)
+
+    print(
+        f"{mode:>8} {sends / elapsed:>9.0f} {sink.lines / elapsed:>9.0f}"
+        f" {statistics.median(latencies) * 1000:>9.2f} {_percentile(latencies, 0.99) * 1000:>9.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="日志开销基准")
+    parser.add_argument("--sends", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.005, help="FakeBot 每次请求的延迟（秒）")
+    parser.add_argument("--write-cost", type=float, default=0.0, help="sink 每条写入额外阻塞的时间（秒），模拟慢磁盘或终端")
+    args = parser.parse_args()
+
+    with isolated_env(BROADCAST_CONCURRENCY=str(args.concurrency), LOG_JSON="1", LOG_LEVEL="INFO") as db_path:
+        from app.db.session import init_db, session_scope
+        from app.services.templates import TemplateService
+
+        init_db()
+        with session_scope() as session:
+            TemplateService(session).create_template(name="bench", text="Hello")
+        print(f"{args.sends} 条，并发 {args.concurrency}，请求延迟 {args.latency * 1000:.0f}ms，sink 每条写入 {args.write_cost * 1e6:.0f}µs")
+        print(f"{'日志':>8} {'条/秒':>9} {'日志/秒':>9} {'p50(ms)':>9} {'p99(ms)':>9}")
+        for mode in ("off", "queued", "sync"):
+            asyncio.run(_run(mode, db_path.with_name(f"{mode}.log"), args.sends, args.concurrency, args.latency, args.write_cost))
+
+
+if __name__ == "__main__":
+    main()
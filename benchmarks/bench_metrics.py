@@ -0,0 +1,115 @@
+"""基准：指标原语的单次开销，以及发送路径与 SQL 计时对单次发送的额外耗时。
+
+用法：python -m benchmarks.bench_metrics --ops 1000000 --sends 2000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import isolated_env
+
+
+class _FakeBot:
+    def __init__(self, token: str, **kwargs) -> None:
+        self.token = token
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str | None = None):
+        return None
+
+
+def _per_op(func, ops: int) -> float:
+    started = time.perf_counter()
+    for _ in range(ops):
+        func()
+    return (time.perf_counter() - started) / ops * 1e6
+
+
+def _primitives(ops: int) -> None:
+    from app import metrics
+
+    registry = metrics.Registry()
+    counter = metrics.Counter("bench_total", "基准计数", ["chat_type", "outcome"], registry=registry)
+    histogram = metrics.Histogram("bench_seconds", "基准直方图", ["method"], registry=registry)
+    child = histogram.labels("sendMessage")
+    plain = lambda: None  # noqa: E731
+    wrapped = metrics.timed(histogram, "wrapped")(plain)
+
+    baseline = _per_op(plain, ops)
+    print(f"空函数调用                     {baseline:6.3f} µs")
+    print(f"counter.labels(..).inc()       {_per_op(lambda: counter.labels('private', 'sent').inc(), ops) - baseline:6.3f} µs")
+    print(f"histogram child.observe()      {_per_op(lambda: child.observe(0.012), ops) - baseline:6.3f} µs")
+    print(f"@timed 包装的额外开销          {_per_op(wrapped, ops) - baseline:6.3f} µs")
+
+
+async def _sends(count: int, send) -> float:
+    started = time.perf_counter()
+    for index in range(count):
+        await send(template_name="bench", chat_id=index, override_text=None, dry_run=False)
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def _queries(engine, count: int) -> float:
+    from sqlalchemy import text
+
+    with engine.connect() as connection:
+        started = time.perf_counter()
+        for _ in range(count):
+            connection.execute(text("SELECT 1")).scalar()
+        return (time.perf_counter() - started) / count * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="指标开销基准")
+    parser.add_argument("--ops", type=int, default=1_000_000)
+    parser.add_argument("--sends", type=int, default=2000)
+    args = parser.parse_args()
+
+    _primitives(args.ops)
+
+    with isolated_env():
+        from sqlmodel import create_engine
+
+        from app import metrics
+        from app.bot import broadcast, client
+        from app.db import session as db_session
+        from app.db.session import get_engine, init_db, session_scope
+        from app.services.templates import TemplateService
+
+        init_db()
+        with session_scope() as session:
+            TemplateService(session).create_template(name="bench", text="Hello")
+        client.Bot = _FakeBot
+
+        instrumented = broadcast.send_manual_broadcast
+        observe = broadcast._observe_send
+        asyncio.run(_sends(200, instrumented))
+        with_metrics, without_metrics = [], []
+        for _ in range(10):
+            with_metrics.append(asyncio.run(_sends(args.sends, instrumented)))
+            broadcast._observe_send = lambda *args: None
+            try:
+                without_metrics.append(asyncio.run(_sends(args.sends, broadcast._send_manual_broadcast)))
+            finally:
+                broadcast._observe_send = observe
+        with_metrics, without_metrics = min(with_metrics), min(without_metrics)
+        per_send = metrics.MANUAL_BROADCASTS_TOTAL, metrics.MANUAL_BROADCAST_SECONDS.labels()
+        send_path = _per_op(lambda: (observe(456, None, "sent", 0.01), per_send[0].labels("sent").inc(), per_send[1].observe(0.01)), args.ops)
+        print(f"每次发送的指标调用合计         {send_path:6.3f} µs（不含 @timed 包装）")
+        print(f"单次发送（FakeBot）            有指标 {with_metrics:7.1f} µs，无指标 {without_metrics:7.1f} µs，差 {with_metrics - without_metrics:5.1f} µs")
+
+        plain_engine = create_engine(str(get_engine().url))
+        timed_engine = create_engine(str(get_engine().url))
+        db_session._install_query_timer(timed_engine)
+        rounds = [(_queries(timed_engine, args.sends * 5), _queries(plain_engine, args.sends * 5)) for _ in range(5)]
+        timed_query = min(timed for timed, _ in rounds)
+        plain_query = min(plain for _, plain in rounds)
+        plain_engine.dispose()
+        timed_engine.dispose()
+        print(f"单条 SQL（SELECT 1）           有计时 {timed_query:7.1f} µs，无计时 {plain_query:7.1f} µs，差 {timed_query - plain_query:5.1f} µs")
+        asyncio.run(client.close_bot_client())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""基准：剖析关闭时 span 的单次开销，以及关闭 / 开启剖析时一批广播的耗时。
+
+用法：python -m benchmarks.bench_profiling --ops 1000000 --sends 5000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.common import isolated_env
+
+
+class _FakeBot:
+    def __init__(self, token: str, **kwargs) -> None:
+        self.token = token
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str | None = None):
+        return None
+
+
+def _per_op(func, ops: int) -> float:
+    started = time.perf_counter()
+    for _ in range(ops):
+        func()
+    return (time.perf_counter() - started) / ops * 1e6
+
+
+def _spans(ops: int) -> None:
+    from app import profiling
+
+    def plain() -> None:
+        pass
+
+    def disabled() -> None:
+        with profiling.span("http"):
+            pass
+
+    def enabled() -> None:
+        with profile_span("http"):
+            pass
+
+    profile_span = profiling.span
+    baseline = min(_per_op(plain, ops) for _ in range(3))
+    print(f"空函数调用                     {baseline:6.3f} µs")
+    print(f"span()（未在剖析中）           {min(_per_op(disabled, ops) for _ in range(3)) - baseline:6.3f} µs")
+    profile = profiling.Profile("bench")
+    token = profiling._ACTIVE.set(profile)
+    try:
+        print(f"span()（剖析中）               {min(_per_op(enabled, ops) for _ in range(3)) - baseline:6.3f} µs")
+    finally:
+        profiling._ACTIVE.reset(token)
+
+
+async def _broadcast(sends: int) -> float:
+    from app.bot.broadcast import broadcast_matrix
+
+    started = time.perf_counter()
+    outcomes = await broadcast_matrix(["bench"], list(range(1, sends + 1)), concurrency=32)
+    assert all(outcome.ok for outcome in outcomes)
+    return (time.perf_counter() - started) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="剖析开销基准")
+    parser.add_argument("--ops", type=int, default=1_000_000)
+    parser.add_argument("--sends", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    from loguru import logger
+
+    logger.remove()  # 只比较剖析本身的开销
+    _spans(args.ops)
+
+    with isolated_env() as db_path:
+        from app.bot import client
+        from app.config import reload_settings
+        from app.db.session import init_db, reset_engine, session_scope
+        from app.services.templates import TemplateService
+
+        os.environ["PROFILE_DIR"] = str(db_path.with_name("profiles"))
+        init_db()
+        with session_scope() as session:
+            TemplateService(session).create_template(name="bench", text="Hello {chat_id}")
+        client.Bot = _FakeBot
+
+        print(f"{args.sends} 条广播（FakeBot，无网络延迟），取 {args.rounds} 轮最小值")
+        for label, enabled in (("关闭剖析", "0"), ("开启剖析", "1")):
+            os.environ["PROFILE_BROADCASTS"] = enabled
+            reload_settings()
+            reset_engine()
+            elapsed = min(asyncio.run(_broadcast(args.sends)) for _ in range(args.rounds))
+            print(f"{label}                       {elapsed:8.1f} ms（{args.sends / elapsed * 1000:7.0f} 条/秒）")
+            asyncio.run(client.close_bot_client())
+        print(f"输出文件：{len(list(db_path.with_name('profiles').glob('*.json')))} 份，位于 {db_path.with_name('profiles')}")
+
+
+if __name__ == "__main__":
+    main()
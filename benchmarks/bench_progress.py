@@ -0,0 +1,63 @@
+"""基准：进度中心的发布吞吐、合并后的更新次数与慢订阅者的内存占用。
+
+用法：python -m benchmarks.bench_progress --events 100000 --subscribers 100
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from benchmarks.common import ROOT_DIR  # noqa: F401 - 确保可以导入 app
+
+
+async def _run(events: int, subscribers: int, seconds: float) -> None:
+    from app.bot.progress import SENT, ProgressEvent, ProgressHub
+
+    hub = ProgressHub()
+    fast = hub.subscribe("job")
+    slow = [hub.subscribe("job") for _ in range(subscribers - 1)]  # 从不读取的慢订阅者
+    updates = 0
+
+    async def consume() -> None:
+        nonlocal updates
+        while await fast.next_batch(timeout=1.0) is not None:
+            updates += 1
+
+    consumer = asyncio.create_task(consume())
+    per_tick = max(1, int(events / (seconds / 0.01)))
+    started = time.perf_counter()
+    publish_time = 0.0
+    for offset in range(0, events, per_tick):
+        tick = time.perf_counter()
+        for chat_id in range(offset, min(offset + per_tick, events)):
+            hub.publish(ProgressEvent(job_id="job", template_id=1, chat_id=chat_id, status=SENT))
+        publish_time += time.perf_counter() - tick
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    await consumer
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for chat_id in range(events):
+        hub.publish(ProgressEvent(job_id="job", template_id=1, chat_id=chat_id, status=SENT))
+    memory = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    print(f"{events} 个事件 × {subscribers} 个订阅者，持续 {elapsed:.1f}s")
+    print(f"发布：{events / publish_time:,.0f} 事件/s（含全部订阅者的扇出）")
+    print(f"活跃订阅者收到 {updates} 次合并更新（约 {updates / elapsed:.1f} 次/s）")
+    print(f"再发布 {events} 个事件，{len(slow)} 个从不读取的订阅者缓冲已满，内存增长 {memory / 1024:.0f} KiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="进度推送基准")
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--subscribers", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=3.0, help="事件分布的时长")
+    args = parser.parse_args()
+    asyncio.run(_run(args.events, args.subscribers, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
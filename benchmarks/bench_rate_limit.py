@@ -0,0 +1,40 @@
+"""基准：限速器在令牌充足时的单次开销，以及大量 chat 下的桶数量。
+
+用法：python -m benchmarks.bench_rate_limit --iterations 200000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from benchmarks import common  # noqa: F401 - 确保仓库根目录在 sys.path 中
+
+
+async def _run(iterations: int, chats: int) -> None:
+    from app.bot.rate_limit import RateLimitConfig, RateLimiter
+
+    limiter = RateLimiter(RateLimitConfig(global_interval_seconds=0, chat_interval_seconds=0, group_interval_seconds=0))
+    started = time.perf_counter()
+    for i in range(iterations):
+        await limiter.acquire(i % chats)
+    elapsed = time.perf_counter() - started
+    print(f"快路径 acquire：{elapsed / iterations * 1e9:.0f} ns/次（{iterations} 次，{chats} 个 chat）")
+    print(f"剩余单聊桶：{limiter.snapshot().chat_buckets}（空闲桶已淘汰）")
+
+    limiter = RateLimiter(RateLimitConfig(global_interval_seconds=0, chat_interval_seconds=60, max_chat_buckets=chats))
+    for i in range(iterations):
+        limiter.reserve(i)
+    print(f"{iterations} 个不同 chat、单聊间隔 60s 时保留的桶：{limiter.snapshot().chat_buckets}（上限 {chats}）")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="限速器开销基准")
+    parser.add_argument("--iterations", type=int, default=200_000)
+    parser.add_argument("--chats", type=int, default=10_000)
+    args = parser.parse_args()
+    asyncio.run(_run(args.iterations, args.chats))
+
+
+if __name__ == "__main__":
+    main()
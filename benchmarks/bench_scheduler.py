@@ -0,0 +1,73 @@
+"""基准：大量定时任务下调度器的启动耗时、堆操作开销与空闲 CPU。
+
+用法：python -m benchmarks.bench_scheduler --schedules 50000 --idle 3
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import isolated_env
+
+
+async def _run(count: int, idle: float) -> None:
+    from sqlalchemy import insert
+
+    from app.bot.scheduler import SchedulerService
+    from app.db.models import Schedule
+    from app.db.session import init_db, session_scope
+    from app.services.templates import TemplateService
+
+    with isolated_env():
+        init_db()
+        now = datetime.utcnow()
+        with session_scope() as session:
+            template_id = TemplateService(session).create_template(name="bench", text="bench").id
+            rows = [
+                {
+                    "name": f"bench_{i}",
+                    "template_id": template_id,
+                    "chat_ids": "1",
+                    "kind": "interval",
+                    "interval_seconds": 3600,
+                    "misfire_policy": "once",
+                    "misfire_grace_seconds": 300,
+                    "enabled": True,
+                    "next_run_at": now + timedelta(hours=1, seconds=random.random() * 3600),
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for i in range(count)
+            ]
+            session.exec(insert(Schedule), params=rows)
+            session.commit()
+
+        scheduler = SchedulerService()
+        started = time.perf_counter()
+        await scheduler.start()
+        print(f"{count} 个定时任务，重建堆耗时 {time.perf_counter() - started:.3f}s")
+
+        started = time.perf_counter()
+        for schedule_id in range(1, 10_001):
+            scheduler.schedule(schedule_id, now + timedelta(hours=2, seconds=schedule_id))
+        print(f"10000 次改期：平均 {(time.perf_counter() - started) / 10_000 * 1e6:.1f}µs")
+
+        cpu = time.process_time()
+        await asyncio.sleep(idle)
+        print(f"空闲 {idle:.0f}s 占用 CPU {time.process_time() - cpu:.4f}s")
+        await scheduler.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="定时任务调度器基准")
+    parser.add_argument("--schedules", type=int, default=50_000)
+    parser.add_argument("--idle", type=float, default=3.0, help="测量空闲 CPU 的秒数")
+    args = parser.parse_args()
+    asyncio.run(_run(args.schedules, args.idle))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""基准：每次发送都检查表结构与进程级一次性检查的耗时对比，以及 API 模块导入耗时。
+
+用法：python -m benchmarks.bench_schema_guard --sends 1000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import ROOT_DIR, isolated_env
+
+
+def _import_api() -> tuple[float, bool]:
+    """在子进程中导入 visualize.api，返回耗时以及导入是否创建了数据库文件。"""
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = pathlib.Path(tmpdir) / "import.db"
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "BOT_TOKEN": "BENCH_TOKEN"}
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import visualize.api"], cwd=ROOT_DIR, env=env, check=True)
+        return time.perf_counter() - started, db_path.exists()
+
+
+async def _sends(count: int) -> float:
+    from app.bot.broadcast import send_manual_broadcast
+
+    started = time.perf_counter()
+    for index in range(count):
+        await send_manual_broadcast(template_name="bench", chat_id=index, dry_run=True)
+    return time.perf_counter() - started
+
+
+async def _run_with(module, check, count: int) -> float:
+    original = module.ensure_schema
+    module.ensure_schema = check
+    try:
+        return await _sends(count)
+    finally:
+        module.ensure_schema = original
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="表结构检查开销基准")
+    parser.add_argument("--sends", type=int, default=1000)
+    args = parser.parse_args()
+
+    with isolated_env():
+        from sqlmodel import SQLModel
+
+        from app.bot import broadcast
+        from app.db.session import ensure_schema, get_engine, init_db, session_scope
+        from app.services.templates import TemplateService
+
+        started = time.perf_counter()
+        init_db()
+        print(f"空库首次迁移 {(time.perf_counter() - started) * 1000:8.2f}ms")
+        with session_scope() as session:
+            TemplateService(session).create_template(name="bench", text="Hello {{ chat_id }}")
+
+        checks = (
+            ("create_all（改造前）", lambda: SQLModel.metadata.create_all(get_engine())),
+            ("init_db 版本检查", init_db),
+            ("ensure_schema", ensure_schema),
+        )
+        for label, check in checks:
+            started = time.perf_counter()
+            for _ in range(args.sends):
+                check()
+            print(f"{label:<18} {(time.perf_counter() - started) / args.sends * 1e6:10.1f}µs/次")
+
+        legacy = asyncio.run(_run_with(broadcast, lambda: SQLModel.metadata.create_all(get_engine()), args.sends))
+        current = asyncio.run(_sends(args.sends))
+        print(f"{args.sends} 次 dry-run 发送：每次 create_all {legacy:.2f}s，ensure_schema {current:.2f}s")
+
+    elapsed, touched = _import_api()
+    print(f"导入 visualize.api 耗时 {elapsed:.2f}s，{'访问了' if touched else '未访问'}数据库")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""基准：多个读线程与一个写线程并发访问 SQLite 时，默认配置与 tuned 配置的吞吐对比。
+
+读线程持续执行模板分页查询，写线程持续批量标记模板为已发送（模拟广播 worker），
+统计各自的吞吐与 "database is locked" 错误数。
+
+用法：python -m benchmarks.bench_sqlite_profile --readers 4 --duration 5
+"""
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.common import isolated_env
+
+
+def _run(profile: str, readers: int, duration: float, templates: int, batch: int) -> None:
+    from sqlalchemy import insert
+
+    from app.db.models import MessageTemplate
+    from app.db.session import init_db, session_scope
+    from app.services.templates import TemplateService
+
+    with isolated_env(DB_PROFILE=profile, SQLITE_BUSY_TIMEOUT_MS="1000"):
+        init_db()
+        with session_scope() as session:
+            session.exec(insert(MessageTemplate), params=[{"name": f"bench_{i}", "text": "lorem ipsum " * 20} for i in range(templates)])
+            session.commit()
+
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def bump(key: str) -> None:
+            with lock:
+                counts[key] += 1
+
+        def reader() -> None:
+            with session_scope() as session:
+                service = TemplateService(session)
+                while time.perf_counter() < deadline:
+                    try:
+                        service.list_page(limit=200, summary=True)
+                        service.count_templates()
+                        bump("reads")
+                    except OperationalError:
+                        session.rollback()
+                        bump("errors")
+
+        def writer() -> None:
+            offset = 0
+            with session_scope() as session:
+                service = TemplateService(session)
+                while time.perf_counter() < deadline:
+                    ids = list(range(offset % templates + 1, offset % templates + 1 + batch))
+                    offset += batch
+                    try:
+                        service.mark_templates_sent(ids)
+                        bump("writes")
+                    except OperationalError:
+                        session.rollback()
+                        bump("errors")
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(
+            f"{profile:<8} 读 {counts['reads'] / duration:8.1f} 次/s  写 {counts['writes'] / duration:8.1f} 批/s  "
+            f"锁错误 {counts['errors']}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SQLite 引擎配置并发基准")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--templates", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=100, help="写线程每批标记的模板数")
+    args = parser.parse_args()
+    print(f"{args.templates} 个模板，{args.readers} 个读线程 + 1 个写线程，各运行 {args.duration:.0f}s")
+    for profile in ("default", "tuned"):
+        _run(profile, args.readers, args.duration, args.templates, args.batch)
+
+
+if __name__ == "__main__":
+    main()
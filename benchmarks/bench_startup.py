@@ -0,0 +1,93 @@
+"""基准：命令行与 API 入口的冷启动耗时与导入构成（python -X importtime）。
+
+用法：python -m benchmarks.bench_startup --repeat 5 --top 8
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+from benchmarks.common import ROOT_DIR
+
+SCENARIOS: dict[str, list[str]] = {
+    "help": ["-m", "app.bot.main", "--help"],
+    "init-db": ["-m", "app.bot.main", "init-db"],
+    "broadcast-help": ["-m", "app.bot.main", "broadcast", "--help"],
+    "api-import": ["-c", "import visualize.api"],
+}
+
+
+@dataclass(slots=True)
+class StartupProfile:
+    """一次子进程启动的墙钟耗时与 -X importtime 报告。"""
+
+    wall: float
+    modules: dict[str, int] = field(default_factory=dict)  # 模块名 -> 累计导入耗时（微秒）
+    top_level: dict[str, int] = field(default_factory=dict)  # 由入口直接触发的导入
+
+    @property
+    def import_us(self) -> int:
+        return sum(self.top_level.values())
+
+
+def parse_importtime(stderr: str) -> tuple[dict[str, int], dict[str, int]]:
+    """解析 -X importtime 输出，返回 (全部模块, 顶层模块) 的累计耗时（微秒）。"""
+
+    modules: dict[str, int] = {}
+    top_level: dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        module = name.strip()
+        modules[module] = int(cumulative)
+        if name[1:2] != " ":
+            top_level[module] = int(cumulative)
+    return modules, top_level
+
+
+def profile_startup(argv: list[str], env: dict[str, str] | None = None) -> StartupProfile:
+    """以 -X importtime 启动一个全新的解释器执行 argv，返回耗时与导入构成。"""
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{pathlib.Path(tmpdir) / 'startup.db'}",
+            "BOT_TOKEN": "BENCH_TOKEN",
+            "LOG_LEVEL": "WARNING",
+            **(env or {}),
+        }
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", *argv], cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True
+        )
+        wall = time.perf_counter() - started
+    modules, top_level = parse_importtime(result.stderr)
+    return StartupProfile(wall=wall, modules=modules, top_level=top_level)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="入口冷启动耗时")
+    parser.add_argument("--repeat", type=int, default=5, help="每个场景启动次数，取最快一次")
+    parser.add_argument("--top", type=int, default=8, help="列出最耗时的顶层导入数")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    args = parser.parse_args()
+
+    baseline = min(profile_startup(["-c", "pass"]).wall for _ in range(args.repeat))
+    print(f"空解释器：{baseline * 1000:.0f}ms")
+    for name in args.scenarios:
+        best = min((profile_startup(SCENARIOS[name]) for _ in range(args.repeat)), key=lambda profile: profile.wall)
+        heavy = sorted(best.top_level.items(), key=lambda item: item[1], reverse=True)[: args.top]
+        print(f"{name:>15}: 墙钟 {best.wall * 1000:.0f}ms，导入 {best.import_us / 1000:.0f}ms，共 {len(best.modules)} 个模块")
+        for module, cumulative in heavy:
+            print(f"{'':>17}{cumulative / 1000:8.1f}ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""基准套件：在本地假 Bot API 上驱动手动发送、/api/templates/send 与模板 CRUD，输出可比较的吞吐与延迟。
+
+场景与延迟口径：
+- manual：以 --concurrency 个调用方并发执行 send_manual_broadcast，延迟为单次调用耗时；
+- api：每个模板一次 POST /api/templates/send，由投递 worker 发送完毕，吞吐按 POST 开始到全部投递
+  结束计算，延迟为 POST 请求耗时；
+- crud：--crud-sizes 个模板依次创建、读取、更新、删除，每个操作一个会话，按操作分别统计。
+
+假服务可注入延迟抖动、500 与 429（--error-rate / --flood-rate）；--seed 固定注入序列，--backoff
+缩短重试等待，使带故障的运行也能在几秒内完成。--json 保存结果，--baseline 与之前保存的结果比较，
+吞吐下降或 p99 上升超过 --tolerance 时以非零状态退出。全部在本机运行，无需网络。
+
+用法：python -m benchmarks.bench_suite --sizes 1x100 10x100 10x300 --latency 0.005 --json results.json
+      python -m benchmarks.bench_suite --baseline results.json --tolerance 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import pathlib
+import sys
+import time
+from dataclasses import asdict, dataclass
+
+from benchmarks.common import isolated_env
+from benchmarks.fake_telegram import FakeTelegramServer, FakeTelegramStats
+
+
+@dataclass
+class Result:
+    """一个场景在一种规模下的结果。"""
+
+    scenario: str
+    size: str
+    ops: int
+    ok: int
+    seconds: float
+    per_second: float
+    p50_ms: float
+    p99_ms: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.scenario}@{self.size}"
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _result(scenario: str, size: str, latencies: list[float], ok: int, seconds: float) -> Result:
+    return Result(
+        scenario=scenario,
+        size=size,
+        ops=len(latencies),
+        ok=ok,
+        seconds=round(seconds, 4),
+        per_second=round(len(latencies) / seconds, 1),
+        p50_ms=round(_percentile(latencies, 0.5) * 1000, 3),
+        p99_ms=round(_percentile(latencies, 0.99) * 1000, 3),
+    )
+
+
+def _parse_size(value: str) -> tuple[int, int]:
+    templates, _, chats = value.lower().partition("x")
+    return int(templates), int(chats)
+
+
+def _create_templates(prefix: str, count: int) -> list[tuple[int, str]]:
+    from app.db.session import session_scope
+    from app.services.templates import TemplateService
+
+    with session_scope() as session:
+        service = TemplateService(session)
+        return [(template.id, template.name) for template in (service.create_template(name=f"{prefix}_{i}", text=f"{prefix} {i} {{chat_id}}") for i in range(count))]
+
+
+async def _manual(size: str, templates: int, chats: int, concurrency: int) -> Result:
+    from app.bot.broadcast import send_manual_broadcast
+
+    names = [name for _, name in _create_templates(f"manual_{size}", templates)]
+    pairs = [(name, chat_id) for name in names for chat_id in range(1, chats + 1)]
+    latencies: list[float] = []
+    ok = 0
+    gate = asyncio.Semaphore(concurrency)
+
+    async def send(name: str, chat_id: int) -> None:
+        nonlocal ok
+        async with gate:
+            started = time.perf_counter()
+            try:
+                await send_manual_broadcast(template_name=name, chat_id=chat_id)
+                ok += 1
+            except Exception:  # noqa: BLE001 - 注入的故障在重试用尽后计为失败
+                pass
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(name, chat_id) for name, chat_id in pairs))
+    return _result("manual", size, latencies, ok, time.perf_counter() - started)
+
+
+async def _api(size: str, templates: int, chats: int, concurrency: int) -> Result:
+    import httpx
+
+    from app.bot.worker import DeliveryWorkerPool
+    from app.db.session import close_async_engine, session_scope
+    from app.services.deliveries import DeliveryService
+    from visualize.api import app
+
+    template_ids = [template_id for template_id, _ in _create_templates(f"api_{size}", templates)]
+    chat_ids = list(range(1, chats + 1))
+    pool = DeliveryWorkerPool(workers=2, concurrency=concurrency)
+    latencies: list[float] = []
+    job_ids: list[str] = []
+
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for template_id in template_ids:
+            request_started = time.perf_counter()
+            response = await client.post("/api/templates/send", json={"template_ids": [template_id], "chat_ids": chat_ids})
+            latencies.append(time.perf_counter() - request_started)
+            response.raise_for_status()
+            job_ids.append(response.json()["job_id"])
+    await asyncio.gather(*(pool.drain() for _ in range(pool.workers)))
+    elapsed = time.perf_counter() - started
+    await close_async_engine()
+
+    with session_scope() as session:
+        summaries = [DeliveryService(session).job_summary(job_id) for job_id in job_ids]
+    sent = sum(summary.sent for summary in summaries)
+    result = _result("api", size, latencies, sent, elapsed)
+    result.ops = templates * chats
+    result.per_second = round(result.ops / elapsed, 1)
+    return result
+
+
+def _crud(count: int) -> list[Result]:
+    from app.db.session import session_scope
+    from app.services.templates import TemplateService
+
+    names = [f"crud_{count}_{i}" for i in range(count)]
+
+    def run(operation) -> tuple[list[float], float]:
+        latencies = []
+        started = time.perf_counter()
+        for name in names:
+            op_started = time.perf_counter()
+            with session_scope() as session:
+                operation(TemplateService(session), name)
+            latencies.append(time.perf_counter() - op_started)
+        return latencies, time.perf_counter() - started
+
+    operations = {
+        "create": lambda service, name: service.create_template(name=name, text="v1"),
+        "read": lambda service, name: service.get_template(name),
+        "update": lambda service, name: service.create_template(name=name, text="v2"),
+        "delete": lambda service, name: service.delete_template(name),
+    }
+    results = []
+    for label, operation in operations.items():
+        latencies, elapsed = run(operation)
+        results.append(_result(f"crud.{label}", str(count), latencies, len(latencies), elapsed))
+    return results
+
+
+def _print(results: list[Result], baseline: dict[str, dict] | None, tolerance: float) -> list[str]:
+    regressions = []
+    print(f"{'场景':<14} {'规模':>9} {'条数':>7} {'成功':>7} {'耗时(s)':>9} {'条/秒':>10} {'p50(ms)':>9} {'p99(ms)':>9}  对比基线")
+    for result in results:
+        note = ""
+        previous = (baseline or {}).get(result.key)
+        if previous is not None:
+            speed = result.per_second / previous["per_second"] - 1
+            tail = result.p99_ms / previous["p99_ms"] - 1 if previous["p99_ms"] else 0.0
+            note = f"吞吐 {speed:+.0%}，p99 {tail:+.0%}"
+            if speed < -tolerance or tail > tolerance:
+                note += "  ← 退化"
+                regressions.append(result.key)
+        print(
+            f"{result.scenario:<14} {result.size:>9} {result.ops:>7} {result.ok:>7} {result.seconds:>9.3f}"
+            f" {result.per_second:>10.1f} {result.p50_ms:>9.2f} {result.p99_ms:>9.2f}  {note}"
+        )
+    return regressions
+
+
+async def _run(args: argparse.Namespace) -> tuple[list[Result], FakeTelegramStats]:
+    from app.bot.client import bot_client_lifespan
+    from app.bot.retry import DEFAULT_RETRY_POLICY
+    from app.db.session import init_db
+
+    defaults = (DEFAULT_RETRY_POLICY.base_delay, DEFAULT_RETRY_POLICY.retry_after_jitter)
+    DEFAULT_RETRY_POLICY.base_delay = DEFAULT_RETRY_POLICY.retry_after_jitter = args.backoff
+    results: list[Result] = []
+    server = FakeTelegramServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        flood_rate=args.flood_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    try:
+        with server, isolated_env(BOT_API_BASE_URL=server.base_url, BOT_POOL_SIZE=str(args.concurrency), BROADCAST_CONCURRENCY=str(args.concurrency)):
+            init_db()
+            async with bot_client_lifespan():
+                for size in args.sizes:
+                    templates, chats = _parse_size(size)
+                    if "manual" in args.scenarios:
+                        results.append(await _manual(size, templates, chats, args.concurrency))
+                    if "api" in args.scenarios:
+                        results.append(await _api(size, templates, chats, args.concurrency))
+            if "crud" in args.scenarios:
+                for count in args.crud_sizes:
+                    results.extend(_crud(count))
+    finally:
+        DEFAULT_RETRY_POLICY.base_delay, DEFAULT_RETRY_POLICY.retry_after_jitter = defaults
+    print(f"假服务：请求 {server.stats.requests}，注入 500 {server.stats.errors} 次、429 {server.stats.floods} 次，峰值在途 {server.stats.peak_in_flight}")
+    return results, server.stats
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="广播链路基准套件")
+    parser.add_argument("--sizes", nargs="+", default=["1x100", "10x100", "10x300"], help="模板数x chat 数")
+    parser.add_argument("--crud-sizes", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--scenarios", nargs="+", choices=["manual", "api", "crud"], default=["manual", "api", "crud"])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.005, help="假服务每次请求的基础延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="在基础延迟上叠加 0~jitter 秒的随机延迟")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="sendMessage 返回 500 的比例")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="sendMessage 返回 429 的比例")
+    parser.add_argument("--retry-after", type=float, default=0.05, help="注入的 429 携带的 retry_after（秒）")
+    parser.add_argument("--backoff", type=float, default=0.05, help="网络错误的初始退避与 429 重试抖动（秒）")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=pathlib.Path, help="把结果写入 JSON 文件")
+    parser.add_argument("--baseline", type=pathlib.Path, help="与之前 --json 保存的结果比较")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的吞吐下降 / p99 上升比例")
+    args = parser.parse_args(argv)
+
+    from loguru import logger
+
+    logger.remove()  # 逐条投递日志会干扰计时
+    baseline = None
+    if args.baseline is not None:
+        baseline = {f"{row['scenario']}@{row['size']}": row for row in json.loads(args.baseline.read_text(encoding="utf-8"))["results"]}
+    results, stats = asyncio.run(_run(args))
+    regressions = _print(results, baseline, args.tolerance)
+    if args.json is not None:
+        params = {name: value for name, value in vars(args).items() if name not in ("json", "baseline")}
+        args.json.write_text(json.dumps({"params": params, "server": asdict(stats), "results": [asdict(result) for result in results]}, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+    if regressions:
+        print(f"退化：{', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
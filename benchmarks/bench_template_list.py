@@ -0,0 +1,66 @@
+"""基准：大量模板下全量列表与游标分页的耗时对比。
+
+用法：python -m benchmarks.bench_template_list --templates 50000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import isolated_env
+
+
+def _best(func, rounds: int = 5) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="模板列表分页基准")
+    parser.add_argument("--templates", type=int, default=50_000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    with isolated_env():
+        from sqlalchemy import insert
+
+        from app.db.models import MessageTemplate
+        from app.db.session import init_db, session_scope
+        from app.services.templates import TemplateService, encode_cursor
+
+        init_db()
+        base = datetime(2030, 1, 1)
+        with session_scope() as session:
+            session.exec(
+                insert(MessageTemplate),
+                params=[
+                    {"name": f"bench_{i}", "text": "lorem ipsum " * 40, "was_sent": i % 3 == 0, "created_at": base, "updated_at": base + timedelta(seconds=i)}
+                    for i in range(args.templates)
+                ],
+            )
+            session.commit()
+
+        with session_scope() as session:
+            service = TemplateService(session)
+            deep_cursor = encode_cursor(base + timedelta(seconds=args.templates // 2), args.templates // 2 + 1)
+            cases = (
+                ("全量 list_templates", lambda: service.list_templates()),
+                ("首页（完整行）", lambda: service.list_page(limit=args.limit)),
+                ("首页（summary）", lambda: service.list_page(limit=args.limit, summary=True)),
+                ("中间页（summary）", lambda: service.list_page(limit=args.limit, cursor=deep_cursor, summary=True)),
+                ("首页（未发送筛选）", lambda: service.list_page(limit=args.limit, was_sent=False, summary=True)),
+            )
+            print(f"{args.templates} 个模板，每页 {args.limit} 条")
+            for label, func in cases:
+                elapsed = _best(func, rounds=1 if label.startswith("全量") else 5)
+                session.expunge_all()
+                print(f"{label:<16} {elapsed * 1000:>10.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
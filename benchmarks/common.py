@@ -0,0 +1,47 @@
+"""基准脚本共用的环境准备工具。"""
+from __future__ import annotations
+
+import os
+import pathlib
+import sys
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app import config  # noqa: E402
+from app.bot import rate_limit  # noqa: E402
+from app.db import session as db_session  # noqa: E402
+from app.services import deliveries as delivery_service  # noqa: E402
+from app.services import templates as template_service  # noqa: E402
+
+
+@contextmanager
+def isolated_env(**overrides: str) -> Iterator[pathlib.Path]:
+    """使用临时 SQLite 数据库与给定环境变量运行基准，结束后恢复原环境。"""
+
+    previous = dict(os.environ)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = pathlib.Path(tmpdir) / "bench.db"
+        os.environ.update({"DATABASE_URL": f"sqlite:///{db_path}", "BOT_TOKEN": "BENCH_TOKEN", "TIMEZONE": "UTC"})
+        for name in ("RATE_LIMIT_GLOBAL_INTERVAL", "RATE_LIMIT_CHAT_INTERVAL", "RATE_LIMIT_GROUP_INTERVAL"):
+            os.environ[name] = "0"  # 默认不限速，测量链路本身的开销
+        os.environ.update(overrides)
+        config.reload_settings()
+        db_session.reset_engine()
+        rate_limit.reset_rate_limiter()
+        template_service.reset_template_cache()
+        delivery_service.reset_delivery_key_cache()
+        try:
+            yield db_path
+        finally:
+            db_session.reset_engine()
+            rate_limit.reset_rate_limiter()
+            template_service.reset_template_cache()
+            delivery_service.reset_delivery_key_cache()
+            os.environ.clear()
+            os.environ.update(previous)
+            config.reload_settings()
@@ -0,0 +1,172 @@
+"""本地假 RSS 订阅源服务，用于离线基准与测试。"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from xml.sax.saxutils import escape
+
+
+def rss(title: str, items: list[tuple[str, str, str]]) -> bytes:
+    """按 (guid, 标题, 摘要) 列表生成 RSS 2.0 文档。"""
+
+    body = "".join(
+        f"<item><guid>{escape(guid)}</guid><title>{escape(item_title)}</title>"
+        f"<link>https://example.com/{escape(guid)}</link><description>{escape(summary)}</description></item>"
+        for guid, item_title, summary in items
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>{escape(title)}</title>{body}</channel></rss>'.encode()
+
+
+@dataclass
+class FakeFeedStats:
+    """记录假服务收到的请求情况。"""
+
+    requests: int = 0
+    connections: int = 0
+    ok: int = 0
+    not_modified: int = 0
+    errors: int = 0
+    paths: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class _Document:
+    body: bytes
+    etag: str
+    last_modified: str
+
+
+class FakeFeedServer:
+    """最小化的 HTTP/1.1 订阅源服务，支持 keep-alive 与延迟注入。
+
+    conditional 为真时响应带 ETag 与 Last-Modified，并对匹配的 If-None-Match / If-Modified-Since
+    返回 304；为假时模拟不支持条件请求的站点，每次都返回完整正文。fail 设置的路径返回指定状态码。
+    """
+
+    def __init__(self, *, conditional: bool = True, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.conditional = conditional
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.stats = FakeFeedStats()
+        self._documents: dict[str, _Document] = {}
+        self._failures: dict[str, int] = {}
+        self._server: asyncio.base_events.Server | None = None
+        self._handlers: set[asyncio.Task] = set()
+
+    def url(self, path: str) -> str:
+        return f"http://{self.host}:{self.port}/{path.lstrip('/')}"
+
+    def publish(self, path: str, items: list[tuple[str, str, str]], *, title: str = "feed") -> str:
+        """设置路径的内容，刷新 ETag 与 Last-Modified，返回完整地址。"""
+
+        body = rss(title, items)
+        digest = hashlib.sha1(body).hexdigest()
+        self._documents["/" + path.lstrip("/")] = _Document(body, f'"{digest}"', formatdate(usegmt=True))
+        self._failures.pop("/" + path.lstrip("/"), None)
+        return self.url(path)
+
+    def fail(self, path: str, status: int) -> str:
+        self._failures["/" + path.lstrip("/")] = status
+        return self.url(path)
+
+    async def start(self) -> "FakeFeedServer":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for task in list(self._handlers):
+                task.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "FakeFeedServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    def __enter__(self) -> "FakeFeedServer":
+        """在独立线程的事件循环中运行，避免与被测代码争用同一个循环。"""
+
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def _serve() -> None:
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=_serve, name="fake-feeds", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats.connections += 1
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers: dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                status, extra, body = self.respond(path, headers)
+                head = "".join(f"{key}: {value}\r\n" for key, value in extra.items())
+                writer.write(
+                    f"HTTP/1.1 {status}\r\n{head}Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+
+    def respond(self, path: str, headers: dict[str, str]) -> tuple[str, dict[str, str], bytes]:
+        """返回 (状态行, 额外响应头, 正文)。"""
+
+        self.stats.requests += 1
+        self.stats.paths[path] = self.stats.paths.get(path, 0) + 1
+        if path in self._failures:
+            self.stats.errors += 1
+            return f"{self._failures[path]} Error", {}, b""
+        document = self._documents.get(path)
+        if document is None:
+            self.stats.errors += 1
+            return "404 Not Found", {}, b""
+        if self.conditional:
+            validators = {"ETag": document.etag, "Last-Modified": document.last_modified}
+            if headers.get("if-none-match") == document.etag or (
+                "if-none-match" not in headers and headers.get("if-modified-since") == document.last_modified
+            ):
+                self.stats.not_modified += 1
+                return "304 Not Modified", validators, b""
+        else:
+            validators = {}
+        self.stats.ok += 1
+        return "200 OK", {"Content-Type": "application/rss+xml", **validators}, document.body
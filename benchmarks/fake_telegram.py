@@ -0,0 +1,210 @@
+"""本地假 Telegram Bot API 服务，用于离线基准与测试。"""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from urllib.parse import parse_qs
+
+
+@dataclass
+class FakeTelegramStats:
+    """记录假服务收到的请求情况。"""
+
+    requests: int = 0
+    connections: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    errors: int = 0
+    floods: int = 0
+    methods: dict[str, int] = field(default_factory=dict)
+
+
+class FakeTelegramServer:
+    """最小化的 HTTP/1.1 Bot API 服务，支持 keep-alive、延迟抖动与 sendMessage 故障注入。
+
+    error_rate 比例的 sendMessage 返回 500（客户端视为临时网络错误），flood_rate 比例返回 429 与
+    retry_after；seed 固定时注入序列可复现。push_updates 放入的更新由 getUpdates 按 offset/limit
+    返回，offset 之前的更新视为已确认并丢弃；没有更新时立即返回空列表，不模拟长轮询等待。
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        flood_rate: float = 0.0,
+        retry_after: float = 1,
+        seed: int | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self.host = host
+        self.port = port
+        self.stats = FakeTelegramStats()
+        self._server: asyncio.base_events.Server | None = None
+        self._handlers: set[asyncio.Task] = set()
+        self._message_id = 0
+        self._update_id = 0
+        self.updates: list[dict] = []
+
+    @property
+    def base_url(self) -> str:
+        """返回可直接传给 `BOT_API_BASE_URL` 的地址。"""
+
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self) -> "FakeTelegramServer":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for task in list(self._handlers):
+                task.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "FakeTelegramServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    def __enter__(self) -> "FakeTelegramServer":
+        """在独立线程的事件循环中运行，避免与被测代码争用同一个循环。"""
+
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def _serve() -> None:
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=_serve, name="fake-telegram", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats.connections += 1
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers: dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0") or 0))
+                status, payload = await self._dispatch(path, headers.get("content-type", ""), body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+
+    async def _dispatch(self, path: str, content_type: str, body: bytes) -> tuple[str, dict]:
+        method = path.rsplit("/", 1)[-1]
+        params = self._parse_params(content_type, body)
+        self.stats.requests += 1
+        self.stats.methods[method] = self.stats.methods.get(method, 0) + 1
+        self.stats.in_flight += 1
+        self.stats.peak_in_flight = max(self.stats.peak_in_flight, self.stats.in_flight)
+        try:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            if delay:
+                await asyncio.sleep(delay)
+            return self.respond(method, params)
+        finally:
+            self.stats.in_flight -= 1
+
+    @staticmethod
+    def _parse_params(content_type: str, body: bytes) -> dict:
+        if not body:
+            return {}
+        if content_type.startswith("application/json"):
+            return json.loads(body)
+        return {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+    def push_updates(self, *updates: dict) -> list[int]:
+        """追加待取的更新并分配递增的 update_id，返回分配的 ID。"""
+
+        ids = []
+        for update in updates:
+            self._update_id += 1
+            self.updates.append({**update, "update_id": self._update_id})
+            ids.append(self._update_id)
+        return ids
+
+    def respond(self, method: str, params: dict) -> tuple[str, dict]:
+        """构造 Bot API 响应，子类可覆盖以注入错误。"""
+
+        if method == "getMe":
+            return "200 OK", {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "fake", "username": "fake_bot"}}
+        if method == "sendMessage" and (self.error_rate or self.flood_rate):
+            roll = self._random.random()
+            if roll < self.flood_rate:
+                self.stats.floods += 1
+                return "429 Too Many Requests", {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }
+            if roll < self.flood_rate + self.error_rate:
+                self.stats.errors += 1
+                return "500 Internal Server Error", {"ok": False, "error_code": 500, "description": "Internal Server Error"}
+        if method == "getUpdates":
+            offset = int(params.get("offset") or 0)
+            if offset:
+                self.updates = [update for update in self.updates if update["update_id"] >= offset]
+            return "200 OK", {"ok": True, "result": self.updates[: int(params.get("limit") or 100)]}
+        if method == "sendMessage":
+            self._message_id += 1
+            chat_id = int(params.get("chat_id", 0))
+            return "200 OK", {
+                "ok": True,
+                "result": {
+                    "message_id": self._message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "group" if chat_id < 0 else "private"},
+                    "text": params.get("text", ""),
+                },
+            }
+        return "404 Not Found", {"ok": False, "error_code": 404, "description": "Not Found: method not found"}
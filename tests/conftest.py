@@ -7,7 +7,12 @@ import tempfile  # 提供临时目录上下文
 import pytest  # 引入 pytest 夹具机制
 
 from app import config  # 用于刷新配置缓存
+from app.bot import client as bot_client  # 重置进程级 Bot 客户端
+from app.bot import rate_limit  # 重置进程级限速器
+from app.bot import updates as bot_updates  # 重置 webhook 合并提交器
 from app.db import session as db_session  # 控制 SQLModel Engine 的创建与销毁
+from app.services import deliveries as delivery_service  # 重置进程级投递幂等键缓存
+from app.services import templates as template_service  # 重置进程级模板缓存
 
 
 @pytest.fixture()
@@ -19,15 +24,27 @@ def temp_env(monkeypatch: pytest.MonkeyPatch) -> None:  # 为每个测试提供
         monkeypatch.setenv("DATABASE_URL", f"sqlite:///{db_path}")  # 指定测试数据库
         monkeypatch.setenv("BOT_TOKEN", "TEST_TOKEN")  # 设置可预测的 token
         monkeypatch.setenv("TIMEZONE", "UTC")  # 固定时区
+        for name in ("RATE_LIMIT_GLOBAL_INTERVAL", "RATE_LIMIT_CHAT_INTERVAL", "RATE_LIMIT_GROUP_INTERVAL"):  # 广播测试不等待令牌
+            monkeypatch.setenv(name, "0")  # 限速器本身由 test_rate_limit 覆盖
         config.reload_settings()  # 清空并重建配置缓存
         db_session.reset_engine()  # 重建 SQLModel Engine
+        bot_client.reset_bot_client()  # 丢弃上个测试留下的 Bot 客户端
+        rate_limit.reset_rate_limiter()  # 按新配置重建限速器
+        bot_updates.reset_update_batcher()  # 合并提交器绑定事件循环，每个测试重新创建
+        template_service.reset_template_cache()  # 避免上个测试数据库中的模板残留在缓存里
+        delivery_service.reset_delivery_key_cache()  # 避免上个测试数据库中的投递键被判为重复
         yield  # 交还控制权给测试
         config.reload_settings()  # 测试结束后再次刷新配置
         db_session.reset_engine()  # 释放 Engine，避免文件锁
+        bot_client.reset_bot_client()  # 避免测试替换的 Bot 泄漏到后续测试
+        rate_limit.reset_rate_limiter()  # 清理令牌桶状态
+        bot_updates.reset_update_batcher()  # 丢弃未提交的批次
+        template_service.reset_template_cache()  # 清理模板缓存
+        delivery_service.reset_delivery_key_cache()  # 清理投递幂等键缓存
 
 
 @pytest.fixture()
 def settings(temp_env) -> config.Settings:  # 返回已经应用测试环境变量的配置
     """返回测试环境下的配置实例。"""
 
-    return config.get_settings()  # 获取缓存好的 Settings 对象
+    return config.get_settings()  # 获取缓存好的 Settings 对象
@@ -0,0 +1,31 @@
+"""基准套件冒烟测试：小规模跑通全部场景，并验证故障注入与基线比较。"""
+from __future__ import annotations
+
+import json
+import sys
+
+from loguru import logger
+
+from benchmarks import bench_suite
+
+
+def test_suite_runs_with_fault_injection_and_flags_regressions(tmp_path) -> None:
+    """注入 500 与 429 时重试后仍能发送；结果可保存为 JSON，并在超出容差时以非零状态退出。"""
+
+    output = tmp_path / "results.json"
+    common = ["--sizes", "1x20", "--crud-sizes", "5", "--latency", "0", "--concurrency", "4", "--retry-after", "0.01", "--backoff", "0.01"]
+    try:
+        assert bench_suite.main([*common, "--error-rate", "0.2", "--flood-rate", "0.1", "--json", str(output)]) == 0
+        assert bench_suite.main([*common, "--baseline", str(output), "--tolerance", "100"]) == 0
+        assert bench_suite.main([*common, "--scenarios", "crud", "--baseline", str(output), "--tolerance", "-1"]) == 1
+    finally:
+        logger.add(sys.stderr)
+
+    saved = json.loads(output.read_text(encoding="utf-8"))
+    results = {f"{row['scenario']}@{row['size']}": row for row in saved["results"]}
+    assert set(results) == {"manual@1x20", "api@1x20", "crud.create@5", "crud.read@5", "crud.update@5", "crud.delete@5"}
+    assert saved["server"]["errors"] > 0 and saved["server"]["floods"] > 0
+    assert saved["server"]["methods"]["sendMessage"] > 40
+    for key in ("manual@1x20", "api@1x20"):
+        assert results[key]["ops"] == 20 and 15 <= results[key]["ok"] <= 20
+    assert all(row["per_second"] > 0 and row["p99_ms"] >= row["p50_ms"] for row in results.values())
@@ -1,11 +1,16 @@
 """Tests for manual broadcast helper."""  # Docstring describing focus on broadcast utilities
 from __future__ import annotations  # Enable postponed annotation evaluation
 
+import threading  # Identify the thread that opens database sessions
+
 import pytest  # Use pytest markers and fixtures for async testing
+from sqlalchemy import event  # Count SQL statements issued by a batch
 
-from app.bot.broadcast import ManualBroadcastResult, send_manual_broadcast  # Import coroutine under test and result dataclass
-from app.db.session import init_db, session_scope  # Provide database helpers for fixture setup
-from app.services.templates import TemplateService  # Use TemplateService to create templates for broadcast
+from app.bot.broadcast import ManualBroadcastResult, broadcast_matrix, send_manual_broadcast  # Import coroutines under test and result dataclass
+from app.db.models import Chat  # Register chats with titles for rendering
+from app.config import get_settings  # Read the default fan-out concurrency
+from app.db.session import get_engine, init_db, session_scope  # Provide database helpers for fixture setup
+from app.services.templates import TemplateService, get_template_cache  # Use TemplateService to create templates and inspect the template cache
 
 
 @pytest.mark.asyncio()  # Mark test as asynchronous to run coroutine directly
@@ -34,15 +39,131 @@ async def test_manual_broadcast_sends_message(monkeypatch, temp_env) -> None:  #
     calls: list[tuple[int, str, str | None]] = []  # Track Bot.send_message invocations for assertion
 
     class FakeBot:  # Define lightweight stub replacing python-telegram-bot Bot class
-        def __init__(self, token: str) -> None:  # Capture token to mimic real constructor signature
+        def __init__(self, token: str, **kwargs) -> None:  # Capture token; accept pooled-client keyword arguments
             self.token = token  # Store provided token for optional debugging
 
         async def send_message(self, chat_id: int, text: str, parse_mode: str | None = None):  # Mimic async send_message behaviour
             calls.append((chat_id, text, parse_mode))  # Record call parameters for later validation
 
-    monkeypatch.setattr("app.bot.broadcast.Bot", FakeBot)  # Patch broadcast module to use FakeBot instead of real API client
+    monkeypatch.setattr("app.bot.client.Bot", FakeBot)  # Patch shared client factory to use FakeBot instead of real API client
 
     result = await send_manual_broadcast(template_name="welcome", chat_id=456, dry_run=False)  # Execute coroutine performing actual send (now patched)
 
     assert calls == [(456, "Hello ::)", "MarkdownV2")]  # Verify FakeBot captured expected call and parse mode
-    assert result.dry_run is False  # Confirm result indicates live send
+    assert result.dry_run is False  # Confirm result indicates live send
+
+
+@pytest.mark.asyncio()  # Run fan-out engine inside event loop
+async def test_broadcast_matrix_reports_each_pair(monkeypatch, temp_env) -> None:  # Verify matrix fan-out returns per-(template, chat) outcomes
+    """Fan-out should send every template to every chat and keep input order."""  # Docstring summarising matrix behaviour
+
+    init_db()  # Bootstrap schema before template creation
+    with session_scope() as session:  # Create templates used by the batch
+        service = TemplateService(session)  # Instantiate template service
+        service.create_template(name="a", text="A")  # First template
+        service.create_template(name="b", text="B", parse_mode="HTML")  # Second template with HTML parse mode
+
+    calls: list[tuple[int, str, str | None]] = []  # Track Bot.send_message invocations
+
+    class FakeBot:  # Stub accepting the pooled-client constructor arguments
+        def __init__(self, token: str, **kwargs) -> None:  # Accept base_url/request keyword arguments
+            self.token = token  # Store token for optional debugging
+
+        async def send_message(self, chat_id: int, text: str, parse_mode: str | None = None):  # Mimic async send_message
+            if chat_id == 3:  # Simulate a failing chat
+                raise RuntimeError("boom")  # Raise to exercise per-outcome error capture
+            calls.append((chat_id, text, parse_mode))  # Record call parameters
+
+    monkeypatch.setattr("app.bot.client.Bot", FakeBot)  # Patch shared client factory to use FakeBot
+
+    outcomes = await broadcast_matrix(["a", "b", "missing"], [1, 2, 3], concurrency=4)  # Execute 3 × 3 matrix
+
+    assert [(o.template_name, o.chat_id) for o in outcomes] == [(t, c) for t in ("a", "b", "missing") for c in (1, 2, 3)]  # Outcomes keep input order
+    assert sorted(calls) == sorted([(c, "A", "MarkdownV2") for c in (1, 2)] + [(c, "B", "HTML") for c in (1, 2)])  # Every healthy pair sent once
+    failed = {(o.template_name, o.chat_id): o.error for o in outcomes if not o.ok}  # Collect failures
+    assert set(failed) == {("a", 3), ("b", 3), ("missing", 1), ("missing", 2), ("missing", 3)}  # Failing chat and missing template reported
+    assert "boom" in failed[("a", 3)]  # Error text propagated from Bot
+
+
+@pytest.mark.asyncio()  # Run dry-run batch inside event loop
+async def test_broadcast_matrix_dry_run_skips_network(monkeypatch, temp_env) -> None:  # Ensure dry-run batch never builds a Bot
+    """Dry-run batches should preview text without constructing Bot clients."""  # Docstring clarifying expectation
+
+    init_db()  # Prepare schema
+    with session_scope() as session:  # Insert template
+        TemplateService(session).create_template(name="welcome", text="Hello")  # Template used for preview
+
+    def fail_bot(*args, **kwargs):  # Any Bot construction is a test failure
+        raise AssertionError("dry-run must not create Bot")  # Guard against network usage
+
+    monkeypatch.setattr("app.bot.client.Bot", fail_bot)  # Patch Bot factory
+
+    outcomes = await broadcast_matrix(["welcome"], [1, 2], dry_run=True)  # Execute dry-run batch
+
+    assert all(o.ok and o.dry_run and o.text == "Hello" for o in outcomes)  # Every pair previewed
+
+
+@pytest.mark.asyncio()  # Run large dry-run batch inside event loop
+async def test_broadcast_matrix_resolves_template_once(temp_env) -> None:  # Ensure the process-wide template cache absorbs repeated lookups
+    """A 1000-chat batch should hit the database once for its template."""  # Docstring clarifying expectation
+
+    init_db()  # Prepare schema
+    with session_scope() as session:  # Insert template
+        TemplateService(session).create_template(name="welcome", text="Hello")  # Template shared by every chat
+
+    statements: list[str] = []  # Capture SQL issued during the batch
+    event.listen(get_engine(), "before_cursor_execute", lambda *args: statements.append(args[2]))  # Record every statement
+    outcomes = await broadcast_matrix(["welcome"], list(range(1000)), dry_run=True)  # Execute 1 × 1000 batch
+
+    stats = get_template_cache().stats()  # Read cache counters
+    assert len(outcomes) == 1000 and all(o.ok for o in outcomes)  # Every pair previewed
+    assert stats.misses == 1 and sum("FROM messagetemplate" in sql for sql in statements) == 1  # Workers that missed while the lookup ran share it
+    assert stats.hits >= 999 - get_settings().broadcast_concurrency  # Everyone else is served from cache
+
+
+@pytest.mark.asyncio()  # Run personalised dry-run batch inside event loop
+async def test_broadcast_matrix_renders_chat_variables(temp_env) -> None:  # Ensure per-chat variables are substituted and escaped
+    """Templates with placeholders should render per-chat titles with MarkdownV2 escaping."""  # Docstring clarifying expectation
+
+    init_db()  # Prepare schema
+    with session_scope() as session:  # Insert template and a known chat
+        TemplateService(session).create_template(name="hello", text="Hi {{ chat_title }} #{{ index }}")  # Template with placeholders
+        session.add(Chat(chat_id=-100, type="supergroup", title="Dev.Team"))  # Chat whose title needs escaping
+        session.commit()  # Persist chat row
+
+    outcomes = await broadcast_matrix(["hello"], [-100, 7], dry_run=True)  # Render for a known and an unknown chat
+
+    assert [o.text for o in outcomes] == ["Hi Dev\\.Team #1", "Hi 7 #2"]  # Title escaped; unknown chat falls back to its ID
+
+
+@pytest.mark.asyncio()  # Run fan-out engine inside event loop
+async def test_broadcast_keeps_database_access_off_the_event_loop(monkeypatch, temp_env) -> None:  # Worker batches share the API's event loop
+    """Template lookups, chat loading and write-backs should run in worker threads, not on the event loop."""  # Docstring clarifying expectation
+
+    init_db()  # Prepare schema
+    with session_scope() as session:  # Insert template and a known chat
+        TemplateService(session).create_template(name="hello", text="Hi {{ chat_title }}")  # Template with placeholders
+        session.add(Chat(chat_id=-100, type="group", title="Team"))  # Chat loaded for rendering
+        session.commit()  # Persist chat row
+
+    class FakeBot:  # Minimal Telegram stub
+        def __init__(self, token: str, **kwargs) -> None:  # Accept pooled-client keyword arguments
+            self.token = token  # Store token
+
+        async def send_message(self, chat_id: int, text: str, parse_mode: str | None = None):  # Always succeed
+            return None
+
+    import app.bot.broadcast as broadcast  # Patch the module-level session factory
+    threads: list[bool] = []  # Whether each session was opened on the event-loop thread
+    scope = broadcast.session_scope  # Original factory
+
+    def tracking_scope():  # Record the calling thread
+        threads.append(threading.current_thread() is threading.main_thread())
+        return scope()
+
+    monkeypatch.setattr("app.bot.client.Bot", FakeBot)  # Avoid real network calls
+    monkeypatch.setattr(broadcast, "session_scope", tracking_scope)  # Observe every session opened by the engine
+    outcomes = await broadcast_matrix(["hello"], [-100, 7])  # Cache miss, chat load and attempt write-back
+
+    assert all(o.ok for o in outcomes)  # Both chats sent
+    assert threads and not any(threads)  # Every session ran in a worker thread
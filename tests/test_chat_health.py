@@ -0,0 +1,157 @@
+"""发送失败时 chat 的自动停用、迁移与失败计数测试。"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import event
+from sqlmodel import select
+from telegram.error import BadRequest, ChatMigrated, Forbidden, NetworkError
+
+from app.bot.broadcast import ChatSkippedError, broadcast_matrix, send_manual_broadcast
+from app.bot.retry import RetryPolicy
+from app.config import reload_settings
+from app.db.models import Chat
+from app.db.session import close_async_engine, get_engine, init_db, session_scope
+from app.services.chats import chat_skip_reason
+from app.services.templates import TemplateService
+
+NO_RETRY_DELAY = RetryPolicy(max_retries=1, base_delay=0.0)
+
+
+def _setup(*chat_ids: int) -> None:
+    init_db()
+    with session_scope() as session:
+        TemplateService(session).create_template(name="t", text="hi")
+        for chat_id in chat_ids:
+            session.add(Chat(chat_id=chat_id, type="group", title=f"g{chat_id}"))
+        session.commit()
+
+
+def _fake_bot(monkeypatch, errors: dict[int, BaseException]) -> list[int]:
+    calls: list[int] = []
+
+    class FakeBot:
+        def __init__(self, token: str, **kwargs) -> None:
+            self.token = token
+
+        async def send_message(self, chat_id: int, text: str, parse_mode: str | None = None):
+            calls.append(chat_id)
+            if chat_id in errors:
+                raise errors[chat_id]
+
+    monkeypatch.setattr("app.bot.client.Bot", FakeBot)
+    return calls
+
+
+def _rows() -> dict[int, Chat]:
+    with session_scope() as session:
+        return {chat.chat_id: chat for chat in session.exec(select(Chat)).all()}
+
+
+async def test_broadcast_deactivates_gone_chats_and_follows_migration(monkeypatch, temp_env) -> None:
+    """Forbidden 与 chat not found 停用 chat，ChatMigrated 改写记录并向新 ID 重发；状态变化按类别批量写回。"""
+
+    _setup(-1, -2, -3, -4, -5)
+    calls = _fake_bot(
+        monkeypatch,
+        {-1: Forbidden("bot was kicked from the group chat"), -2: BadRequest("Chat not found"), -3: ChatMigrated(-1003)},
+    )
+    statements: list[str] = []
+    event.listen(get_engine(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    outcomes = await broadcast_matrix(["t"], [-1, -2, -3, -4], retry_policy=NO_RETRY_DELAY)
+
+    assert [(o.chat_id, o.ok) for o in outcomes] == [(-1, False), (-2, False), (-1003, True), (-4, True)]
+    assert sorted(calls) == [-1003, -4, -3, -2, -1]
+    assert sum(statement.startswith("UPDATE chat") for statement in statements) == 2
+    rows = _rows()
+    assert not rows[-1].is_active and "kicked" in rows[-1].last_error
+    assert not rows[-2].is_active
+    assert -3 not in rows and (rows[-1003].type, rows[-1003].title, rows[-1003].is_active) == ("supergroup", "g-3", True)
+
+    calls.clear()
+    outcomes = await broadcast_matrix(["t"], [-1, -2, -1003, -4])
+    assert sorted(calls) == [-1003, -4]
+    assert [o.error.startswith("chat 已停用") for o in outcomes if not o.ok] == [True, True]
+
+
+async def test_repeated_failures_skip_chat_until_cooldown_and_success_resets(monkeypatch, temp_env) -> None:
+    """重试用尽的网络错误累计失败分数，达到阈值后在冷却期内跳过；冷却结束后发送成功即清零。"""
+
+    monkeypatch.setenv("CHAT_FAILURE_THRESHOLD", "2")
+    reload_settings()
+    _setup(-1, -2)
+    errors: dict[int, BaseException] = {-1: NetworkError("connection reset")}
+    calls = _fake_bot(monkeypatch, errors)
+
+    for _ in range(2):
+        await broadcast_matrix(["t"], [-1, -2], retry_policy=NO_RETRY_DELAY)
+    assert calls.count(-1) == 4
+    rows = _rows()
+    assert (rows[-1].failure_score, rows[-1].is_active, rows[-2].failure_score) == (2, True, 0)
+
+    calls.clear()
+    outcomes = await broadcast_matrix(["t"], [-1, -2], retry_policy=NO_RETRY_DELAY)
+    assert calls == [-2]
+    assert "连续失败 2 次" in outcomes[0].error
+
+    with session_scope() as session:
+        chat = session.get(Chat, -1)
+        chat.last_failure_at = datetime.utcnow() - timedelta(hours=2)
+        session.add(chat)
+        session.commit()
+    errors.clear()
+    outcomes = await broadcast_matrix(["t"], [-1])
+    assert outcomes[0].ok
+    assert (_rows()[-1].failure_score, _rows()[-1].last_failure_at) == (0, None)
+
+
+async def test_manual_send_shares_skip_migration_and_health_handling(monkeypatch, temp_env) -> None:
+    """单条发送与批量发送一样：失效时停用，停用后跳过不再请求 Telegram，群组迁移后向新 ID 重发。"""
+
+    _setup(-1, -3)
+    calls = _fake_bot(monkeypatch, {-1: Forbidden("bot was blocked by the user"), -3: ChatMigrated(-1003)})
+    with pytest.raises(Forbidden):
+        await send_manual_broadcast(template_name="t", chat_id=-1)
+    assert _rows()[-1].is_active is False
+    with pytest.raises(ChatSkippedError):
+        await send_manual_broadcast(template_name="t", chat_id=-1)
+    assert calls == [-1]
+
+    result = await send_manual_broadcast(template_name="t", chat_id=-3)
+    assert (result.chat_id, calls[1:]) == (-1003, [-3, -1003])
+    assert -1003 in _rows() and -3 not in _rows()
+
+
+async def test_chats_api_reports_failure_score_and_skip_reason(temp_env) -> None:
+    """/api/chats 默认只列出活跃 chat，附带失败计数与跳过原因。"""
+
+    _setup(-1)
+    with session_scope() as session:
+        session.add(Chat(chat_id=-2, type="group", title="flaky", failure_score=9, last_failure_at=datetime.utcnow(), last_error="TimedOut"))
+        session.add(Chat(chat_id=-3, type="group", title="gone", is_active=False, last_error="Forbidden"))
+        session.commit()
+    from visualize.api import app
+
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            active = (await client.get("/api/chats")).json()
+            everything = (await client.get("/api/chats", params={"include_inactive": True})).json()
+    finally:
+        await close_async_engine()
+
+    assert sorted((chat["chat_id"], chat["failure_score"], chat["skip_reason"] is None) for chat in active) == [(-2, 9, False), (-1, 0, True)]
+    assert {chat["chat_id"]: chat["skip_reason"] for chat in everything}[-3] == "chat 已停用：Forbidden"
+
+
+def test_skip_reason_respects_threshold_and_cooldown() -> None:
+    """未达阈值、冷却期已过或阈值为 0 时不跳过。"""
+
+    now = datetime(2024, 1, 1, 12)
+    hour = timedelta(hours=1)
+    assert chat_skip_reason(True, 4, now, "x", threshold=5, cooldown=hour, now=now) is None
+    assert chat_skip_reason(True, 5, now - 2 * hour, "x", threshold=5, cooldown=hour, now=now) is None
+    assert chat_skip_reason(True, 5, now, "x", threshold=0, cooldown=hour, now=now) is None
+    assert chat_skip_reason(True, 5, now, "x", threshold=5, cooldown=hour, now=now) == "chat 连续失败 5 次，暂停发送至 2024-01-01 13:00:00 UTC"
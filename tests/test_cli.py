@@ -0,0 +1,70 @@
+"""命令行批量广播测试。"""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.bot.main import build_parser, run_command
+from app.db.models import Chat
+from app.db.session import init_db, session_scope
+from app.services.templates import TemplateService
+
+
+def _broadcast(*argv: str) -> None:
+    parser = build_parser()
+    run_command(parser, parser.parse_args(["broadcast", *argv]))
+
+
+@pytest.fixture()
+def templates(temp_env) -> None:
+    init_db()
+    with session_scope() as session:
+        service = TemplateService(session)
+        service.create_template(name="a", text="A {{ chat_id }}")
+        service.create_template(name="b", text="B")
+        session.add_all([Chat(chat_id=5, title="five"), Chat(chat_id=6, is_active=False), Chat(chat_id=7)])
+        session.commit()
+
+
+def test_dry_run_renders_every_template_for_every_chat_source(templates, tmp_path, capsys) -> None:
+    """多个模板 × (--chat-id、chat 文件、全部活跃 chat) 去重后逐条渲染，并输出汇总。"""
+
+    chat_file = tmp_path / "chats.txt"
+    chat_file.write_text("# 目标\n1\n\n2  # 重复的会被合并\n5\n", encoding="utf-8")
+
+    _broadcast("--template", "a", "b", "--chat-id", "1", "--chat-file", str(chat_file), "--all-chats", "--dry-run", "--quiet")
+
+    output = capsys.readouterr().out
+    assert output.strip() == "[dry-run] 共 8 条消息（2 个模板，4 个 chat）：可发送 8，失败 0，合计 16 字符。"
+
+
+def test_manifest_rows_are_streamed_and_failures_exit_non_zero(templates, tmp_path, capsys) -> None:
+    """CSV 与 JSONL 清单逐行执行；缺失模板与坏行计为失败，坏行之前的任务照常完成。"""
+
+    csv_manifest = tmp_path / "jobs.csv"
+    csv_manifest.write_text("template,chat_id,text\na,1,\nb,2,custom\nmissing,3,\n", encoding="utf-8")
+    with pytest.raises(SystemExit) as exc:
+        _broadcast("--manifest", str(csv_manifest), "--dry-run")
+    output = capsys.readouterr().out
+    assert exc.value.code == 1
+    assert "将向 1 发送模板 'a':\nA 1" in output and "将向 2 发送模板 'b':\ncustom" in output
+    assert "向 3 发送模板 'missing' 失败" in output
+
+    jsonl_manifest = tmp_path / "jobs.jsonl"
+    rows = [{"template": "a", "chat_id": 1}, {"template": "b", "chat_id": "2"}]
+    jsonl_manifest.write_text("\n".join(json.dumps(row) for row in rows) + "\n\n[1]\n", encoding="utf-8")
+    with pytest.raises(SystemExit):
+        _broadcast("--manifest", str(jsonl_manifest), "--dry-run", "--quiet")
+    output = capsys.readouterr().out
+    assert f"{jsonl_manifest}:4: 每行必须是 JSON 对象" in output
+    assert "共 2 条消息（2 个模板，2 个 chat）：可发送 2，失败 0" in output
+
+
+def test_broadcast_requires_a_target(templates, capsys) -> None:
+    """只给模板不给 chat 时在发送前报错。"""
+
+    with pytest.raises(SystemExit) as exc:
+        _broadcast("--template", "a")
+    assert exc.value.code == 2
+    assert "至少一个 --template" in capsys.readouterr().err
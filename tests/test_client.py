@@ -0,0 +1,43 @@
+"""共享 Bot 客户端测试。"""
+from __future__ import annotations
+
+from app import config
+from app.bot.client import close_bot_client, get_bot_client, resolve_http_version, shard_sizes
+
+
+def test_bot_client_is_reused_until_settings_change(temp_env, monkeypatch) -> None:
+    """同一配置下复用管理器，token 变化后重建。"""
+
+    first = get_bot_client()
+    assert get_bot_client() is first
+
+    monkeypatch.setenv("BOT_TOKEN", "OTHER_TOKEN")
+    config.reload_settings()
+    assert get_bot_client() is not first
+
+
+def test_bot_client_shards_http11_pool(temp_env, monkeypatch) -> None:
+    """HTTP/1.1 下按每 8 个连接拆分连接池，并轮询分配。"""
+
+    monkeypatch.setenv("BOT_POOL_SIZE", "20")
+    config.reload_settings()
+    manager = get_bot_client()
+    assert manager.http_version == "1.1"
+    assert manager.size == 3
+    assert len({id(manager.bot()) for _ in range(6)}) == 3
+    assert (shard_sizes(20), shard_sizes(8), shard_sizes(0)) == ([8, 8, 4], [8], [1])
+
+
+def test_resolve_http_version() -> None:
+    """auto 模式不对明文地址启用 HTTP/2。"""
+
+    assert resolve_http_version("auto", "http://127.0.0.1:8081/bot") == "1.1"
+    assert resolve_http_version("2", "http://127.0.0.1:8081/bot") == "2"
+
+
+async def test_close_bot_client_drops_manager(temp_env) -> None:
+    """关闭后再次获取会得到新的管理器。"""
+
+    first = get_bot_client()
+    await close_bot_client()
+    assert get_bot_client() is not first
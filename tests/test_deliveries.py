@@ -0,0 +1,202 @@
+"""投递队列与 worker 池测试。"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import select
+
+from app.bot.worker import DeliveryWorkerPool
+from app.db.models import Delivery, MessageTemplate, SendAttempt
+from app.db.session import get_engine, init_db, session_scope
+from app.services.deliveries import FAILED, PENDING, SENDING, SENT, DeliveryResult, DeliveryService, get_delivery_key_cache
+from app.services.templates import TemplateNotFoundError, TemplateService
+
+
+def _create_templates(*names: str) -> list[int]:
+    with session_scope() as session:
+        service = TemplateService(session)
+        return [service.create_template(name=name, text=name.upper()).id for name in names]
+
+
+def test_enqueue_creates_one_row_per_pair(temp_env) -> None:
+    """入队应为每个 (模板, chat) 组合写入一条待发送记录，并记录模板版本。"""
+
+    init_db()
+    ids = _create_templates("a", "b")
+    with session_scope() as session:
+        job_id, queued = DeliveryService(session).enqueue(ids, [1, 2, 3])
+        rows = session.exec(select(Delivery).where(Delivery.job_id == job_id)).all()
+
+    assert queued == 6
+    assert sorted((row.template_id, row.chat_id) for row in rows) == sorted((t, c) for t in ids for c in (1, 2, 3))
+    assert {row.status for row in rows} == {PENDING}
+    assert {row.template_version for row in rows} == {1}
+
+
+def test_enqueue_rejects_missing_template(temp_env) -> None:
+    """存在未知模板 ID 时不应写入任何记录。"""
+
+    init_db()
+    ids = _create_templates("a")
+    with session_scope() as session:
+        service = DeliveryService(session)
+        with pytest.raises(TemplateNotFoundError):
+            service.enqueue([ids[0], 999], [1])
+        assert session.exec(select(Delivery)).all() == []
+
+
+def test_claim_complete_and_summary(temp_env) -> None:
+    """领取的记录不会被重复领取，回写后汇总反映最终状态。"""
+
+    init_db()
+    ids = _create_templates("a")
+    with session_scope() as session:
+        service = DeliveryService(session)
+        job_id, _ = service.enqueue(ids, [1, 2, 3])
+
+        first = service.claim_batch(2)
+        second = service.claim_batch(2)
+        assert [row.chat_id for row in first] == [1, 2]
+        assert [row.chat_id for row in second] == [3]
+        assert service.claim_batch(2) == []
+
+        sent_templates = service.complete_batch(
+            [
+                DeliveryResult(delivery_id=first[0].delivery_id, ok=True, attempts=1),
+                DeliveryResult(delivery_id=first[1].delivery_id, ok=False, attempts=3, error="boom"),
+            ]
+        )
+        assert sent_templates == ids
+
+        summary = service.job_summary(job_id)
+        assert (summary.sent, summary.failed, summary.sending, summary.done) == (1, 1, 1, False)
+        failed = service.list_failed(job_id)
+        assert [(row.chat_id, row.error, row.attempts) for row in failed] == [(2, "boom", 3)]
+
+
+def test_release_expired_only_requeues_rows_past_their_lease(temp_env) -> None:
+    """只回收租约已过期的 sending 记录；续期中的记录无论领取多久都保留给领取方。"""
+
+    init_db()
+    ids = _create_templates("a")
+    with session_scope() as session:
+        service = DeliveryService(session)
+        service.enqueue(ids, [1, 2])
+        claimed = service.claim_batch(10, owner="api", lease=timedelta(minutes=5))
+        for row in session.exec(select(Delivery)).all():
+            row.updated_at = datetime.utcnow() - timedelta(hours=1)
+            session.add(row)
+        session.commit()
+
+        assert service.release_expired() == 0
+        assert service.renew_leases([row.delivery_id for row in claimed], "other", timedelta(minutes=5)) == 0
+        assert service.renew_leases([claimed[0].delivery_id], "api", timedelta(minutes=5)) == 1
+
+        expired = session.get(Delivery, claimed[1].delivery_id)
+        expired.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+        session.add(expired)
+        session.commit()
+        assert service.release_expired() == 1
+        again = service.claim_batch(10, owner="worker")
+        assert [item.delivery_id for item in again] == [claimed[1].delivery_id]
+        assert session.get(Delivery, claimed[1].delivery_id).claimed_by == "worker"
+
+
+@pytest.mark.asyncio()
+async def test_worker_pool_drains_queue(monkeypatch, temp_env) -> None:
+    """worker 池应发送全部记录、批量回写状态并标记模板已发送。"""
+
+    init_db()
+    ids = _create_templates("a", "b")
+    with session_scope() as session:
+        job_id, _ = DeliveryService(session).enqueue(ids, [1, 2, 3])
+
+    calls: list[tuple[int, str]] = []
+
+    class FakeBot:
+        def __init__(self, token: str, **kwargs) -> None:
+            self.token = token
+
+        async def send_message(self, chat_id: int, text: str, parse_mode: str | None = None):
+            if chat_id == 3:
+                raise RuntimeError("boom")
+            calls.append((chat_id, text))
+
+    monkeypatch.setattr("app.bot.client.Bot", FakeBot)
+
+    processed = await DeliveryWorkerPool(batch_size=4, concurrency=2).drain()
+
+    assert processed == 6
+    assert sorted(calls) == sorted((c, t) for t in ("A", "B") for c in (1, 2))
+    with session_scope() as session:
+        summary = DeliveryService(session).job_summary(job_id)
+        assert (summary.sent, summary.failed, summary.done) == (4, 2, True)
+        statuses = {row.status for row in session.exec(select(Delivery)).all()}
+        assert SENDING not in statuses and statuses == {SENT, FAILED}
+        templates = session.exec(select(MessageTemplate)).all()
+        assert all(tpl.was_sent for tpl in templates)
+        attempts = session.exec(select(SendAttempt)).all()
+        deliveries = {row.id: row for row in session.exec(select(Delivery)).all()}
+    assert len(attempts) == 6
+    assert all(deliveries[row.delivery_id].chat_id == row.chat_id for row in attempts)
+    assert {(row.chat_id, row.ok, row.error) for row in attempts if not row.ok} == {(3, False, "RuntimeError: boom")}
+
+
+def test_enqueue_skips_keys_already_queued_or_sent(temp_env) -> None:
+    """同一版本模板对同一 chat 只入队一次；新的请求 ID 或新版本才会再次入队。"""
+
+    init_db()
+    ids = _create_templates("a")
+    with session_scope() as session:
+        service = DeliveryService(session)
+        assert service.enqueue(ids, [1, 2])[1] == 2
+        assert service.enqueue(ids, [1, 2, 2, 3])[1] == 1
+        assert service.enqueue(ids, [1], request_id="resend")[1] == 1
+        assert service.enqueue(ids, [1], request_id="resend")[1] == 0
+        TemplateService(session).create_template("a", text="v2")
+        assert service.enqueue(ids, [1, 2, 3])[1] == 3
+        keys = session.exec(select(Delivery.template_version, Delivery.chat_id, Delivery.request_id)).all()
+
+    assert len(keys) == len(set(keys)) == 7
+
+
+def test_duplicate_check_hits_key_cache_before_database(temp_env) -> None:
+    """刚入队的键由进程内缓存判定为重复，不再查询投递表；缓存清空后由唯一索引查询兜底。"""
+
+    init_db()
+    ids = _create_templates("a")
+    with session_scope() as session:
+        DeliveryService(session).enqueue(ids, [1, 2])
+    statements: list[str] = []
+    event.listen(get_engine(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    with session_scope() as session:
+        assert DeliveryService(session).enqueue(ids, [1, 2])[1] == 0
+    assert not any("FROM delivery" in statement for statement in statements)
+
+    get_delivery_key_cache().clear()
+    with session_scope() as session:
+        assert DeliveryService(session).enqueue(ids, [1, 2])[1] == 0
+    assert any("FROM delivery" in statement for statement in statements)
+
+
+def test_failed_keys_are_requeued(temp_env) -> None:
+    """发送失败的键再次提交时移入新批次重新投递，而不是新增一行。"""
+
+    init_db()
+    ids = _create_templates("a")
+    with session_scope() as session:
+        service = DeliveryService(session)
+        first_job, _ = service.enqueue(ids, [1, 2])
+        claimed = service.claim_batch(10)
+        service.complete_batch(
+            DeliveryResult(item.delivery_id, ok=item.chat_id == 1, attempts=1, error=None if item.chat_id == 1 else "boom")
+            for item in claimed
+        )
+        job_id, queued = service.enqueue(ids, [1, 2])
+        rows = session.exec(select(Delivery)).all()
+
+    assert queued == 1 and job_id != first_job
+    assert len(rows) == 2
+    assert {(row.chat_id, row.job_id, row.status) for row in rows} == {(1, first_job, SENT), (2, job_id, PENDING)}
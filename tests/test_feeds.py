@@ -0,0 +1,147 @@
+"""RSS 订阅源轮询与模板生成测试。"""
+from __future__ import annotations
+
+import time
+
+import httpx
+import pytest
+from sqlalchemy import event
+from sqlmodel import select
+
+from app.bot.feeds import FeedPoller, stop_feed_poller
+from app.db.models import Feed, FeedEntry, MessageTemplate
+from app.db.session import close_async_engine, get_engine, init_db, session_scope
+from app.services.feeds import FeedError, FeedService, parse_items
+from benchmarks.fake_feeds import FakeFeedServer, rss
+
+
+def _items(prefix: str, count: int) -> list[tuple[str, str, str]]:
+    return [(f"{prefix}-{index}", f"{prefix} title {index}", f"<p>{prefix} summary &amp; {index}</p>") for index in range(count)]
+
+
+def _add_feed(url: str, name: str, **options) -> int:
+    with session_scope() as session:
+        return FeedService(session).create_feed(url, name, **options).id
+
+
+def _templates() -> dict[str, str]:
+    with session_scope() as session:
+        return {template.name: template.text for template in session.exec(select(MessageTemplate)).all()}
+
+
+def test_parse_items_strips_markup_and_falls_back_to_link() -> None:
+    """摘要去掉标签与实体；没有 guid 的条目按链接去重。"""
+
+    items = parse_items(rss("t", [("a", "A & B", "<p>x &amp; <i>y</i></p>")]))
+    assert (items[0].title, items[0].summary) == ("A & B", "x & y")
+    without_guid = b'<rss version="2.0"><channel><item><title>t</title><link>https://e.com/1</link></item></channel></rss>'
+    assert parse_items(without_guid)[0].guid_hash == parse_items(without_guid)[0].guid_hash != items[0].guid_hash
+    with pytest.raises(FeedError):
+        parse_items(b"\x00not a feed")
+
+
+async def test_poll_creates_templates_once_and_skips_unchanged_feeds(temp_env) -> None:
+    """首轮按筛选规则生成模板；再次轮询时源返回 304，不解析也不写模板；新增条目只生成一次。"""
+
+    init_db()
+    with FakeFeedServer() as server:
+        news = _add_feed(server.publish("news.xml", _items("news", 3) + [("ad", "Sponsored", "buy")]), "news", exclude="sponsored")
+        _add_feed(server.publish("py.xml", _items("py", 2) + _items("go", 2)), "py", include="PY", parse_mode="MarkdownV2")
+        broken = _add_feed(server.fail("down.xml", 503), "down")
+        poller = FeedPoller()
+        try:
+            first = await poller.run_once()
+            assert (first.feeds, first.modified, first.failed, first.created, first.filtered) == (3, 2, 1, 5, 3)
+            templates = _templates()
+            assert len(templates) == 5
+            assert any(text.startswith("<b>news title 0</b>\nnews summary &amp; 0\nhttps://example.com/news-0") for text in templates.values())
+            assert any(text.startswith("*py title 1*\npy summary & 1\nhttps://example\\.com/py\\-1") for text in templates.values())
+
+            statements: list[str] = []
+            event.listen(get_engine(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+            second = await poller.run_once()
+            assert (second.not_modified, second.failed, second.created) == (2, 1, 0)
+            assert server.stats.not_modified == 2
+            assert not any(statement.startswith(("INSERT", "SELECT feedentry")) for statement in statements)
+
+            server.publish("news.xml", _items("news", 4) + [("ad", "Sponsored", "buy")])
+            third = await poller.run_once([news, broken])
+            assert (third.feeds, third.modified, third.created, third.duplicates) == (2, 1, 1, 4)
+        finally:
+            await poller.stop()
+
+    assert len(_templates()) == 6
+    with session_scope() as session:
+        assert len(session.exec(select(FeedEntry)).all()) == 9
+        feeds = {feed.name: feed for feed in session.exec(select(Feed)).all()}
+    assert feeds["news"].etag and feeds["news"].last_modified and feeds["news"].last_status == 200
+    assert (feeds["down"].last_status, feeds["down"].last_error) == (503, "HTTP 503")
+
+
+async def test_feed_without_validators_is_skipped_by_content_hash(temp_env) -> None:
+    """不支持条件请求的源每次返回正文，内容未变时不解析、不生成模板。"""
+
+    init_db()
+    with FakeFeedServer(conditional=False) as server:
+        _add_feed(server.publish("plain.xml", _items("plain", 2)), "plain")
+        poller = FeedPoller()
+        try:
+            assert (await poller.run_once()).created == 2
+            assert (await poller.run_once()).not_modified == 1
+        finally:
+            await poller.stop()
+    assert server.stats.ok == 2 and server.stats.not_modified == 0
+
+
+async def test_polls_hundreds_of_feeds_concurrently(temp_env) -> None:
+    """数百个源在共享连接池上并发抓取，整轮结果一次写回；重新轮询几乎没有开销。"""
+
+    init_db()
+    with FakeFeedServer(latency=0.02) as server:
+        with session_scope() as session:
+            service = FeedService(session)
+            for index in range(300):
+                service.create_feed(server.publish(f"f{index}.xml", _items(f"f{index}", 5)), f"f{index}")
+        poller = FeedPoller(concurrency=32)
+        try:
+            started = time.perf_counter()
+            first = await poller.run_once()
+            elapsed = time.perf_counter() - started
+            started = time.perf_counter()
+            second = await poller.run_once()
+            repoll = time.perf_counter() - started
+        finally:
+            await poller.stop()
+
+    assert (first.modified, first.created) == (300, 1500)
+    assert second.not_modified == 300
+    assert server.stats.connections < server.stats.requests / 5
+    assert elapsed < 300 * 0.02
+    assert repoll < elapsed
+
+
+async def test_feed_api_validates_and_polls(temp_env) -> None:
+    """API 拒绝非 http(s) 地址与重复的源，手动触发一轮轮询。"""
+
+    init_db()
+    from visualize.api import app
+
+    with FakeFeedServer() as server:
+        url = server.publish("api.xml", _items("api", 2))
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                created = await client.post("/api/feeds", json={"url": url, "name": "api"})
+                duplicate = await client.post("/api/feeds", json={"url": url, "name": "other"})
+                invalid = await client.post("/api/feeds", json={"url": "ftp://example.com/x", "name": "ftp"})
+                polled = await client.post("/api/feeds/poll")
+                feeds = (await client.get("/api/feeds")).json()
+                deleted = await client.delete(f"/api/feeds/{created.json()['id']}")
+        finally:
+            await stop_feed_poller()
+            await close_async_engine()
+
+    assert created.status_code == 201
+    assert (duplicate.status_code, invalid.status_code) == (400, 400)
+    assert polled.json()["created"] == 2 and len(polled.json()["template_ids"]) == 2
+    assert feeds[0]["last_status"] == 200
+    assert deleted.status_code == 204
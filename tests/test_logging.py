@@ -0,0 +1,97 @@
+"""结构化日志与关联 ID 测试。"""
+from __future__ import annotations
+
+import io
+import json
+import sys
+
+import httpx
+import pytest
+from loguru import logger
+
+from app.bot.worker import DeliveryWorkerPool
+from app.config import get_settings
+from app.db.session import close_async_engine, init_db, session_scope
+from app.log import configure_logging, flush_logging, shutdown_logging
+from app.services.deliveries import DeliveryService
+from app.services.templates import TemplateService
+
+
+class FakeBot:
+    def __init__(self, token: str, **kwargs) -> None:
+        self.token = token
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str | None = None):
+        if chat_id == 3:
+            raise RuntimeError("boom")
+
+
+@pytest.fixture()
+def log_lines(temp_env):
+    buffer = io.StringIO()
+    configure_logging(get_settings(), sink=buffer)
+
+    def read() -> list[dict]:
+        flush_logging()
+        return [json.loads(line) for line in buffer.getvalue().splitlines()]
+
+    yield read
+    shutdown_logging()
+    logger.add(sys.stderr)
+
+
+def test_json_lines_carry_context_and_exceptions(log_lines) -> None:
+    """每条记录一行 JSON，contextualize 与调用参数平铺为字段，异常写入 exception 字段。"""
+
+    with logger.contextualize(correlation_id="abc"):
+        logger.info("hello {name}", name="世界")
+    try:
+        raise ValueError("bad")
+    except ValueError:
+        logger.exception("failed")
+
+    first, second = log_lines()
+    assert first["message"] == "hello 世界" and first["level"] == "INFO"
+    assert first["correlation_id"] == "abc" and first["name"] == "世界"
+    assert second["correlation_id"] == "-"
+    assert "ValueError: bad" in second["exception"]
+
+
+@pytest.mark.asyncio()
+async def test_worker_logs_each_delivery_with_its_correlation_id(monkeypatch, log_lines) -> None:
+    """队列投递的每条日志都带有 "批次/投递记录" 形式的关联 ID。"""
+
+    init_db()
+    with session_scope() as session:
+        template_id = TemplateService(session).create_template(name="a", text="A").id
+        job_id, _ = DeliveryService(session).enqueue([template_id], [1, 2, 3])
+    monkeypatch.setattr("app.bot.client.Bot", FakeBot)
+
+    await DeliveryWorkerPool(batch_size=10, concurrency=2).drain()
+
+    deliveries = {line["chat_id"]: line for line in log_lines() if line["message"] in ("delivery sent", "delivery failed")}
+    assert set(deliveries) == {1, 2, 3}
+    assert deliveries[3]["message"] == "delivery failed" and deliveries[3]["error"].endswith("boom")
+    assert len({line["correlation_id"] for line in deliveries.values()}) == 3
+    assert all(line["correlation_id"].startswith(f"{job_id}/") for line in deliveries.values())
+
+
+@pytest.mark.asyncio()
+async def test_api_requests_are_logged_with_request_id(log_lines) -> None:
+    """API 沿用调用方的 X-Request-ID 作为关联 ID，并在响应头中返回；未提供时自动生成。"""
+
+    from visualize.api import app
+
+    init_db()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            given = await client.get("/api/templates/counts", headers={"X-Request-ID": "req-1"})
+            generated = await client.get("/api/templates/counts")
+    finally:
+        await close_async_engine()
+
+    assert given.headers["x-request-id"] == "req-1"
+    assert generated.headers["x-request-id"] not in ("", "req-1")
+    requests = [line for line in log_lines() if line["message"] == "request handled"]
+    assert [line["correlation_id"] for line in requests] == ["req-1", generated.headers["x-request-id"]]
+    assert requests[0]["path"] == "/api/templates/counts" and requests[0]["status"] == 200
@@ -0,0 +1,126 @@
+"""发送路径指标与 /metrics 接口测试。"""
+from __future__ import annotations
+
+import httpx
+import pytest
+
+from app import metrics
+from app.bot.broadcast import send_manual_broadcast
+from app.config import reload_settings
+from app.db.session import close_async_engine, init_db, reset_engine, session_scope
+from app.services.deliveries import DeliveryService
+from app.services.templates import TemplateService, TemplateSnapshot, get_template_cache, reset_template_cache
+
+
+class FakeBot:
+    def __init__(self, token: str, **kwargs) -> None:
+        self.token = token
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str | None = None):
+        return None
+
+
+def _count(metric, *labels: str) -> float:
+    child = metric.labels(*labels)
+    return child.value if hasattr(child, "value") else sum(child.counts)
+
+
+def test_registry_renders_prometheus_text() -> None:
+    """计数器、仪表与直方图应按文本格式输出，直方图桶为累计值，标签值被转义。"""
+
+    registry = metrics.Registry()
+    counter = metrics.Counter("demo_total", "示例计数", ["outcome"], registry=registry)
+    gauge = metrics.Gauge("demo_depth", "示例仪表", registry=registry)
+    histogram = metrics.Histogram("demo_seconds", "示例直方图", registry=registry, buckets=(0.1, 1.0))
+    counter.labels('say "hi"').inc(2)
+    registry.add_collector(lambda: gauge.set(7))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE demo_total counter" in lines
+    assert 'demo_total{outcome="say \\"hi\\""} 2' in lines
+    assert "demo_depth 7" in lines
+    assert 'demo_seconds_bucket{le="0.1"} 2' in lines
+    assert 'demo_seconds_bucket{le="1"} 3' in lines
+    assert 'demo_seconds_bucket{le="+Inf"} 4' in lines
+    assert "demo_seconds_count 4" in lines and "demo_seconds_sum 3.65" in lines
+    with pytest.raises(ValueError):
+        metrics.Counter("demo_total", "重复", registry=registry)
+    with pytest.raises(ValueError):
+        counter.labels()
+
+
+def test_template_cache_events_survive_cache_reset(temp_env) -> None:
+    """缓存重建会清零自身统计，但 template_cache_events_total 只增不减。"""
+
+    before = _count(metrics.TEMPLATE_CACHE_EVENTS, "hits")
+    cache = get_template_cache()
+    cache.put(TemplateSnapshot(id=1, name="a", version=1, text="x", parse_mode="HTML"))
+    assert cache.get(1) is not None and cache.get("a") is not None
+    assert _count(metrics.TEMPLATE_CACHE_EVENTS, "hits") == before + 2
+
+    reset_template_cache()
+    metrics.REGISTRY.render()
+    assert get_template_cache().stats().hits == 0
+    assert _count(metrics.TEMPLATE_CACHE_EVENTS, "hits") == before + 2
+
+
+@pytest.mark.asyncio()
+async def test_manual_broadcast_records_send_metrics(monkeypatch, temp_env) -> None:
+    """一次真实发送应记录 Telegram 调用耗时、按 chat 类型的结果与模板服务耗时；dry-run 不调用 Telegram。"""
+
+    init_db()
+    with session_scope() as session:
+        TemplateService(session).create_template(name="welcome", text="Hello")
+    monkeypatch.setattr("app.bot.client.Bot", FakeBot)
+    before = {
+        "request": _count(metrics.TELEGRAM_REQUEST_SECONDS, "sendMessage", "ok"),
+        "sends": _count(metrics.SENDS_TOTAL, "private", "sent"),
+        "sent": _count(metrics.MANUAL_BROADCASTS_TOTAL, "sent"),
+        "dry_run": _count(metrics.MANUAL_BROADCASTS_TOTAL, "dry_run"),
+        "failed": _count(metrics.MANUAL_BROADCASTS_TOTAL, "failed"),
+        "lookup": _count(metrics.TEMPLATE_SERVICE_SECONDS, "get_cached_template"),
+    }
+
+    await send_manual_broadcast(template_name="welcome", chat_id=456)
+    await send_manual_broadcast(template_name="welcome", chat_id=456, dry_run=True)
+    with pytest.raises(Exception):
+        await send_manual_broadcast(template_name="missing", chat_id=456)
+
+    assert _count(metrics.TELEGRAM_REQUEST_SECONDS, "sendMessage", "ok") == before["request"] + 1
+    assert _count(metrics.SENDS_TOTAL, "private", "sent") == before["sends"] + 1
+    assert _count(metrics.MANUAL_BROADCASTS_TOTAL, "sent") == before["sent"] + 1
+    assert _count(metrics.MANUAL_BROADCASTS_TOTAL, "dry_run") == before["dry_run"] + 1
+    assert _count(metrics.MANUAL_BROADCASTS_TOTAL, "failed") == before["failed"] + 1
+    assert _count(metrics.TEMPLATE_SERVICE_SECONDS, "get_cached_template") == before["lookup"] + 2
+
+
+@pytest.mark.asyncio()
+async def test_metrics_endpoint_reports_queue_depth(monkeypatch, temp_env) -> None:
+    """/metrics 应以 Prometheus 文本格式返回，并在抓取时刷新队列深度与模板缓存统计。"""
+
+    from visualize.api import app
+
+    monkeypatch.setenv("METRICS_SQL_TIMING", "1")
+    reload_settings()
+    reset_engine()
+    init_db()
+    with session_scope() as session:
+        template_id = TemplateService(session).create_template(name="a", text="A").id
+        DeliveryService(session).enqueue([template_id], [1, 2, 3])
+
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/metrics")
+    finally:
+        await close_async_engine()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert 'delivery_queue_depth{status="pending"} 3' in lines
+    assert 'delivery_queue_depth{status="sending"} 0' in lines
+    assert "template_cache_entries 0" in lines
+    assert any(line.startswith('db_session_seconds_count{kind="async"}') for line in lines)
+    assert int(next(line for line in lines if line.startswith("db_query_seconds_count")).split()[-1]) > 0
@@ -0,0 +1,112 @@
+"""数据库迁移执行器测试。"""
+from __future__ import annotations
+
+import sqlite3
+
+from sqlalchemy import event, inspect
+from sqlmodel import SQLModel
+
+from app.config import get_settings
+from app.db import session as db_session
+from app.db.migrations import LATEST_VERSION, current_version
+from app.db.session import get_engine, init_db, session_scope
+from app.services.templates import TemplateService
+
+LEGACY_SCHEMA = """
+CREATE TABLE messagetemplate (
+    id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(100) NOT NULL, version INTEGER NOT NULL, text VARCHAR NOT NULL,
+    parse_mode VARCHAR NOT NULL, created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL
+);
+CREATE UNIQUE INDEX ix_messagetemplate_name ON messagetemplate (name);
+INSERT INTO messagetemplate VALUES (1, 'legacy', 1, 'hi', 'MarkdownV2', '2024-01-01 00:00:00', '2024-01-01 00:00:00');
+"""
+
+
+def _database_path() -> str:
+    return get_settings().database_url.removeprefix("sqlite:///")
+
+
+def test_fresh_database_matches_models(temp_env) -> None:
+    """空库迁移后的表、列与索引应与模型元数据一致，再次执行不做任何事。"""
+
+    assert init_db() == list(range(1, LATEST_VERSION + 1))
+    assert init_db() == []
+    inspector = inspect(get_engine())
+    for table in SQLModel.metadata.sorted_tables:
+        assert {column["name"] for column in inspector.get_columns(table.name)} == set(table.columns.keys())
+        assert {index.name for index in table.indexes} <= {index["name"] for index in inspector.get_indexes(table.name)}
+    with get_engine().connect() as connection:
+        assert current_version(connection) == LATEST_VERSION
+
+
+def test_legacy_database_is_upgraded_in_place(temp_env) -> None:
+    """旧库缺少 was_sent/sent_at 与新索引时，迁移应补齐结构并保留已有数据。"""
+
+    connection = sqlite3.connect(_database_path())
+    connection.executescript(LEGACY_SCHEMA)
+    connection.close()
+
+    init_db()
+    with session_scope() as session:
+        template = TemplateService(session).get_template("legacy")
+        assert template.was_sent is False and template.sent_at is None
+        assert TemplateService(session).mark_templates_sent([template.id])[0].was_sent is True
+    index_names = {index["name"] for index in inspect(get_engine()).get_indexes("messagetemplate")}
+    assert {"ix_messagetemplate_updated_id", "ix_messagetemplate_sent_updated_id"} <= index_names
+
+
+def test_create_all_database_adopts_versioning(temp_env) -> None:
+    """由旧版 create_all 建出的库没有版本表，迁移步骤应全部幂等跳过已有结构。"""
+
+    SQLModel.metadata.create_all(get_engine())
+    assert init_db() == list(range(1, LATEST_VERSION + 1))
+
+
+def test_up_to_date_check_is_constant_time(temp_env) -> None:
+    """已是最新版本时只执行版本检查，不反射其它表。"""
+
+    init_db()
+    statements: list[str] = []
+    event.listen(get_engine(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    init_db()
+    assert len(statements) <= 2
+    assert not any("messagetemplate" in statement for statement in statements)
+
+
+def test_ensure_schema_migrates_once_per_engine(temp_env, monkeypatch) -> None:
+    """ensure_schema 在同一引擎上只迁移一次，引擎重建后重新检查。"""
+
+    calls: list[int] = []
+    real_migrate = db_session.migrate
+    monkeypatch.setattr(db_session, "migrate", lambda engine, migrations: calls.append(1) or real_migrate(engine, migrations))
+    for _ in range(100):
+        db_session.ensure_schema()
+    assert len(calls) == 1
+    db_session.reset_engine()
+    db_session.ensure_schema()
+    assert len(calls) == 2
+
+
+def test_duplicate_legacy_deliveries_keep_one_key(temp_env) -> None:
+    """升级前已有重复的 (模板, 版本, chat) 记录时，只保留最早一条参与去重，唯一索引仍能建立。"""
+
+    init_db()
+    connection = sqlite3.connect(_database_path())
+    connection.executescript(
+        """
+        DROP INDEX ux_delivery_key;
+        ALTER TABLE delivery DROP COLUMN request_id;
+        UPDATE schema_version SET version = 5;
+        INSERT INTO delivery (job_id, template_id, template_version, chat_id, status, attempts, created_at, updated_at)
+        VALUES ('a', 1, 1, 7, 'sent', 1, '2024-01-01', '2024-01-01'), ('b', 1, 1, 7, 'sent', 1, '2024-01-02', '2024-01-02'),
+               ('b', 1, 1, 8, 'sent', 1, '2024-01-02', '2024-01-02');
+        """
+    )
+    connection.close()
+    db_session.reset_engine()
+
+    assert init_db() == list(range(6, LATEST_VERSION + 1))
+    with get_engine().connect() as connection:
+        rows = connection.exec_driver_sql("SELECT id, chat_id, request_id FROM delivery ORDER BY id").all()
+    assert rows == [(1, 7, ""), (2, 7, "legacy:2"), (3, 8, "")]
+    assert "ux_delivery_key" in {index["name"] for index in inspect(get_engine()).get_indexes("delivery")}
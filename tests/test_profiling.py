@@ -0,0 +1,110 @@
+"""可选剖析（阶段 span、采样调用栈与输出文件）测试。"""
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app import profiling
+from app.bot.broadcast import broadcast_matrix
+from app.config import reload_settings
+from app.db.session import close_async_engine, init_db, reset_engine, session_scope
+from app.services.templates import TemplateService
+
+
+class FakeBot:
+    def __init__(self, token: str, **kwargs) -> None:
+        self.token = token
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str | None = None):
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture()
+def profile_dir(monkeypatch, tmp_path, temp_env):
+    def configure(**env: str):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+        reload_settings()
+        reset_engine()
+        init_db()
+        with session_scope() as session:
+            TemplateService(session).create_template(name="hello", text="Hi {chat_title}")
+        return tmp_path
+
+    return configure
+
+
+def test_span_is_shared_noop_outside_a_profile() -> None:
+    """不在剖析中时 span 返回同一个空上下文，不记录任何数据。"""
+
+    assert profiling.span("db") is profiling.span("http")
+    with profiling.span("db"):
+        profiling.record("sql", 1.0)
+
+
+@pytest.mark.asyncio()
+async def test_broadcast_profile_reports_stages_and_folded_stacks(monkeypatch, profile_dir) -> None:
+    """PROFILE_BROADCASTS 开启时一次广播写出阶段汇总、span 折叠栈与采样折叠栈。"""
+
+    output = profile_dir(PROFILE_BROADCASTS="1", PROFILE_SAMPLE_INTERVAL="0.001")
+    monkeypatch.setattr("app.bot.client.Bot", FakeBot)
+
+    outcomes = await broadcast_matrix(["hello"], [1, 2, 3], concurrency=3)
+
+    assert all(outcome.ok for outcome in outcomes)
+    [summary_path] = output.glob("broadcast-*.json")
+    summary = json.loads(summary_path.read_text(encoding="utf-8"))
+    stages = summary["stages"]
+    assert stages["http"]["count"] == 3 and stages["http"]["total_ms"] >= 30
+    assert stages["render"]["count"] == 3 and stages["rate_limit"]["count"] == 3
+    assert stages["template;db"]["count"] == 1 and stages["template;db;sql"]["count"] >= 1
+    assert stages["db"]["count"] == 2 and "bot_client" in stages
+    assert summary["samples"] > 0
+    spans = summary_path.with_suffix("").with_suffix(".spans.folded").read_text(encoding="utf-8").splitlines()
+    assert any(line.startswith("broadcast;http ") for line in spans)
+    assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in spans)
+    stacks = summary_path.with_suffix("").with_suffix(".folded").read_text(encoding="utf-8").splitlines()
+    assert stacks and all(";" in line.rsplit(" ", 1)[0] for line in stacks)
+
+
+@pytest.mark.asyncio()
+async def test_disabled_profiling_writes_nothing(monkeypatch, profile_dir) -> None:
+    """默认配置下广播与 API 请求都不产生剖析输出。"""
+
+    from visualize.api import app
+
+    output = profile_dir()
+    monkeypatch.setattr("app.bot.client.Bot", FakeBot)
+
+    await broadcast_matrix(["hello"], [1], concurrency=1)
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            await client.get("/api/templates/counts")
+    finally:
+        await close_async_engine()
+
+    assert list(output.iterdir()) == []
+
+
+@pytest.mark.asyncio()
+async def test_sampled_api_request_is_profiled(profile_dir) -> None:
+    """PROFILE_API_SAMPLE_RATE=1 时每个请求写出一份剖析，SQL 耗时计入 sql 阶段。"""
+
+    from visualize.api import app
+
+    output = profile_dir(PROFILE_API_SAMPLE_RATE="1")
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/api/templates/counts")
+    finally:
+        await close_async_engine()
+
+    assert response.status_code == 200
+    [summary_path] = output.glob("GET__api_templates_counts-*.json")
+    summary = json.loads(summary_path.read_text(encoding="utf-8"))
+    assert summary["name"] == "GET /api/templates/counts"
+    assert summary["stages"]["sql"]["count"] >= 1
@@ -0,0 +1,111 @@
+"""投递进度推送测试。"""
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.bot.progress import FAILED, SENT, ProgressEvent, ProgressHub, get_progress_hub, reset_progress_hub
+from app.bot.worker import DeliveryWorkerPool
+from app.db.session import close_async_engine, init_db, session_scope
+from app.services.deliveries import DeliveryService
+from app.services.templates import TemplateService
+
+
+@pytest.fixture()
+def hub():
+    reset_progress_hub()
+    yield get_progress_hub()
+    reset_progress_hub()
+
+
+class FakeBot:
+    def __init__(self, token: str, **kwargs) -> None:
+        self.token = token
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str | None = None):
+        if chat_id == 3:
+            raise RuntimeError("boom")
+
+
+def _enqueue(chat_ids: list[int]) -> str:
+    with session_scope() as session:
+        template_id = TemplateService(session).create_template(name="a", text="A").id
+        return DeliveryService(session).enqueue([template_id], chat_ids)[0]
+
+
+@pytest.mark.asyncio()
+async def test_subscription_coalesces_and_stays_bounded() -> None:
+    """大量事件应合并为一次更新，缓冲只保留最近的若干条，其余只计数。"""
+
+    hub = ProgressHub(max_events=50)
+    subscription = hub.subscribe("job")
+    other = hub.subscribe("other")
+    for chat_id in range(10_000):
+        hub.publish(ProgressEvent(job_id="job", template_id=1, chat_id=chat_id, status=SENT if chat_id % 10 else FAILED))
+
+    batch = await subscription.next_batch(timeout=1, interval=0)
+    assert batch.counts == {SENT: 9000, FAILED: 1000}
+    assert len(batch.events) == 50 and batch.dropped == 9950
+    assert batch.events[-1].chat_id == 9999
+    assert await subscription.next_batch(timeout=0.01, interval=0) is None
+    assert await other.next_batch(timeout=0.01, interval=0) is None
+
+    hub.commit(["job"])
+    assert (await subscription.next_batch(timeout=1, interval=0)).committed is True
+    subscription.close()
+    other.close()
+    assert hub.subscriber_count() == 0
+
+
+@pytest.mark.asyncio()
+async def test_worker_publishes_results_and_commits(monkeypatch, temp_env, hub) -> None:
+    """worker 发送时应按批次发布逐条结果，并在回写后发出落库通知。"""
+
+    init_db()
+    job_id = _enqueue([1, 2, 3])
+    monkeypatch.setattr("app.bot.client.Bot", FakeBot)
+    subscription = hub.subscribe(job_id)
+
+    await DeliveryWorkerPool(batch_size=10, concurrency=2).drain()
+
+    batch = await subscription.next_batch(timeout=1, interval=0)
+    assert batch.counts == {SENT: 2, FAILED: 1}
+    assert batch.committed is True
+    assert {event.chat_id: event.status for event in batch.events} == {1: SENT, 2: SENT, 3: FAILED}
+    assert next(event.error for event in batch.events if event.status == FAILED).endswith("boom")
+
+
+@pytest.mark.asyncio()
+async def test_job_events_stream_until_done(monkeypatch, temp_env, hub) -> None:
+    """SSE 接口先推送汇总，再推送逐条进度，批次完成后推送 done 并结束。"""
+
+    from visualize.api import app
+
+    init_db()
+    job_id = _enqueue([1, 2, 3])
+    monkeypatch.setattr("app.bot.client.Bot", FakeBot)
+
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            assert (await client.get("/api/jobs/missing/events")).status_code == 404
+            request = asyncio.create_task(client.get(f"/api/jobs/{job_id}/events"))
+            while hub.subscriber_count(job_id) == 0:
+                await asyncio.sleep(0.01)
+            await DeliveryWorkerPool(batch_size=10, concurrency=2).drain()
+            response = await asyncio.wait_for(request, timeout=5)
+    finally:
+        await close_async_engine()
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    messages = [block.split("\n") for block in response.text.strip().split("\n\n") if block.startswith("event:")]
+    events = [(lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: "))) for lines in messages]
+    assert events[0][0] == "summary" and events[0][1]["pending"] == 3
+    progress = [data for name, data in events if name == "progress"]
+    assert sum(sum(data["counts"].values()) for data in progress) == 3
+    assert events[-1][0] == "done"
+    assert (events[-1][1]["sent"], events[-1][1]["failed"]) == (2, 1)
+    assert events[-1][1]["failures"][0]["chat_id"] == 3
+    assert hub.subscriber_count() == 0
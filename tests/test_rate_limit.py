@@ -0,0 +1,103 @@
+"""限速器单元测试。"""
+from __future__ import annotations
+
+import asyncio
+
+from app.bot.rate_limit import RateLimitConfig, RateLimiter
+
+
+class FakeClock:
+    """可手动推进的单调时钟。"""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_global_and_chat_buckets_space_out_sends() -> None:
+    """全局与单聊间隔同时生效，先到的令牌不需要等待。"""
+
+    clock = FakeClock()
+    limiter = RateLimiter(RateLimitConfig(global_interval_seconds=1.0, chat_interval_seconds=10.0), clock=clock)
+
+    assert limiter.reserve(1, "private") == 0
+    assert limiter.reserve(2, "private") == 1.0  # 受全局间隔限制
+    assert limiter.reserve(1, "private") == 10.0  # 同一 chat 受单聊间隔限制
+
+
+def test_group_and_private_limits_differ() -> None:
+    """群组与私聊使用各自的间隔，未知类型按 ID 正负推断。"""
+
+    clock = FakeClock()
+    limiter = RateLimiter(RateLimitConfig(global_interval_seconds=0, chat_interval_seconds=1.0, group_interval_seconds=3.0), clock=clock)
+
+    limiter.reserve(-100, "supergroup")
+    limiter.reserve(5)
+    assert limiter.reserve(-100, "supergroup") == 3.0
+    assert limiter.reserve(5) == 1.0
+
+
+def test_burst_allows_immediate_sends() -> None:
+    """桶容量内的请求全部立即放行。"""
+
+    clock = FakeClock()
+    limiter = RateLimiter(RateLimitConfig(global_interval_seconds=1.0, global_burst=3, chat_interval_seconds=0), clock=clock)
+
+    assert [limiter.reserve(chat_id) for chat_id in (1, 2, 3)] == [0, 0, 0]
+    assert limiter.reserve(4) == 1.0
+
+
+def test_idle_chat_buckets_are_evicted() -> None:
+    """空闲桶被淘汰，桶数量保持有界。"""
+
+    clock = FakeClock()
+    limiter = RateLimiter(RateLimitConfig(global_interval_seconds=0, chat_interval_seconds=1.0, max_chat_buckets=100), clock=clock)
+
+    for chat_id in range(50):
+        limiter.reserve(chat_id)
+    clock.now += 2
+    limiter.reserve(999)
+    assert limiter.snapshot().chat_buckets == 1
+
+    for chat_id in range(500):
+        limiter.reserve(chat_id)
+    assert limiter.snapshot().chat_buckets <= 100
+
+
+def test_pause_chat_delays_only_that_chat() -> None:
+    """暂停单个 chat 不影响其他 chat。"""
+
+    clock = FakeClock()
+    limiter = RateLimiter(RateLimitConfig(global_interval_seconds=0, chat_interval_seconds=0), clock=clock)
+
+    limiter.pause_chat(1, 30)
+    assert limiter.reserve(1) == 30
+    assert limiter.reserve(2) == 0
+
+
+def test_snapshot_reports_utilization() -> None:
+    """利用率反映最近窗口内占用的全局容量。"""
+
+    clock = FakeClock()
+    limiter = RateLimiter(RateLimitConfig(global_interval_seconds=2.0, global_burst=30, chat_interval_seconds=0), clock=clock)
+
+    for chat_id in range(15):
+        limiter.reserve(chat_id)
+    snapshot = limiter.snapshot()
+    assert snapshot.acquired == 15
+    assert snapshot.global_utilization == 0.5
+
+
+async def test_acquire_waits_for_reserved_slot() -> None:
+    """令牌不足时 acquire 睡眠到预约时刻。"""
+
+    limiter = RateLimiter(RateLimitConfig(global_interval_seconds=0.05, chat_interval_seconds=0))
+
+    assert await limiter.acquire(1) == 0
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    waited = await limiter.acquire(2)
+    assert waited > 0
+    assert loop.time() - started >= 0.04
@@ -0,0 +1,108 @@
+"""重试策略与延迟队列测试。"""
+from __future__ import annotations
+
+import asyncio
+
+from sqlmodel import select
+from telegram.error import BadRequest, ChatMigrated, Forbidden, RetryAfter, TimedOut
+
+from app.bot.broadcast import broadcast_matrix
+from app.bot.retry import CHAT_GONE, CHAT_MIGRATED, PERMANENT, RATE_LIMITED, TRANSIENT, DelayQueue, FloodDetector, RetryPolicy, chat_failure
+from app.db.models import SendAttempt
+from app.db.session import init_db, session_scope
+from app.services.templates import TemplateService
+
+
+def _no_jitter(low: float, high: float) -> float:
+    return low
+
+
+def test_policy_honours_retry_after_and_limits_attempts() -> None:
+    """429 按 retry_after 重试，最多重试 2 次。"""
+
+    policy = RetryPolicy(rng=_no_jitter)
+    first = policy.decide(RetryAfter(7), attempt=1)
+    assert (first.retry, first.delay, first.kind, first.retry_after) == (True, 7.0, RATE_LIMITED, 7.0)
+    assert policy.decide(RetryAfter(7), attempt=2).retry is True
+    assert policy.decide(RetryAfter(7), attempt=3).retry is False
+
+
+def test_policy_backs_off_transient_and_skips_permanent() -> None:
+    """网络错误指数退避，BadRequest 不重试。"""
+
+    policy = RetryPolicy(base_delay=1.0, rng=lambda low, high: high)
+    assert policy.decide(TimedOut(), attempt=1).delay == 1.0
+    assert policy.decide(TimedOut(), attempt=2).delay == 2.0
+    assert policy.decide(TimedOut(), attempt=2).kind == TRANSIENT
+    decision = policy.decide(BadRequest("chat not found"), attempt=1)
+    assert (decision.retry, decision.kind) == (False, PERMANENT)
+
+
+def test_chat_failure_identifies_dead_and_migrated_chats() -> None:
+    """只有与 chat 本身相关的错误会改变 chat 状态。"""
+
+    assert chat_failure(Forbidden("bot was blocked by the user")).kind == CHAT_GONE
+    assert chat_failure(BadRequest("Chat not found")).kind == CHAT_GONE
+    migrated = chat_failure(ChatMigrated(-1003))
+    assert (migrated.kind, migrated.migrate_to) == (CHAT_MIGRATED, -1003)
+    assert chat_failure(BadRequest("Can't parse entities")) is None
+    assert chat_failure(TimedOut()) is None
+
+
+def test_flood_detector_needs_distinct_chats() -> None:
+    """同一 chat 多次 429 不算全局限流。"""
+
+    detector = FloodDetector(threshold=3, window=1.0, clock=lambda: 0.0)
+    assert not detector.record(1)
+    assert not detector.record(1)
+    assert not detector.record(2)
+    assert detector.record(3)
+
+
+async def test_delay_queue_releases_items_by_deadline() -> None:
+    """延迟队列按截止时间顺序放出元素。"""
+
+    released: list[str] = []
+    queue: DelayQueue[str] = DelayQueue(released.append)
+    queue.push("late", 0.05)
+    queue.push("early", 0.01)
+    queue.push("now", 0)
+    await asyncio.sleep(0.1)
+    await queue.aclose()
+    assert released == ["now", "early", "late"]
+
+
+async def test_rate_limited_chat_does_not_block_others(monkeypatch, temp_env) -> None:
+    """429 的任务停放等待，其他 chat 的发送先完成，尝试记录逐次保存。"""
+
+    init_db()
+    with session_scope() as session:
+        TemplateService(session).create_template(name="news", text="N")
+
+    sent: list[int] = []
+    failures = {1: 1, 9: 10}
+
+    class FakeBot:
+        def __init__(self, token: str, **kwargs) -> None:
+            self.token = token
+
+        async def send_message(self, chat_id: int, text: str, parse_mode: str | None = None):
+            if failures.get(chat_id, 0) > 0:
+                failures[chat_id] -= 1
+                raise RetryAfter(0.2)
+            sent.append(chat_id)
+
+    monkeypatch.setattr("app.bot.client.Bot", FakeBot)
+
+    outcomes = await broadcast_matrix(["news"], [1, 2, 3, 9], concurrency=1, retry_policy=RetryPolicy(rng=_no_jitter))
+    by_chat = {outcome.chat_id: outcome for outcome in outcomes}
+
+    assert sent == [2, 3, 1]
+    assert [a.ok for a in by_chat[1].attempts] == [False, True]
+    assert by_chat[1].attempts[0].retry_after == 0.2
+    assert by_chat[9].ok is False
+    assert len(by_chat[9].attempts) == 3
+    with session_scope() as session:
+        rows = session.exec(select(SendAttempt).order_by(SendAttempt.id)).all()
+    assert len(rows) == 7 and {row.delivery_id for row in rows} == {None}
+    assert [(row.attempt, row.ok, row.kind, row.retry_after) for row in rows if row.chat_id == 1] == [(1, False, RATE_LIMITED, 0.2), (2, True, None, None)]
@@ -12,5 +12,6 @@ def test_settings_fixture(settings) -> None:  # 检查 settings 夹具效果
 
 def test_rate_limit_defaults() -> None:  # 检查限速默认值是否符合需求
     """校验速率限制默认配置。"""
-    assert DEFAULT_RATE_LIMITS.global_interval_seconds == 5.0  # 全局间隔为 5 秒
-    assert DEFAULT_RATE_LIMITS.chat_interval_seconds == 10.0  # 单聊间隔为 10 秒
+    assert DEFAULT_RATE_LIMITS.global_interval_seconds == 1 / 30  # 全局约 30 条/秒
+    assert DEFAULT_RATE_LIMITS.chat_interval_seconds == 1.0  # 单聊 1 条/秒
+    assert DEFAULT_RATE_LIMITS.group_interval_seconds == 3.0  # 群组约 20 条/分钟
@@ -0,0 +1,142 @@
+"""定时广播服务与调度器测试。"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import select
+
+from app.bot.scheduler import SchedulerService
+from app.db.models import Delivery, Schedule
+from app.db.session import init_db, session_scope
+from app.services.deliveries import DeliveryService, reset_delivery_key_cache
+from app.services.schedules import MISFIRE_SKIP, ScheduleError, ScheduleService
+from app.services.templates import TemplateNotFoundError, TemplateService
+
+
+def _template_id() -> int:
+    with session_scope() as session:
+        return TemplateService(session).create_template(name="daily", text="Hi").id
+
+
+def test_create_schedule_computes_next_run(temp_env) -> None:
+    """三种类型的定时任务都应计算出首次触发时间，cron 按配置的时区解释。"""
+
+    init_db()
+    template_id = _template_id()
+    run_at = datetime(2030, 1, 1, 8, 0)
+    with session_scope() as session:
+        once = ScheduleService(session).create_schedule("once", template_id, [1], run_at=run_at)
+        interval = ScheduleService(session).create_schedule("every", template_id, [1], interval_seconds=60, run_at=run_at)
+        cron = ScheduleService(session, tz_name="Asia/Shanghai").create_schedule("cron", template_id, [1, 2], cron="0 9 * * *")
+
+        assert once.next_run_at == run_at
+        assert interval.next_run_at == run_at
+        assert cron.chat_ids == "1,2"
+        assert (cron.next_run_at.hour, cron.next_run_at.minute) == (1, 0)
+        assert cron.next_run_at > datetime.utcnow()
+
+
+def test_create_schedule_validates_input(temp_env) -> None:
+    """缺少触发方式、cron 无效或模板不存在时应拒绝创建。"""
+
+    init_db()
+    template_id = _template_id()
+    with session_scope() as session:
+        service = ScheduleService(session)
+        with pytest.raises(ScheduleError):
+            service.create_schedule("none", template_id, [1])
+        with pytest.raises(ScheduleError):
+            service.create_schedule("bad", template_id, [1], cron="not a cron")
+        with pytest.raises(TemplateNotFoundError):
+            service.create_schedule("missing", 999, [1], interval_seconds=10)
+
+
+def test_fire_due_applies_misfire_policy(temp_env) -> None:
+    """错过的触发：once 策略补发一次并跳到下一个未来时间点，skip 策略超出宽限时不发送。"""
+
+    init_db()
+    template_id = _template_id()
+    start = datetime(2030, 1, 1, 0, 0)
+    with session_scope() as session:
+        service = ScheduleService(session)
+        catch_up = service.create_schedule("catch-up", template_id, [1, 2], interval_seconds=60, run_at=start)
+        skip = service.create_schedule(
+            "skip", template_id, [3], interval_seconds=60, run_at=start, misfire_policy=MISFIRE_SKIP, misfire_grace_seconds=30
+        )
+        once = service.create_schedule("once", template_id, [4], run_at=start)
+        ids = [catch_up.id, skip.id, once.id]
+
+        now = start + timedelta(minutes=10, seconds=5)
+        results = {result.schedule_id: result for result in service.fire_due(ids, now)}
+
+        assert results[ids[0]].job_id is not None and results[ids[0]].next_run_at == start + timedelta(minutes=11)
+        assert results[ids[1]].skipped and results[ids[1]].job_id is None
+        assert results[ids[2]].job_id is not None and results[ids[2]].next_run_at is None
+        deliveries = session.exec(select(Delivery)).all()
+        assert sorted(row.chat_id for row in deliveries) == [1, 2, 4]
+        assert session.get(Schedule, ids[2]).enabled is False
+        assert session.get(Schedule, ids[0]).last_job_id == results[ids[0]].job_id
+
+
+def test_fire_due_keeps_schedule_changes_when_enqueue_races(monkeypatch, temp_env) -> None:
+    """另一进程抢先入队了同一次触发：重试只回滚到保存点，停用一次性任务等修改仍随入队一起提交。"""
+
+    init_db()
+    template_id = _template_id()
+    start = datetime(2030, 1, 1, 0, 0)
+    with session_scope() as session:
+        schedule_id = ScheduleService(session).create_schedule("once", template_id, [4], run_at=start).id
+    with session_scope() as session:
+        DeliveryService(session).enqueue([template_id], [4], request_id=f"schedule:{schedule_id}:{start:%Y%m%dT%H%M%S}")
+    reset_delivery_key_cache()
+
+    lookup = DeliveryService._existing
+    calls: list[int] = []
+
+    def stale_existing(self, keys):
+        calls.append(1)
+        return {} if len(calls) == 1 else lookup(self, keys)
+
+    monkeypatch.setattr(DeliveryService, "_existing", stale_existing)
+    with session_scope() as session:
+        results = ScheduleService(session).fire_due([schedule_id], start + timedelta(seconds=1))
+
+    assert len(calls) == 2 and results[0].next_run_at is None
+    with session_scope() as session:
+        schedule = session.get(Schedule, schedule_id)
+        assert (schedule.enabled, schedule.next_run_at, schedule.last_run_at) == (False, None, start + timedelta(seconds=1))
+        assert len(session.exec(select(Delivery)).all()) == 1
+
+
+@pytest.mark.asyncio()
+async def test_scheduler_rebuilds_heap_and_fires_due(temp_env) -> None:
+    """调度器启动时从数据库重建堆，只处理到期任务，并在重启后延续触发时间。"""
+
+    init_db()
+    template_id = _template_id()
+    start = datetime(2030, 1, 1, 0, 0)
+    with session_scope() as session:
+        service = ScheduleService(session)
+        due = service.create_schedule("due", template_id, [1], interval_seconds=60, run_at=start)
+        later = service.create_schedule("later", template_id, [2], run_at=start + timedelta(hours=1))
+        due_id, later_id = due.id, later.id
+
+    now = start + timedelta(seconds=30)
+    scheduler = SchedulerService(clock=lambda: now)
+    await scheduler.start()
+    await scheduler.stop()
+    assert len(scheduler) == 2
+
+    assert await scheduler.run_due() == 1
+    assert scheduler.next_run_at() == start + timedelta(minutes=1)
+    assert await scheduler.run_due() == 0
+
+    restarted = SchedulerService(clock=lambda: now)
+    await restarted.start()
+    await restarted.stop()
+    assert restarted.next_run_at() == start + timedelta(minutes=1)
+    with session_scope() as session:
+        assert [row.chat_id for row in session.exec(select(Delivery)).all()] == [1]
+        assert session.get(Schedule, later_id).next_run_at == start + timedelta(hours=1)
+        assert session.get(Schedule, due_id).last_run_at == now
@@ -0,0 +1,37 @@
+"""数据库引擎配置测试。"""  # 验证 SQLite 调优 PRAGMA 与连接池选择
+from __future__ import annotations  # 兼容未来注解
+
+from sqlalchemy import text  # 执行 PRAGMA 查询
+from sqlalchemy.pool import StaticPool  # 内存数据库应使用的连接池
+
+from app import config  # 切换配置后刷新缓存
+from app.db.session import get_engine, reset_engine  # 被测的引擎工厂
+
+
+def _pragmas(names: tuple[str, ...]) -> list:  # 读取当前引擎连接上的 PRAGMA 值
+    with get_engine().connect() as connection:  # 新连接会触发 connect 事件
+        return [connection.execute(text(f"PRAGMA {name}")).scalar() for name in names]  # 按顺序返回各项取值
+
+
+def test_tuned_profile_applies_sqlite_pragmas(temp_env) -> None:  # 默认 tuned 配置下检查 PRAGMA
+    """tuned 配置应启用 WAL、NORMAL 同步与忙等待，且不再 pre-ping。"""
+    assert _pragmas(("journal_mode", "synchronous", "busy_timeout")) == ["wal", 1, 5000]  # NORMAL 对应数值 1
+    assert get_engine().pool._pre_ping is False  # SQLite 文件库无需额外的探活往返
+
+
+def test_default_profile_keeps_driver_behaviour(temp_env, monkeypatch) -> None:  # 关闭调优后的行为
+    """DB_PROFILE=default 时保持原先的回滚日志模式与 pre-ping。"""
+    monkeypatch.setenv("DB_PROFILE", "default")  # 切换到原始配置
+    config.reload_settings()  # 让新的环境变量生效
+    reset_engine()  # 丢弃按 tuned 配置创建的引擎
+    assert _pragmas(("journal_mode",)) == ["delete"]  # 保持 SQLite 默认的回滚日志
+    assert get_engine().pool._pre_ping is True  # 原有的 pre-ping 行为保留
+
+
+def test_memory_database_uses_static_pool(temp_env, monkeypatch) -> None:  # 内存数据库需要共享连接
+    """内存 SQLite 使用 StaticPool，所有会话看到同一个数据库。"""
+    monkeypatch.setenv("DATABASE_URL", "sqlite://")  # 切换到内存数据库
+    config.reload_settings()  # 让新的环境变量生效
+    reset_engine()  # 按新 URL 重建引擎
+    assert isinstance(get_engine().pool, StaticPool)  # 连接池类型符合预期
+    assert _pragmas(("busy_timeout",)) == [5000]  # 内存库同样应用非文件相关的 PRAGMA
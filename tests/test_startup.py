@@ -0,0 +1,29 @@
+"""命令行冷启动预算：--help 不加载重量级依赖，init-db 不加载 telegram。"""
+from __future__ import annotations
+
+from benchmarks.bench_startup import SCENARIOS, profile_startup
+
+HEAVY_MODULES = {"asyncio", "loguru", "sqlalchemy", "sqlmodel", "telegram", "httpx", "fastapi", "dotenv"}
+HELP_EXTRA_MODULES_BUDGET = 60
+HELP_EXTRA_IMPORT_MS_BUDGET = 150
+
+
+def test_help_stays_within_startup_budget() -> None:
+    """--help 相比空解释器只多导入少量标准库模块，导入耗时不超过预算。"""
+
+    baseline = profile_startup(["-c", "pass"])
+    for name in ("help", "broadcast-help"):
+        profile = profile_startup(SCENARIOS[name])
+        extra = set(profile.modules) - set(baseline.modules)
+        assert not HEAVY_MODULES & extra, f"{name} 导入了 {sorted(HEAVY_MODULES & extra)}"
+        assert len(extra) <= HELP_EXTRA_MODULES_BUDGET, f"{name} 多导入了 {len(extra)} 个模块：{sorted(extra)}"
+        extra_ms = (profile.import_us - baseline.import_us) / 1000
+        assert extra_ms <= HELP_EXTRA_IMPORT_MS_BUDGET, f"{name} 导入耗时 {extra_ms:.0f}ms，超出预算"
+
+
+def test_init_db_does_not_load_telegram() -> None:
+    """init-db 只加载数据库栈。"""
+
+    modules = profile_startup(SCENARIOS["init-db"]).modules
+    assert "sqlmodel" in modules
+    assert not {"telegram", "httpx", "fastapi"} & set(modules)
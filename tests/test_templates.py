@@ -1,8 +1,29 @@
 """Stage 1 模板服务单元测试。"""
 from __future__ import annotations
 
-from app.db.session import init_db, session_scope
-from app.services.templates import TemplateNotFoundError, TemplateService
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, insert
+from sqlmodel import func, select
+
+from app.db.bulk import MAX_IN_PARAMS
+from app.db.models import MessageTemplate
+from app.db.session import async_session_scope, close_async_engine, init_db, session_scope
+from app.services import templates as template_service
+from app.services.templates import (
+    AsyncTemplateService,
+    InvalidCursorError,
+    TemplateCache,
+    TemplateNotFoundError,
+    TemplateService,
+    TemplateSnapshot,
+    TemplateSummary,
+    compile_template,
+    get_compiled,
+    get_template_cache,
+    render_template,
+)
 
 
 def test_create_and_list_templates(temp_env) -> None:
@@ -81,4 +102,213 @@ def test_get_missing_template_raises(temp_env) -> None:
         except TemplateNotFoundError as exc:
             assert str(exc) == "absent"
         else:  # pragma: no cover - 防御逻辑
-            raise AssertionError("预期抛出 TemplateNotFoundError")
+            raise AssertionError("预期抛出 TemplateNotFoundError")
+
+
+def test_cached_template_invalidated_on_update(temp_env) -> None:
+    """缓存读取只查询一次数据库；模板更新或删除后立即失效。"""
+
+    init_db()
+    with session_scope() as session:
+        service = TemplateService(session)
+        tpl = service.create_template(name="welcome", text="Hello")
+
+        first = service.get_cached_template("welcome")
+        assert service.get_cached_template(tpl.id) is first
+        assert service.get_cached_template("welcome") is first
+        stats = get_template_cache().stats()
+        assert (stats.misses, stats.hits) == (1, 2)
+
+        service.mark_templates_sent([tpl.id])
+        assert service.get_cached_template("welcome") is first
+
+        service.create_template(name="welcome", text="Hi")
+        updated = service.get_cached_template("welcome")
+        assert (updated.text, updated.version) == ("Hi", 2)
+
+        service.delete_template("welcome")
+        try:
+            service.get_cached_template("welcome")
+        except TemplateNotFoundError:
+            pass
+        else:  # pragma: no cover - 防御逻辑
+            raise AssertionError("预期抛出 TemplateNotFoundError")
+
+
+def test_cached_template_revalidation_detects_recreated_id(monkeypatch, temp_env) -> None:
+    """TTL 过期后按 version 与 updated_at 校验：其他进程删除并以同一 id 重建的模板不应沿用旧快照。"""
+
+    init_db()
+    now = [0.0]
+    monkeypatch.setattr(template_service, "_CACHE", TemplateCache(ttl=10.0, clock=lambda: now[0]))
+    with session_scope() as session:
+        service = TemplateService(session)
+        tpl = service.create_template(name="a", text="Hello from A")
+        assert service.get_cached_template(tpl.id).text == "Hello from A"
+
+        session.exec(delete(MessageTemplate).where(MessageTemplate.id == tpl.id))
+        session.exec(
+            insert(MessageTemplate),
+            params=[{"id": tpl.id, "name": "b", "text": "Hi from B", "version": 1, "updated_at": datetime(2030, 1, 1)}],
+        )
+        session.commit()
+        now[0] = 11.0
+        snapshot = service.get_cached_template(tpl.id)
+        assert (snapshot.name, snapshot.text, snapshot.version) == ("b", "Hi from B", 1)
+        with pytest.raises(TemplateNotFoundError):
+            service.get_cached_template("a")
+
+        session.exec(delete(MessageTemplate).where(MessageTemplate.id == tpl.id))
+        session.commit()
+        now[0] = 22.0
+        with pytest.raises(TemplateNotFoundError):
+            service.get_cached_template(tpl.id)
+        assert get_template_cache().peek_stale(tpl.id) is None
+
+
+def test_template_cache_lru_and_ttl(temp_env) -> None:
+    """超出容量时淘汰最久未使用的条目；过期条目需要重新校验。"""
+
+    now = [0.0]
+    cache = TemplateCache(max_size=2, ttl=10.0, clock=lambda: now[0])
+    snapshots = [TemplateSnapshot(id=i, name=f"t{i}", version=1, text="x", parse_mode="HTML") for i in range(3)]
+    cache.put(snapshots[0])
+    cache.put(snapshots[1])
+    assert cache.get("t0") is snapshots[0]
+    cache.put(snapshots[2])
+
+    assert cache.get(1) is None and cache.get("t1") is None
+    assert cache.get(0) is snapshots[0] and cache.get(2) is snapshots[2]
+    assert cache.stats().evictions == 1
+
+    now[0] = 11.0
+    assert cache.get(0) is None
+    assert cache.peek_stale(0) is snapshots[0]
+
+
+def test_render_escapes_values_by_parse_mode(temp_env) -> None:
+    """变量值按 parse_mode 转义，正文保持原样，缺失的变量保留转义后的占位符。"""
+
+    markdown = compile_template("*Hi* {{ chat_title }} {{missing}}\\!", "MarkdownV2")
+    assert markdown.render({"chat_title": "A.b_(c)"}) == "*Hi* A\\.b\\_\\(c\\) \\{\\{missing\\}\\}\\!"
+
+    lowercase = compile_template("{{ name }}", "markdownv2")
+    assert lowercase.render({"name": "a.b"}) == "a\\.b"
+
+    html_template = compile_template("<b>{{ name }}</b> #{{ index }}", "HTML")
+    assert html_template.render({"name": "<x & y>", "index": 3}) == "<b>&lt;x &amp; y&gt;</b> #3"
+
+    static = compile_template("Hello ::)", "MarkdownV2")
+    assert static.is_static and static.render({"x": 1}) == "Hello ::)"
+
+
+def test_compiled_template_cached_by_version(temp_env) -> None:
+    """同一 (id, version) 只编译一次，版本变化后重新编译。"""
+
+    first = TemplateSnapshot(id=1, name="t", version=1, text="{{a}}", parse_mode="HTML")
+    assert get_compiled(first) is get_compiled(first)
+    second = TemplateSnapshot(id=1, name="t", version=2, text="[{{a}}]", parse_mode="HTML")
+    assert get_compiled(second).render({"a": "x"}) == "[x]"
+
+
+def test_compiled_template_not_reused_after_delete_and_recreate(temp_env) -> None:
+    """删除后新模板复用同一 id 与版本 1 时，不应渲染出已删除模板的正文。"""
+
+    init_db()
+    with session_scope() as session:
+        service = TemplateService(session)
+        first = service.create_template(name="a", text="Hello {{ index }} from A")
+        assert render_template(service.get_cached_template("a"), {"index": 1}) == "Hello 1 from A"
+        service.delete_template("a")
+
+        second = service.create_template(name="b", text="Hi {{ index }} from B")
+        assert (second.id, second.version) == (first.id, 1)
+        assert render_template(service.get_cached_template("b"), {"index": 1}) == "Hi 1 from B"
+
+
+def test_bulk_updates_span_multiple_chunks(temp_env) -> None:
+    """超过单条语句参数上限的 ID 列表应分块处理，且不会重复计数。"""
+
+    init_db()
+    count = MAX_IN_PARAMS * 2 + 10
+    with session_scope() as session:
+        session.exec(insert(MessageTemplate), params=[{"name": f"t{i}", "text": "x"} for i in range(count)])
+        session.commit()
+        ids = list(session.exec(select(MessageTemplate.id)).all())
+        service = TemplateService(session)
+
+        updated = service.mark_templates_sent(ids + ids[:5])
+        assert len(updated) == count
+        assert all(item.was_sent and item.sent_at is not None for item in updated)
+
+        assert service.delete_templates(ids[: MAX_IN_PARAMS + 1] + [10**9]) == MAX_IN_PARAMS + 1
+        remaining = session.exec(select(func.count()).select_from(MessageTemplate)).one()
+        assert remaining == count - MAX_IN_PARAMS - 1
+
+
+def test_list_page_keyset_pagination(temp_env) -> None:
+    """游标分页按 (updated_at, id) 降序遍历全部模板，相同 updated_at 也不会重复或遗漏。"""
+
+    init_db()
+    same = datetime(2030, 1, 1)
+    with session_scope() as session:
+        session.exec(
+            insert(MessageTemplate),
+            params=[
+                {"name": f"t{i}", "text": "x" * 200, "was_sent": i % 2 == 0, "created_at": same, "updated_at": same if i < 4 else datetime(2030, 1, 2)}
+                for i in range(7)
+            ],
+        )
+        session.commit()
+        service = TemplateService(session)
+
+        seen: list[int] = []
+        cursor = None
+        while True:
+            page = service.list_page(limit=3, cursor=cursor, summary=True)
+            seen.extend(item.id for item in page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        assert seen == [7, 6, 5, 4, 3, 2, 1]
+        assert all(isinstance(item, TemplateSummary) and len(item.preview) == 120 for item in page.items)
+
+        pending = service.list_page(limit=10, was_sent=False)
+        assert [tpl.id for tpl in pending.items] == [6, 4, 2] and pending.next_cursor is None
+        assert service.count_templates().pending == 3
+
+        try:
+            service.list_page(cursor="not-a-cursor")
+        except InvalidCursorError:
+            pass
+        else:  # pragma: no cover - 防御逻辑
+            raise AssertionError("预期抛出 InvalidCursorError")
+
+
+@pytest.mark.asyncio()
+async def test_async_service_matches_sync_results(temp_env) -> None:
+    """异步服务的分页、统计、查询与删除结果应与同步版本一致，删除时同样清理缓存。"""
+
+    init_db()
+    with session_scope() as session:
+        service = TemplateService(session)
+        for index in range(5):
+            service.create_template(name=f"t{index}", text=f"text {index}")
+        service.mark_templates_sent([1, 2])
+        expected = service.list_page(limit=2, summary=True)
+        service.get_cached_template(3)
+
+    try:
+        async with async_session_scope() as session:
+            service = AsyncTemplateService(session)
+            page = await service.list_page(limit=2, summary=True)
+            assert page == expected
+            assert (await service.count_templates()).sent == 2
+            assert (await service.get_template("t4")).text == "text 4"
+            assert sorted(item.id for item in await service.get_summaries([5, 1, 5])) == [1, 5]
+            assert await service.delete_templates_returning([3, 99]) == [3]
+            with pytest.raises(TemplateNotFoundError):
+                await service.get_template_by_id(3)
+        assert get_template_cache().peek_stale(3) is None
+    finally:
+        await close_async_engine()
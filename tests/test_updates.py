@@ -0,0 +1,143 @@
+"""Telegram 更新消费与 Chat 自动登记测试。"""
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+from sqlalchemy import event
+from sqlmodel import select
+from telegram import Update
+
+from app.bot import updates as bot_updates
+from app.bot.updates import UpdatePoller, chat_changes
+from app.config import reload_settings
+from app.db.models import Chat, UpdateOffset
+from app.db.session import close_async_engine, get_engine, init_db, session_scope
+from app.services.chats import ChatService
+from benchmarks.fake_telegram import FakeTelegramServer
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "fake"}
+
+
+def _chat(chat_id: int, title: str = "group") -> dict:
+    if chat_id > 0:
+        return {"id": chat_id, "type": "private", "first_name": title}
+    return {"id": chat_id, "type": "group", "title": title}
+
+
+def _message(chat_id: int, title: str = "group", **extra) -> dict:
+    return {"message": {"message_id": 1, "date": 0, "chat": _chat(chat_id, title), "text": "hi", **extra}}
+
+
+def _member(chat_id: int, status: str, title: str = "group") -> dict:
+    new_member = {"status": status, "user": BOT_USER, **({"until_date": 0} if status == "kicked" else {})}
+    return {
+        "my_chat_member": {
+            "chat": _chat(chat_id, title),
+            "from": {"id": 9, "is_bot": False, "first_name": "admin"},
+            "date": 0,
+            "old_chat_member": {"status": "member", "user": BOT_USER},
+            "new_chat_member": new_member,
+        }
+    }
+
+
+def _apply(*updates: dict):
+    parsed = [Update.de_json({"update_id": index, **data}, None) for index, data in enumerate(updates, start=1)]
+    with session_scope() as session:
+        return ChatService(session).apply_changes(chat_changes(parsed))
+
+
+def _chats() -> dict[int, tuple[str, str | None, bool]]:
+    with session_scope() as session:
+        return {chat.chat_id: (chat.type, chat.title, chat.is_active) for chat in session.exec(select(Chat)).all()}
+
+
+def test_updates_upsert_chats_and_track_membership(temp_env) -> None:
+    """消息登记 chat 与标题，Bot 被移出时标记不活跃，群组升级后旧 ID 停用、新 ID 登记。"""
+
+    init_db()
+    result = _apply(
+        _message(-1, "G"),
+        _message(5, "Ann"),
+        _member(-2, "member", "Joined"),
+        _member(-1, "kicked", "G"),
+        _message(-1, "G2"),
+        _message(-3, "Old", migrate_to_chat_id=-1003),
+    )
+    assert (result.inserted, result.updated) == (5, 0)
+    assert _chats() == {
+        -1: ("group", "G2", False),
+        5: ("private", "Ann", True),
+        -2: ("group", "Joined", True),
+        -3: ("group", "Old", False),
+        -1003: ("supergroup", "Old", True),
+    }
+
+    result = _apply(_message(-2, "Joined"), _message(5, "Ann"), _member(-1, "member", "G2"))
+    assert (result.inserted, result.updated, result.unchanged) == (0, 1, 2)
+    assert _chats()[-1] == ("group", "G2", True)
+
+
+async def test_poller_drains_backlog_and_resumes_from_persisted_offset(temp_env, monkeypatch) -> None:
+    """积压的数千条更新逐页批量写入；offset 随 chat 变更持久化，重启后不重读也不丢失。"""
+
+    init_db()
+    with FakeTelegramServer() as server:
+        monkeypatch.setenv("BOT_API_BASE_URL", server.base_url)
+        reload_settings()
+        server.push_updates(*(_message(-(index % 50) - 1, f"chat {index % 50}") for index in range(2490)))
+        server.push_updates(*(_member(-(index + 1), "left") for index in range(10)))
+        statements: list[str] = []
+        event.listen(get_engine(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        poller = UpdatePoller()
+        try:
+            assert await poller.drain() == 2500
+        finally:
+            await poller.stop()
+        assert server.stats.methods["getUpdates"] == 26
+        assert sum(statement.startswith(("INSERT INTO chat", "UPDATE chat")) for statement in statements) <= 2
+        chats = _chats()
+        assert len(chats) == 50
+        assert sum(not active for _, _, active in chats.values()) == 10
+        with session_scope() as session:
+            assert session.get(UpdateOffset, "TEST_TOKEN").next_offset == 2501
+
+        restarted = UpdatePoller()
+        try:
+            assert await restarted.drain() == 0
+            server.push_updates(_message(7, "Bob"), _member(-1, "member", "chat 0"))
+            assert await restarted.drain() == 2
+        finally:
+            await restarted.stop()
+    assert _chats()[7] == ("private", "Bob", True)
+    assert _chats()[-1][2] is True
+
+
+async def test_webhook_requires_secret_and_commits_concurrent_updates_together(temp_env, monkeypatch) -> None:
+    """webhook 校验密钥；并发到达的更新合并为少量事务，每个请求在提交后才返回。"""
+
+    monkeypatch.setenv("UPDATES_MODE", "webhook")
+    monkeypatch.setenv("WEBHOOK_SECRET", "s3cret")
+    reload_settings()
+    init_db()
+    batches: list[int] = []
+    real_apply = bot_updates._apply
+    monkeypatch.setattr(bot_updates, "_apply", lambda changes, *args: batches.append(len(changes)) or real_apply(changes, *args))
+    from visualize.api import app
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": "s3cret"}
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            denied = await client.post("/telegram/webhook", json={"update_id": 1, **_message(-1)})
+            responses = await asyncio.gather(
+                *(client.post("/telegram/webhook", json={"update_id": index, **_message(-index)}, headers=headers) for index in range(1, 41))
+            )
+    finally:
+        await close_async_engine()
+
+    assert denied.status_code == 403
+    assert all(response.status_code == 200 for response in responses)
+    assert len(_chats()) == 40
+    assert sum(batches) == 40 and len(batches) < 40
@@ -1,30 +1,137 @@
 """FastAPI 后端：为可视化界面提供模板/广播操作接口。"""
 from __future__ import annotations
 
-from datetime import datetime
+import asyncio
+import hmac
+import json
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Generator
+from typing import AsyncIterator, Literal
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from loguru import logger
 from app.db.models import Chat
-from app.services.templates import TemplateService
-from pydantic import BaseModel, Field
-from sqlmodel import Session, select
+from app.services.templates import AsyncTemplateService, InvalidCursorError, TemplateNotFoundError, get_template_cache
+from pydantic import BaseModel, ConfigDict, Field
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from telegram import Update
 
-from app.bot.broadcast import send_manual_broadcast
-from app.db.session import get_engine, init_db
+from app.bot.client import close_bot_client, start_bot_client
+from app.bot.feeds import get_feed_poller, stop_feed_poller
+from app.bot.progress import ProgressSubscription, get_progress_hub
+from app.bot.rate_limit import get_rate_limiter
+from app.bot.scheduler import get_scheduler, notify_scheduler, stop_scheduler
+from app.bot.updates import get_update_batcher, get_update_poller, reset_update_batcher, stop_update_poller
+from app.bot.worker import get_delivery_pool, notify_delivery_workers, stop_delivery_pool
+from app.config import get_settings
+from app.log import configure_logging, new_correlation_id, shutdown_logging
+from app.metrics import CONTENT_TYPE, DELIVERY_QUEUE_DEPTH, REGISTRY
+from app.profiling import profile_run, should_profile_request
+from app.services.chats import chat_skip_reason
+from app.services.deliveries import DeliveryService
+from app.services.feeds import FeedError, FeedService
+from app.services.schedules import ScheduleError, ScheduleService
+from app.db.session import async_session_scope, close_async_engine, ensure_schema
 
-init_db()
+SUMMARY_REFRESH_SECONDS = 2.0
+MAX_REQUEST_ID_LENGTH = 64
 
-app = FastAPI(title="TG Auto Messenger Visualize API", version="0.2.0")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """启动时配置日志、迁移数据库并准备共享 Bot 连接池、投递 worker、调度器、（UPDATES_MODE=poll 时）更新轮询与（FEED_POLL_INTERVAL>0 时）订阅源轮询，关闭时释放。"""
+
+    configure_logging()
+    await asyncio.to_thread(ensure_schema)
+    await start_bot_client()
+    await get_delivery_pool().start()
+    await get_scheduler().start()
+    if get_settings().updates_mode == "poll":
+        await get_update_poller().start()
+    await get_feed_poller().start()
+    try:
+        yield
+    finally:
+        await stop_feed_poller()
+        await stop_update_poller()
+        await stop_scheduler()
+        await stop_delivery_pool()
+        await close_bot_client()
+        await close_async_engine()
+        reset_update_batcher()
+        shutdown_logging()
+
+
+class RequestLogMiddleware:
+    """为每个 HTTP 请求绑定关联 ID（沿用 X-Request-ID 或新生成）并在结束时记录一行日志。
+
+    纯 ASGI 实现，不缓冲响应体，SSE 流与断开检测不受影响。
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = dict(scope["headers"]).get(b"x-request-id", b"")
+        correlation_id = header.decode("latin-1")[:MAX_REQUEST_ID_LENGTH] or new_correlation_id()
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_id(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", correlation_id.encode("latin-1"))]
+            await send(message)
+
+        with logger.contextualize(correlation_id=correlation_id):
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                logger.info(
+                    "request handled",
+                    method=scope["method"],
+                    path=scope["path"],
+                    status=status,
+                    elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+                )
+
+
+class ProfileMiddleware:
+    """按 PROFILE_API_SAMPLE_RATE 抽样剖析请求，输出写入 PROFILE_DIR。
+
+    采样线程记录的是事件循环线程的调用栈，同时在处理的其他请求也会出现在结果中。
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not should_profile_request():
+            await self.app(scope, receive, send)
+            return
+        with profile_run(f"{scope['method']} {scope['path']}"):
+            await self.app(scope, receive, send)
+
+
+app = FastAPI(title="TG Auto Messenger Visualize API", version="0.2.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"]
 )
+app.add_middleware(ProfileMiddleware)
+app.add_middleware(RequestLogMiddleware)
 
 FRONTEND_DIR = Path(__file__).resolve().parent / "frontend"
 if FRONTEND_DIR.exists():
@@ -35,13 +142,14 @@ if FRONTEND_DIR.exists():
     )
 
 
-def get_session() -> Generator[Session, None, None]:
-    engine = get_engine()
-    with Session(engine) as session:
+async def get_session() -> AsyncIterator[AsyncSession]:
+    async with async_session_scope() as session:
         yield session
 
 
 class TemplateDTO(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     name: str
     version: int
@@ -52,23 +160,149 @@ class TemplateDTO(BaseModel):
     updated_at: datetime
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+
+class TemplateSummaryDTO(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    version: int
+    parse_mode: str
+    was_sent: bool
+    sent_at: datetime | None
+    updated_at: datetime
+    created_at: datetime
+    preview: str
 
 
 class TemplatesResponse(BaseModel):
-    items: list[TemplateDTO]
+    items: list[TemplateDTO] | list[TemplateSummaryDTO]
+    next_cursor: str | None = None
+
+
+class TemplateCountsResponse(BaseModel):
+    total: int
+    sent: int
+    pending: int
+
+
+class DeleteResponse(BaseModel):
+    deleted_ids: list[int]
+
+
+class SendJobResponse(BaseModel):
+    job_id: str
+    queued: int
+    duplicates: int = 0
+
+
+class FailedDeliveryDTO(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    template_id: int
+    chat_id: int
+    attempts: int
+    error: str | None
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    total: int
+    pending: int
+    sending: int
+    sent: int
+    failed: int
+    done: bool
+    failures: list[FailedDeliveryDTO]
 
 
 class SendRequest(BaseModel):
     template_ids: list[int] = Field(default_factory=list)
     chat_ids: list[int] = Field(default_factory=list)
+    request_id: str | None = Field(default=None, max_length=64)
+
+
+class ScheduleDTO(BaseModel):
+    id: int
+    name: str
+    template_id: int
+    chat_ids: list[int]
+    kind: str
+    run_at: datetime | None
+    interval_seconds: int | None
+    cron: str | None
+    misfire_policy: str
+    enabled: bool
+    next_run_at: datetime | None
+    last_run_at: datetime | None
+    last_job_id: str | None
+
+    @classmethod
+    def from_model(cls, schedule) -> "ScheduleDTO":
+        data = schedule.model_dump()
+        data["chat_ids"] = [int(item) for item in schedule.chat_ids.split(",") if item]
+        return cls(**data)
+
+
+class ScheduleRequest(BaseModel):
+    name: str
+    template_id: int
+    chat_ids: list[int] = Field(default_factory=list)
+    run_at: datetime | None = None
+    interval_seconds: int | None = None
+    cron: str | None = None
+    misfire_policy: str = "once"
+    misfire_grace_seconds: int = 300
+
+
+class FeedDTO(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    url: str
+    name: str
+    include: str | None
+    exclude: str | None
+    text_format: str | None
+    parse_mode: str
+    enabled: bool
+    last_checked_at: datetime | None
+    last_status: int | None
+    last_error: str | None
+
+
+class FeedRequest(BaseModel):
+    url: str
+    name: str
+    include: str | None = None
+    exclude: str | None = None
+    text_format: str | None = None
+    parse_mode: str = "HTML"
+
+
+class FeedPollRequest(BaseModel):
+    feed_ids: list[int] | None = None
+
+
+class FeedPollResponse(BaseModel):
+    feeds: int
+    modified: int
+    not_modified: int
+    failed: int
+    created: int
+    filtered: int
+    duplicates: int
+    template_ids: list[int]
 
 
 class DeleteRequest(BaseModel):
     template_ids: list[int] = Field(default_factory=list)
 
 
+class LookupRequest(BaseModel):
+    template_ids: list[int] = Field(default_factory=list)
+
+
 @app.get("/", response_class=FileResponse)
 async def serve_index():
     index_path = FRONTEND_DIR / "index.html"
@@ -78,53 +312,274 @@ async def serve_index():
 
 
 @app.get("/api/templates", response_model=TemplatesResponse)
-async def list_templates(include_sent: bool = True, session: Session = Depends(get_session)):
-    service = TemplateService(session)
-    items = service.list_templates(include_sent=include_sent)
-    return TemplatesResponse(items=items)
+async def list_templates(
+    include_sent: bool = True,
+    was_sent: bool | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = None,
+    view: Literal["full", "summary"] = "full",
+    session: AsyncSession = Depends(get_session),
+):
+    if not include_sent and was_sent is None:
+        was_sent = False
+    try:
+        page = await AsyncTemplateService(session).list_page(limit=limit, cursor=cursor, was_sent=was_sent, summary=view == "summary")
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail="无效的分页游标") from exc
+    dto = TemplateSummaryDTO if view == "summary" else TemplateDTO
+    return TemplatesResponse(items=[dto.model_validate(item) for item in page.items], next_cursor=page.next_cursor)
+
+
+@app.get("/api/templates/counts", response_model=TemplateCountsResponse)
+async def template_counts(session: AsyncSession = Depends(get_session)):
+    return asdict(await AsyncTemplateService(session).count_templates())
+
+
+@app.post("/api/templates/lookup", response_model=list[TemplateSummaryDTO])
+async def lookup_templates(payload: LookupRequest, session: AsyncSession = Depends(get_session)):
+    summaries = await AsyncTemplateService(session).get_summaries(payload.template_ids)
+    return [TemplateSummaryDTO.model_validate(item) for item in summaries]
 
 
 @app.get("/api/chats")
-async def list_chats(session: Session = Depends(get_session)):
-    chats = session.exec(select(Chat).where(Chat.is_active.is_(True))).all()
+async def list_chats(include_inactive: bool = False, session: AsyncSession = Depends(get_session)):
+    settings = get_settings()
+    cooldown = timedelta(seconds=settings.chat_failure_cooldown)
+    now = datetime.utcnow()
+    statement = select(Chat) if include_inactive else select(Chat).where(Chat.is_active.is_(True))
+    chats = (await session.exec(statement)).all()
     return [
         {
             "chat_id": chat.chat_id,
             "title": chat.title or str(chat.chat_id),
             "type": chat.type,
+            "is_active": chat.is_active,
+            "failure_score": chat.failure_score,
+            "last_error": chat.last_error,
+            "skip_reason": chat_skip_reason(
+                chat.is_active,
+                chat.failure_score,
+                chat.last_failure_at,
+                chat.last_error,
+                threshold=settings.chat_failure_threshold,
+                cooldown=cooldown,
+                now=now,
+            ),
         }
         for chat in chats
     ]
 
 
-@app.post("/api/templates/send", response_model=TemplatesResponse)
-async def send_templates(payload: SendRequest, session: Session = Depends(get_session)):
+@app.post("/api/templates/send", response_model=SendJobResponse, status_code=202)
+async def send_templates(payload: SendRequest, session: AsyncSession = Depends(get_session)):
     if not payload.template_ids:
         raise HTTPException(status_code=400, detail="template_ids 不能为空")
     if not payload.chat_ids:
         raise HTTPException(status_code=400, detail="chat_ids 不能为空")
 
-    service = TemplateService(session)
-    templates = [service.get_template_by_id(template_id) for template_id in payload.template_ids]
+    try:
+        job_id, queued = await session.run_sync(
+            lambda sync_session: DeliveryService(sync_session).enqueue(payload.template_ids, payload.chat_ids, request_id=payload.request_id)
+        )
+    except TemplateNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=f"模板不存在：{exc}") from exc
+    duplicates = len(set(payload.template_ids)) * len(set(payload.chat_ids)) - queued
+    if queued:
+        notify_delivery_workers()
+    logger.info("deliveries queued", job_id=job_id, queued=queued, duplicates=duplicates, templates=len(payload.template_ids), chats=len(payload.chat_ids))
+    return SendJobResponse(job_id=job_id, queued=queued, duplicates=duplicates)
+
+
+async def load_job_status(session: AsyncSession, job_id: str) -> JobStatusResponse | None:
+    summary = await session.run_sync(lambda sync_session: DeliveryService(sync_session).job_summary(job_id))
+    if summary.total == 0:
+        return None
+    failures = []
+    if summary.failed:
+        failures = await session.run_sync(lambda sync_session: DeliveryService(sync_session).list_failed(job_id))
+    return JobStatusResponse(
+        job_id=summary.job_id,
+        total=summary.total,
+        pending=summary.pending,
+        sending=summary.sending,
+        sent=summary.sent,
+        failed=summary.failed,
+        done=summary.done,
+        failures=[FailedDeliveryDTO.model_validate(item) for item in failures],
+    )
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobStatusResponse)
+async def job_status(job_id: str, session: AsyncSession = Depends(get_session)):
+    status = await load_job_status(session, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return status
+
+
+def sse_message(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def job_event_stream(request: Request, subscription: ProgressSubscription, status: JobStatusResponse) -> AsyncIterator[str]:
+    """先推送批次汇总，随后推送合并后的逐条进度；批次结束时推送 done 并关闭。
+
+    每个连接只持有一个有界的订阅缓冲。worker 在其它进程运行时收不到逐条事件，
+    此时每 SUMMARY_REFRESH_SECONDS 秒从数据库重新读取一次汇总。
+    """
+
+    try:
+        yield sse_message("summary", status.model_dump(mode="json"))
+        while not status.done:
+            if await request.is_disconnected():
+                return
+            batch = await subscription.next_batch(timeout=SUMMARY_REFRESH_SECONDS)
+            if batch is not None and (batch.counts or batch.dropped):
+                yield sse_message(
+                    "progress",
+                    {"counts": batch.counts, "dropped": batch.dropped, "events": [asdict(event) for event in batch.events]},
+                )
+            if batch is None or batch.committed:
+                async with async_session_scope() as session:
+                    latest = await load_job_status(session, status.job_id)
+                if latest is None:
+                    return
+                if latest != status:
+                    yield sse_message("summary", latest.model_dump(mode="json"))
+                else:
+                    yield ": keep-alive\n\n"
+                status = latest
+        yield sse_message("done", status.model_dump(mode="json"))
+    finally:
+        subscription.close()
 
-    for tpl in templates:
-        for chat_id in payload.chat_ids:
-            await send_manual_broadcast(
-                template_name=tpl.name,
-                chat_id=chat_id,
-                override_text=None,
-                dry_run=False,
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    subscription = get_progress_hub().subscribe(job_id)
+    async with async_session_scope() as session:
+        status = await load_job_status(session, job_id)
+    if status is None:
+        subscription.close()
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return StreamingResponse(
+        job_event_stream(request, subscription, status),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/schedules", response_model=list[ScheduleDTO])
+async def list_schedules(session: AsyncSession = Depends(get_session)):
+    schedules = await session.run_sync(lambda sync_session: ScheduleService(sync_session).list_schedules())
+    return [ScheduleDTO.from_model(schedule) for schedule in schedules]
+
+
+@app.post("/api/schedules", response_model=ScheduleDTO, status_code=201)
+async def create_schedule(payload: ScheduleRequest, session: AsyncSession = Depends(get_session)):
+    try:
+        schedule = await session.run_sync(
+            lambda sync_session: ScheduleService(sync_session).create_schedule(
+                payload.name,
+                payload.template_id,
+                payload.chat_ids,
+                run_at=payload.run_at,
+                interval_seconds=payload.interval_seconds,
+                cron=payload.cron,
+                misfire_policy=payload.misfire_policy,
+                misfire_grace_seconds=payload.misfire_grace_seconds,
+            )
+        )
+    except ScheduleError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except TemplateNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=f"模板不存在：{exc}") from exc
+    notify_scheduler(schedule.id, schedule.next_run_at)
+    logger.info("schedule created", schedule_id=schedule.id, template_id=schedule.template_id, next_run_at=schedule.next_run_at)
+    return ScheduleDTO.from_model(schedule)
+
+
+@app.delete("/api/schedules/{schedule_id}", status_code=204)
+async def delete_schedule(schedule_id: int, session: AsyncSession = Depends(get_session)):
+    if not await session.run_sync(lambda sync_session: ScheduleService(sync_session).delete_schedule(schedule_id)):
+        raise HTTPException(status_code=404, detail="定时任务不存在")
+    notify_scheduler(schedule_id, None)
+    logger.info("schedule deleted", schedule_id=schedule_id)
+
+
+@app.get("/api/feeds", response_model=list[FeedDTO])
+async def list_feeds(session: AsyncSession = Depends(get_session)):
+    feeds = await session.run_sync(lambda sync_session: FeedService(sync_session).list_feeds())
+    return [FeedDTO.model_validate(feed) for feed in feeds]
+
+
+@app.post("/api/feeds", response_model=FeedDTO, status_code=201)
+async def create_feed(payload: FeedRequest, session: AsyncSession = Depends(get_session)):
+    try:
+        feed = await session.run_sync(
+            lambda sync_session: FeedService(sync_session).create_feed(
+                payload.url,
+                payload.name,
+                include=payload.include,
+                exclude=payload.exclude,
+                text_format=payload.text_format,
+                parse_mode=payload.parse_mode,
             )
+        )
+    except FeedError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    logger.info("feed created", feed_id=feed.id, url=feed.url)
+    return FeedDTO.model_validate(feed)
+
+
+@app.delete("/api/feeds/{feed_id}", status_code=204)
+async def delete_feed(feed_id: int, session: AsyncSession = Depends(get_session)):
+    if not await session.run_sync(lambda sync_session: FeedService(sync_session).delete_feed(feed_id)):
+        raise HTTPException(status_code=404, detail="订阅源不存在")
+    logger.info("feed deleted", feed_id=feed_id)
+
+
+@app.post("/api/feeds/poll", response_model=FeedPollResponse)
+async def poll_feeds(payload: FeedPollRequest | None = None):
+    result = await get_feed_poller().run_once(payload.feed_ids if payload else None)
+    return FeedPollResponse(**asdict(result))
+
+
+@app.post("/api/templates/delete", response_model=DeleteResponse)
+async def delete_templates(payload: DeleteRequest, session: AsyncSession = Depends(get_session)):
+    deleted_ids = await AsyncTemplateService(session).delete_templates_returning(payload.template_ids)
+    return DeleteResponse(deleted_ids=deleted_ids)
+
+
+@app.get("/api/rate-limit")
+async def rate_limit_status():
+    return asdict(get_rate_limiter().snapshot())
+
+
+@app.get("/api/templates/cache")
+async def template_cache_status():
+    return asdict(get_template_cache().stats())
+
+
+@app.post("/telegram/webhook")
+async def telegram_webhook(request: Request):
+    settings = get_settings()
+    secret = request.headers.get("x-telegram-bot-api-secret-token", "")
+    if settings.updates_mode != "webhook" or not settings.webhook_secret or not hmac.compare_digest(secret, settings.webhook_secret):
+        raise HTTPException(status_code=403, detail="webhook 未启用或密钥不匹配")
+    try:
+        update = Update.de_json(await request.json(), None)
+    except (ValueError, TypeError, KeyError) as exc:
+        raise HTTPException(status_code=400, detail="无效的更新") from exc
+    await get_update_batcher().submit(update)
+    return {"ok": True}
 
-    service.mark_templates_sent(payload.template_ids)
-    items = service.list_templates()
-    return TemplatesResponse(items=items)
 
+@app.get("/metrics")
+async def metrics(session: AsyncSession = Depends(get_session)):
+    """Prometheus 抓取端点：刷新队列深度后输出本进程的全部指标。"""
 
-@app.post("/api/templates/delete", response_model=TemplatesResponse)
-async def delete_templates(payload: DeleteRequest, session: Session = Depends(get_session)):
-    service = TemplateService(session)
-    if payload.template_ids:
-        service.delete_templates(payload.template_ids)
-    items = service.list_templates()
-    return TemplatesResponse(items=items)
+    depth = await session.run_sync(lambda sync_session: DeliveryService(sync_session).queue_depth())
+    for status, count in depth.items():
+        DELIVERY_QUEUE_DEPTH.labels(status).set(count)
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)